@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+# Lower value = served first
+MANUAL = 0
+CAMERA = 1
+PRIORITY_NAMES = {MANUAL: "manual", CAMERA: "camera"}
+
+DEFAULT_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "8"))
+DEFAULT_QUEUE = int(os.getenv("ADMISSION_QUEUE", "32"))
+MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_WAIT_SECONDS", "2"))
+# Camera requests may only fill this share of a queue, so a teacher's click
+# always finds a slot even while every camera in the building retries
+CAMERA_QUEUE_SHARE = float(os.getenv("ADMISSION_CAMERA_QUEUE_SHARE", "0.5"))
+MAX_RETRY_AFTER = 30
+
+
+class Rejected(Exception):
+    """Raised when a gate sheds a request; carries the Retry-After hint."""
+
+    def __init__(self, gate: str, reason: str, retry_after: int):
+        super().__init__(f"{gate} is busy ({reason})")
+        self.gate = gate
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """Bounded concurrency for one endpoint, with a small priority queue.
+
+    At most ``concurrency`` requests run at once. Up to ``max_queue`` more
+    wait (manual actions ahead of camera traffic, FIFO within a priority)
+    for at most ``max_wait`` seconds. Anything beyond that is rejected
+    straight away with a Retry-After estimated from the queue depth and the
+    recent service time, instead of piling onto the database and timing out.
+
+    Limits are per process; with N workers the database sees N times them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_queue: int = DEFAULT_QUEUE,
+        max_wait: float = MAX_WAIT_SECONDS,
+    ):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting: list = []
+        self.sequence = itertools.count()
+        self.service_time = 0.05
+        self.condition = threading.Condition()
+        self.counters: Dict[str, int] = {}
+
+    def _count(self, key: str) -> None:
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    def _queue_limit(self, priority: int) -> int:
+        if priority == MANUAL:
+            return self.max_queue
+        return int(self.max_queue * CAMERA_QUEUE_SHARE)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained."""
+
+        backlog = len(self.waiting) + self.active + 1
+        estimate = backlog / self.concurrency * self.service_time
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(estimate)))
+
+    def _reject(self, priority: int, reason: str) -> Rejected:
+        self._count(f"shed_{PRIORITY_NAMES[priority]}")
+        self._count(f"shed_{reason}")
+        return Rejected(self.name, reason, self.retry_after())
+
+    def acquire(self, priority: int = MANUAL) -> None:
+        with self.condition:
+            if self.active < self.concurrency and not self.waiting:
+                self.active += 1
+                self._count(f"admitted_{PRIORITY_NAMES[priority]}")
+                return
+            if len(self.waiting) >= self._queue_limit(priority):
+                raise self._reject(priority, "queue_full")
+
+            entry = (priority, next(self.sequence))
+            heapq.heappush(self.waiting, entry)
+            self._count("queued")
+            deadline = time.monotonic() + self.max_wait
+            while not (self.active < self.concurrency and self.waiting[0] == entry):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    # Our slot may have been the one the head was waiting behind
+                    self.condition.notify_all()
+                    raise self._reject(priority, "timeout")
+                self.condition.wait(remaining)
+            heapq.heappop(self.waiting)
+            self.active += 1
+            self._count(f"admitted_{PRIORITY_NAMES[priority]}")
+            self.condition.notify_all()
+
+    def release(self, elapsed: Optional[float] = None) -> None:
+        with self.condition:
+            self.active -= 1
+            if elapsed is not None:
+                self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+            self.condition.notify_all()
+
+    @contextmanager
+    def admit(self, priority: int = MANUAL):
+        self.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self) -> Dict:
+        with self.condition:
+            return {
+                "concurrency": self.concurrency,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queued": len(self.waiting),
+                "service_ms": round(self.service_time * 1000, 1),
+                "counters": dict(self.counters),
+            }
+
+
+class AdmissionController:
+    """The process-wide set of gates, created on first use."""
+
+    def __init__(self):
+        self.gates: Dict[str, AdmissionGate] = {}
+        self.lock = threading.Lock()
+
+    def gate(self, name: str) -> AdmissionGate:
+        with self.lock:
+            gate = self.gates.get(name)
+            if gate is None:
+                prefix = f"ADMISSION_{name.upper()}"
+                gate = AdmissionGate(
+                    name,
+                    concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", DEFAULT_CONCURRENCY)),
+                    max_queue=int(os.getenv(f"{prefix}_QUEUE", DEFAULT_QUEUE)),
+                )
+                self.gates[name] = gate
+            return gate
+
+    def stats(self) -> Dict[str, Dict]:
+        with self.lock:
+            gates = list(self.gates.values())
+        return {gate.name: gate.stats() for gate in gates}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.gates.clear()
+
+
+controller = AdmissionController()
@@ -0,0 +1,111 @@
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+
+# Compact status codes used by the columnar snapshot. The SQL query maps
+# Student_Attendance.status onto these so only small integers leave the DB.
+STATUS_CODES = {
+    "present": 0,
+    "late": 1,
+    "absent": 2,
+    "excused": 3,
+    "unknown": 4,
+}
+STATUS_LABELS = [label for label, _ in sorted(STATUS_CODES.items(), key=lambda item: item[1])]
+
+INTERVALS = {"day", "week"}
+
+
+def snapshot_to_arrays(rows: Iterable[Tuple[date, int, int]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Convert (session_date, lecture_id, status_code) rows into NumPy columns.
+
+    Dates become integer day numbers since the epoch so bucketing is plain
+    integer arithmetic.
+    """
+
+    rows = list(rows)
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.copy(), empty.copy()
+
+    session_dates, lecture_ids, codes = zip(*rows)
+    days = np.array(session_dates, dtype="datetime64[D]").astype(np.int64)
+    return (
+        days,
+        np.asarray(lecture_ids, dtype=np.int64),
+        np.asarray(codes, dtype=np.int64),
+    )
+
+
+def bucket_days(days: np.ndarray, interval: str) -> np.ndarray:
+    """Floor epoch day numbers to the start of their day or ISO week (Monday)."""
+
+    if interval == "week":
+        # 1970-01-01 was a Thursday, so shift by 3 to align buckets on Monday.
+        return days - (days + 3) % 7
+    return days
+
+
+def aggregate_timeseries(
+    days: np.ndarray,
+    group_index: np.ndarray,
+    codes: np.ndarray,
+    interval: str,
+) -> Dict[str, List]:
+    """Group attendance rows by (period, group) and count statuses per bucket.
+
+    ``group_index`` holds a dense 0..n-1 index per row (lecture or department).
+    Returns columnar lists sorted by group, then period.
+    """
+
+    if days.size == 0:
+        series = {"period": [], "group": [], "total": [], "rate": []}
+        series.update({label: [] for label in STATUS_LABELS})
+        return series
+
+    periods = bucket_days(days, interval)
+    period_values, period_index = np.unique(periods, return_inverse=True)
+    n_periods = period_values.size
+
+    # One composite key per row; np.unique gives sorted keys and the inverse
+    # map that bincount uses to accumulate every status in a single pass.
+    keys = group_index * n_periods + period_index
+    unique_keys, key_index = np.unique(keys, return_inverse=True)
+    n_status = len(STATUS_LABELS)
+    counts = np.bincount(
+        key_index * n_status + codes, minlength=unique_keys.size * n_status
+    ).reshape(unique_keys.size, n_status)
+
+    totals = counts.sum(axis=1)
+    present = counts[:, STATUS_CODES["present"]]
+    rates = np.round(np.divide(present * 100.0, totals, out=np.zeros(totals.shape), where=totals > 0), 1)
+
+    period_dates = period_values[unique_keys % n_periods].astype("datetime64[D]")
+    series = {
+        "period": np.datetime_as_string(period_dates).tolist(),
+        "group": (unique_keys // n_periods).tolist(),
+        "total": totals.tolist(),
+        "rate": rates.tolist(),
+    }
+    for label in STATUS_LABELS:
+        series[label] = counts[:, STATUS_CODES[label]].tolist()
+    return series
+
+
+def dense_groups(lecture_ids: np.ndarray, lecture_keys: Dict[int, object]) -> Tuple[List, np.ndarray]:
+    """Map each row's lecture to a dense group index.
+
+    ``lecture_keys`` maps lecture_id to its group key: the lecture id itself for
+    per-lecture series or the department name for per-department series. Only
+    the distinct lectures are looked up in Python; rows are mapped vectorized.
+    """
+
+    unique_lectures, lecture_index = np.unique(lecture_ids, return_inverse=True)
+    keys = [lecture_keys.get(int(lecture_id)) for lecture_id in unique_lectures]
+    # Natural order of the keys themselves (ids numerically), unknown last
+    labels = sorted({key for key in keys if key is not None}) + ([None] if None in keys else [])
+    positions = {key: index for index, key in enumerate(labels)}
+    mapping = np.array([positions[key] for key in keys], dtype=np.int64)
+    return labels, mapping[lecture_index]
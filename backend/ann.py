@@ -0,0 +1,392 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from recognition import normalize_rows, parse_embeddings
+
+
+DEFAULT_N_PROBE = 8
+SAVE_INTERVAL_SECONDS = 300
+INDEX_PATH = os.getenv(
+    "ANN_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "campus_ivf.npz"),
+)
+KMEANS_ITERATIONS = 12
+TRAINING_SAMPLE_PER_LIST = 64
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    n_lists: int,
+    iterations: int = KMEANS_ITERATIONS,
+    seed: int = 0,
+) -> np.ndarray:
+    """Cluster L2-normalized vectors by cosine similarity and return centroids."""
+
+    rng = np.random.default_rng(seed)
+    sample_size = min(vectors.shape[0], n_lists * TRAINING_SAMPLE_PER_LIST)
+    sample = vectors[rng.choice(vectors.shape[0], sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=n_lists)
+        empty = counts == 0
+        # Re-seed empty clusters from random points so every list stays useful
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over face templates with a k-means coarse quantizer.
+
+    Each template lives in the list of its nearest centroid. A search scores the
+    query against the centroids, then scans only the ``n_probe`` closest lists:
+    raising ``n_probe`` trades latency for recall, and ``n_probe >= n_lists``
+    (or ``exact=True``) is a brute-force scan. Ids are user ids and may own
+    several templates.
+    """
+
+    def __init__(self, dim: int, n_probe: int = DEFAULT_N_PROBE):
+        self.dim = dim
+        self.n_probe = n_probe
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.list_ids: List[np.ndarray] = []
+        self.list_vectors: List[np.ndarray] = []
+        self.id_lists: Dict[int, Set[int]] = {}
+        self.trained_size = 0
+        self.lock = threading.RLock()
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def size(self) -> int:
+        return sum(ids.size for ids in self.list_ids)
+
+    def __len__(self) -> int:
+        return len(self.id_lists)
+
+    def __contains__(self, user_id) -> bool:
+        return int(user_id) in self.id_lists
+
+    @property
+    def needs_retrain(self) -> bool:
+        """True once the index has grown well past the data it was trained on."""
+
+        return self.size > 4 * max(self.trained_size, 1)
+
+    def retrain(self, n_lists: Optional[int] = None) -> None:
+        """Re-cluster the templates already in the index and redistribute them."""
+
+        with self.lock:
+            if not self.list_ids:
+                return
+            ids = np.concatenate(self.list_ids)
+            vectors = np.vstack(self.list_vectors)
+            if ids.size == 0:
+                return
+            self.train(vectors, n_lists)
+            self.add(ids, vectors)
+
+    def train(self, vectors: np.ndarray, n_lists: Optional[int] = None) -> None:
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(vectors.shape[0])))
+        n_lists = max(1, min(n_lists, vectors.shape[0]))
+        with self.lock:
+            self.centroids = spherical_kmeans(vectors, n_lists).astype(np.float32)
+            self.list_ids = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+            self.list_vectors = [np.empty((0, self.dim), dtype=np.float32) for _ in range(n_lists)]
+            self.id_lists = {}
+            self.trained_size = vectors.shape[0]
+
+    def add(self, user_ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Insert templates; call ``train`` first (or use ``build``)."""
+
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape[0] == 0:
+            return
+        with self.lock:
+            assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+            for list_no in np.unique(assignment):
+                mask = assignment == list_no
+                self.list_ids[list_no] = np.concatenate([self.list_ids[list_no], user_ids[mask]])
+                self.list_vectors[list_no] = np.vstack([self.list_vectors[list_no], vectors[mask]])
+                for user_id in np.unique(user_ids[mask]):
+                    self.id_lists.setdefault(int(user_id), set()).add(int(list_no))
+
+    def remove(self, user_id: int) -> bool:
+        with self.lock:
+            lists = self.id_lists.pop(int(user_id), None)
+            if not lists:
+                return False
+            for list_no in lists:
+                keep = self.list_ids[list_no] != user_id
+                self.list_ids[list_no] = self.list_ids[list_no][keep]
+                self.list_vectors[list_no] = self.list_vectors[list_no][keep]
+            return True
+
+    @classmethod
+    def build(cls, user_ids: np.ndarray, vectors: np.ndarray, n_lists: Optional[int] = None, n_probe: int = DEFAULT_N_PROBE) -> "IVFIndex":
+        index = cls(vectors.shape[1], n_probe=n_probe)
+        index.train(vectors, n_lists)
+        index.add(user_ids, vectors)
+        return index
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        n_probe: Optional[int] = None,
+        exact: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (user ids, scores) of the k best users per query, best first.
+
+        Rows with fewer than k candidates are padded with id -1 and score -inf.
+        """
+
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        queries = normalize_rows(np.asarray(queries, dtype=np.float32))
+        n_queries = queries.shape[0]
+        out_ids = np.full((n_queries, k), -1, dtype=np.int64)
+        out_scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+
+        with self.lock:
+            if self.n_lists == 0 or n_queries == 0:
+                return out_ids, out_scores
+            n_probe = self.n_lists if exact else min(n_probe or self.n_probe, self.n_lists)
+            coarse = queries @ self.centroids.T
+            if n_probe < self.n_lists:
+                probed = np.argpartition(-coarse, n_probe - 1, axis=1)[:, :n_probe]
+            else:
+                probed = np.tile(np.arange(self.n_lists), (n_queries, 1))
+
+            for row in range(n_queries):
+                lists = probed[row]
+                ids = np.concatenate([self.list_ids[list_no] for list_no in lists])
+                if ids.size == 0:
+                    continue
+                vectors = np.vstack([self.list_vectors[list_no] for list_no in lists])
+                scores = vectors @ queries[row]
+
+                # Best template per user: sort by score, keep first occurrence
+                order = np.argsort(-scores, kind="stable")
+                _, first = np.unique(ids[order], return_index=True)
+                best = np.sort(first)[:k]
+                out_ids[row, : best.size] = ids[order][best]
+                out_scores[row, : best.size] = scores[order][best]
+        return out_ids, out_scores
+
+    def save(self, path: str) -> None:
+        with self.lock:
+            sizes = np.array([ids.size for ids in self.list_ids], dtype=np.int64)
+            ids = np.concatenate(self.list_ids) if self.list_ids else np.empty(0, dtype=np.int64)
+            vectors = (
+                np.vstack(self.list_vectors) if self.list_vectors else np.empty((0, self.dim), dtype=np.float32)
+            )
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            temp_path = f"{path}.tmp.npz"
+            np.savez(
+                temp_path,
+                centroids=self.centroids,
+                sizes=sizes,
+                ids=ids,
+                vectors=vectors,
+                meta=np.array([self.dim, self.n_probe, self.trained_size], dtype=np.int64),
+            )
+            os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            dim, n_probe, trained_size = (int(value) for value in data["meta"])
+            index = cls(dim, n_probe=n_probe)
+            index.centroids = data["centroids"]
+            index.trained_size = trained_size
+            bounds = np.concatenate([[0], np.cumsum(data["sizes"])])
+            ids, vectors = data["ids"], data["vectors"]
+        for list_no in range(index.n_lists):
+            start, end = bounds[list_no], bounds[list_no + 1]
+            index.list_ids.append(ids[start:end].copy())
+            index.list_vectors.append(vectors[start:end].copy())
+            for user_id in np.unique(index.list_ids[list_no]):
+                index.id_lists.setdefault(int(user_id), set()).add(list_no)
+        return index
+
+
+def rows_to_templates(rows) -> Tuple[np.ndarray, np.ndarray]:
+    """Flatten (user_id, face_embeddings) rows into parallel id/template arrays."""
+
+    ids: List[np.ndarray] = []
+    templates: List[np.ndarray] = []
+    dim = None
+    for user_id, raw in rows:
+        parsed = parse_embeddings(raw)
+        if parsed is None or (dim is not None and parsed.shape[1] != dim):
+            continue
+        dim = parsed.shape[1]
+        templates.append(parsed)
+        ids.append(np.full(parsed.shape[0], user_id, dtype=np.int64))
+    if not templates:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    return np.concatenate(ids), np.vstack(templates)
+
+
+_campus_index: Optional[IVFIndex] = None
+# True once get_campus_index has run, even if there was nothing to index
+_campus_loaded = False
+_campus_lock = threading.Lock()
+_last_saved = 0.0
+
+
+def get_campus_index(load_ids, load_rows, path: Optional[str] = None) -> Optional[IVFIndex]:
+    """Return the campus-wide index, loading it from disk or building it once.
+
+    ``load_ids()`` returns the user ids that should be searchable and
+    ``load_rows(user_ids)`` their (user_id, face_embeddings) rows (all rows when
+    ``user_ids`` is None). A persisted index is reconciled against ``load_ids``
+    so students created or deleted while the server was down are picked up.
+    An empty result is remembered too; the first enrollment then starts the
+    index (see ``index_student``).
+    """
+
+    global _campus_index, _campus_loaded, _last_saved
+    path = path or INDEX_PATH
+    with _campus_lock:
+        if _campus_loaded:
+            return _campus_index
+
+        index = None
+        if os.path.exists(path):
+            try:
+                index = IVFIndex.load(path)
+            except (OSError, ValueError, KeyError):
+                index = None
+
+        if index is not None:
+            wanted = {int(user_id) for user_id in load_ids()}
+            indexed = set(index.id_lists)
+            for user_id in indexed - wanted:
+                index.remove(user_id)
+            missing = wanted - indexed
+            if missing:
+                user_ids, templates = rows_to_templates(load_rows(sorted(missing)))
+                if templates.shape[0] and templates.shape[1] == index.dim:
+                    index.add(user_ids, templates)
+            if missing or indexed - wanted:
+                index.save(path)
+        else:
+            user_ids, templates = rows_to_templates(load_rows(None))
+            if templates.shape[0]:
+                index = IVFIndex.build(user_ids, templates)
+                index.save(path)
+
+        _campus_index = index
+        _campus_loaded = True
+        _last_saved = time.monotonic()
+        return index
+
+
+def _save_throttled(path: str) -> None:
+    global _last_saved
+    if _campus_index is not None and time.monotonic() - _last_saved >= SAVE_INTERVAL_SECONDS:
+        _campus_index.save(path)
+        _last_saved = time.monotonic()
+
+
+def index_student(user_id: int, raw_embeddings, path: Optional[str] = None) -> None:
+    """Insert (or replace) a student's templates in the loaded campus index.
+
+    Lists keep the centroids they were trained with, so once the index has
+    grown well past its training set it is re-clustered in place.
+    """
+
+    global _campus_index
+    if not _campus_loaded:
+        return
+    path = path or INDEX_PATH
+    parsed = parse_embeddings(raw_embeddings)
+    user_ids = None if parsed is None else np.full(parsed.shape[0], user_id, dtype=np.int64)
+    with _campus_lock:
+        if _campus_index is None:
+            # Nothing was indexed yet: this student's templates start the index
+            if parsed is not None:
+                _campus_index = IVFIndex.build(user_ids, parsed)
+                _campus_index.save(path)
+            return
+    _campus_index.remove(user_id)
+    if parsed is not None and parsed.shape[1] == _campus_index.dim:
+        _campus_index.add(user_ids, parsed)
+        if _campus_index.needs_retrain:
+            _campus_index.retrain()
+    _save_throttled(path)
+
+
+def unindex_student(user_id: int, path: Optional[str] = None) -> None:
+    if _campus_index is None:
+        return
+    if _campus_index.remove(user_id):
+        _save_throttled(path or INDEX_PATH)
+
+
+def reset_campus_index() -> None:
+    """Forget the in-memory index so the next lookup reloads or rebuilds it."""
+
+    global _campus_index, _campus_loaded
+    with _campus_lock:
+        _campus_index = None
+        _campus_loaded = False
+
+
+def rebuild_campus_index(load_rows, path: str = INDEX_PATH, n_lists: Optional[int] = None) -> Optional[IVFIndex]:
+    """Retrain the coarse quantizer on all current templates and persist it."""
+
+    global _campus_index, _campus_loaded, _last_saved
+    user_ids, templates = rows_to_templates(load_rows(None))
+    if templates.shape[0] == 0:
+        return None
+    index = IVFIndex.build(user_ids, templates, n_lists=n_lists)
+    index.save(path)
+    with _campus_lock:
+        _campus_index = index
+        _campus_loaded = True
+        _last_saved = time.monotonic()
+    return index
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild the campus-wide face index.")
+    parser.add_argument("--lists", type=int, default=None, help="Number of IVF lists (default: sqrt(n)).")
+    parser.add_argument("--path", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    from app import app, load_campus_rows
+
+    with app.app_context():
+        started = time.perf_counter()
+        index = rebuild_campus_index(load_campus_rows, path=args.path, n_lists=args.lists)
+        if index is None:
+            print("No usable face embeddings found; index not written.")
+            return
+        print(
+            f"Indexed {len(index)} students ({index.size} templates, {index.n_lists} lists) "
+            f"in {time.perf_counter() - started:.2f}s -> {args.path}"
+        )
+
+
+if __name__ == "__main__":
+    main()
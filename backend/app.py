@@ -1,14 +1,61 @@
 import os
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
+from functools import wraps
 from typing import Tuple
 from urllib.parse import quote_plus
 
-from flask import Flask, jsonify, request
+import numpy as np
+from flask import Flask, current_app, jsonify, request
 from flask_cors import CORS
-from sqlalchemy import case, func, or_, text
-from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy import bindparam, case, func, insert, or_, text, update
+from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
+from sqlalchemy.orm import joinedload
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from admission import CAMERA, MANUAL, Rejected, controller as admission
+from analytics import INTERVALS, STATUS_CODES, aggregate_timeseries, dense_groups, snapshot_to_arrays
+from ann import get_campus_index, index_student
+from dashboard_cache import dashboard_cache
+from embedding import MAX_IMAGES as MAX_ENROLLMENT_IMAGES, decode_payload, enrollments, image_list
+from archive import attendance_source
+from bitsets import store as bitset_store, summarize as summarize_bitset
+from cache_sync import follower as cache_follower, forget_lectures, forget_users
+from counts import overview_counts
+from jobs import HANDLERS as JOB_HANDLERS, enqueue, handler as job_handler
+from changes import ENTITIES as CHANGE_ENTITIES, attendance_rows, enrollment_key, log_change, log_changes, read_changes
+from presence import start_flusher as start_presence_flusher, tracker as presence_tracker
+from quality import TEMPLATES_PER_STUDENT, apply_best_templates, best_templates, score_pending
+from seats import claim_seat, holds_seat, join_waitlist, promote_waitlist, recount as recount_seats, release_seats
+from search import (
+    DEFAULT_LIMIT,
+    MAX_LIMIT,
+    build_documents,
+    get_search_index,
+    index_document,
+    lecture_document,
+    user_document,
+)
+from serialization import columnar_response, install_json_provider, wants_columnar
+from session_lifecycle import finalize_session
+from sync import MAX_EVENTS as SYNC_MAX_EVENTS, apply_events as apply_sync_events
+from timetable import (
+    backfill as backfill_timetable,
+    format_schedule,
+    index as timetable_index,
+    parse_schedule,
+    replace_slots,
+    resolve_session,
+    slots_from_payload,
+)
+from recognition import (
+    DEFAULT_THRESHOLD,
+    DEFAULT_TOP_K,
+    MAX_TOP_K,
+    assign_candidates,
+    get_cached_gallery,
+    invalidate_galleries,
+    parse_embeddings,
+)
 from models import (
     db,
     User,
@@ -20,8 +67,13 @@ from models import (
     StudentAttendance,
     Camera,
     Department,
+    StudentAttendanceArchive,
     FaceDataset,
-    AttendanceCorrectionRequest
+    AttendanceCorrectionRequest,
+    AttendanceRisk,
+    LectureWaitlist,
+    LectureSlot,
+    BackgroundJob,
 )
 
 
@@ -69,12 +121,28 @@ def create_app() -> Flask:
 
     db.init_app(app)
     CORS(app)
+    install_json_provider(app)
 
     register_error_handlers(app)
     register_routes(app)
+    if os.getenv("PRESENCE_FLUSH_THREAD", "1") != "0":
+        # Started by the first request, so only processes that serve the API
+        # run it; CLIs that import app for an app context never do
+        app.before_request(lambda: start_presence_flusher(app))
+    app.before_request(follow_changes)
     return app
 
 
+def follow_changes() -> None:
+    """Apply deletes committed by the job worker or other API processes to this one's caches."""
+
+    try:
+        cache_follower.poll()
+    except (OperationalError, DBAPIError) as exc:
+        db.session.rollback()
+        current_app.logger.warning("Could not read Change_Log for cache sync: %s", exc)
+
+
 def validate_role(role: str) -> Tuple[bool, str]:
     normalized = (role or "").strip().upper()
     return normalized in ALLOWED_ROLES, normalized
@@ -178,6 +246,608 @@ def resolve_department_name(department_id, department_value):
     return None, None
 
 
+def parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    # time_in/time_out are local wall-clock times, like session_start_time
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def parse_date_range(args):
+    """Parse optional ``from``/``to`` query args (YYYY-MM-DD); raises ValueError."""
+
+    start_date = datetime.strptime(args["from"], "%Y-%m-%d").date() if args.get("from") else None
+    end_date = datetime.strptime(args["to"], "%Y-%m-%d").date() if args.get("to") else None
+    return start_date, end_date
+
+
+def lecture_timetable(lecture_id: int):
+    slots = (
+        LectureSlot.query.filter_by(lecture_id=lecture_id)
+        .order_by(LectureSlot.day_of_week, LectureSlot.start_time, LectureSlot.slot_id)
+        .all()
+    )
+    return [slot.to_dict() for slot in slots]
+
+
+def locked_session_response(session):
+    return error_response(f"Attendance for session {session.session_id} is locked", 409)
+
+
+def request_priority() -> int:
+    """Edge nodes and camera scripts identify themselves with X-Request-Source: camera."""
+
+    return CAMERA if request.headers.get("X-Request-Source", "").lower() == "camera" else MANUAL
+
+
+def admitted(gate: str, priority=None):
+    """Run the view under an admission gate; shed load with 429 and Retry-After."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with admission.gate(gate).admit(request_priority() if priority is None else priority):
+                    return view(*args, **kwargs)
+            except Rejected as exc:
+                response, status = error_response(f"Server busy, retry in {exc.retry_after}s", 429)
+                response.headers["Retry-After"] = str(exc.retry_after)
+                return response, status
+
+        return wrapper
+
+    return decorator
+
+
+def record_matches(session, matches) -> int:
+    """Feed recognized faces into the presence tracker; returns detections recorded."""
+
+    recorded = 0
+    for match in matches:
+        if match.get("user_id") is None:
+            continue
+        presence_tracker.observe(session, match["user_id"], match.get("confidence") or 0.0)
+        recorded += 1
+    presence_tracker.flush_if_due(session.session_id)
+    return recorded
+
+
+def user_dict_options(loader=None):
+    """Eager-load what User.to_dict() reads, optionally below another loader."""
+
+    options = (joinedload(User.student), joinedload(User.teacher))
+    return [loader.options(*options)] if loader is not None else list(options)
+
+
+def lecture_dict_options(loader=None):
+    """Eager-load the teacher graph Lecture.to_dict() walks."""
+
+    teacher = loader.joinedload(Lecture.teacher) if loader is not None else joinedload(Lecture.teacher)
+    return user_dict_options(teacher.joinedload(Teacher.user))
+
+
+def load_search_documents():
+    users = (
+        db.session.query(
+            User.user_id,
+            User.full_name,
+            User.username,
+            User.email,
+            User.role,
+            Student.roll_number,
+        )
+        .outerjoin(Student, Student.user_id == User.user_id)
+        .all()
+    )
+    lectures = db.session.query(Lecture.lecture_id, Lecture.lecture_name, Lecture.course_code).all()
+    return build_documents(((row, row.roll_number) for row in users), lectures)
+
+
+def load_campus_ids():
+    return [
+        row.user_id
+        for row in db.session.query(Student.user_id).filter(Student.enrollment_status == "Active")
+    ]
+
+
+def load_campus_rows(user_ids=None):
+    query = db.session.query(Student.user_id, Student.face_embeddings).filter(
+        Student.enrollment_status == "Active"
+    )
+    if user_ids is not None:
+        query = query.filter(Student.user_id.in_(user_ids))
+    return query.all()
+
+
+def load_teacher_roster(teacher_id: int, include_breakdown: bool = False):
+    """One row per distinct student across a teacher's lectures, with attendance stats."""
+
+    # Attendance stats for THIS teacher's classes, aggregated per student and lecture
+    lecture_stats = (
+        db.session.query(
+            StudentAttendance.user_id.label("user_id"),
+            AttendanceSession.lecture_id.label("lecture_id"),
+            func.count(StudentAttendance.attendance_id).label("total"),
+            func.sum(case((StudentAttendance.status.ilike("present"), 1), else_=0)).label("present"),
+            func.sum(case((StudentAttendance.status.ilike("absent"), 1), else_=0)).label("absent"),
+            func.sum(case((StudentAttendance.status.ilike("late"), 1), else_=0)).label("late"),
+        )
+        .join(AttendanceSession, AttendanceSession.session_id == StudentAttendance.session_id)
+        .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
+        .filter(Lecture.teacher_id == teacher_id)
+        .group_by(StudentAttendance.user_id, AttendanceSession.lecture_id)
+        .subquery()
+    )
+
+    student_stats = (
+        db.session.query(
+            lecture_stats.c.user_id,
+            func.sum(lecture_stats.c.total).label("total"),
+            func.sum(lecture_stats.c.present).label("present"),
+            func.sum(lecture_stats.c.absent).label("absent"),
+            func.sum(lecture_stats.c.late).label("late"),
+        )
+        .group_by(lecture_stats.c.user_id)
+        .subquery()
+    )
+
+    # One row per distinct student: a student in several of the teacher's
+    # lectures is summarized as "Overall Performance" with this teacher.
+    rows = (
+        db.session.query(
+            Student.student_id,
+            Student.user_id,
+            Student.roll_number,
+            User.full_name,
+            User.email,
+            func.min(Lecture.lecture_name).label("lecture"),
+            func.min(UserLecture.enrollment_status).label("enrollment_status"),
+            func.count(UserLecture.lecture_id).label("lecture_count"),
+            func.max(student_stats.c.total).label("total"),
+            func.max(student_stats.c.present).label("present"),
+            func.max(student_stats.c.absent).label("absent"),
+            func.max(student_stats.c.late).label("late"),
+            func.max(case((AttendanceRisk.is_at_risk == True, 1), else_=0)).label("at_risk"),
+            func.max(AttendanceRisk.current_absence_streak).label("absence_streak"),
+        )
+        .join(User, User.user_id == Student.user_id)
+        .join(UserLecture, UserLecture.user_id == Student.user_id)
+        .join(Lecture, Lecture.lecture_id == UserLecture.lecture_id)
+        .outerjoin(student_stats, student_stats.c.user_id == Student.user_id)
+        .outerjoin(
+            AttendanceRisk,
+            (AttendanceRisk.user_id == UserLecture.user_id)
+            & (AttendanceRisk.lecture_id == UserLecture.lecture_id),
+        )
+        .filter(Lecture.teacher_id == teacher_id, UserLecture.is_teacher == False)
+        .group_by(
+            Student.student_id,
+            Student.user_id,
+            Student.roll_number,
+            User.full_name,
+            User.email,
+        )
+        .order_by(Student.student_id.asc())
+        .all()
+    )
+
+    payload = []
+    by_user = {}
+    for row in rows:
+        total = row.total or 0
+        present = row.present or 0
+        pct = (present / total * 100) if total > 0 else 0
+        entry = {
+            "student_id": row.student_id,
+            "user_id": row.user_id,
+            "roll_number": row.roll_number,
+            "full_name": row.full_name,
+            "email": row.email,
+            "lecture": row.lecture,
+            "lecture_count": row.lecture_count,
+            "enrollment_status": row.enrollment_status,
+            "total_classes": total,
+            "present": present,
+            "absent": row.absent or 0,
+            "late": row.late or 0,
+            "attendance_percentage": round(pct, 1),
+            "at_risk": bool(row.at_risk),
+            "absence_streak": row.absence_streak or 0,
+        }
+        if include_breakdown:
+            entry["lectures"] = []
+            by_user[row.user_id] = entry
+        payload.append(entry)
+
+    if include_breakdown:
+        breakdown_rows = (
+            db.session.query(
+                UserLecture.user_id,
+                Lecture.lecture_id,
+                Lecture.lecture_name,
+                Lecture.course_code,
+                UserLecture.enrollment_status,
+                lecture_stats.c.total,
+                lecture_stats.c.present,
+                lecture_stats.c.absent,
+                lecture_stats.c.late,
+                AttendanceRisk.is_at_risk,
+                AttendanceRisk.current_absence_streak,
+                AttendanceRisk.recent_rate,
+            )
+            .join(Lecture, Lecture.lecture_id == UserLecture.lecture_id)
+            .join(Student, Student.user_id == UserLecture.user_id)
+            .outerjoin(
+                lecture_stats,
+                (lecture_stats.c.user_id == UserLecture.user_id)
+                & (lecture_stats.c.lecture_id == UserLecture.lecture_id),
+            )
+            .outerjoin(
+                AttendanceRisk,
+                (AttendanceRisk.user_id == UserLecture.user_id)
+                & (AttendanceRisk.lecture_id == UserLecture.lecture_id),
+            )
+            .filter(Lecture.teacher_id == teacher_id, UserLecture.is_teacher == False)
+            .order_by(UserLecture.user_id.asc(), Lecture.lecture_id.asc())
+            .all()
+        )
+        for row in breakdown_rows:
+            entry = by_user.get(row.user_id)
+            if entry is None:
+                continue
+            total = row.total or 0
+            present = row.present or 0
+            pct = (present / total * 100) if total > 0 else 0
+            entry["lectures"].append(
+                {
+                    "lecture_id": row.lecture_id,
+                    "lecture_name": row.lecture_name,
+                    "course_code": row.course_code,
+                    "enrollment_status": row.enrollment_status,
+                    "total_classes": total,
+                    "present": present,
+                    "absent": row.absent or 0,
+                    "late": row.late or 0,
+                    "attendance_percentage": round(pct, 1),
+                    "at_risk": bool(row.is_at_risk),
+                    "absence_streak": row.current_absence_streak or 0,
+                    "recent_rate": row.recent_rate,
+                }
+            )
+
+    return payload
+
+
+def load_pending_corrections(teacher_id=None):
+    """Pending correction requests, newest first, optionally for one teacher's lectures."""
+
+    query = AttendanceCorrectionRequest.query.filter(AttendanceCorrectionRequest.status == "Pending")
+    if teacher_id is not None:
+        # Filter by the actual teacher_id PK
+        query = query.join(StudentAttendance).join(AttendanceSession).join(Lecture).filter(
+            Lecture.teacher_id == teacher_id
+        )
+    return (
+        query.options(
+            joinedload(AttendanceCorrectionRequest.requesting_user),
+            joinedload(AttendanceCorrectionRequest.reviewed_by_user),
+            joinedload(AttendanceCorrectionRequest.attendance_record)
+            .joinedload(StudentAttendance.session)
+            .joinedload(AttendanceSession.lecture),
+        )
+        .order_by(AttendanceCorrectionRequest.requested_at.desc())
+        .all()
+    )
+
+
+def remove_user(user: User) -> None:
+    """Delete a user with their profile, enrollments and attendance, and commit.
+
+    Seats the user held go to the longest-waiting students. Runs in the
+    request, or in a worker for ``DELETE /api/users/<id>?async=true``.
+    """
+
+    user_id = user.user_id
+    seated = [
+        row.lecture_id
+        for row in db.session.query(UserLecture.lecture_id).filter(
+            UserLecture.user_id == user.user_id, holds_seat()
+        )
+    ]
+    if user.student:
+        student_id = user.student.student_id
+        FaceDataset.query.filter_by(student_id=student_id).delete(synchronize_session=False)
+        UserLecture.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
+        StudentAttendance.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
+        db.session.delete(user.student)
+
+    if user.teacher:
+        teacher_id = user.teacher.teacher_id
+        Lecture.query.filter_by(teacher_id=teacher_id).update({"teacher_id": None})
+        UserLecture.query.filter_by(user_id=user.user_id, is_teacher=True).delete(
+            synchronize_session=False
+        )
+        db.session.delete(user.teacher)
+
+    # remove any lingering enrollments and attendance for this user
+    UserLecture.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
+    StudentAttendance.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
+    StudentAttendanceArchive.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
+    LectureWaitlist.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
+    bitset_store.drop_user(user.user_id)
+    release_seats(seated)
+    promoted = {lecture_id: promote_waitlist(lecture_id) for lecture_id in seated}
+    # One entry stands for the user's enrollments and attendance too
+    log_change("user", "delete", user.user_id, user_id=user.user_id)
+    log_changes(
+        "enrollment",
+        "insert",
+        [
+            {"key": enrollment_key(promoted_id, lecture_id), "user_id": promoted_id, "lecture_id": lecture_id}
+            for lecture_id, user_ids in promoted.items()
+            for promoted_id in user_ids
+        ],
+    )
+
+    db.session.delete(user)
+    db.session.commit()
+    # Only this process's caches; other processes pick the delete up from
+    # Change_Log (see cache_sync)
+    forget_users([user_id])
+    dashboard_cache.invalidate_users(uid for user_ids in promoted.values() for uid in user_ids)
+
+
+def remove_lecture(lecture: Lecture) -> None:
+    """Delete a lecture with its sessions, attendance, enrollments and timetable, and commit."""
+
+    lecture_id = lecture.lecture_id
+    session_ids = [session.session_id for session in lecture.sessions]
+    if session_ids:
+        StudentAttendance.query.filter(
+            StudentAttendance.session_id.in_(session_ids)
+        ).delete(synchronize_session=False)
+        StudentAttendanceArchive.query.filter(
+            StudentAttendanceArchive.session_id.in_(session_ids)
+        ).delete(synchronize_session=False)
+        AttendanceSession.query.filter(AttendanceSession.session_id.in_(session_ids)).delete(
+            synchronize_session=False
+        )
+
+    UserLecture.query.filter_by(lecture_id=lecture_id).delete(synchronize_session=False)
+    LectureWaitlist.query.filter_by(lecture_id=lecture_id).delete(synchronize_session=False)
+    LectureSlot.query.filter_by(lecture_id=lecture_id).delete(synchronize_session=False)
+    Camera.query.filter_by(assigned_lecture_id=lecture_id).update({"assigned_lecture_id": None})
+    bitset_store.drop_lecture(lecture_id)
+    # One entry stands for the lecture's sessions, attendance and enrollments too
+    log_change("lecture", "delete", lecture_id, lecture_id=lecture_id)
+
+    db.session.delete(lecture)
+    db.session.commit()
+    forget_lectures([lecture_id])
+
+
+def attendance_report(teacher_id=None, lecture_id=None, start_date=None, end_date=None) -> dict:
+    """Totals, per-class breakdown and recent sessions for GET /api/reports/attendance."""
+
+    # Closed terms live in the archive table; only touch it when the range needs it
+    attendance = attendance_source(start_date, end_date)
+
+    def in_range(query):
+        if start_date:
+            query = query.filter(AttendanceSession.session_date >= start_date)
+        if end_date:
+            query = query.filter(AttendanceSession.session_date <= end_date)
+        return query
+
+    attendance_query = in_range(
+        db.session.query(
+            func.count(attendance.c.attendance_id),
+            *[
+                func.sum(case((attendance.c.status.ilike(status), 1), else_=0))
+                for status in ("present", "absent", "late", "unknown")
+            ],
+        )
+        .select_from(attendance)
+        .join(AttendanceSession, AttendanceSession.session_id == attendance.c.session_id)
+        .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
+    )
+    if teacher_id:
+        attendance_query = attendance_query.filter(Lecture.teacher_id == teacher_id)
+    if lecture_id:
+        attendance_query = attendance_query.filter(AttendanceSession.lecture_id == lecture_id)
+
+    total_records, present, absent, late, unknown = (count or 0 for count in attendance_query.one())
+
+    class_breakdown = (
+        db.session.query(
+            Lecture.lecture_id,
+            Lecture.lecture_name,
+            func.count(attendance.c.attendance_id).label("total"),
+            func.sum(case((attendance.c.status.ilike("present"), 1), else_=0)).label(
+                "present"
+            ),
+            func.sum(case((attendance.c.status.ilike("absent"), 1), else_=0)).label(
+                "absent"
+            ),
+            func.sum(case((attendance.c.status.ilike("late"), 1), else_=0)).label(
+                "late"
+            ),
+        )
+        .join(AttendanceSession, AttendanceSession.lecture_id == Lecture.lecture_id)
+        .join(attendance, attendance.c.session_id == AttendanceSession.session_id)
+    )
+    class_breakdown = in_range(class_breakdown)
+    if teacher_id:
+        class_breakdown = class_breakdown.filter(Lecture.teacher_id == teacher_id)
+    if lecture_id:
+        class_breakdown = class_breakdown.filter(Lecture.lecture_id == lecture_id)
+
+    class_results = (
+        class_breakdown.group_by(Lecture.lecture_id, Lecture.lecture_name)
+        .order_by(func.count(attendance.c.attendance_id).desc())
+        .all()
+    )
+
+    attendance_counts = (
+        db.session.query(
+            AttendanceSession.session_id.label("session_id"),
+            func.sum(case((attendance.c.status.ilike("present"), 1), else_=0)).label(
+                "present"
+            ),
+            func.sum(case((attendance.c.status.ilike("absent"), 1), else_=0)).label(
+                "absent"
+            ),
+            func.sum(case((attendance.c.status.ilike("late"), 1), else_=0)).label(
+                "late"
+            ),
+        )
+        .join(attendance, attendance.c.session_id == AttendanceSession.session_id)
+        .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
+    )
+    attendance_counts = in_range(attendance_counts)
+    if teacher_id:
+        attendance_counts = attendance_counts.filter(Lecture.teacher_id == teacher_id)
+
+    attendance_counts = attendance_counts.group_by(AttendanceSession.session_id).subquery()
+
+    recent_sessions = (
+        db.session.query(
+            AttendanceSession,
+            Lecture.lecture_name,
+            attendance_counts.c.present,
+            attendance_counts.c.absent,
+            attendance_counts.c.late,
+        )
+        .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
+        .join(attendance_counts, attendance_counts.c.session_id == AttendanceSession.session_id)
+    )
+    if teacher_id:
+        recent_sessions = recent_sessions.filter(Lecture.teacher_id == teacher_id)
+
+    recent_results = (
+        recent_sessions.order_by(AttendanceSession.session_date.desc())
+        .limit(10)
+        .all()
+    )
+
+    return {
+        "average_attendance": (present / total_records * 100) if total_records else 0,
+        "total_records": total_records,
+        "status": {
+            "present": present,
+            "absent": absent,
+            "late": late,
+            "unknown": unknown,
+        },
+        "classes": [
+            {
+                "lecture_id": row.lecture_id,
+                "lecture_name": row.lecture_name,
+                "total": row.total,
+                "present": row.present or 0,
+                "absent": row.absent or 0,
+                "late": row.late or 0,
+            }
+            for row in class_results
+        ],
+        "recent_sessions": [
+            {
+                "session_id": session.session_id,
+                "lecture_name": lecture_name,
+                "session_date": session.session_date.isoformat()
+                if session.session_date
+                else None,
+                "present": present or 0,
+                "absent": absent or 0,
+                "late": late or 0,
+                "status": session.status,
+            }
+            for session, lecture_name, present, absent, late in recent_results
+        ],
+    }
+
+
+def wants_async() -> bool:
+    """Slow endpoints queue a job instead when asked with ?async=true or Prefer: respond-async."""
+
+    if (request.args.get("async") or "").lower() in ("1", "true"):
+        return True
+    return "respond-async" in request.headers.get("Prefer", "").lower()
+
+
+def job_accepted(job):
+    db.session.commit()
+    payload = job.to_dict()
+    payload["status_url"] = f"/api/jobs/{job.job_id}"
+    return jsonify(payload), 202, {"Location": payload["status_url"]}
+
+
+# Background job handlers (run by jobs.py workers). Each gets its JSON
+# payload and a JobContext for progress; raising schedules a retry.
+
+
+@job_handler("delete_user")
+def delete_user_job(payload, job):
+    user = db.session.get(User, payload["user_id"])
+    # Gone already: deleted meanwhile, or an earlier attempt committed
+    if user is None:
+        return {"user_id": payload["user_id"], "deleted": False}
+    remove_user(user)
+    return {"user_id": payload["user_id"], "deleted": True}
+
+
+@job_handler("delete_lecture")
+def delete_lecture_job(payload, job):
+    lecture = db.session.get(Lecture, payload["lecture_id"])
+    if lecture is None:
+        return {"lecture_id": payload["lecture_id"], "deleted": False}
+    remove_lecture(lecture)
+    return {"lecture_id": payload["lecture_id"], "deleted": True}
+
+
+@job_handler("attendance_report")
+def attendance_report_job(payload, job):
+    start_date, end_date = parse_date_range(payload)
+    return attendance_report(payload.get("teacher_id"), payload.get("lecture_id"), start_date, end_date)
+
+
+@job_handler("rebuild_bitsets")
+def rebuild_bitsets_job(payload, job):
+    lecture_ids = payload.get("lecture_ids") or [
+        row.lecture_id for row in db.session.query(AttendanceSession.lecture_id).distinct()
+    ]
+    rows = 0
+    for done, lecture_id in enumerate(lecture_ids, 1):
+        rows += bitset_store.rebuild_lecture(lecture_id)
+        job.progress(done, len(lecture_ids), f"Rebuilt lecture {lecture_id}")
+        db.session.commit()
+    return {"lectures": len(lecture_ids), "rows": rows}
+
+
+@job_handler("recount_seats")
+def recount_seats_job(payload, job):
+    return {"lectures": recount_seats(payload.get("lecture_ids"))}
+
+
+@job_handler("backfill_timetable")
+def backfill_timetable_job(payload, job):
+    lectures, slots = backfill_timetable(bool(payload.get("overwrite")))
+    return {"lectures": lectures, "slots": slots}
+
+
+@job_handler("migrate")
+def migrate_job(payload, job):
+    from migrate_db import migrate
+
+    migrate()
+
+
 def register_routes(app: Flask) -> None:
     @app.route("/api/health", methods=["GET"])
     def health_check():
@@ -196,6 +866,43 @@ def register_routes(app: Flask) -> None:
             }
         )
 
+    @app.route("/api/admission", methods=["GET"])
+    def admission_stats():
+        # Per-gate in-flight/queued counts and how often each gate shed load
+        return jsonify(admission.stats())
+
+    @app.route("/api/jobs", methods=["POST"])
+    def create_job():
+        data = request.get_json() or {}
+        kind = data.get("kind")
+        if kind not in JOB_HANDLERS:
+            return error_response(f"kind must be one of: {', '.join(sorted(JOB_HANDLERS))}")
+        payload = data.get("payload") or {}
+        if not isinstance(payload, dict):
+            return error_response("payload must be an object")
+        max_attempts = coerce_int(data.get("max_attempts"))
+        if max_attempts is not None and max_attempts < 1:
+            return error_response("max_attempts must be at least 1")
+        return job_accepted(enqueue(kind, payload, max_attempts=max_attempts))
+
+    @app.route("/api/jobs", methods=["GET"])
+    def list_jobs():
+        limit = min(max(request.args.get("limit", default=50, type=int), 1), 200)
+        query = BackgroundJob.query
+        if request.args.get("status"):
+            query = query.filter(BackgroundJob.status == request.args["status"])
+        if request.args.get("kind"):
+            query = query.filter(BackgroundJob.kind == request.args["kind"])
+        jobs = query.order_by(BackgroundJob.job_id.desc()).limit(limit).all()
+        return jsonify([job.to_dict() for job in jobs])
+
+    @app.route("/api/jobs/<int:job_id>", methods=["GET"])
+    def get_job(job_id: int):
+        job = db.session.get(BackgroundJob, job_id)
+        if not job:
+            return error_response("Job not found", 404)
+        return jsonify(job.to_dict())
+
     @app.route("/api/departments", methods=["GET", "POST"])
     def departments():
         if request.method == "GET":
@@ -244,7 +951,10 @@ def register_routes(app: Flask) -> None:
             profile_picture=data.get("profile_picture"),
         )
         db.session.add(user)
+        db.session.flush()
+        log_change("user", "insert", user.user_id, user_id=user.user_id)
         db.session.commit()
+        index_document(user_document(user))
         return jsonify(user.to_dict()), 201
 
     @app.route("/api/login", methods=["POST"])
@@ -279,29 +989,11 @@ def register_routes(app: Flask) -> None:
         user = User.query.get(user_id)
         if not user:
             return error_response("User not found", 404)
+        if wants_async():
+            return job_accepted(enqueue("delete_user", {"user_id": user_id}))
 
         try:
-            if user.student:
-                student_id = user.student.student_id
-                FaceDataset.query.filter_by(student_id=student_id).delete(synchronize_session=False)
-                UserLecture.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
-                StudentAttendance.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
-                db.session.delete(user.student)
-
-            if user.teacher:
-                teacher_id = user.teacher.teacher_id
-                Lecture.query.filter_by(teacher_id=teacher_id).update({"teacher_id": None})
-                UserLecture.query.filter_by(user_id=user.user_id, is_teacher=True).delete(
-                    synchronize_session=False
-                )
-                db.session.delete(user.teacher)
-
-            # remove any lingering enrollments and attendance for this user
-            UserLecture.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
-            StudentAttendance.query.filter_by(user_id=user.user_id).delete(synchronize_session=False)
-
-            db.session.delete(user)
-            db.session.commit()
+            remove_user(user)
             return jsonify({"message": "User deleted"})
         except Exception as exc:  # pragma: no cover - safety rollback
             db.session.rollback()
@@ -323,21 +1015,66 @@ def register_routes(app: Flask) -> None:
     @app.route("/api/users", methods=["GET"])
     def list_users():
         role = request.args.get("role")
-        query = User.query
+        if wants_columnar():
+            query = (
+                db.session.query(
+                    User.user_id,
+                    User.username,
+                    User.role,
+                    User.full_name,
+                    User.email,
+                    User.phone,
+                    User.is_active,
+                    User.created_at,
+                    Student.student_id,
+                    Teacher.teacher_id,
+                )
+                .outerjoin(Student, Student.user_id == User.user_id)
+                .outerjoin(Teacher, Teacher.user_id == User.user_id)
+            )
+            if role:
+                query = query.filter(User.role.ilike(role))
+            query = query.order_by(User.user_id.asc())
+            return columnar_response([column["name"] for column in query.column_descriptions], query)
+
+        query = User.query.options(*user_dict_options())
         if role:
             query = query.filter(User.role.ilike(role))
         users = query.order_by(User.user_id.asc()).all()
         return jsonify([user.to_dict() for user in users])
 
+    @app.route("/api/search", methods=["GET"])
+    def search():
+        query = (request.args.get("q") or "").strip()
+        doc_type = request.args.get("type")
+        limit = request.args.get("limit", type=int) or DEFAULT_LIMIT
+        if doc_type and doc_type not in {"user", "lecture"}:
+            return error_response("type must be 'user' or 'lecture'")
+        if not query:
+            return jsonify({"query": query, "results": []})
+
+        index = get_search_index(load_search_documents)
+        results = index.search(query, limit=max(1, min(limit, MAX_LIMIT)), doc_type=doc_type)
+        return jsonify({"query": query, "results": results})
+
     @app.route("/api/students", methods=["POST"])
     def create_student():
         data = request.get_json() or {}
         user_id = data.get("user_id")
         roll_number = data.get("roll_number")
         face_embeddings = data.get("face_embeddings")
-
-        if not user_id or not roll_number or face_embeddings is None:
-            return error_response("user_id, roll_number, and face_embeddings are required")
+        # Captured images (also what older clients send as face_embeddings)
+        # are turned into vectors by the enrollment workers, not stored raw
+        raw_images = image_list(data.get("images")) or image_list(face_embeddings)
+
+        if not user_id or not roll_number or (face_embeddings is None and raw_images is None):
+            return error_response("user_id, roll_number, and images or face_embeddings are required")
+        if raw_images and len(raw_images) > MAX_ENROLLMENT_IMAGES:
+            return error_response(f"At most {MAX_ENROLLMENT_IMAGES} images per enrollment")
+        try:
+            images = [decode_payload(image) for image in raw_images] if raw_images else None
+        except ValueError as exc:
+            return error_response(str(exc))
 
         user = User.query.get(user_id)
         if not user:
@@ -361,105 +1098,272 @@ def register_routes(app: Flask) -> None:
             roll_number=roll_number,
             department=department_name,
             registered_by=data.get("registered_by"),
-            face_embeddings=face_embeddings,
+            face_embeddings="[]" if images else face_embeddings,
             face_image_path=data.get("face_image_path"),
             enrollment_status=data.get("enrollment_status", "Active"),
         )
         db.session.add(student)
+        log_change("user", "update", user_id, user_id=user_id)
         db.session.commit()
-        return jsonify(student.to_dict()), 201
+        invalidate_galleries()
+        index_document(user_document(user, student.roll_number))
+        payload = student.to_dict()
+        if images:
+            payload["enrollment"] = enrollments.submit(
+                current_app._get_current_object(),
+                student.user_id,
+                student.student_id,
+                images,
+                capture_device=data.get("capture_device"),
+            )
+        elif student.enrollment_status == "Active":
+            index_student(student.user_id, student.face_embeddings)
+        return jsonify(payload), 201
+
+    @app.route("/api/students/<int:user_id>/faces", methods=["POST"])
+    def reenroll_student(user_id: int):
+        student = Student.query.filter_by(user_id=user_id).first()
+        if not student:
+            return error_response("Student not found", 404)
+
+        data = request.get_json() or {}
+        raw_images = image_list(data.get("images"))
+        if not raw_images:
+            return error_response("images must be a non-empty list of base64 images")
+        if len(raw_images) > MAX_ENROLLMENT_IMAGES:
+            return error_response(f"At most {MAX_ENROLLMENT_IMAGES} images per enrollment")
+        try:
+            images = [decode_payload(image) for image in raw_images]
+        except ValueError as exc:
+            return error_response(str(exc))
+
+        current = enrollments.get(user_id)
+        if current and current["status"] == "processing":
+            return error_response("An enrollment is already running for this student", 409)
+        status = enrollments.submit(
+            current_app._get_current_object(),
+            user_id,
+            student.student_id,
+            images,
+            capture_device=data.get("capture_device"),
+            replace=data.get("replace", True) is not False,
+        )
+        return jsonify(status), 202
+
+    @app.route("/api/students/<int:user_id>/enrollment", methods=["GET"])
+    def enrollment_status(user_id: int):
+        status = enrollments.get(user_id)
+        if status is None:
+            return error_response("No enrollment for this student", 404)
+        return jsonify(status)
 
     @app.route("/api/students", methods=["GET"])
     def list_students():
-        students = Student.query.order_by(Student.student_id.asc()).all()
+        if wants_columnar():
+            # face_embeddings is left out: it dwarfs every other column
+            query = (
+                db.session.query(
+                    Student.student_id,
+                    Student.user_id,
+                    Student.roll_number,
+                    Student.department,
+                    Student.registration_date,
+                    Student.registered_by,
+                    Student.face_image_path,
+                    Student.enrollment_status,
+                    User.username,
+                    User.full_name,
+                    User.email,
+                )
+                .join(User, User.user_id == Student.user_id)
+                .order_by(Student.student_id.asc())
+            )
+            return columnar_response([column["name"] for column in query.column_descriptions], query)
+
+        students = (
+            Student.query.options(*user_dict_options(joinedload(Student.user)))
+            .order_by(Student.student_id.asc())
+            .all()
+        )
         return jsonify([student.to_dict() for student in students])
 
+    @app.route("/api/students/<int:user_id>/faces/score", methods=["POST"])
+    def score_student_faces(user_id: int):
+        # Scores this student's enrollment images on the quality pool and
+        # keeps the best templates in the gallery (see quality.py)
+        student = Student.query.filter_by(user_id=user_id).first()
+        if not student:
+            return error_response("Student not found", 404)
+
+        data = request.get_json(silent=True) or {}
+        keep = coerce_int(data.get("keep")) or TEMPLATES_PER_STUDENT
+        try:
+            scored = score_pending([student.student_id], rescore=bool(data.get("rescore")))
+            changed = apply_best_templates([student.student_id], keep)
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            return error_response(f"Unable to score faces: {exc}", 500)
+
+        if changed:
+            invalidate_galleries()
+            if student.enrollment_status == "Active":
+                index_student(user_id, changed[user_id])
+
+        faces = (
+            FaceDataset.query.filter_by(student_id=student.student_id)
+            .order_by(FaceDataset.quality_score.desc(), FaceDataset.image_id.asc())
+            .all()
+        )
+        kept = best_templates(((face.image_id, face.quality_score) for face in faces if face.embedding), keep)
+        return jsonify(
+            {
+                "user_id": user_id,
+                "scored": scored,
+                "templates": kept,
+                "faces": [face.to_dict() for face in faces],
+            }
+        )
+
     @app.route("/api/students/<int:user_id>/dashboard", methods=["GET"])
     def student_dashboard(user_id: int):
-        student = Student.query.filter_by(user_id=user_id).first()
+        try:
+            start_date, end_date = parse_date_range(request.args)
+        except ValueError:
+            return error_response("Invalid date format", 400)
+
+        # Snapshots are dropped by every write touching this student's
+        # attendance or enrollments (see dashboard_cache.py)
+        cache_key = (user_id, start_date, end_date)
+        cached = dashboard_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+        stamp = dashboard_cache.stamp()
+
+        student = (
+            Student.query.options(*user_dict_options(joinedload(Student.user))).filter_by(user_id=user_id).first()
+        )
         if not student:
             return error_response("Student profile not found", 404)
 
+        attendance = attendance_source(start_date, end_date)
+
+        def in_range(query):
+            if start_date:
+                query = query.filter(AttendanceSession.session_date >= start_date)
+            if end_date:
+                query = query.filter(AttendanceSession.session_date <= end_date)
+            return query
+
         enrollments = (
-            db.session.query(UserLecture, Lecture)
+            db.session.query(UserLecture, Lecture, AttendanceRisk)
             .join(Lecture, Lecture.lecture_id == UserLecture.lecture_id)
+            .outerjoin(
+                AttendanceRisk,
+                (AttendanceRisk.user_id == UserLecture.user_id)
+                & (AttendanceRisk.lecture_id == UserLecture.lecture_id),
+            )
             .filter(UserLecture.user_id == user_id, UserLecture.is_teacher == False)
             .all()
         )
 
         attendance_records = (
-            db.session.query(StudentAttendance, AttendanceSession, Lecture)
-            .join(AttendanceSession, AttendanceSession.session_id == StudentAttendance.session_id)
-            .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
-            .filter(StudentAttendance.user_id == user_id)
+            in_range(
+                db.session.query(
+                    attendance.c.attendance_id,
+                    attendance.c.status,
+                    attendance.c.time_in,
+                    attendance.c.verification_method,
+                    AttendanceSession,
+                    Lecture,
+                )
+                .select_from(attendance)
+                .join(AttendanceSession, AttendanceSession.session_id == attendance.c.session_id)
+                .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
+                .filter(attendance.c.user_id == user_id)
+            )
             .order_by(AttendanceSession.session_date.desc(), AttendanceSession.session_start_time.desc())
             .limit(60)
             .all()
         )
 
-        def status_count(status: str) -> int:
-            return (
-                db.session.query(func.count(StudentAttendance.attendance_id))
-                .join(AttendanceSession, AttendanceSession.session_id == StudentAttendance.session_id)
-                .filter(StudentAttendance.user_id == user_id, StudentAttendance.status.ilike(status))
-                .scalar()
-                or 0
+        counts = in_range(
+            db.session.query(
+                *[
+                    func.sum(case((attendance.c.status.ilike(status), 1), else_=0))
+                    for status in ("present", "absent", "late", "unknown")
+                ]
             )
-
-        present = status_count("present")
-        absent = status_count("absent")
-        late = status_count("late")
-        unknown = status_count("unknown")
+            .select_from(attendance)
+            .join(AttendanceSession, AttendanceSession.session_id == attendance.c.session_id)
+            .filter(attendance.c.user_id == user_id)
+        ).one()
+        present, absent, late, unknown = (count or 0 for count in counts)
         total_sessions = present + absent + late + unknown
 
+        payload = {
+            "student": student.to_dict(),
+            "enrollments": [
+                {
+                    "lecture_id": lecture.lecture_id,
+                    "lecture_name": lecture.lecture_name,
+                    "course_code": lecture.course_code,
+                    "department": lecture.department,
+                    "schedule": lecture.schedule,
+                    "room_number": lecture.room_number,
+                    "semester": lecture.semester,
+                    "year": lecture.year,
+                    "risk": risk.to_dict() if risk else None,
+                }
+                for _, lecture, risk in enrollments
+            ],
+            "at_risk": any(risk.is_at_risk for _, _, risk in enrollments if risk),
+            "attendance": {
+                "present": present,
+                "absent": absent,
+                "late": late,
+                "unknown": unknown,
+                "percentage": (present / total_sessions * 100) if total_sessions else 0,
+            },
+            "recent_records": [
+                {
+                    "attendance_id": attendance_id,
+                    "session_id": session.session_id,
+                    "lecture": lecture.lecture_name,
+                    "status": status.lower(),
+                    "session_date": session.session_date.isoformat() if session.session_date else None,
+                    "time_in": time_in.isoformat() if time_in else None,
+                    "verification_method": verification_method,
+                }
+                for attendance_id, status, time_in, verification_method, session, lecture in attendance_records
+            ],
+        }
+        dashboard_cache.put(
+            cache_key, payload, user_id, (lecture.lecture_id for _, lecture, _ in enrollments), stamp=stamp
+        )
+        return jsonify(payload)
+
+    @app.route("/api/students/<int:user_id>/attendance-history", methods=["GET"])
+    def student_attendance_history(user_id: int):
+        # Served from Attendance_Bitset (see bitsets.py): popcounts instead of
+        # scanning attendance rows
+        lecture_id = request.args.get("lecture_id", type=int)
+        history = bitset_store.user_history(user_id)
+        if lecture_id:
+            history = {key: value for key, value in history.items() if key == lecture_id}
+        unheld = bitset_store.unheld(history) if history else {}
         return jsonify(
-            {
-                "student": student.to_dict(),
-                "enrollments": [
-                    {
-                        "lecture_id": lecture.lecture_id,
-                        "lecture_name": lecture.lecture_name,
-                        "course_code": lecture.course_code,
-                        "department": lecture.department,
-                        "schedule": lecture.schedule,
-                        "room_number": lecture.room_number,
-                        "semester": lecture.semester,
-                        "year": lecture.year,
-                    }
-                    for _, lecture in enrollments
-                ],
-                "attendance": {
-                    "present": present,
-                    "absent": absent,
-                    "late": late,
-                    "unknown": unknown,
-                    "percentage": (present / total_sessions * 100) if total_sessions else 0,
-                },
-                "recent_records": [
-                    {
-                        "attendance_id": record.attendance_id,
-                        "session_id": session.session_id,
-                        "lecture": lecture.lecture_name,
-                        "status": record.status.lower(),
-                        "session_date": session.session_date.isoformat() if session.session_date else None,
-                        "time_in": record.time_in.isoformat() if record.time_in else None,
-                        "verification_method": record.verification_method,
-                    }
-                    for record, session, lecture in attendance_records
-                ],
-            }
+            [
+                {"user_id": user_id, "lecture_id": key, **summarize_bitset(bits, length, unheld=unheld[key])}
+                for key, (bits, length) in sorted(history.items())
+            ]
         )
 
     @app.route("/api/stats/overview", methods=["GET"])
     def overview_stats():
-        totals = {
-            "total_users": db.session.query(func.count(User.user_id)).scalar() or 0,
-            "total_students": db.session.query(func.count(Student.student_id)).scalar() or 0,
-            "total_teachers": db.session.query(func.count(Teacher.teacher_id)).scalar() or 0,
-            "total_lectures": db.session.query(func.count(Lecture.lecture_id)).scalar() or 0,
-            "total_enrollments": db.session.query(func.count(UserLecture.user_id)).scalar() or 0,
-        }
-        return jsonify(totals)
+        # Approximate row counts on SQL Server unless ?exact=true (see counts.py)
+        exact = (request.args.get("exact") or "").lower() in ("1", "true")
+        return jsonify(overview_counts(exact))
 
     @app.route("/api/lectures/summary", methods=["GET"])
     def lecture_summary():
@@ -472,7 +1376,7 @@ def register_routes(app: Flask) -> None:
                 return error_response("Teacher profile not found", 404)
             teacher_id = teacher.teacher_id
 
-        lecture_query = Lecture.query
+        lecture_query = Lecture.query.options(joinedload(Lecture.teacher).joinedload(Teacher.user))
         if teacher_id:
             lecture_query = lecture_query.filter(Lecture.teacher_id == teacher_id)
 
@@ -490,7 +1394,8 @@ def register_routes(app: Flask) -> None:
         }
 
         camera_map = {
-            camera.assigned_lecture_id: camera for camera in Camera.query.all()
+            camera.assigned_lecture_id: camera
+            for camera in Camera.query.options(*lecture_dict_options(joinedload(Camera.lecture)))
         }
 
         lectures = lecture_query.order_by(Lecture.lecture_id.asc()).all()
@@ -561,127 +1466,94 @@ def register_routes(app: Flask) -> None:
                 return error_response("Teacher profile not found", 404)
             teacher_id = teacher.teacher_id
 
-        attendance_query = (
-            db.session.query(StudentAttendance)
-            .join(AttendanceSession, AttendanceSession.session_id == StudentAttendance.session_id)
-            .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
-        )
-        if teacher_id:
-            attendance_query = attendance_query.filter(Lecture.teacher_id == teacher_id)
-        if lecture_id:
-            attendance_query = attendance_query.filter(AttendanceSession.lecture_id == lecture_id)
+        try:
+            start_date, end_date = parse_date_range(request.args)
+        except ValueError:
+            return error_response("Invalid date format", 400)
+        if wants_async():
+            arguments = {
+                "teacher_id": teacher_id,
+                "lecture_id": lecture_id,
+                "from": request.args.get("from"),
+                "to": request.args.get("to"),
+            }
+            return job_accepted(enqueue("attendance_report", arguments))
+        return jsonify(attendance_report(teacher_id, lecture_id, start_date, end_date))
 
-        total_records = attendance_query.count()
-        present = attendance_query.filter(StudentAttendance.status.ilike("present")).count()
-        absent = attendance_query.filter(StudentAttendance.status.ilike("absent")).count()
-        late = attendance_query.filter(StudentAttendance.status.ilike("late")).count()
-        unknown = attendance_query.filter(StudentAttendance.status.ilike("unknown")).count()
+    @app.route("/api/analytics/timeseries", methods=["GET"])
+    def attendance_timeseries():
+        interval = (request.args.get("interval") or "day").lower()
+        group_by = (request.args.get("group_by") or "lecture").lower()
+        teacher_user_id = request.args.get("teacher_user_id", type=int)
+        lecture_id = request.args.get("lecture_id", type=int)
+        department = request.args.get("department")
 
-        class_breakdown = (
-            db.session.query(
-                Lecture.lecture_id,
-                Lecture.lecture_name,
-                func.count(StudentAttendance.attendance_id).label("total"),
-                func.sum(case((StudentAttendance.status.ilike("present"), 1), else_=0)).label(
-                    "present"
-                ),
-                func.sum(case((StudentAttendance.status.ilike("absent"), 1), else_=0)).label(
-                    "absent"
-                ),
-                func.sum(case((StudentAttendance.status.ilike("late"), 1), else_=0)).label(
-                    "late"
-                ),
-            )
-            .join(AttendanceSession, AttendanceSession.lecture_id == Lecture.lecture_id)
-            .join(StudentAttendance, StudentAttendance.session_id == AttendanceSession.session_id)
-        )
-        if teacher_id:
-            class_breakdown = class_breakdown.filter(Lecture.teacher_id == teacher_id)
-        if lecture_id:
-            class_breakdown = class_breakdown.filter(Lecture.lecture_id == lecture_id)
+        if interval not in INTERVALS:
+            return error_response("interval must be 'day' or 'week'")
+        if group_by not in {"lecture", "department"}:
+            return error_response("group_by must be 'lecture' or 'department'")
 
-        class_results = (
-            class_breakdown.group_by(Lecture.lecture_id, Lecture.lecture_name)
-            .order_by(func.count(StudentAttendance.attendance_id).desc())
-            .all()
-        )
+        try:
+            start_date, end_date = parse_date_range(request.args)
+        except ValueError:
+            return error_response("Invalid date format", 400)
+        attendance = attendance_source(start_date, end_date)
 
-        attendance_counts = (
-            db.session.query(
-                AttendanceSession.session_id.label("session_id"),
-                func.sum(case((StudentAttendance.status.ilike("present"), 1), else_=0)).label(
-                    "present"
-                ),
-                func.sum(case((StudentAttendance.status.ilike("absent"), 1), else_=0)).label(
-                    "absent"
-                ),
-                func.sum(case((StudentAttendance.status.ilike("late"), 1), else_=0)).label(
-                    "late"
-                ),
-            )
-            .join(StudentAttendance, StudentAttendance.session_id == AttendanceSession.session_id)
-            .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
+        lecture_query = db.session.query(Lecture.lecture_id, Lecture.lecture_name, Lecture.department)
+        if teacher_user_id:
+            teacher = get_teacher_by_user_id(teacher_user_id)
+            if not teacher:
+                return error_response("Teacher profile not found", 404)
+            lecture_query = lecture_query.filter(Lecture.teacher_id == teacher.teacher_id)
+        if lecture_id:
+            lecture_query = lecture_query.filter(Lecture.lecture_id == lecture_id)
+        if department:
+            lecture_query = lecture_query.filter(Lecture.department == department)
+        lectures = {row.lecture_id: row for row in lecture_query.all()}
+
+        # Compact columnar snapshot: only (date, lecture, status code) leaves the DB
+        status_code = case(
+            *[
+                (func.lower(attendance.c.status) == label, code)
+                for label, code in STATUS_CODES.items()
+                if label != "unknown"
+            ],
+            else_=STATUS_CODES["unknown"],
         )
-        if teacher_id:
-            attendance_counts = attendance_counts.filter(Lecture.teacher_id == teacher_id)
-
-        attendance_counts = attendance_counts.group_by(AttendanceSession.session_id).subquery()
-
-        recent_sessions = (
-            db.session.query(
-                AttendanceSession,
-                Lecture.lecture_name,
-                attendance_counts.c.present,
-                attendance_counts.c.absent,
-                attendance_counts.c.late,
-            )
-            .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
-            .join(attendance_counts, attendance_counts.c.session_id == AttendanceSession.session_id)
+        snapshot = db.session.query(
+            AttendanceSession.session_date,
+            AttendanceSession.lecture_id,
+            status_code,
+        ).join(attendance, attendance.c.session_id == AttendanceSession.session_id)
+        if teacher_user_id or lecture_id or department:
+            snapshot = snapshot.filter(AttendanceSession.lecture_id.in_(list(lectures)))
+        if start_date:
+            snapshot = snapshot.filter(AttendanceSession.session_date >= start_date)
+        if end_date:
+            snapshot = snapshot.filter(AttendanceSession.session_date <= end_date)
+
+        days, lecture_ids, codes = snapshot_to_arrays(
+            row for row in snapshot.all() if row[0] is not None
         )
-        if teacher_id:
-            recent_sessions = recent_sessions.filter(Lecture.teacher_id == teacher_id)
 
-        recent_results = (
-            recent_sessions.order_by(AttendanceSession.session_date.desc())
-            .limit(10)
-            .all()
-        )
+        if group_by == "department":
+            keys = {lid: lecture.department for lid, lecture in lectures.items()}
+        else:
+            keys = {lid: lid for lid in lectures}
+        labels, group_index = dense_groups(lecture_ids, keys)
 
         return jsonify(
             {
-                "average_attendance": (present / total_records * 100) if total_records else 0,
-                "total_records": total_records,
-                "status": {
-                    "present": present,
-                    "absent": absent,
-                    "late": late,
-                    "unknown": unknown,
+                "interval": interval,
+                "group_by": group_by,
+                "groups": {
+                    "key": labels,
+                    "name": [
+                        lectures[label].lecture_name if group_by == "lecture" and label in lectures else label
+                        for label in labels
+                    ],
                 },
-                "classes": [
-                    {
-                        "lecture_id": row.lecture_id,
-                        "lecture_name": row.lecture_name,
-                        "total": row.total,
-                        "present": row.present or 0,
-                        "absent": row.absent or 0,
-                        "late": row.late or 0,
-                    }
-                    for row in class_results
-                ],
-                "recent_sessions": [
-                    {
-                        "session_id": session.session_id,
-                        "lecture_name": lecture_name,
-                        "session_date": session.session_date.isoformat()
-                        if session.session_date
-                        else None,
-                        "present": present or 0,
-                        "absent": absent or 0,
-                        "late": late or 0,
-                        "status": session.status,
-                    }
-                    for session, lecture_name, present, absent, late in recent_results
-                ],
+                "series": aggregate_timeseries(days, group_index, codes, interval),
             }
         )
 
@@ -691,80 +1563,101 @@ def register_routes(app: Flask) -> None:
         if not teacher:
             return error_response("Teacher profile not found", 404)
 
-        # Base query to get students enrolled in teacher's lectures
-        enrollments = (
-            db.session.query(Student, User, UserLecture, Lecture)
-            .join(User, User.user_id == Student.user_id)
-            .join(UserLecture, UserLecture.user_id == Student.user_id)
-            .join(Lecture, Lecture.lecture_id == UserLecture.lecture_id)
-            .filter(Lecture.teacher_id == teacher.teacher_id, UserLecture.is_teacher == False)
+        # ?breakdown=lecture adds one entry per enrolled lecture to each student
+        include_breakdown = (request.args.get("breakdown") or "").lower() == "lecture"
+
+        return jsonify(load_teacher_roster(teacher.teacher_id, include_breakdown))
+
+    @app.route("/api/teachers/<int:user_id>/workspace", methods=["GET"])
+    def teacher_workspace(user_id: int):
+        # Everything the teacher attendance page needs for first paint, in one response
+        teacher = Teacher.query.filter_by(user_id=user_id).first()
+        if not teacher:
+            return error_response("Teacher profile not found", 404)
+        day = date.today()
+        if request.args.get("date"):
+            try:
+                day = datetime.strptime(request.args["date"], "%Y-%m-%d").date()
+            except ValueError:
+                return error_response("Invalid date format", 400)
+
+        lectures = (
+            db.session.query(
+                Lecture.lecture_id,
+                Lecture.lecture_name,
+                Lecture.course_code,
+                Lecture.department,
+                Lecture.semester,
+                Lecture.year,
+                Lecture.schedule,
+                Lecture.room_number,
+                Lecture.capacity,
+                Lecture.enrolled_count,
+            )
+            .filter(Lecture.teacher_id == teacher.teacher_id)
+            .order_by(Lecture.lecture_id.asc())
             .all()
         )
-
-        # Aggregate attendance stats for these students across ALL teacher's lectures
-        # We want stats specific to THIS teacher's classes
-        stats_query = (
+        roster = load_teacher_roster(teacher.teacher_id)
+        corrections = load_pending_corrections(teacher.teacher_id)
+        sessions = (
             db.session.query(
-                StudentAttendance.user_id,
-                func.count(StudentAttendance.attendance_id).label("total"),
-                func.sum(case((StudentAttendance.status.ilike("present"), 1), else_=0)).label("present"),
-                func.sum(case((StudentAttendance.status.ilike("absent"), 1), else_=0)).label("absent"),
-                func.sum(case((StudentAttendance.status.ilike("late"), 1), else_=0)).label("late"),
+                AttendanceSession.session_id,
+                AttendanceSession.lecture_id,
+                AttendanceSession.session_start_time,
+                AttendanceSession.session_end_time,
+                AttendanceSession.status,
+                AttendanceSession.attendance_locked,
+                func.count(StudentAttendance.attendance_id).label("marked"),
+                func.sum(case((StudentAttendance.status.in_(["Present", "Late"]), 1), else_=0)).label("present"),
             )
-            .join(AttendanceSession, AttendanceSession.session_id == StudentAttendance.session_id)
             .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
-            .filter(Lecture.teacher_id == teacher.teacher_id)
-            .group_by(StudentAttendance.user_id)
+            .outerjoin(StudentAttendance, StudentAttendance.session_id == AttendanceSession.session_id)
+            .filter(Lecture.teacher_id == teacher.teacher_id, AttendanceSession.session_date == day)
+            .group_by(
+                AttendanceSession.session_id,
+                AttendanceSession.lecture_id,
+                AttendanceSession.session_start_time,
+                AttendanceSession.session_end_time,
+                AttendanceSession.status,
+                AttendanceSession.attendance_locked,
+            )
+            .order_by(AttendanceSession.session_start_time.asc(), AttendanceSession.session_id.asc())
             .all()
         )
-        
-        stats_map = {
-            row.user_id: {
-                "total": row.total,
-                "present": row.present or 0,
-                "absent": row.absent or 0,
-                "late": row.late or 0
-            } for row in stats_query
-        }
-
-        # Deduplicate students (student might be in multiple classes)
-        # We will summarize their performance across all classes of this teacher
-        # OR we can return one entry per enrollment. 
-        # The frontend expects a list of students. If a student is in Math and Physics (both taught by same teacher), 
-        # they might appear twice or once. 
-        # Let's deduplicate by student_id to show "Overall Performance" for that student with this teacher.
-        
-        unique_students = {}
-        for student, user, user_lecture, lecture in enrollments:
-            if student.student_id not in unique_students:
-                s_stats = stats_map.get(student.user_id, {"total": 0, "present": 0, "absent": 0, "late": 0})
-                
-                # Calculate percentage
-                total = s_stats["total"]
-                pct = (s_stats["present"] / total * 100) if total > 0 else 0
-
-                unique_students[student.student_id] = {
-                    "student_id": student.student_id,
-                    "user_id": student.user_id,
-                    "roll_number": student.roll_number,
-                    "full_name": user.full_name,
-                    "email": user.email,
-                    # We might want to list the lectures they are in? 
-                    # For now just picking the first one found or generic
-                    "lecture": lecture.lecture_name, 
-                    "enrollment_status": user_lecture.enrollment_status,
-                    "total_classes": total,
-                    "present": s_stats["present"],
-                    "absent": s_stats["absent"],
-                    "late": s_stats["late"],
-                    "attendance_percentage": round(pct, 1)
-                }
-            else:
-                # If already added, loop implies we might want to append lecture names?
-                # For simplicity, keeping first entry.
-                pass
 
-        return jsonify(list(unique_students.values()))
+        rates = [entry["attendance_percentage"] for entry in roster if entry["total_classes"]]
+        return jsonify(
+            {
+                "teacher_id": teacher.teacher_id,
+                "user_id": user_id,
+                "stats": {"teacher_id": teacher.teacher_id, "classes": len(lectures), "students": len(roster)},
+                "lectures": [row._asdict() for row in lectures],
+                "roster": roster,
+                "roster_summary": {
+                    "students": len(roster),
+                    "at_risk": sum(1 for entry in roster if entry["at_risk"]),
+                    "average_attendance": round(sum(rates) / len(rates), 1) if rates else None,
+                },
+                "pending_corrections": [req.to_dict() for req in corrections],
+                "today": {
+                    "date": day.isoformat(),
+                    "sessions": [
+                        {
+                            "session_id": row.session_id,
+                            "lecture_id": row.lecture_id,
+                            "start_time": row.session_start_time.isoformat() if row.session_start_time else None,
+                            "end_time": row.session_end_time.isoformat() if row.session_end_time else None,
+                            "status": row.status,
+                            "attendance_locked": bool(row.attendance_locked),
+                            "marked": row.marked,
+                            "present": row.present or 0,
+                        }
+                        for row in sessions
+                    ],
+                },
+            }
+        )
 
     @app.route("/api/teachers", methods=["POST"])
     def create_teacher():
@@ -795,12 +1688,17 @@ def register_routes(app: Flask) -> None:
             specialization=data.get("specialization"),
         )
         db.session.add(teacher)
+        log_change("user", "update", user_id, user_id=user_id)
         db.session.commit()
         return jsonify(teacher.to_dict()), 201
 
     @app.route("/api/teachers", methods=["GET"])
     def list_teachers():
-        teachers = Teacher.query.order_by(Teacher.teacher_id.asc()).all()
+        teachers = (
+            Teacher.query.options(*user_dict_options(joinedload(Teacher.user)))
+            .order_by(Teacher.teacher_id.asc())
+            .all()
+        )
         return jsonify([teacher.to_dict() for teacher in teachers])
 
     @app.route("/api/lectures", methods=["POST"])
@@ -818,30 +1716,49 @@ def register_routes(app: Flask) -> None:
         )
         if dept_error:
             return dept_error
+        # A structured timetable wins; otherwise the free-text schedule is parsed
+        schedule = data.get("schedule")
+        if data.get("timetable") is not None:
+            slots, slot_error = slots_from_payload(data.get("timetable"), data.get("room_number"))
+            if slot_error:
+                return error_response(slot_error)
+            schedule = schedule or format_schedule(slots)
+        else:
+            slots = parse_schedule(schedule, data.get("room_number"))
         lecture = Lecture(
             lecture_name=lecture_name,
             course_code=data.get("course_code"),
             department=department_name,
             semester=coerce_semester(data.get("semester")),
             year=coerce_int(data.get("year")),
-            schedule=data.get("schedule"),
+            schedule=schedule,
             room_number=data.get("room_number"),
             capacity=coerce_int(data.get("capacity")),
             credits=coerce_int(data.get("credits")),
             teacher=teacher,
         )
         db.session.add(lecture)
+        db.session.flush()
+        replace_slots(lecture.lecture_id, slots)
+        log_change("lecture", "insert", lecture.lecture_id, lecture_id=lecture.lecture_id)
         db.session.commit()
-        return jsonify(lecture.to_dict()), 201
+        index_document(lecture_document(lecture))
+        if slots:
+            timetable_index.invalidate()
+        payload = lecture.to_dict()
+        payload["timetable"] = lecture_timetable(lecture.lecture_id)
+        return jsonify(payload), 201
 
     @app.route("/api/lectures", methods=["GET"])
     def list_lectures():
-        lectures = Lecture.query.order_by(Lecture.lecture_id.asc()).all()
+        lectures = Lecture.query.options(*lecture_dict_options()).order_by(Lecture.lecture_id.asc()).all()
         return jsonify([lecture.to_dict() for lecture in lectures])
 
     @app.route("/api/lectures/<int:lecture_id>", methods=["GET"])
     def get_lecture(lecture_id: int):
-        lecture = Lecture.query.get(lecture_id)
+        lecture = db.session.get(
+            Lecture, lecture_id, options=[*lecture_dict_options(), joinedload(Lecture.enrollments)]
+        )
         if not lecture:
             return error_response("Lecture not found", 404)
 
@@ -854,22 +1771,11 @@ def register_routes(app: Flask) -> None:
         lecture = Lecture.query.get(lecture_id)
         if not lecture:
             return error_response("Lecture not found", 404)
+        if wants_async():
+            return job_accepted(enqueue("delete_lecture", {"lecture_id": lecture_id}))
 
         try:
-            session_ids = [session.session_id for session in lecture.sessions]
-            if session_ids:
-                StudentAttendance.query.filter(
-                    StudentAttendance.session_id.in_(session_ids)
-                ).delete(synchronize_session=False)
-                AttendanceSession.query.filter(AttendanceSession.session_id.in_(session_ids)).delete(
-                    synchronize_session=False
-                )
-
-            UserLecture.query.filter_by(lecture_id=lecture_id).delete(synchronize_session=False)
-            Camera.query.filter_by(assigned_lecture_id=lecture_id).update({"assigned_lecture_id": None})
-
-            db.session.delete(lecture)
-            db.session.commit()
+            remove_lecture(lecture)
             return jsonify({"message": "Lecture deleted"})
         except Exception as exc:  # pragma: no cover - safety rollback
             db.session.rollback()
@@ -906,7 +1812,8 @@ def register_routes(app: Flask) -> None:
             )
 
         recent_sessions = (
-            AttendanceSession.query.order_by(AttendanceSession.session_date.desc())
+            AttendanceSession.query.options(joinedload(AttendanceSession.lecture))
+            .order_by(AttendanceSession.session_date.desc())
             .limit(5)
             .all()
         )
@@ -940,6 +1847,7 @@ def register_routes(app: Flask) -> None:
             return error_response("Teacher not found", 404)
 
         lecture.teacher = teacher
+        log_change("lecture", "update", lecture_id, lecture_id=lecture_id)
         db.session.commit()
         return jsonify(lecture.to_dict())
 
@@ -959,11 +1867,58 @@ def register_routes(app: Flask) -> None:
             return error_response("Camera not found", 404)
 
         camera.assigned_lecture_id = lecture_id
+        log_change("lecture", "update", lecture_id, lecture_id=lecture_id)
         db.session.commit()
+        timetable_index.invalidate()
         payload = lecture.to_dict()
         payload["camera"] = camera.to_dict()
         return jsonify(payload)
 
+    @app.route("/api/lectures/<int:lecture_id>/timetable", methods=["GET"])
+    def get_lecture_timetable(lecture_id: int):
+        lecture = db.session.get(Lecture, lecture_id)
+        if not lecture:
+            return error_response("Lecture not found", 404)
+        return jsonify(
+            {
+                "lecture_id": lecture_id,
+                "schedule": lecture.schedule,
+                "room_number": lecture.room_number,
+                "timetable": lecture_timetable(lecture_id),
+            }
+        )
+
+    @app.route("/api/lectures/<int:lecture_id>/timetable", methods=["PUT"])
+    def replace_lecture_timetable(lecture_id: int):
+        lecture = db.session.get(Lecture, lecture_id)
+        if not lecture:
+            return error_response("Lecture not found", 404)
+
+        data = request.get_json() or {}
+        if data.get("timetable") is not None:
+            slots, slot_error = slots_from_payload(data.get("timetable"), lecture.room_number)
+            if slot_error:
+                return error_response(slot_error)
+            lecture.schedule = format_schedule(slots)
+        elif data.get("schedule") is not None:
+            slots = parse_schedule(data.get("schedule"), lecture.room_number)
+            lecture.schedule = data.get("schedule")
+        else:
+            return error_response("timetable or schedule is required")
+
+        replace_slots(lecture_id, slots)
+        log_change("lecture", "update", lecture_id, lecture_id=lecture_id)
+        db.session.commit()
+        timetable_index.invalidate()
+        return jsonify(
+            {
+                "lecture_id": lecture_id,
+                "schedule": lecture.schedule,
+                "room_number": lecture.room_number,
+                "timetable": lecture_timetable(lecture_id),
+            }
+        )
+
     @app.route("/api/lectures/<int:lecture_id>/enroll", methods=["POST"])
     def enroll_user(lecture_id: int):
         data = request.get_json() or {}
@@ -982,6 +1937,21 @@ def register_routes(app: Flask) -> None:
         if UserLecture.query.filter_by(user_id=user_id, lecture_id=lecture_id).first():
             return error_response("User already enrolled in this lecture", 409)
 
+        # Teachers do not take a seat; students claim one atomically (see seats.py)
+        if not is_teacher:
+            if db.session.get(LectureWaitlist, (lecture_id, user_id)):
+                return error_response("User is already on the waitlist for this lecture", 409)
+            if not claim_seat(lecture_id):
+                if not data.get("waitlist"):
+                    return error_response("Lecture is full", 409)
+                try:
+                    position = join_waitlist(lecture_id, user_id)
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+                    return error_response("User is already on the waitlist for this lecture", 409)
+                return jsonify({"lecture_id": lecture_id, "user_id": user_id, "waitlisted": True, "position": position}), 202
+
         enrollment = UserLecture(
             user_id=user_id,
             lecture_id=lecture_id,
@@ -989,9 +1959,57 @@ def register_routes(app: Flask) -> None:
             enrollment_status=data.get("enrollment_status", "Active"),
         )
         db.session.add(enrollment)
-        db.session.commit()
+        log_change("enrollment", "insert", enrollment_key(user_id, lecture_id), user_id=user_id, lecture_id=lecture_id)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request enrolled the same user; the rollback also returns the seat
+            db.session.rollback()
+            return error_response("User already enrolled in this lecture", 409)
+        invalidate_galleries()
+        dashboard_cache.invalidate_users([enrollment.user_id])
         return jsonify(enrollment.to_dict()), 201
 
+    @app.route("/api/lectures/<int:lecture_id>/waitlist", methods=["GET"])
+    def lecture_waitlist(lecture_id: int):
+        lecture = db.session.get(Lecture, lecture_id)
+        if not lecture:
+            return error_response("Lecture not found", 404)
+
+        rows = (
+            db.session.query(LectureWaitlist.user_id, LectureWaitlist.requested_at, User.full_name)
+            .join(User, User.user_id == LectureWaitlist.user_id)
+            .filter(LectureWaitlist.lecture_id == lecture_id)
+            .order_by(LectureWaitlist.requested_at, LectureWaitlist.user_id)
+            .all()
+        )
+        return jsonify(
+            {
+                "lecture_id": lecture_id,
+                "capacity": lecture.capacity,
+                "enrolled_count": lecture.enrolled_count,
+                "waitlist": [
+                    {
+                        "position": position,
+                        "user_id": row.user_id,
+                        "full_name": row.full_name,
+                        "requested_at": row.requested_at.isoformat() if row.requested_at else None,
+                    }
+                    for position, row in enumerate(rows, start=1)
+                ],
+            }
+        )
+
+    @app.route("/api/lectures/<int:lecture_id>/waitlist/<int:user_id>", methods=["DELETE"])
+    def leave_waitlist(lecture_id: int, user_id: int):
+        removed = LectureWaitlist.query.filter_by(lecture_id=lecture_id, user_id=user_id).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+        if not removed:
+            return error_response("Waitlist entry not found", 404)
+        return jsonify({"message": "Removed from waitlist"})
+
     @app.route("/api/lectures/<int:lecture_id>/students", methods=["GET"])
     def lecture_students(lecture_id: int):
         lecture = Lecture.query.get(lecture_id)
@@ -1069,9 +2087,22 @@ def register_routes(app: Flask) -> None:
             return error_response("Enrollment not found", 404)
 
         db.session.delete(enrollment)
+        release_seats([lecture_id])
+        promoted = promote_waitlist(lecture_id)
+        log_changes(
+            "enrollment",
+            "insert",
+            [{"key": enrollment_key(user_id, lecture_id), "user_id": user_id, "lecture_id": lecture_id, "operation": "delete"}]
+            + [
+                {"key": enrollment_key(promoted_id, lecture_id), "user_id": promoted_id, "lecture_id": lecture_id}
+                for promoted_id in promoted
+            ],
+        )
         db.session.commit()
+        invalidate_galleries()
+        dashboard_cache.invalidate_users([user_id, *promoted])
 
-        return jsonify({"message": "Student removed from class"})
+        return jsonify({"message": "Student removed from class", "promoted": promoted})
 
     @app.route("/api/lectures/<int:lecture_id>/attendance-summary", methods=["GET"])
     def lecture_attendance_summary(lecture_id: int):
@@ -1102,9 +2133,49 @@ def register_routes(app: Flask) -> None:
             }
         )
 
+    @app.route("/api/lectures/<int:lecture_id>/attendance-history", methods=["GET"])
+    def lecture_attendance_history(lecture_id: int):
+        history = bitset_store.lecture_history(lecture_id)
+        unheld = bitset_store.unheld([lecture_id])[lecture_id]
+        return jsonify(
+            [
+                {"user_id": user_id, "lecture_id": lecture_id, **summarize_bitset(bits, length, unheld=unheld)}
+                for user_id, (bits, length) in sorted(history.items())
+            ]
+        )
+
     @app.route("/api/enrollments", methods=["GET"])
     def list_enrollments():
-        enrollments = UserLecture.query.order_by(UserLecture.lecture_id.asc(), UserLecture.user_id.asc()).all()
+        if wants_columnar():
+            query = (
+                db.session.query(
+                    UserLecture.user_id,
+                    UserLecture.lecture_id,
+                    UserLecture.is_teacher,
+                    UserLecture.enrolled_at,
+                    UserLecture.enrollment_status,
+                    Lecture.lecture_name,
+                    Lecture.course_code,
+                    Lecture.teacher_id,
+                    User.full_name,
+                    User.username,
+                    User.role,
+                )
+                .join(Lecture, Lecture.lecture_id == UserLecture.lecture_id)
+                .join(User, User.user_id == UserLecture.user_id)
+                .order_by(UserLecture.lecture_id.asc(), UserLecture.user_id.asc())
+            )
+            return columnar_response([column["name"] for column in query.column_descriptions], query)
+
+        # One SELECT: the lecture/teacher/user graph the payload walks is joined in
+        enrollments = (
+            UserLecture.query.options(
+                *lecture_dict_options(joinedload(UserLecture.lecture)),
+                *user_dict_options(joinedload(UserLecture.user)),
+            )
+            .order_by(UserLecture.lecture_id.asc(), UserLecture.user_id.asc())
+            .all()
+        )
         result = []
         for enrollment in enrollments:
             record = enrollment.to_dict()
@@ -1115,7 +2186,11 @@ def register_routes(app: Flask) -> None:
 
     @app.route("/api/cameras", methods=["GET"])
     def list_cameras():
-        cameras = Camera.query.order_by(Camera.camera_id.asc()).all()
+        cameras = (
+            Camera.query.options(*lecture_dict_options(joinedload(Camera.lecture)))
+            .order_by(Camera.camera_id.asc())
+            .all()
+        )
         payload = []
         for camera in cameras:
             entry = camera.to_dict()
@@ -1138,11 +2213,13 @@ def register_routes(app: Flask) -> None:
             camera_name=name,
             location=location,
             stream_url=stream_url,
+            room_number=data.get("room_number"),
             assigned_lecture_id=data.get("assigned_lecture_id"),
             status=data.get("status", "Online"),
         )
         db.session.add(camera)
         db.session.commit()
+        timetable_index.invalidate()
         payload = camera.to_dict()
         if camera.lecture:
             payload["lecture_name"] = camera.lecture.lecture_name
@@ -1159,6 +2236,8 @@ def register_routes(app: Flask) -> None:
             camera.camera_name = data.get("camera_name") or camera.camera_name
         if "location" in data:
             camera.location = data.get("location") or camera.location
+        if "room_number" in data:
+            camera.room_number = data.get("room_number") or None
         if "stream_url" in data:
             camera.stream_url = data.get("stream_url") or camera.stream_url
         if "status" in data:
@@ -1167,6 +2246,7 @@ def register_routes(app: Flask) -> None:
             camera.assigned_lecture_id = data.get("assigned_lecture_id")
 
         db.session.commit()
+        timetable_index.invalidate()
         payload = camera.to_dict()
         if camera.lecture:
             payload["lecture_name"] = camera.lecture.lecture_name
@@ -1186,11 +2266,90 @@ def register_routes(app: Flask) -> None:
 
             db.session.delete(camera)
             db.session.commit()
+            timetable_index.invalidate()
             return jsonify({"message": "Camera deleted"})
         except Exception as exc:  # pragma: no cover - safety rollback
             db.session.rollback()
             return error_response(f"Unable to delete camera: {exc}", 500)
 
+    @app.route("/api/cameras/<int:camera_id>/active-session", methods=["GET"])
+    def camera_active_session(camera_id: int):
+        # Which lecture the timetable puts in front of this camera at ``at``
+        # (default now), and that lecture's session for the day if one exists
+        at = request.args.get("at")
+        when = parse_timestamp(at) if at else datetime.now()
+        if when is None:
+            return error_response("at must be an ISO 8601 timestamp")
+        if not db.session.get(Camera, camera_id):
+            return error_response("Camera not found", 404)
+
+        lecture_id, slot, session = resolve_session(camera_id, when)
+        return jsonify(
+            {
+                "camera_id": camera_id,
+                "at": when.isoformat(),
+                "lecture_id": lecture_id,
+                "slot": slot,
+                "session": session.to_dict() if session else None,
+            }
+        )
+
+    @app.route("/api/cameras/<int:camera_id>/edge-snapshot", methods=["GET"])
+    def camera_edge_snapshot(camera_id: int):
+        # What an edge node (edge.py) needs to recognize and record offline:
+        # its lecture's roster templates and the upcoming sessions
+        camera = db.session.get(Camera, camera_id)
+        if not camera:
+            return error_response("Camera not found", 404)
+
+        days = min(max(request.args.get("days", default=7, type=int), 1), 31)
+        roster = []
+        sessions = []
+        if camera.assigned_lecture_id:
+            roster = (
+                db.session.query(Student.user_id, Student.face_embeddings)
+                .join(UserLecture, UserLecture.user_id == Student.user_id)
+                .filter(
+                    UserLecture.lecture_id == camera.assigned_lecture_id,
+                    UserLecture.is_teacher == False,
+                    or_(UserLecture.enrollment_status.is_(None), UserLecture.enrollment_status == "Active"),
+                )
+                .all()
+            )
+            today = datetime.now().date()
+            sessions = (
+                AttendanceSession.query.filter(
+                    AttendanceSession.lecture_id == camera.assigned_lecture_id,
+                    AttendanceSession.session_date >= today,
+                    AttendanceSession.session_date < today + timedelta(days=days),
+                )
+                .order_by(AttendanceSession.session_date, AttendanceSession.session_start_time)
+                .all()
+            )
+
+        return jsonify(
+            {
+                "camera_id": camera.camera_id,
+                "lecture_id": camera.assigned_lecture_id,
+                "generated_at": datetime.now().isoformat(),
+                "roster": [
+                    {"user_id": user_id, "face_embeddings": embeddings}
+                    for user_id, embeddings in roster
+                    if parse_embeddings(embeddings) is not None
+                ],
+                "sessions": [
+                    {
+                        "session_id": session.session_id,
+                        "session_date": session.session_date.isoformat() if session.session_date else None,
+                        "session_start_time": session.session_start_time.isoformat() if session.session_start_time else None,
+                        "session_end_time": session.session_end_time.isoformat() if session.session_end_time else None,
+                        "attendance_locked": bool(session.attendance_locked),
+                    }
+                    for session in sessions
+                ],
+            }
+        )
+
 
     @app.route("/api/change-password", methods=["POST"])
     def change_password():
@@ -1211,6 +2370,7 @@ def register_routes(app: Flask) -> None:
         return jsonify({"message": "Password updated successfully"})
 
     @app.route("/api/sessions/get-or-create", methods=["POST"])
+    @admitted("sessions")
     def get_or_create_session():
         data = request.get_json() or {}
         lecture_name = data.get("lecture_name")
@@ -1250,7 +2410,9 @@ def register_routes(app: Flask) -> None:
 
             return jsonify({
                 "session_id": session.session_id,
-                "existing_records": existing_records
+                "existing_records": existing_records,
+                "status": session.status,
+                "attendance_locked": bool(session.attendance_locked),
             })
         except ValueError:
             return error_response("Invalid date format", 400)
@@ -1259,6 +2421,7 @@ def register_routes(app: Flask) -> None:
             return error_response(str(e), 500)
 
     @app.route("/api/attendance/batch", methods=["POST"])
+    @admitted("batch", MANUAL)
     def batch_mark_attendance():
         data = request.get_json() or {}
         records = data.get("records", [])
@@ -1267,53 +2430,283 @@ def register_routes(app: Flask) -> None:
         if not records:
             return error_response("No records provided", 400)
 
+        # Fail fast before touching anything if the batch targets a locked session
+        requested_sessions = {coerce_int(record.get("session_id")) for record in records}
+        requested_sessions.discard(None)
+        locked = [
+            row.session_id
+            for row in db.session.query(AttendanceSession.session_id).filter(
+                AttendanceSession.session_id.in_(requested_sessions),
+                AttendanceSession.attendance_locked == True,
+            )
+        ]
+        if locked:
+            return error_response(f"Attendance is locked for session(s): {', '.join(map(str, sorted(locked)))}", 409)
+
         processed_count = 0
         try:
+            # Load the sessions and existing rows once instead of querying per record
+            sessions = {
+                session.session_id: session
+                for session in AttendanceSession.query.filter(AttendanceSession.session_id.in_(requested_sessions))
+            }
+            requested_users = {coerce_int(record.get("user_id")) for record in records}
+            existing = {
+                (attendance.session_id, attendance.user_id): attendance
+                for attendance in db.session.query(
+                    StudentAttendance.attendance_id,
+                    StudentAttendance.session_id,
+                    StudentAttendance.user_id,
+                    StudentAttendance.time_in,
+                ).filter(
+                    StudentAttendance.session_id.in_(list(sessions)),
+                    StudentAttendance.user_id.in_(requested_users - {None}),
+                )
+            }
+
+            now = datetime.now(timezone.utc)
+            updates = {}
+            inserts = {}
             for record in records:
-                session_id = record.get("session_id")
-                user_id = record.get("user_id")
+                session_id = coerce_int(record.get("session_id"))
+                user_id = coerce_int(record.get("user_id"))
                 status = record.get("status")
                 
                 if not all([session_id, user_id, status]):
                     continue
 
                 # Check if session exists
-                session = AttendanceSession.query.get(session_id)
+                session = sessions.get(session_id)
                 if not session:
                     continue
 
-                # Check existing record
-                attendance = StudentAttendance.query.filter_by(
-                    session_id=session_id, user_id=user_id
-                ).first()
-
+                key = (session_id, user_id)
+                attendance = existing.get(key)
                 if attendance:
-                    attendance.status = status
-                    attendance.manual_override = True
-                    attendance.edited_by = verified_by
-                    attendance.edited_at = datetime.now(timezone.utc)
-                    if status == "Present" and not attendance.time_in:
-                        attendance.time_in = session.session_start_time
+                    time_in = attendance.time_in
+                    if status == "Present" and not time_in:
+                        time_in = session.session_start_time
+                    updates[key] = {"b_id": attendance.attendance_id, "b_status": status, "b_time_in": time_in}
                 else:
-                    attendance = StudentAttendance(
-                        session_id=session_id,
-                        user_id=user_id,
-                        status=status,
-                        verification_method="Manual",
-                        verified_by=verified_by,
-                        manual_override=True,
-                        time_in=session.session_start_time if status == "Present" else None
-                    )
-                    db.session.add(attendance)
+                    inserts[key] = {
+                        "session_id": session_id,
+                        "user_id": user_id,
+                        "status": status,
+                        "verification_method": "Manual",
+                        "verified_by": verified_by,
+                        "manual_override": True,
+                        "time_in": session.session_start_time if status == "Present" else None,
+                    }
                 
                 processed_count += 1
-            
+
+            # One executemany UPDATE and one bulk INSERT, whatever the batch size
+            table = StudentAttendance.__table__
+            if updates:
+                db.session.execute(
+                    update(table)
+                    .where(table.c.attendance_id == bindparam("b_id"))
+                    .values(
+                        status=bindparam("b_status"),
+                        time_in=bindparam("b_time_in"),
+                        manual_override=True,
+                        edited_by=verified_by,
+                        edited_at=now,
+                    ),
+                    list(updates.values()),
+                )
+            if inserts:
+                db.session.execute(insert(StudentAttendance), list(inserts.values()))
+            bitset_store.record(
+                [(*key, values["b_status"]) for key, values in updates.items()]
+                + [(*key, values["status"]) for key, values in inserts.items()],
+                {session.lecture_id for session in sessions.values()},
+            )
+            session_lectures = {session_id: session.lecture_id for session_id, session in sessions.items()}
+            log_changes(
+                "attendance",
+                "update",
+                attendance_rows(updates, session_lectures) + attendance_rows(inserts, session_lectures, "insert"),
+            )
+
             db.session.commit()
+            dashboard_cache.invalidate_users(user_id for _, user_id in [*updates, *inserts])
             return jsonify({"message": f"Successfully updated {processed_count} records"})
         except Exception as e:
             db.session.rollback()
             return error_response(str(e), 500)
 
+    @app.route("/api/changes", methods=["GET"])
+    def list_changes():
+        # Consumers poll with the last next_cursor they saw (see changes.py)
+        since = coerce_int(request.args.get("since", 0))
+        limit = coerce_int(request.args.get("limit", 100))
+        if since is None or since < 0 or not limit or limit < 1:
+            return error_response("since and limit must be non-negative integers")
+        entities = [value.strip() for value in (request.args.get("entity") or "").split(",") if value.strip()]
+        unknown = sorted(set(entities) - set(CHANGE_ENTITIES))
+        if unknown:
+            return error_response(f"Unknown entity: {', '.join(unknown)}")
+        lecture_id = coerce_int(request.args.get("lecture_id"))
+        return jsonify(read_changes(since, limit, entities or None, lecture_id))
+
+    @app.route("/api/attendance/sync", methods=["POST"])
+    @admitted("recognition", CAMERA)
+    def sync_attendance():
+        # Bulk upload from edge nodes; every event carries an idempotency key
+        # so a retried batch is never written twice (see sync.py)
+        data = request.get_json() or {}
+        events = data.get("events")
+        if not isinstance(events, list):
+            return error_response("events must be a list")
+        if len(events) > SYNC_MAX_EVENTS:
+            return error_response(f"At most {SYNC_MAX_EVENTS} events per request", 413)
+
+        try:
+            result = apply_sync_events(events, coerce_int(data.get("camera_id")))
+        except IntegrityError:
+            # Another request applied some of these keys concurrently
+            db.session.rollback()
+            return error_response("Conflicting sync in progress, retry the batch", 409)
+        return jsonify(result)
+
+    @app.route("/api/recognition/match", methods=["POST"])
+    @admitted("recognition", CAMERA)
+    def match_faces():
+        data = request.get_json() or {}
+        embeddings = data.get("embeddings")
+        lecture_id = coerce_int(data.get("lecture_id"))
+        top_k = DEFAULT_TOP_K if data.get("top_k") is None else coerce_int(data.get("top_k"))
+        threshold = data.get("threshold", DEFAULT_THRESHOLD)
+        # Campus-wide (no lecture) searches use the ANN index unless exact is requested
+        exact = str(data.get("exact", "")).lower() in ("1", "true")
+        n_probe = coerce_int(data.get("n_probe"))
+        session_id = coerce_int(data.get("session_id"))
+        camera_id = coerce_int(data.get("camera_id"))
+        session = None
+
+        if not isinstance(embeddings, list):
+            return error_response("embeddings must be a list of vectors")
+        if top_k is None or top_k < 1:
+            return error_response("top_k must be a positive integer")
+        top_k = min(top_k, MAX_TOP_K)
+        if data.get("n_probe") is not None and (n_probe is None or n_probe < 1):
+            return error_response("n_probe must be a positive integer")
+        try:
+            probes = np.asarray(embeddings, dtype=np.float32)
+            threshold = float(threshold)
+        except (TypeError, ValueError):
+            return error_response("embeddings must be numeric vectors")
+        if embeddings and probes.ndim != 2:
+            return error_response("embeddings must all have the same length")
+
+        if camera_id and not session_id and not lecture_id:
+            # Cameras need not know the schedule: the timetable picks the session
+            captured_at = parse_timestamp(data.get("captured_at")) or datetime.now()
+            lecture_id, _, active = resolve_session(camera_id, captured_at)
+            session_id = active.session_id if active else None
+
+        if session_id:
+            # Matches for a live session are recorded; the session fixes the roster
+            session = AttendanceSession.query.get(session_id)
+            if not session:
+                return error_response("Session not found", 404)
+            if session.attendance_locked:
+                return locked_session_response(session)
+            lecture_id = session.lecture_id
+
+        if lecture_id:
+            if not Lecture.query.get(lecture_id):
+                return error_response("Lecture not found", 404)
+
+            def load_roster():
+                return (
+                    db.session.query(Student.user_id, Student.face_embeddings)
+                    .join(UserLecture, UserLecture.user_id == Student.user_id)
+                    .filter(UserLecture.lecture_id == lecture_id, UserLecture.is_teacher == False)
+                    .all()
+                )
+
+        else:
+            if not exact:
+                index = get_campus_index(load_campus_ids, load_campus_rows)
+                if index is None or not embeddings:
+                    return jsonify({"lecture_id": None, "gallery_size": len(index) if index else 0, "matches": []})
+                if probes.shape[1] != index.dim:
+                    return error_response(f"Embedding dimension must be {index.dim}")
+                candidate_users, scores = index.search(probes, top_k, n_probe=n_probe)
+                return jsonify(
+                    {
+                        "lecture_id": None,
+                        "gallery_size": len(index),
+                        "n_probe": min(n_probe or index.n_probe, index.n_lists),
+                        "matches": assign_candidates(candidate_users, scores, threshold),
+                    }
+                )
+
+            load_roster = load_campus_rows
+
+        gallery = get_cached_gallery(("lecture", lecture_id), load_roster)
+        if not embeddings:
+            probes = np.empty((0, gallery.dim), dtype=np.float32)
+        elif len(gallery) and probes.shape[1] != gallery.dim:
+            return error_response(f"Embedding dimension must be {gallery.dim}")
+
+        matches = gallery.match_batch(probes, top_k, threshold)
+        payload = {
+            "lecture_id": lecture_id,
+            "gallery_size": len(gallery),
+            "matches": matches,
+        }
+        if session:
+            payload["session_id"] = session.session_id
+            payload["recorded"] = record_matches(session, matches)
+        return jsonify(payload)
+
+    @app.route("/api/sessions/<int:session_id>/detections", methods=["POST"])
+    @admitted("recognition", CAMERA)
+    def record_detections(session_id: int):
+        session = AttendanceSession.query.get(session_id)
+        if not session:
+            return error_response("Session not found", 404)
+        if session.attendance_locked:
+            return locked_session_response(session)
+
+        data = request.get_json() or {}
+        detections = data.get("detections") or []
+        if not isinstance(detections, list):
+            return error_response("detections must be a list")
+
+        recorded = 0
+        for detection in detections:
+            user_id = coerce_int((detection or {}).get("user_id"))
+            if not user_id:
+                continue
+            try:
+                confidence = float(detection.get("confidence") or 0.0)
+            except (TypeError, ValueError):
+                confidence = 0.0
+            presence_tracker.observe(session, user_id, confidence, parse_timestamp(detection.get("seen_at")))
+            recorded += 1
+
+        flushed = presence_tracker.flush_if_due(session_id)
+        return jsonify({"session_id": session_id, "recorded": recorded, "flushed": flushed})
+
+    @app.route("/api/sessions/<int:session_id>/end", methods=["POST"])
+    @app.route("/api/sessions/<int:session_id>/lock", methods=["POST"])
+    def finalize_attendance_session(session_id: int):
+        session = AttendanceSession.query.get(session_id)
+        if not session:
+            return error_response("Session not found", 404)
+        if session.attendance_locked:
+            return locked_session_response(session)
+
+        data = request.get_json(silent=True) or {}
+        # Hits this process is still holding count before no-shows are marked
+        presence_tracker.end_session(session_id)
+        absent = finalize_session(session, locked_by=coerce_int(data.get("locked_by")))
+        return jsonify({"session": session.to_dict(), "absent_marked": absent})
+
     @app.route("/api/attendance/correction", methods=["GET", "POST"])
     def correction_requests():
         if request.method == "POST":
@@ -1342,24 +2735,105 @@ def register_routes(app: Flask) -> None:
         # GET - list requests
         # filters: teacher_id (optional) to see requests for their classes
         teacher_id = request.args.get("teacher_id")
-        query = AttendanceCorrectionRequest.query.filter(AttendanceCorrectionRequest.status == "Pending")
-        
         if teacher_id:
             # The teacher_id param is actually a user_id from frontend
             teacher = Teacher.query.filter_by(user_id=teacher_id).first()
-            if teacher:
-                # Filter by the actual teacher_id PK
-                query = query.join(StudentAttendance).join(AttendanceSession).join(Lecture).filter(
-                    Lecture.teacher_id == teacher.teacher_id
-                )
-            else:
+            if not teacher:
                 # If user is not a teacher, show nothing? or just don't filter?
                 # Safer to return empty if invalid teacher
                 return jsonify([])
-
-        requests = query.order_by(AttendanceCorrectionRequest.requested_at.desc()).all()
+            requests = load_pending_corrections(teacher.teacher_id)
+        else:
+            requests = load_pending_corrections()
         return jsonify([r.to_dict() for r in requests])
 
+    @app.route("/api/attendance/correction/resolve", methods=["POST"])
+    def bulk_resolve_corrections():
+        data = request.get_json() or {}
+        status = data.get("status")  # Approved or Rejected
+        reviewed_by = data.get("reviewed_by")
+        notes = data.get("notes")
+        raw_ids = data.get("request_ids") or []
+
+        if status not in ["Approved", "Rejected"]:
+            return error_response("Invalid status", 400)
+        if not isinstance(raw_ids, list) or not raw_ids:
+            return error_response("request_ids must be a non-empty list", 400)
+
+        request_ids = {coerce_int(value) for value in raw_ids}
+        request_ids.discard(None)
+        if not request_ids:
+            return error_response("request_ids must be a non-empty list", 400)
+
+        try:
+            # Claim the requests first: the guarded UPDATE is what decides
+            # which ids this call resolves, so a concurrent resolution that
+            # commits in between is skipped instead of overwritten
+            requests_table = AttendanceCorrectionRequest.__table__
+            now = datetime.now(timezone.utc)
+            resolved_ids = list(
+                db.session.execute(
+                    update(requests_table)
+                    .where(
+                        requests_table.c.request_id.in_(request_ids),
+                        requests_table.c.status == "Pending",
+                    )
+                    .values(status=status, reviewed_by=reviewed_by, review_notes=notes, reviewed_at=now)
+                    .returning(requests_table.c.request_id)
+                ).scalars()
+            )
+            pending = []
+
+            if resolved_ids and status == "Approved":
+                pending = (
+                    db.session.query(
+                        AttendanceCorrectionRequest.attendance_id,
+                        StudentAttendance.session_id,
+                        StudentAttendance.user_id,
+                        AttendanceSession.lecture_id,
+                    )
+                    .join(StudentAttendance, StudentAttendance.attendance_id == AttendanceCorrectionRequest.attendance_id)
+                    .join(AttendanceSession, AttendanceSession.session_id == StudentAttendance.session_id)
+                    .filter(AttendanceCorrectionRequest.request_id.in_(resolved_ids))
+                    .all()
+                )
+                StudentAttendance.query.filter(
+                    StudentAttendance.attendance_id.in_({row.attendance_id for row in pending})
+                ).update(
+                    {
+                        "status": "Present",
+                        "manual_override": True,
+                        "edited_by": reviewed_by,
+                        "edited_at": now,
+                        "notes": f"Correction approved: {notes or 'No notes'}",
+                    },
+                    synchronize_session=False,
+                )
+                bitset_store.record((row.session_id, row.user_id, "Present") for row in pending)
+                log_changes(
+                    "attendance",
+                    "update",
+                    attendance_rows(
+                        [(row.session_id, row.user_id) for row in pending],
+                        {row.session_id: row.lecture_id for row in pending},
+                    ),
+                )
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return error_response(str(e), 500)
+
+        if status == "Approved":
+            dashboard_cache.invalidate_users(row.user_id for row in pending)
+        return jsonify(
+            {
+                "status": status,
+                "resolved": sorted(resolved_ids),
+                "skipped": sorted(request_ids.difference(resolved_ids)),
+            }
+        )
+
     @app.route("/api/attendance/correction/<int:req_id>/resolve", methods=["POST"])
     def resolve_correction(req_id):
         data = request.get_json() or {}
@@ -1390,8 +2864,19 @@ def register_routes(app: Flask) -> None:
             attendance.edited_by = reviewed_by
             attendance.edited_at = datetime.now(timezone.utc)
             attendance.notes = f"Correction approved: {notes or 'No notes'}"
+            bitset_store.record([(attendance.session_id, attendance.user_id, attendance.status)])
+            log_change(
+                "attendance",
+                "update",
+                f"{attendance.session_id}:{attendance.user_id}",
+                session_id=attendance.session_id,
+                user_id=attendance.user_id,
+                lecture_id=attendance.session.lecture_id,
+            )
 
         db.session.commit()
+        if status == "Approved":
+            dashboard_cache.invalidate_users([req.attendance_record.user_id])
         return jsonify(req.to_dict())
 
 
@@ -0,0 +1,196 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, exists, func, insert, select, union_all
+
+# Allow running as a script from the backend directory (like migrate_db.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models import (
+    db,
+    ArchivedTerm,
+    AttendanceCorrectionRequest,
+    AttendanceSession,
+    Lecture,
+    StudentAttendance,
+    StudentAttendanceArchive,
+)
+
+
+OPEN_SESSION_STATUSES = ("Scheduled", "In Progress")
+SPAN_CACHE_SECONDS = 60
+
+live_table = StudentAttendance.__table__
+archive_table = StudentAttendanceArchive.__table__
+ATTENDANCE_COLUMNS = [column.name for column in live_table.columns]
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def term_session_ids(semester: int, year: int):
+    return (
+        select(AttendanceSession.session_id)
+        .join(Lecture, Lecture.lecture_id == AttendanceSession.lecture_id)
+        .where(Lecture.semester == semester, Lecture.year == year)
+    )
+
+
+def archive_term(semester: int, year: int, force: bool = False) -> ArchivedTerm:
+    """Move a closed term's attendance rows into Student_Attendance_Archive.
+
+    Rows referenced by correction requests stay in the live table so the
+    requests keep their attendance record. The copy and delete run as two
+    set-based statements in one transaction.
+    """
+
+    sessions = term_session_ids(semester, year)
+    open_sessions = (
+        db.session.query(func.count(AttendanceSession.session_id))
+        .filter(
+            AttendanceSession.session_id.in_(sessions),
+            AttendanceSession.status.in_(OPEN_SESSION_STATUSES),
+        )
+        .scalar()
+        or 0
+    )
+    if open_sessions and not force:
+        raise ArchiveError(f"Term {semester}/{year} still has {open_sessions} open session(s)")
+
+    span = (
+        db.session.query(func.min(AttendanceSession.session_date), func.max(AttendanceSession.session_date))
+        .filter(AttendanceSession.session_id.in_(sessions))
+        .one()
+    )
+
+    has_correction = exists().where(AttendanceCorrectionRequest.attendance_id == live_table.c.attendance_id)
+    movable = (live_table.c.session_id.in_(sessions)) & ~has_correction
+
+    try:
+        moved = db.session.execute(
+            insert(archive_table).from_select(
+                ATTENDANCE_COLUMNS,
+                select(*[live_table.c[name] for name in ATTENDANCE_COLUMNS]).where(movable),
+            )
+        ).rowcount or 0
+        db.session.execute(delete(live_table).where(movable))
+        retained = (
+            db.session.query(func.count(StudentAttendance.attendance_id))
+            .filter(StudentAttendance.session_id.in_(sessions))
+            .scalar()
+            or 0
+        )
+
+        term = db.session.get(ArchivedTerm, (semester, year))
+        if term is None:
+            term = ArchivedTerm(semester=semester, year=year, row_count=0)
+            db.session.add(term)
+        term.first_session_date = min(filter(None, [term.first_session_date, span[0]]), default=None)
+        term.last_session_date = max(filter(None, [term.last_session_date, span[1]]), default=None)
+        term.row_count = (term.row_count or 0) + moved
+        term.retained_count = retained
+        term.archived_at = datetime.now(timezone.utc)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    invalidate_spans()
+    return term
+
+
+_spans: Optional[Tuple[float, Optional[date], Optional[date], Optional[date]]] = None
+_spans_lock = threading.Lock()
+
+
+def invalidate_spans() -> None:
+    global _spans
+    with _spans_lock:
+        _spans = None
+
+
+def attendance_spans() -> Tuple[Optional[date], Optional[date], Optional[date]]:
+    """Return (archive_first, archive_last, live_first) session dates, cached briefly.
+
+    live_first is the earliest session that still has live attendance rows;
+    the live table is treated as open-ended towards the future.
+    """
+
+    global _spans
+    with _spans_lock:
+        if _spans and time.monotonic() - _spans[0] < SPAN_CACHE_SECONDS:
+            return _spans[1:]
+
+    archive_first, archive_last = db.session.query(
+        func.min(ArchivedTerm.first_session_date), func.max(ArchivedTerm.last_session_date)
+    ).one()
+    live_first = None
+    if archive_first is not None:
+        live_first = (
+            db.session.query(func.min(AttendanceSession.session_date))
+            .filter(exists().where(StudentAttendance.session_id == AttendanceSession.session_id))
+            .scalar()
+        )
+
+    with _spans_lock:
+        _spans = (time.monotonic(), archive_first, archive_last, live_first)
+    return archive_first, archive_last, live_first
+
+
+def attendance_source(start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """Pick the attendance table(s) covering a session_date range.
+
+    Returns the live table, the archive table, or a UNION ALL of both, all with
+    Student_Attendance's columns. Callers still filter on session_date.
+    """
+
+    archive_first, archive_last, live_first = attendance_spans()
+    if archive_first is None:
+        return live_table
+
+    use_archive = (start_date is None or start_date <= archive_last) and (
+        end_date is None or end_date >= archive_first
+    )
+    use_live = live_first is None or end_date is None or end_date >= live_first
+    if use_archive and use_live:
+        return union_all(
+            select(*[live_table.c[name] for name in ATTENDANCE_COLUMNS]),
+            select(*[archive_table.c[name] for name in ATTENDANCE_COLUMNS]),
+        ).subquery("attendance")
+    if use_archive:
+        return archive_table
+    return live_table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archive attendance of a closed term.")
+    parser.add_argument("--semester", type=int, help="Semester number (1=Spring, 2=Summer, 3=Fall, 4=Winter)")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--force", action="store_true", help="Archive even if sessions are still open")
+    parser.add_argument("--list", action="store_true", help="List archived terms")
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        if args.list or args.semester is None or args.year is None:
+            for term in ArchivedTerm.query.order_by(ArchivedTerm.year, ArchivedTerm.semester):
+                print(term.to_dict())
+            return
+        started = time.perf_counter()
+        try:
+            term = archive_term(args.semester, args.year, force=args.force)
+        except ArchiveError as exc:
+            print(exc)
+            sys.exit(1)
+        print(f"Archived term {args.semester}/{args.year}: {term.to_dict()} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, event, or_, select, update
+
+# Allow running as a script from the backend directory (like migrate_db.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models import db, AttendanceBitset, AttendanceSession, StudentAttendance
+
+
+# 2-bit code per session ordinal. Sessions without a row read as absent,
+# which is what session close writes for no-shows anyway; sessions that
+# have not been held yet are masked out when summarizing (see unheld).
+CODES = {"absent": 0, "present": 1, "late": 2, "excused": 3}
+LETTERS = "APLE"
+RECENT_SESSIONS = 10
+# Lecture-wide maps are re-read from Attendance_Bitset after this long, so
+# writes made by other processes show up
+READ_TTL_SECONDS = 300
+
+Bitset = Tuple[int, int]  # (packed codes, length in sessions)
+
+
+def status_code(status: Optional[str]) -> int:
+    return CODES.get((status or "").strip().lower(), CODES["absent"])
+
+
+def set_code(bits: int, ordinal: int, code: int) -> int:
+    shift = 2 * ordinal
+    return (bits & ~(3 << shift)) | (code << shift)
+
+
+def code_planes(bits: int, length: int) -> Tuple[int, int, int, int]:
+    """Split packed codes into one mask per status (bit 2*i set for session i)."""
+
+    even = ((1 << (2 * length)) - 1) // 3  # 0b0101...01
+    low = bits & even
+    high = (bits >> 1) & even
+    present = low & ~high
+    late = high & ~low
+    excused = low & high
+    absent = even & ~(low | high)
+    return present, late, absent, excused
+
+
+def summarize(bits: int, length: int, recent: int = RECENT_SESSIONS, unheld: int = 0) -> Dict:
+    """Counts, rate, current absence streak and recent pattern from popcounts.
+
+    Excused sessions are left out of the rate and neither extend nor break
+    an absence streak; so are absences on sessions in the ``unheld`` mask
+    (bit 2*i for session i), which are scheduled but have not run yet.
+    ``recent_pattern`` lists the last sessions oldest first: P present,
+    L late, A absent, E excused, - not held yet.
+    """
+
+    present, late, absent, excused = code_planes(bits, length)
+    pending = absent & unheld
+    absent &= ~pending
+    counted = length - excused.bit_count() - pending.bit_count()
+    attended = present.bit_count() + late.bit_count()
+
+    attended_mask = present | late
+    if attended_mask:
+        # absences above the most recent attended session
+        streak = (absent >> (attended_mask.bit_length() + 1)).bit_count()
+    else:
+        streak = absent.bit_count()
+
+    return {
+        "sessions": length - pending.bit_count(),
+        "present": present.bit_count(),
+        "late": late.bit_count(),
+        "absent": absent.bit_count(),
+        "excused": excused.bit_count(),
+        "attendance_rate": round(attended / counted * 100, 2) if counted else None,
+        "absence_streak": streak,
+        "recent_pattern": "".join(
+            "-" if pending >> (2 * ordinal) & 1 else LETTERS[(bits >> (2 * ordinal)) & 3]
+            for ordinal in range(max(0, length - recent), length)
+        ),
+    }
+
+
+def held_clause():
+    """True for sessions that have run: started, or with any attendance row."""
+
+    return or_(
+        AttendanceSession.status != "Scheduled",
+        select(StudentAttendance.attendance_id)
+        .where(StudentAttendance.session_id == AttendanceSession.session_id)
+        .exists(),
+    )
+
+
+def to_bytes(bits: int, length: int) -> bytes:
+    return bits.to_bytes((2 * length + 7) // 8, "little")
+
+
+def from_bytes(codes: bytes) -> int:
+    return int.from_bytes(codes or b"", "little")
+
+
+class BitsetStore:
+    """Per (student, lecture) attendance history kept as packed 2-bit codes.
+
+    Attendance_Bitset is written in the same transaction as the attendance
+    rows; the in-memory copy of a lecture is updated only after that
+    transaction commits. A session's ordinal is its rank by session_id
+    within the lecture, so new sessions only ever append bits (a back-dated
+    session shows up where it was created, not by date). If a lecture's
+    sessions stop being a prefix of the new order (a session was removed),
+    the lecture is rebuilt from the attendance rows. Sessions created ahead
+    of time also get ordinals, so readers mask out the ones not held yet.
+    """
+
+    def __init__(self):
+        self.orders: Dict[int, List[int]] = {}
+        self.ordinals: Dict[int, Tuple[int, int]] = {}
+        self.lectures: Dict[int, Dict[int, Bitset]] = {}
+        self.loaded_at: Dict[int, float] = {}
+        self.held_masks: Dict[int, Tuple[int, float]] = {}
+        self.lock = threading.Lock()
+
+    # -- session ordinals ---------------------------------------------------
+
+    def _load_order(self, lecture_id: int) -> bool:
+        """Refresh a lecture's session order; False if existing ordinals moved."""
+
+        session_ids = [
+            row.session_id
+            for row in db.session.query(AttendanceSession.session_id)
+            .filter(AttendanceSession.lecture_id == lecture_id)
+            .order_by(AttendanceSession.session_id)
+        ]
+        with self.lock:
+            previous = self.orders.get(lecture_id)
+            for session_id in previous or ():
+                self.ordinals.pop(session_id, None)
+            self.orders[lecture_id] = session_ids
+            for ordinal, session_id in enumerate(session_ids):
+                self.ordinals[session_id] = (lecture_id, ordinal)
+        return previous is None or session_ids[: len(previous)] == previous
+
+    def _resolve(
+        self, session_ids: Iterable[int], lecture_ids: Optional[Iterable[int]] = None
+    ) -> Tuple[Dict[int, Tuple[int, int]], set]:
+        """Map sessions to (lecture, ordinal); also returns lectures that need a rebuild."""
+
+        session_ids = set(session_ids)
+        unknown = [session_id for session_id in session_ids if session_id not in self.ordinals]
+        rebuild = set()
+        if unknown:
+            if lecture_ids is not None:
+                lectures = set(lecture_ids)
+            else:
+                lectures = {
+                    row.lecture_id
+                    for row in db.session.query(AttendanceSession.lecture_id)
+                    .filter(AttendanceSession.session_id.in_(unknown))
+                    .distinct()
+                }
+            for lecture_id in lectures:
+                if not self._load_order(lecture_id):
+                    rebuild.add(lecture_id)
+        return {session_id: self.ordinals[session_id] for session_id in session_ids if session_id in self.ordinals}, rebuild
+
+    # -- writes ---------------------------------------------------------------
+
+    def record(
+        self, rows: Iterable[Tuple[int, int, Optional[str]]], lecture_ids: Optional[Iterable[int]] = None
+    ) -> None:
+        """Apply (session_id, user_id, status) writes. Call before the commit.
+
+        ``lecture_ids`` (the lectures of those sessions), when the caller
+        already has them, saves a lookup for sessions not seen before.
+        """
+
+        rows = [(int(session_id), int(user_id), status) for session_id, user_id, status in rows]
+        if not rows:
+            return
+        ordinals, rebuild = self._resolve((session_id for session_id, _, _ in rows), lecture_ids)
+        for lecture_id in rebuild:
+            self.rebuild_lecture(lecture_id)
+
+        changes: Dict[int, Dict[int, List[Tuple[int, int]]]] = defaultdict(lambda: defaultdict(list))
+        for session_id, user_id, status in rows:
+            if session_id not in ordinals:
+                continue
+            lecture_id, ordinal = ordinals[session_id]
+            if lecture_id in rebuild:
+                continue
+            changes[lecture_id][user_id].append((ordinal, status_code(status)))
+
+        for lecture_id, by_user in changes.items():
+            self._write(lecture_id, by_user)
+        with self.lock:
+            # A session with a row written has been held
+            for lecture_id, ordinal in ordinals.values():
+                if lecture_id in self.held_masks:
+                    mask, loaded_at = self.held_masks[lecture_id]
+                    self.held_masks[lecture_id] = (mask | 1 << (2 * ordinal), loaded_at)
+
+    def record_session(self, session_id: int, lecture_ids: Optional[Iterable[int]] = None) -> None:
+        """Re-read every row of one session, e.g. after an INSERT ... SELECT."""
+
+        rows = db.session.query(StudentAttendance.user_id, StudentAttendance.status).filter(
+            StudentAttendance.session_id == session_id
+        )
+        self.record([(session_id, row.user_id, row.status) for row in rows], lecture_ids)
+
+    def _write(self, lecture_id: int, by_user: Dict[int, List[Tuple[int, int]]]) -> None:
+        # Read-modify-write against the table, not memory. The read takes
+        # update locks (UPDLOCK, HOLDLOCK on SQL Server so missing keys are
+        # covered too; FOR UPDATE elsewhere) held until commit, so a writer in
+        # another process waits for this transaction instead of overwriting
+        # its bits with a stale copy
+        stored = {
+            row.user_id: (from_bytes(row.codes), row.length)
+            for row in db.session.execute(
+                select(AttendanceBitset.user_id, AttendanceBitset.codes, AttendanceBitset.length)
+                .where(AttendanceBitset.lecture_id == lecture_id, AttendanceBitset.user_id.in_(list(by_user)))
+                .with_hint(AttendanceBitset, "WITH (UPDLOCK, HOLDLOCK)", "mssql")
+                .with_for_update()
+            )
+        }
+
+        now = datetime.now(timezone.utc)
+        updates, inserts, staged = [], [], []
+        for user_id, codes in by_user.items():
+            bits, length = stored.get(user_id, (0, 0))
+            for ordinal, code in codes:
+                bits = set_code(bits, ordinal, code)
+                length = max(length, ordinal + 1)
+            staged.append(("set", lecture_id, user_id, (bits, length)))
+            values = {"codes": to_bytes(bits, length), "length": length, "updated_at": now}
+            if user_id in stored:
+                updates.append({"b_user": user_id, **{f"b_{key}": value for key, value in values.items()}})
+            else:
+                inserts.append({"user_id": user_id, "lecture_id": lecture_id, **values})
+
+        table = AttendanceBitset.__table__
+        if updates:
+            db.session.execute(
+                update(table)
+                .where((table.c.lecture_id == lecture_id) & (table.c.user_id == bindparam("b_user")))
+                .values(codes=bindparam("b_codes"), length=bindparam("b_length"), updated_at=bindparam("b_updated_at")),
+                updates,
+            )
+        if inserts:
+            db.session.execute(table.insert(), inserts)
+        self._stage(staged)
+
+    def rebuild_lecture(self, lecture_id: int) -> int:
+        """Recompute a lecture's bitsets from attendance rows (live and archived)."""
+
+        from archive import attendance_source
+
+        self._load_order(lecture_id)
+        ordinal_of = {session_id: ordinal for ordinal, session_id in enumerate(self.orders[lecture_id])}
+        attendance = attendance_source()
+        rows = (
+            db.session.query(attendance.c.session_id, attendance.c.user_id, attendance.c.status)
+            .join(AttendanceSession, AttendanceSession.session_id == attendance.c.session_id)
+            .filter(AttendanceSession.lecture_id == lecture_id)
+        )
+
+        bitsets: Dict[int, Bitset] = {}
+        for session_id, user_id, status in rows:
+            bits, length = bitsets.get(user_id, (0, 0))
+            ordinal = ordinal_of[session_id]
+            bitsets[user_id] = (set_code(bits, ordinal, status_code(status)), max(length, ordinal + 1))
+
+        now = datetime.now(timezone.utc)
+        AttendanceBitset.query.filter_by(lecture_id=lecture_id).delete(synchronize_session=False)
+        if bitsets:
+            db.session.execute(
+                AttendanceBitset.__table__.insert(),
+                [
+                    {
+                        "user_id": user_id,
+                        "lecture_id": lecture_id,
+                        "codes": to_bytes(bits, length),
+                        "length": length,
+                        "updated_at": now,
+                    }
+                    for user_id, (bits, length) in bitsets.items()
+                ],
+            )
+        self._stage([("lecture", lecture_id, None, bitsets)])
+        return len(bitsets)
+
+    def drop_user(self, user_id: int) -> None:
+        AttendanceBitset.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        self._stage([("drop_user", None, user_id, None)])
+
+    def drop_lecture(self, lecture_id: int) -> None:
+        AttendanceBitset.query.filter_by(lecture_id=lecture_id).delete(synchronize_session=False)
+        self._stage([("drop_lecture", lecture_id, None, None)])
+
+    # -- reads ----------------------------------------------------------------
+
+    def lecture_history(self, lecture_id: int) -> Dict[int, Bitset]:
+        """Bitsets of every student in a lecture, served from memory when fresh."""
+
+        with self.lock:
+            cached = self.lectures.get(lecture_id)
+            if cached is not None and time.monotonic() - self.loaded_at[lecture_id] < READ_TTL_SECONDS:
+                return dict(cached)
+        bitsets = {
+            row.user_id: (from_bytes(row.codes), row.length)
+            for row in db.session.query(AttendanceBitset.user_id, AttendanceBitset.codes, AttendanceBitset.length)
+            .filter(AttendanceBitset.lecture_id == lecture_id)
+        }
+        with self.lock:
+            self.lectures[lecture_id] = bitsets
+            self.loaded_at[lecture_id] = time.monotonic()
+        return dict(bitsets)
+
+    def unheld(self, lecture_ids: Iterable[int]) -> Dict[int, int]:
+        """Per lecture, a mask (bit 2*ordinal) of sessions not known to have been held.
+
+        The held sessions are read once per READ_TTL_SECONDS, like lecture
+        maps, and writes made here add theirs at once. Sessions created since
+        the read fall outside it, so the mask is the (infinite) complement.
+        """
+
+        lecture_ids = set(lecture_ids)
+        now = time.monotonic()
+        with self.lock:
+            held = {
+                lecture_id: self.held_masks[lecture_id][0]
+                for lecture_id in lecture_ids
+                if lecture_id in self.held_masks and now - self.held_masks[lecture_id][1] < READ_TTL_SECONDS
+            }
+        missing = lecture_ids - set(held)
+        if missing:
+            loaded = dict.fromkeys(missing, 0)
+            ordinal_of: Dict[int, int] = defaultdict(int)
+            rows = (
+                db.session.query(AttendanceSession.lecture_id, held_clause().label("held"))
+                .filter(AttendanceSession.lecture_id.in_(missing))
+                .order_by(AttendanceSession.lecture_id, AttendanceSession.session_id)
+            )
+            for lecture_id, was_held in rows:
+                ordinal = ordinal_of[lecture_id]
+                ordinal_of[lecture_id] += 1
+                if was_held:
+                    loaded[lecture_id] |= 1 << (2 * ordinal)
+            with self.lock:
+                for lecture_id, mask in loaded.items():
+                    self.held_masks[lecture_id] = (mask, now)
+            held.update(loaded)
+        return {lecture_id: ~mask for lecture_id, mask in held.items()}
+
+    def user_history(self, user_id: int) -> Dict[int, Bitset]:
+        """A student's bitsets across lectures: one primary-key range read."""
+
+        return {
+            row.lecture_id: (from_bytes(row.codes), row.length)
+            for row in db.session.query(AttendanceBitset.lecture_id, AttendanceBitset.codes, AttendanceBitset.length)
+            .filter(AttendanceBitset.user_id == user_id)
+        }
+
+    # -- commit hooks ---------------------------------------------------------
+
+    def _stage(self, operations) -> None:
+        db.session.info.setdefault("bitsets", []).extend(operations)
+
+    def apply(self, operations) -> None:
+        with self.lock:
+            for kind, lecture_id, user_id, value in operations:
+                if kind == "set":
+                    if lecture_id in self.lectures:
+                        self.lectures[lecture_id][user_id] = value
+                elif kind == "lecture":
+                    self.lectures[lecture_id] = dict(value)
+                    self.loaded_at[lecture_id] = time.monotonic()
+                elif kind == "drop_user":
+                    for bitsets in self.lectures.values():
+                        bitsets.pop(user_id, None)
+                elif kind == "drop_lecture":
+                    self.lectures.pop(lecture_id, None)
+                    self.held_masks.pop(lecture_id, None)
+                    for session_id in self.orders.pop(lecture_id, ()):
+                        self.ordinals.pop(session_id, None)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.orders.clear()
+            self.ordinals.clear()
+            self.lectures.clear()
+            self.loaded_at.clear()
+            self.held_masks.clear()
+
+
+store = BitsetStore()
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_after_commit(session) -> None:
+    operations = session.info.pop("bitsets", None)
+    if operations:
+        store.apply(operations)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_after_rollback(session) -> None:
+    session.info.pop("bitsets", None)
+
+
+def rebuild_all() -> int:
+    lecture_ids = [row.lecture_id for row in db.session.query(AttendanceSession.lecture_id).distinct()]
+    rows = 0
+    for lecture_id in lecture_ids:
+        rows += store.rebuild_lecture(lecture_id)
+        db.session.commit()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild Attendance_Bitset from attendance rows.")
+    parser.add_argument("--lecture", type=int, help="Only rebuild this lecture")
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        started = time.perf_counter()
+        if args.lecture:
+            rows = store.rebuild_lecture(args.lecture)
+            db.session.commit()
+        else:
+            rows = rebuild_all()
+        print(f"Rebuilt {rows} bitsets in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
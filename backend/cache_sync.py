@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import func, or_, select
+
+import changes
+from ann import index_student, unindex_student
+from bitsets import store as bitset_store
+from dashboard_cache import dashboard_cache
+from models import db, ChangeLog, Lecture, Student, User
+from recognition import invalidate_galleries
+from search import index_document, lecture_document, unindex_document, user_document
+from timetable import index as timetable_index
+
+
+# How often a process looks for changes committed elsewhere; 0 turns it off
+SYNC_SECONDS = float(os.getenv("CACHE_SYNC_SECONDS", "1"))
+# A change_id still missing after this long belongs to a rolled-back
+# transaction (or an identity jump) and is no longer waited for
+GAP_SECONDS = float(os.getenv("CACHE_SYNC_GAP_SECONDS", "600"))
+# Gaps re-checked per poll, oldest first
+GAP_BATCH = 500
+FOLLOWED = ("user", "lecture", "enrollment", "attendance")
+
+
+def forget_users(user_ids: Iterable[int]) -> None:
+    """Drop deleted users from this process's recognition, search and dashboard caches."""
+
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    invalidate_galleries()
+    for user_id in user_ids:
+        unindex_student(user_id)
+        unindex_document("user", user_id)
+    dashboard_cache.invalidate_users(user_ids)
+
+
+def forget_lectures(lecture_ids: Iterable[int]) -> None:
+    """Drop deleted lectures from this process's rosters, timetable, search and dashboards."""
+
+    lecture_ids = set(lecture_ids)
+    if not lecture_ids:
+        return
+    invalidate_galleries()
+    timetable_index.invalidate()
+    for lecture_id in lecture_ids:
+        unindex_document("lecture", lecture_id)
+    dashboard_cache.invalidate_lectures(lecture_ids)
+
+
+def reindex_users(user_ids: Iterable[int]) -> None:
+    """Re-read created or renamed users into this process's search index."""
+
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    rows = (
+        db.session.query(
+            User.user_id,
+            User.full_name,
+            User.username,
+            User.email,
+            User.role,
+            Student.roll_number,
+        )
+        .outerjoin(Student, Student.user_id == User.user_id)
+        .filter(User.user_id.in_(user_ids))
+        .all()
+    )
+    for row in rows:
+        index_document(user_document(row, row.roll_number))
+
+
+def reindex_lectures(lecture_ids: Iterable[int]) -> None:
+    """Re-read created or renamed lectures into this process's search index."""
+
+    lecture_ids = set(lecture_ids)
+    if not lecture_ids:
+        return
+    rows = (
+        db.session.query(Lecture.lecture_id, Lecture.lecture_name, Lecture.course_code)
+        .filter(Lecture.lecture_id.in_(lecture_ids))
+        .all()
+    )
+    for row in rows:
+        index_document(lecture_document(row))
+
+
+def reload_templates(user_ids: Iterable[int]) -> None:
+    """Re-read face templates rewritten elsewhere into the campus index."""
+
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    rows = (
+        db.session.query(Student.user_id, Student.face_embeddings)
+        .filter(Student.user_id.in_(user_ids), Student.enrollment_status == "Active")
+        .all()
+    )
+    for row in rows:
+        index_student(row.user_id, row.face_embeddings)
+
+
+class ChangeFollower:
+    """Applies changes that other processes logged to Change_Log.
+
+    Caches are per process, so a delete run by the job worker (or another
+    API process) only clears that process's copies. Every ``interval``
+    seconds this reads the entries past the last one it saw and runs the
+    same invalidations here for user, lecture and enrollment entries, and
+    drops the dashboards of students whose attendance changed;
+    users and lectures created or updated elsewhere are re-read into the
+    search index, and rewritten face templates into the campus index.
+
+    change_id is handed out before commit, so a transaction that commits
+    late leaves a gap that fills in afterwards. Missing ids are remembered
+    and re-read on each poll until they appear or GAP_SECONDS pass; the
+    cursor stays below the oldest open gap and ids already applied above it
+    are not applied twice. No clock is involved.
+    """
+
+    def __init__(self, interval: float = SYNC_SECONDS, gap_seconds: float = GAP_SECONDS):
+        self.interval = interval
+        self.gap_seconds = gap_seconds
+        self.cursor: Optional[int] = None
+        self.top = 0
+        self.applied: Set[int] = set()
+        self.gaps: Dict[int, float] = {}
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def poll(self, force: bool = False) -> int:
+        """Apply new entries if due; returns how many were applied."""
+
+        if self.interval <= 0 and not force:
+            return 0
+        with self.lock:
+            if not force and time.monotonic() - self.checked_at < self.interval:
+                return 0
+            self.checked_at = now = time.monotonic()
+            if self.cursor is None:
+                # Nothing was cached before this process started following;
+                # entries younger than the feed's settle window may still be
+                # joined by late commits below them
+                self.cursor = db.session.execute(
+                    select(func.max(ChangeLog.change_id)).where(
+                        ChangeLog.changed_at <= changes.utc_ago(changes.SETTLE_SECONDS)
+                    )
+                ).scalar() or 0
+                self.top = self.cursor
+            waiting = sorted(self.gaps)[:GAP_BATCH]
+            rows = db.session.execute(
+                select(
+                    ChangeLog.change_id,
+                    ChangeLog.entity,
+                    ChangeLog.operation,
+                    ChangeLog.user_id,
+                    ChangeLog.lecture_id,
+                )
+                .where(
+                    or_(ChangeLog.change_id > self.top, ChangeLog.change_id.in_(waiting))
+                    if waiting
+                    else ChangeLog.change_id > self.top
+                )
+                .order_by(ChangeLog.change_id)
+            ).all()
+
+            fresh = [row for row in rows if row.change_id not in self.applied]
+            self._apply([row for row in fresh if row.entity in FOLLOWED])
+            self._advance([row.change_id for row in rows], now)
+            return len(fresh)
+
+    def _apply(self, rows) -> None:
+        deleted_users = {row.user_id for row in rows if row.entity == "user" and row.operation == "delete"}
+        deleted_lectures = {row.lecture_id for row in rows if row.entity == "lecture" and row.operation == "delete"}
+        written_users = {row.user_id for row in rows if row.entity == "user" and row.operation != "delete"}
+        written_lectures = {row.lecture_id for row in rows if row.entity == "lecture" and row.operation != "delete"}
+        enrolled = {row.user_id for row in rows if row.entity == "enrollment"}
+        retemplated = {row.user_id for row in rows if row.entity == "enrollment" and row.operation == "update"}
+        marked = {row.user_id for row in rows if row.entity == "attendance"}
+        reindex_users(written_users - deleted_users - {None})
+        reindex_lectures(written_lectures - deleted_lectures - {None})
+        # Snapshots carry names and attendance; a put racing this is discarded
+        # by the cache's generation stamps
+        dashboard_cache.invalidate_users((written_users | marked) - {None})
+        dashboard_cache.invalidate_lectures(written_lectures - {None})
+        forget_users(deleted_users - {None})
+        forget_lectures(deleted_lectures - {None})
+        if enrolled:
+            # Waitlist promotions and drops change rosters and dashboards;
+            # template rewrites (quality.py, enrollment jobs) change galleries
+            invalidate_galleries()
+            dashboard_cache.invalidate_users(enrolled - {None})
+        reload_templates(retemplated - deleted_users - {None})
+        bitset_store.apply(
+            [("drop_user", None, user_id, None) for user_id in deleted_users - {None}]
+            + [("drop_lecture", lecture_id, None, None) for lecture_id in deleted_lectures - {None}]
+        )
+
+    def _advance(self, seen: Iterable[int], now: float) -> None:
+        seen = set(seen)
+        self.applied |= seen
+        for change_id in seen:
+            self.gaps.pop(change_id, None)
+        top = max(seen | {self.top})
+        for change_id in range(self.top + 1, top + 1):
+            if change_id not in seen:
+                self.gaps[change_id] = now
+        self.top = top
+        for change_id, noticed in list(self.gaps.items()):
+            if now - noticed >= self.gap_seconds:
+                del self.gaps[change_id]
+        self.cursor = min(self.gaps) - 1 if self.gaps else self.top
+        self.applied = {change_id for change_id in self.applied if change_id > self.cursor}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.cursor = None
+            self.top = 0
+            self.applied = set()
+            self.gaps = {}
+            self.checked_at = 0.0
+
+
+follower = ChangeFollower()
@@ -0,0 +1,124 @@
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import DateTime, insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+from models import db, ChangeLog
+
+
+ENTITIES = ("attendance", "enrollment", "user", "lecture")
+MAX_PAGE = 1000
+# Identity values are handed out before commit, so a slow transaction can
+# commit a lower change_id after a reader already moved past it. Readers only
+# see rows older than this window; it must exceed the longest write transaction.
+# Rows are stamped and compared on the database clock, so app hosts' clocks
+# do not matter (cache_sync tracks gaps instead and does not depend on it).
+SETTLE_SECONDS = float(os.getenv("CHANGE_FEED_SETTLE_SECONDS", "30"))
+
+
+class utc_ago(FunctionElement):
+    """The database server's UTC clock, ``seconds`` ago (0 = now)."""
+
+    type = DateTime()
+    inherit_cache = True
+
+    def __init__(self, seconds: float = 0):
+        self.seconds = float(seconds)
+        super().__init__()
+
+
+@compiles(utc_ago)
+def _utc_ago_sqlite(element, compiler, **kw):
+    # CURRENT_TIMESTAMP is UTC in SQLite
+    if not element.seconds:
+        return "CURRENT_TIMESTAMP"
+    return f"datetime(CURRENT_TIMESTAMP, '-{element.seconds:f} seconds')"
+
+
+@compiles(utc_ago, "mssql")
+def _utc_ago_mssql(element, compiler, **kw):
+    if not element.seconds:
+        return "SYSUTCDATETIME()"
+    return f"DATEADD(millisecond, -{int(element.seconds * 1000)}, SYSUTCDATETIME())"
+
+
+@compiles(utc_ago, "postgresql")
+def _utc_ago_postgresql(element, compiler, **kw):
+    return f"(CURRENT_TIMESTAMP AT TIME ZONE 'utc') - INTERVAL '{element.seconds:f} seconds'"
+
+
+def log_changes(entity: str, operation: str, rows: Iterable[Dict]) -> int:
+    """Append change rows in the caller's transaction; returns how many.
+
+    Each row needs ``key`` and may carry ``user_id``, ``lecture_id``,
+    ``session_id`` and its own ``operation``. Nothing is committed here:
+    the entry lands (or is rolled back) together with the write it describes.
+    """
+
+    values = [
+        {
+            "entity": entity,
+            "entity_key": str(row["key"]),
+            "operation": row.get("operation", operation),
+            "user_id": row.get("user_id"),
+            "lecture_id": row.get("lecture_id"),
+            "session_id": row.get("session_id"),
+        }
+        for row in rows
+    ]
+    if values:
+        db.session.execute(insert(ChangeLog).values(changed_at=utc_ago()), values)
+    return len(values)
+
+
+def log_change(entity: str, operation: str, key, **refs) -> None:
+    log_changes(entity, operation, [dict(refs, key=key)])
+
+
+def attendance_rows(
+    marks: Iterable[Tuple[int, int]], lecture_ids: Dict[int, Optional[int]], operation: str = "update"
+) -> List[Dict]:
+    """Change rows for (session_id, user_id) attendance writes."""
+
+    return [
+        {
+            "key": f"{session_id}:{user_id}",
+            "operation": operation,
+            "session_id": session_id,
+            "user_id": user_id,
+            "lecture_id": lecture_ids.get(session_id),
+        }
+        for session_id, user_id in marks
+    ]
+
+
+def enrollment_key(user_id: int, lecture_id: int) -> str:
+    return f"{user_id}:{lecture_id}"
+
+
+def read_changes(
+    since: int = 0,
+    limit: int = 100,
+    entities: Optional[Iterable[str]] = None,
+    lecture_id: Optional[int] = None,
+) -> Dict:
+    """One page of the feed after cursor ``since``, oldest first."""
+
+    limit = max(1, min(int(limit), MAX_PAGE))
+    query = ChangeLog.query.filter(ChangeLog.change_id > since, ChangeLog.changed_at <= utc_ago(SETTLE_SECONDS))
+    if entities:
+        query = query.filter(ChangeLog.entity.in_(list(entities)))
+    if lecture_id is not None:
+        query = query.filter(ChangeLog.lecture_id == lecture_id)
+    rows = query.order_by(ChangeLog.change_id).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "changes": [row.to_dict() for row in rows],
+        # Filtered pages still advance the cursor past what they scanned
+        "next_cursor": rows[-1].change_id if rows else since,
+        "has_more": has_more,
+    }
@@ -0,0 +1,64 @@
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, func, select, text
+from sqlalchemy.exc import DBAPIError
+
+from models import db, Lecture, Student, Teacher, User, UserLecture
+
+
+COUNTED = {
+    "total_users": User,
+    "total_students": Student,
+    "total_teachers": Teacher,
+    "total_lectures": Lecture,
+    "total_enrollments": UserLecture,
+}
+
+# Row counts SQL Server keeps per heap/clustered index. Reading them touches
+# no table pages; they can trail in-flight transactions by a few rows.
+PARTITION_STATS = text(
+    """
+    SELECT OBJECT_NAME(object_id) AS table_name, SUM(row_count) AS row_count
+    FROM sys.dm_db_partition_stats
+    WHERE index_id IN (0, 1)
+      AND OBJECT_SCHEMA_NAME(object_id) = SCHEMA_NAME()
+      AND OBJECT_NAME(object_id) IN :tables
+    GROUP BY object_id
+    """
+).bindparams(bindparam("tables", expanding=True))
+
+
+def exact_counts() -> Dict[str, int]:
+    """COUNT(*) of every table, as scalar subqueries of a single SELECT."""
+
+    columns = [select(func.count()).select_from(model).scalar_subquery().label(key) for key, model in COUNTED.items()]
+    row = db.session.execute(select(*columns)).one()
+    return {key: row._mapping[key] or 0 for key in COUNTED}
+
+
+def metadata_counts() -> Optional[Dict[str, int]]:
+    """Counts from sys.dm_db_partition_stats; None if a table is missing from it."""
+
+    tables = {model.__tablename__: key for key, model in COUNTED.items()}
+    rows = db.session.execute(PARTITION_STATS, {"tables": list(tables)}).all()
+    found = {tables[row.table_name]: int(row.row_count or 0) for row in rows if row.table_name in tables}
+    return found if len(found) == len(COUNTED) else None
+
+
+def overview_counts(exact: bool = False) -> Dict:
+    """Dashboard totals with an ``accuracy`` flag.
+
+    On SQL Server the partition metadata answers without scanning anything;
+    it needs VIEW DATABASE STATE, and any failure falls back to exact counts,
+    as do SQLite and ``exact=True``.
+    """
+
+    if not exact and db.engine.dialect.name == "mssql":
+        try:
+            counts = metadata_counts()
+        except DBAPIError:
+            db.session.rollback()
+            counts = None
+        if counts is not None:
+            return {**counts, "accuracy": "approximate", "source": "partition_stats"}
+    return {**exact_counts(), "accuracy": "exact", "source": "count"}
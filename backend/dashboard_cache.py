@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Set
+
+
+MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_SIZE", "2048"))
+# Bounds staleness for data no Change_Log entry covers (risk.py scores)
+TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+
+
+class SnapshotCache:
+    """LRU + TTL cache of student dashboard payloads.
+
+    Entries are indexed by user and by the lectures the payload lists, so a
+    write can drop exactly the snapshots it affects: a batch of marks drops
+    the marked students, closing a session drops everyone enrolled in its
+    lecture. Everything else keeps serving from memory.
+
+    A payload built from rows read before an invalidation must not be cached
+    after it. Readers take ``stamp()`` before querying and pass it to ``put``;
+    every invalidation bumps a generation and marks the users and lectures it
+    dropped, and a put whose user or lectures were marked after its stamp is
+    discarded. Other processes' writes arrive the same way through cache_sync.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.by_user: Dict[int, Set[Hashable]] = {}
+        self.by_lecture: Dict[int, Set[Hashable]] = {}
+        self.generation = 0
+        # Generation of the last invalidation per user / lecture. Trimmed by
+        # raising ``floor``: stamps older than it are treated as invalidated.
+        self.user_marks: Dict[int, int] = {}
+        self.lecture_marks: Dict[int, int] = {}
+        self.floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def stamp(self) -> int:
+        """Take before reading the rows a payload is built from."""
+
+        with self.lock:
+            return self.generation
+
+    def put(
+        self, key: Hashable, payload: dict, user_id: int, lecture_ids: Iterable[int], stamp: Optional[int] = None
+    ) -> None:
+        lecture_ids = frozenset(lecture_ids)
+        with self.lock:
+            if stamp is not None and self._stale(stamp, user_id, lecture_ids):
+                return
+            self._drop(key)
+            self.entries[key] = (time.monotonic(), payload, user_id, lecture_ids)
+            self.by_user.setdefault(user_id, set()).add(key)
+            for lecture_id in lecture_ids:
+                self.by_lecture.setdefault(lecture_id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def invalidate_users(self, user_ids: Iterable[int]) -> None:
+        with self.lock:
+            self._bump()
+            for user_id in set(user_ids):
+                self.user_marks[user_id] = self.generation
+                for key in list(self.by_user.get(user_id, ())):
+                    self._drop(key)
+
+    def invalidate_lectures(self, lecture_ids: Iterable[int]) -> None:
+        with self.lock:
+            self._bump()
+            for lecture_id in set(lecture_ids):
+                self.lecture_marks[lecture_id] = self.generation
+                for key in list(self.by_lecture.get(lecture_id, ())):
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.by_user.clear()
+            self.by_lecture.clear()
+            self.generation += 1
+            self.floor = self.generation
+            self.user_marks.clear()
+            self.lecture_marks.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _bump(self) -> None:
+        self.generation += 1
+        if len(self.user_marks) + len(self.lecture_marks) > self.max_entries:
+            self.floor = self.generation
+            self.user_marks.clear()
+            self.lecture_marks.clear()
+
+    def _stale(self, stamp: int, user_id: int, lecture_ids: Iterable[int]) -> bool:
+        if stamp < self.floor or self.user_marks.get(user_id, 0) > stamp:
+            return True
+        return any(self.lecture_marks.get(lecture_id, 0) > stamp for lecture_id in lecture_ids)
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        _, _, user_id, lecture_ids = entry
+        self._unlink(self.by_user, user_id, key)
+        for lecture_id in lecture_ids:
+            self._unlink(self.by_lecture, lecture_id, key)
+
+    @staticmethod
+    def _unlink(index: Dict[int, Set[Hashable]], owner: int, key: Hashable) -> None:
+        keys = index.get(owner)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[owner]
+
+
+dashboard_cache = SnapshotCache()
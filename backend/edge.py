@@ -0,0 +1,399 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, time as dt_time, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Allow running as a script from the backend directory (like migrate_db.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from recognition import DEFAULT_THRESHOLD, DEFAULT_TOP_K, FaceGallery
+
+
+EDGE_DB_PATH = os.getenv("EDGE_DB_PATH", "edge.sqlite3")
+EDGE_SPOOL_DIR = os.getenv("EDGE_SPOOL_DIR", "edge_spool")
+SEGMENT_EVENTS = 5000
+SYNC_BATCH = 1000
+FLUSH_INTERVAL_SECONDS = 10.0
+# Detections this long before a session starts or after it ends still count
+SESSION_GRACE_MINUTES = 15
+HTTP_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roster (user_id INTEGER PRIMARY KEY, face_embeddings TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id INTEGER PRIMARY KEY,
+    session_date TEXT,
+    session_start_time TEXT,
+    session_end_time TEXT,
+    attendance_locked INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class SyncFailed(Exception):
+    """The central server could not be reached or refused a batch; retry later."""
+
+
+def post_json(url: str, payload: Optional[Dict] = None) -> Dict:
+    """GET (no payload) or POST JSON with the standard library; raises SyncFailed."""
+
+    body = json.dumps(payload).encode() if payload is not None else None
+    # Camera traffic yields to teachers under load; a 429 just leaves the spool for the next round
+    headers = {"Content-Type": "application/json", "X-Request-Source": "camera"}
+    request = urllib.request.Request(url, data=body, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            return json.loads(response.read() or b"{}")
+    except (urllib.error.URLError, OSError, ValueError) as exc:
+        raise SyncFailed(str(exc)) from exc
+
+
+class LocalRoster:
+    """SQLite copy of the roster and sessions from ``/api/cameras/<id>/edge-snapshot``."""
+
+    def __init__(self, path: str = EDGE_DB_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self._gallery: Optional[FaceGallery] = None
+
+    def replace(self, snapshot: Dict) -> None:
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM roster")
+            self.connection.execute("DELETE FROM sessions")
+            roster = []
+            for row in snapshot.get("roster", []):
+                embeddings = row["face_embeddings"]
+                roster.append((row["user_id"], embeddings if isinstance(embeddings, str) else json.dumps(embeddings)))
+            self.connection.executemany("INSERT INTO roster (user_id, face_embeddings) VALUES (?, ?)", roster)
+            self.connection.executemany(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        row["session_id"],
+                        row.get("session_date"),
+                        row.get("session_start_time"),
+                        row.get("session_end_time"),
+                        int(bool(row.get("attendance_locked"))),
+                    )
+                    for row in snapshot.get("sessions", [])
+                ],
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('refreshed_at', ?)", (snapshot.get("generated_at"),)
+            )
+            self._gallery = None
+
+    def gallery(self) -> FaceGallery:
+        with self.lock:
+            if self._gallery is None:
+                self._gallery = FaceGallery.from_rows(
+                    self.connection.execute("SELECT user_id, face_embeddings FROM roster").fetchall()
+                )
+            return self._gallery
+
+    def active_session(self, at: datetime) -> Optional[int]:
+        """The unlocked session running at ``at`` (local time), within the grace period."""
+
+        grace = timedelta(minutes=SESSION_GRACE_MINUTES)
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT session_id, session_start_time, session_end_time FROM sessions "
+                "WHERE session_date = ? AND attendance_locked = 0 ORDER BY session_start_time",
+                (at.date().isoformat(),),
+            ).fetchall()
+        for session_id, start, end in rows:
+            starts = datetime.combine(at.date(), dt_time.fromisoformat(start)) if start else None
+            ends = datetime.combine(at.date(), dt_time.fromisoformat(end)) if end else None
+            if (starts is None or at >= starts - grace) and (ends is None or at <= ends + grace):
+                return session_id
+        return None
+
+    def refreshed_at(self) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'refreshed_at'").fetchone()
+        return row[0] if row else None
+
+
+class Spool:
+    """Append-only JSON-lines segments on disk.
+
+    Events are appended to ``current.jsonl`` and fsynced; a segment is sealed
+    (renamed to a sequence number) when it fills up or before a sync. Sealed
+    segments are uploaded oldest first and deleted only once the server has
+    acknowledged every event in them.
+    """
+
+    def __init__(self, directory: str = EDGE_SPOOL_DIR, segment_events: int = SEGMENT_EVENTS):
+        self.directory = directory
+        self.segment_events = segment_events
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.current = os.path.join(directory, "current.jsonl")
+        self.current_events = self._count(self.current)
+
+    @staticmethod
+    def _count(path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as handle:
+            return sum(1 for _ in handle)
+
+    def append(self, events: List[Dict]) -> None:
+        if not events:
+            return
+        with self.lock:
+            with open(self.current, "a", encoding="utf-8") as handle:
+                for event in events:
+                    handle.write(json.dumps(event, separators=(",", ":")) + "\n")
+                handle.flush()
+                os.fsync(handle.fileno())
+            self.current_events += len(events)
+            if self.current_events >= self.segment_events:
+                self._seal()
+
+    def seal(self) -> None:
+        with self.lock:
+            self._seal()
+
+    def _seal(self) -> None:
+        if not self.current_events:
+            return
+        sealed = self.segments()
+        number = int(os.path.basename(sealed[-1]).split(".")[0]) + 1 if sealed else 1
+        os.replace(self.current, os.path.join(self.directory, f"{number:012d}.jsonl"))
+        self.current_events = 0
+
+    def segments(self) -> List[str]:
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".jsonl") and name != "current.jsonl"
+        )
+
+    def pending(self) -> int:
+        return sum(self._count(path) for path in self.segments()) + self.current_events
+
+    @staticmethod
+    def read(path: str) -> List[Dict]:
+        events = []
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue  # torn write from a power loss; the rest is intact
+        return events
+
+
+class EdgeNode:
+    """Offline edge mode for one camera room.
+
+    Recognition runs against the LocalRoster copy and results are appended
+    to the Spool; ``sync()`` uploads the spool to ``POST /api/attendance/sync``
+    in large batches once the central server is reachable. Every event gets
+    its idempotency key when it is spooled, so re-sending a batch after a
+    dropped connection never writes twice.
+
+    Like the central presence tracker, detections are coalesced per
+    (session, student) in memory and written out at most every
+    ``flush_interval`` seconds, so the spool (and later the central
+    database) sees one event per student per interval instead of one per
+    frame.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        camera_id: int,
+        roster: Optional[LocalRoster] = None,
+        spool: Optional[Spool] = None,
+        transport: Callable[[str, Optional[Dict]], Dict] = post_json,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+    ):
+        self.server = server.rstrip("/")
+        self.camera_id = camera_id
+        self.roster = roster or LocalRoster()
+        self.spool = spool or Spool()
+        self.transport = transport
+        self.flush_interval = flush_interval
+        self.pending: Dict[Tuple[int, int], Dict] = {}
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refresh(self, days: int = 7) -> None:
+        snapshot = self.transport(f"{self.server}/api/cameras/{self.camera_id}/edge-snapshot?days={days}", None)
+        self.roster.replace(snapshot)
+
+    def recognize(
+        self,
+        embeddings,
+        seen_at: Optional[datetime] = None,
+        top_k: int = DEFAULT_TOP_K,
+        threshold: float = DEFAULT_THRESHOLD,
+    ) -> Dict:
+        seen_at = seen_at or datetime.now()
+        gallery = self.roster.gallery()
+        probes = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1) if len(embeddings) else None
+        if probes is None or len(gallery) == 0 or probes.shape[1] != gallery.dim:
+            matches = []
+        else:
+            matches = gallery.match_batch(probes, top_k, threshold)
+
+        session_id = self.roster.active_session(seen_at)
+        if session_id is not None:
+            with self.lock:
+                for match in matches:
+                    if match["user_id"] is None:
+                        continue
+                    key = (session_id, match["user_id"])
+                    entry = self.pending.get(key)
+                    if entry is None:
+                        self.pending[key] = {"first_seen": seen_at, "last_seen": seen_at, "confidence": match["confidence"]}
+                    else:
+                        entry["first_seen"] = min(entry["first_seen"], seen_at)
+                        entry["last_seen"] = max(entry["last_seen"], seen_at)
+                        entry["confidence"] = max(entry["confidence"], match["confidence"])
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+        return {"session_id": session_id, "gallery_size": len(gallery), "matches": matches}
+
+    def flush(self) -> int:
+        """Spool coalesced detections, each under a fresh idempotency key."""
+
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        events = [
+            {
+                "key": f"{self.camera_id}:{uuid.uuid4().hex}",
+                "session_id": session_id,
+                "user_id": user_id,
+                "first_seen": entry["first_seen"].isoformat(),
+                "last_seen": entry["last_seen"].isoformat(),
+                "confidence": round(float(entry["confidence"] or 0.0), 4),
+            }
+            for (session_id, user_id), entry in pending.items()
+        ]
+        self.spool.append(events)
+        return len(events)
+
+    def sync(self, batch_size: int = SYNC_BATCH) -> Dict:
+        """Upload sealed segments oldest first; stops at the first failure."""
+
+        self.flush()
+        self.spool.seal()
+        totals = {"segments": 0, "accepted": 0, "duplicates": 0, "rejected": 0}
+        for path in self.spool.segments():
+            events = Spool.read(path)
+            for start in range(0, len(events), batch_size):
+                result = self.transport(
+                    f"{self.server}/api/attendance/sync",
+                    {"camera_id": self.camera_id, "events": events[start : start + batch_size]},
+                )
+                if "accepted" not in result:
+                    raise SyncFailed(result.get("error") or "Unexpected sync response")
+                totals["accepted"] += result["accepted"]
+                totals["duplicates"] += result["duplicates"]
+                # Rejections (unknown or teacher-locked sessions) will not
+                # succeed on retry either, so they do not hold the segment back
+                totals["rejected"] += len(result.get("rejected", []))
+            os.remove(path)
+            totals["segments"] += 1
+        return totals
+
+
+def create_edge_app(node: EdgeNode):
+    from flask import Flask, jsonify, request
+
+    app = Flask(__name__)
+
+    @app.route("/api/recognition/match", methods=["POST"])
+    def match_faces():
+        data = request.get_json() or {}
+        embeddings = data.get("embeddings")
+        if not isinstance(embeddings, list):
+            return jsonify({"error": "embeddings must be a list of vectors"}), 400
+        try:
+            result = node.recognize(
+                embeddings,
+                top_k=int(data.get("top_k") or DEFAULT_TOP_K),
+                threshold=float(data.get("threshold", DEFAULT_THRESHOLD)),
+            )
+        except (TypeError, ValueError):
+            return jsonify({"error": "embeddings must be numeric vectors"}), 400
+        return jsonify({"camera_id": node.camera_id, **result})
+
+    @app.route("/api/edge/status", methods=["GET"])
+    def edge_status():
+        return jsonify(
+            {
+                "camera_id": node.camera_id,
+                "roster_refreshed_at": node.roster.refreshed_at(),
+                "gallery_size": len(node.roster.gallery()),
+                "active_session_id": node.roster.active_session(datetime.now()),
+                "spooled_events": node.spool.pending(),
+            }
+        )
+
+    return app
+
+
+def run_sync_loop(node: EdgeNode, every: int, refresh_every: int) -> None:
+    last_refresh = time.monotonic()
+    while True:
+        try:
+            if time.monotonic() - last_refresh >= refresh_every * 60:
+                node.refresh()
+                last_refresh = time.monotonic()
+            totals = node.sync()
+            if totals["segments"]:
+                print(f"Synced {totals}")
+        except SyncFailed as exc:
+            print(f"Central server unavailable, keeping {node.spool.pending()} events spooled: {exc}")
+        time.sleep(every)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a camera room in offline edge mode.")
+    parser.add_argument("--server", required=True, help="Central backend URL, e.g. http://central:5000")
+    parser.add_argument("--camera", type=int, required=True, help="Camera id of this room")
+    parser.add_argument("--db", default=EDGE_DB_PATH, help="Local SQLite roster file")
+    parser.add_argument("--spool", default=EDGE_SPOOL_DIR, help="Spool directory")
+    parser.add_argument("--serve", action="store_true", help="Serve /api/recognition/match locally")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--every", type=int, default=30, help="Sync every N seconds")
+    parser.add_argument("--refresh-every", type=int, default=60, help="Refresh the roster every N minutes")
+    args = parser.parse_args()
+
+    node = EdgeNode(args.server, args.camera, LocalRoster(args.db), Spool(args.spool))
+    try:
+        node.refresh()
+    except SyncFailed as exc:
+        print(f"Using the existing local roster (refreshed {node.roster.refreshed_at()}): {exc}")
+
+    if not args.serve:
+        print(node.sync())
+        return
+
+    threading.Thread(target=run_sync_loop, args=(node, args.every, args.refresh_every), daemon=True).start()
+    create_edge_app(node).run(host="0.0.0.0", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+import base64
+import binascii
+import importlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+import quality
+from ann import index_student
+from jobs import finish as finish_job, start as start_job
+from models import db, BackgroundJob, FaceDataset, Student
+from recognition import invalidate_galleries
+
+
+FACE_MODEL = os.getenv("FACE_MODEL", "stub")
+ENROLLMENT_THREADS = int(os.getenv("ENROLLMENT_THREADS", "2"))
+MAX_IMAGES = 20
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+ALIGNED_SIZE = 112
+# Where the eyes land in the aligned crop, as fractions of ALIGNED_SIZE
+CANONICAL_EYES = ((0.35, 0.4), (0.65, 0.4))
+
+
+class FaceModel:
+    """Detector + embedder used for enrollment.
+
+    ``detect`` returns faces as ``{"box": (x, y, w, h), "landmarks":
+    {"left_eye", "right_eye", "nose"}, "score"}`` in image pixels; ``embed``
+    maps aligned ``(n, size, size)`` grayscale crops to ``(n, dim)``
+    vectors. Point ``FACE_MODEL`` at ``package.module:Class`` to plug in a
+    real network; it is instantiated once per worker process.
+    """
+
+    name = "base"
+    dim = 0
+    input_size = ALIGNED_SIZE
+
+    def detect(self, image: np.ndarray) -> List[Dict]:
+        raise NotImplementedError
+
+    def embed(self, faces: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class StubFaceModel(FaceModel):
+    """Deterministic stand-in that runs offline (tests, demos, CI).
+
+    It "detects" one face as the centred square of the frame, rejects blank
+    frames, and embeds with a fixed random projection of a 16x16 thumbnail:
+    the same image always gives the same vector and similar images give
+    similar vectors, which is all the enrollment pipeline relies on.
+    """
+
+    name = "stub"
+    dim = 128
+    grid = 16
+
+    def __init__(self, seed: int = 1729):
+        rng = np.random.default_rng(seed)
+        self.projection = rng.standard_normal((self.grid * self.grid, self.dim)).astype(np.float32)
+        self.projection /= np.sqrt(self.grid * self.grid)
+
+    def detect(self, image: np.ndarray) -> List[Dict]:
+        height, width = image.shape
+        if min(height, width) < 32 or float(image.std()) < 2.0:
+            return []
+        side = int(min(height, width) * 0.8)
+        x, y = (width - side) // 2, (height - side) // 2
+        landmarks = {
+            "left_eye": (x + 0.3 * side, y + 0.4 * side),
+            "right_eye": (x + 0.7 * side, y + 0.4 * side),
+            "nose": (x + 0.5 * side, y + 0.6 * side),
+        }
+        return [{"box": (x, y, side, side), "landmarks": landmarks, "score": 1.0}]
+
+    def embed(self, faces: np.ndarray) -> np.ndarray:
+        n, size, _ = faces.shape
+        block = size // self.grid
+        thumbs = faces[:, : block * self.grid, : block * self.grid]
+        thumbs = thumbs.reshape(n, self.grid, block, self.grid, block).mean(axis=(2, 4)).reshape(n, -1)
+        thumbs = (thumbs - thumbs.mean(axis=1, keepdims=True)) / (thumbs.std(axis=1, keepdims=True) + 1e-6)
+        vectors = thumbs.astype(np.float32) @ self.projection
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+_model: Optional[FaceModel] = None
+_model_lock = threading.Lock()
+
+
+def get_model() -> FaceModel:
+    """The configured model, loaded once per process."""
+
+    global _model
+    with _model_lock:
+        if _model is None:
+            if FACE_MODEL == "stub":
+                _model = StubFaceModel()
+            else:
+                module_name, _, class_name = FACE_MODEL.partition(":")
+                _model = getattr(importlib.import_module(module_name), class_name)()
+        return _model
+
+
+def align_face(image: np.ndarray, face: Dict, size: int = ALIGNED_SIZE) -> np.ndarray:
+    """Warp the face so the eyes sit at CANONICAL_EYES in a ``size`` square.
+
+    A similarity transform (rotation, scale, shift) from the two eye
+    landmarks removes head roll; without landmarks the box is just resized.
+    """
+
+    landmarks = face.get("landmarks") or {}
+    if "left_eye" in landmarks and "right_eye" in landmarks:
+        source = np.array([landmarks["left_eye"], landmarks["right_eye"]], dtype=np.float64)
+        target = np.array(CANONICAL_EYES, dtype=np.float64) * size
+    else:
+        x, y, width, height = face["box"]
+        source = np.array([[x, y], [x + width, y]], dtype=np.float64)
+        target = np.array([[0, 0], [size, 0]], dtype=np.float64)
+
+    # Complex numbers make the 2-point similarity transform a single division
+    source_c = source[:, 0] + 1j * source[:, 1]
+    target_c = target[:, 0] + 1j * target[:, 1]
+    scale_rotation = (source_c[1] - source_c[0]) / (target_c[1] - target_c[0])
+    offset = source_c[0] - scale_rotation * target_c[0]
+
+    rows, columns = np.mgrid[0:size, 0:size]
+    mapped = scale_rotation * (columns + 1j * rows) + offset
+    sample_x = np.clip(mapped.real, 0, image.shape[1] - 1)
+    sample_y = np.clip(mapped.imag, 0, image.shape[0] - 1)
+
+    # Bilinear sampling
+    x0, y0 = np.floor(sample_x).astype(int), np.floor(sample_y).astype(int)
+    x1, y1 = np.minimum(x0 + 1, image.shape[1] - 1), np.minimum(y0 + 1, image.shape[0] - 1)
+    dx, dy = sample_x - x0, sample_y - y0
+    top = image[y0, x0] * (1 - dx) + image[y0, x1] * dx
+    bottom = image[y1, x0] * (1 - dx) + image[y1, x1] * dx
+    return (top * (1 - dy) + bottom * dy).astype(np.float32)
+
+
+def extract_face(data: bytes) -> Dict:
+    """Decode, detect the largest face, score it, align and embed it."""
+
+    try:
+        image = quality.decode_image(data)
+    except (OSError, ValueError):
+        return {"error": "unreadable_image"}
+    model = get_model()
+    faces = model.detect(image)
+    if not faces:
+        return {"error": "no_face"}
+    face = max(faces, key=lambda candidate: candidate["box"][2] * candidate["box"][3])
+    scores = quality.score_face(image, face["box"], face.get("landmarks"))
+    aligned = align_face(image, face, model.input_size)
+    vector = model.embed(aligned[np.newaxis])[0]
+    return {
+        "vector": [round(float(value), 6) for value in vector],
+        "quality": scores["quality"],
+        "box": [int(value) for value in face["box"]],
+        "faces": len(faces),
+    }
+
+
+def _extract_job(job: Tuple[int, bytes]) -> Tuple[int, Dict]:
+    index, data = job
+    return index, extract_face(data)
+
+
+def run_extraction(images: Sequence[bytes]) -> List[Dict]:
+    """Extract every image, on the shared CPU pool when there are enough of them."""
+
+    jobs = list(enumerate(images))
+    if quality.QUALITY_WORKERS <= 1 or len(jobs) < quality.POOL_MIN_JOBS:
+        results = dict(map(_extract_job, jobs))
+    else:
+        results = dict(quality.get_pool().map(_extract_job, jobs))
+    return [results[index] for index in range(len(jobs))]
+
+
+def decode_payload(value) -> bytes:
+    """Accept a data URL (``data:image/jpeg;base64,...``) or bare base64."""
+
+    if not isinstance(value, str) or not value:
+        raise ValueError("image must be a base64 string")
+    if value.startswith("data:"):
+        value = value.partition(",")[2]
+    try:
+        data = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError) as exc:
+        raise ValueError("image is not valid base64") from exc
+    if not data or len(data) > MAX_IMAGE_BYTES:
+        raise ValueError("image is empty or too large")
+    return data
+
+
+def image_list(value) -> Optional[List]:
+    """Images from a request field; also unpacks the legacy ``face_embeddings``
+    payload (a JSON string of captured data URLs)."""
+
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    if isinstance(value, list) and value and all(isinstance(item, str) for item in value):
+        return value
+    return None
+
+
+def _extension(data: bytes) -> str:
+    if data[:6] == b"\x93NUMPY":
+        return "npy"
+    if data[:2] in (b"P5", b"P6"):
+        return "pgm" if data[:2] == b"P5" else "ppm"
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    return "bin"
+
+
+# Background_Job statuses as the enrollment endpoints report them
+ENROLLMENT_STATUSES = {"queued": "processing", "running": "processing", "succeeded": "completed", "failed": "failed"}
+
+
+class EnrollmentTracker:
+    """Runs enrollments off the request thread; their outcome is kept in Background_Job.
+
+    The request thread only decodes base64 and hands the images over; a
+    small thread pool runs extraction (on the shared process pool for larger
+    batches) and then writes Face_dataset rows and the best templates in its
+    own app context. Each enrollment is an "enrollment" job row claimed by
+    this process (see jobs.start), so every API process can report it.
+    """
+
+    def __init__(self, threads: int = ENROLLMENT_THREADS):
+        self.threads = threads
+        # Only enrollments running in this process, so wait() can block on them
+        self.running: Dict[int, threading.Event] = {}
+        self.lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, app, user_id: int, student_id: int, images: List[bytes], capture_device=None, replace=False) -> Dict:
+        """Record the enrollment and queue it; commits. Must run inside an app context."""
+
+        job = start_job(
+            "enrollment",
+            {"student_id": student_id, "model": get_model().name, "images": len(images), "replace": bool(replace)},
+            user_id=user_id,
+        )
+        db.session.commit()
+        status = self.describe(job)
+        with self.lock:
+            self.running[user_id] = threading.Event()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="enrollment")
+            executor = self._executor
+        executor.submit(self._run, app, job.job_id, user_id, student_id, images, capture_device, replace)
+        return status
+
+    def get(self, user_id: int) -> Optional[Dict]:
+        """The student's latest enrollment, from whichever process ran it."""
+
+        job = db.session.execute(
+            select(BackgroundJob)
+            .where(BackgroundJob.user_id == user_id, BackgroundJob.kind == "enrollment")
+            .order_by(BackgroundJob.job_id.desc())
+            .limit(1)
+            .execution_options(populate_existing=True)
+        ).scalar()
+        return self.describe(job) if job is not None else None
+
+    def wait(self, user_id: int, timeout: float = 30.0) -> Optional[Dict]:
+        with self.lock:
+            done = self.running.get(user_id)
+        if done is not None:
+            done.wait(timeout)
+        return self.get(user_id)
+
+    @staticmethod
+    def describe(job: BackgroundJob) -> Dict:
+        payload = json.loads(job.payload) if job.payload else {}
+        status = {
+            "user_id": job.user_id,
+            "job_id": job.job_id,
+            "status": ENROLLMENT_STATUSES.get(job.status, job.status),
+            "model": payload.get("model"),
+            "images": payload.get("images"),
+            "accepted": 0,
+            "rejected": [],
+            "submitted_at": _isoformat(job.created_at),
+        }
+        status.update(json.loads(job.result) if job.result else {})
+        if job.finished_at:
+            status["finished_at"] = _isoformat(job.finished_at)
+        if job.error:
+            status["error"] = job.error
+        return status
+
+    def _finish(self, app, job_id: int, user_id: int, succeeded: bool, result=None, error=None) -> None:
+        try:
+            with app.app_context():
+                finish_job(job_id, succeeded, result, error)
+                db.session.commit()
+        finally:
+            with self.lock:
+                done = self.running.pop(user_id, None)
+            if done is not None:
+                done.set()
+
+    def _run(self, app, job_id, user_id, student_id, images, capture_device, replace) -> None:
+        started = time.perf_counter()
+        try:
+            results = run_extraction(images)
+            rejected = [{"index": index, "reason": result["error"]} for index, result in enumerate(results) if "error" in result]
+            accepted = [(images[index], result) for index, result in enumerate(results) if "error" not in result]
+            if not accepted:
+                self._finish(app, job_id, user_id, False, {"accepted": 0, "rejected": rejected})
+                return
+            with app.app_context():
+                templates = store_enrollment(student_id, accepted, capture_device, replace)
+            outcome = {
+                "accepted": len(accepted),
+                "rejected": rejected,
+                "templates": templates,
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+        except Exception as exc:  # reported through the status endpoint
+            self._finish(app, job_id, user_id, False, error=str(exc))
+            return
+        self._finish(app, job_id, user_id, True, outcome)
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    # SQLite hands back naive datetimes; they are stored as UTC
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+
+
+def store_enrollment(student_id: int, accepted: List[Tuple[bytes, Dict]], capture_device=None, replace=False) -> int:
+    """Save images and Face_dataset rows, then rebuild the student's templates."""
+
+    directory = os.path.join(quality.FACE_IMAGE_ROOT, str(student_id))
+    os.makedirs(directory, exist_ok=True)
+    rows = []
+    for data, result in accepted:
+        name = f"{uuid.uuid4().hex}.{_extension(data)}"
+        with open(os.path.join(directory, name), "wb") as handle:
+            handle.write(data)
+        rows.append(
+            {
+                "student_id": student_id,
+                "image_path": f"{student_id}/{name}",
+                "capture_device": capture_device,
+                "quality_score": result["quality"],
+                "embedding": json.dumps(result["vector"]),
+            }
+        )
+
+    try:
+        if replace:
+            FaceDataset.query.filter_by(student_id=student_id).delete(synchronize_session=False)
+        db.session.execute(FaceDataset.__table__.insert(), rows)
+        changed = quality.apply_best_templates([student_id])
+        student = db.session.get(Student, student_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if changed:
+        invalidate_galleries()
+        for user_id, templates in changed.items():
+            if student is not None and student.enrollment_status == "Active":
+                index_student(user_id, templates)
+    return len(json.loads(student.face_embeddings)) if student is not None else 0
+
+
+enrollments = EnrollmentTracker()
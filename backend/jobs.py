@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+
+# Allow running as a script from the backend directory (like migrate_db.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models import db, BackgroundJob
+
+
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Retry n waits BACKOFF_SECONDS * 2^(n-1), capped at BACKOFF_MAX_SECONDS
+BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "10"))
+BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "600"))
+# A running job whose worker has not finished it or reported progress
+# within this long is assumed dead and becomes claimable again
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "900"))
+CLAIM_BATCH = 5
+
+HANDLERS: Dict[str, Callable] = {}
+
+
+def handler(kind: str):
+    """Register ``fn(payload, job)`` to run jobs of ``kind``; its return value is the job result."""
+
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+
+    return decorator
+
+
+class LeaseLost(RuntimeError):
+    """The job's lease expired and another worker claimed it."""
+
+
+class JobContext:
+    """Handed to a running handler for progress reports.
+
+    Progress is written in the handler's transaction, so it becomes visible
+    when the handler commits; handlers that work in committed chunks report
+    after each chunk. Each report also renews the lease (locked_at), and
+    raises LeaseLost if another worker has taken the job over meanwhile.
+    """
+
+    def __init__(self, job_id: int, worker: Optional[str] = None):
+        self.job_id = job_id
+        self.worker = worker
+
+    def progress(self, done: float, total: Optional[float] = None, message: Optional[str] = None) -> None:
+        fraction = done / total if total else done
+        values = {"progress": round(max(0.0, min(fraction, 1.0)) * 100, 1), "locked_at": datetime.now(timezone.utc)}
+        if message is not None:
+            values["progress_message"] = message[:255]
+        table = BackgroundJob.__table__
+        renewed = db.session.execute(
+            update(table).where(table.c.job_id == self.job_id, table.c.locked_by == self.worker).values(**values)
+        ).rowcount
+        if not renewed:
+            raise LeaseLost(f"Job {self.job_id} is no longer held by {self.worker}")
+
+
+def enqueue(kind: str, payload: Optional[dict] = None, max_attempts: Optional[int] = None, delay: float = 0) -> BackgroundJob:
+    """Add a job in the caller's transaction; it runs once that commits."""
+
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = BackgroundJob(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        status="queued",
+        progress=0,
+        attempts=0,
+        max_attempts=max_attempts or MAX_ATTEMPTS,
+        run_after=datetime.now(timezone.utc) + timedelta(seconds=delay),
+    )
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+def start(kind: str, payload: Optional[dict] = None, user_id: Optional[int] = None) -> BackgroundJob:
+    """Record a job the calling process runs itself, already claimed by it.
+
+    Workers never run it: it has one attempt, so if the process dies before
+    finish() the lease expires and the next claim marks it failed. Added in
+    the caller's transaction.
+    """
+
+    now = datetime.now(timezone.utc)
+    job = BackgroundJob(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        user_id=user_id,
+        status="running",
+        progress=0,
+        attempts=1,
+        max_attempts=1,
+        run_after=now,
+        locked_by=worker_name(),
+        locked_at=now,
+        started_at=now,
+    )
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+def finish(job_id: int, succeeded: bool, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+    """Record the outcome of a job taken with start(); the caller commits.
+
+    Skipped if the lease expired and a worker already failed the job.
+    """
+
+    table = BackgroundJob.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.job_id == job_id, table.c.locked_by == worker_name())
+        .values(
+            status="succeeded" if succeeded else "failed",
+            progress=100 if succeeded else table.c.progress,
+            result=json.dumps(result) if result is not None else None,
+            error=error[:4000] if error else None,
+            finished_at=datetime.now(timezone.utc),
+            locked_by=None,
+        )
+    )
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def backoff(attempts: int) -> float:
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_SECONDS * 2 ** max(attempts - 1, 0))
+
+
+def claim(worker: str) -> Optional[BackgroundJob]:
+    """Take the next due job, or None.
+
+    Candidates are read without locks; each is then taken with a conditional
+    UPDATE that only succeeds while the row is still claimable, so two
+    workers never run the same attempt. Expired leases past their last
+    attempt are failed here rather than run again.
+    """
+
+    table = BackgroundJob.__table__
+    now = datetime.now(timezone.utc)
+    expired = and_(table.c.status == "running", table.c.locked_at < now - timedelta(seconds=LEASE_SECONDS))
+    db.session.execute(
+        update(table)
+        .where(expired, table.c.attempts >= table.c.max_attempts)
+        .values(status="failed", error="Worker lease expired", finished_at=now, locked_by=None)
+    )
+    claimable = or_(and_(table.c.status == "queued", table.c.run_after <= now), expired)
+    candidates = db.session.execute(
+        select(table.c.job_id).where(claimable).order_by(table.c.run_after, table.c.job_id).limit(CLAIM_BATCH)
+    ).scalars().all()
+    for job_id in candidates:
+        taken = db.session.execute(
+            update(table)
+            .where(table.c.job_id == job_id, claimable)
+            .values(
+                status="running",
+                attempts=table.c.attempts + 1,
+                locked_by=worker,
+                locked_at=now,
+                started_at=func.coalesce(table.c.started_at, now),
+                error=None,
+            )
+        ).rowcount
+        if taken:
+            db.session.commit()
+            return db.session.get(BackgroundJob, job_id, populate_existing=True)
+    db.session.commit()
+    return None
+
+
+def run(job: BackgroundJob) -> str:
+    """Run one claimed job and record the outcome; returns the new status.
+
+    The outcome is only written while this worker still holds the lease; a
+    job taken over by another worker is rolled back and reported as "lost".
+    """
+
+    job_id, kind, attempts, max_attempts = job.job_id, job.kind, job.attempts, job.max_attempts
+    worker = job.locked_by
+    payload = json.loads(job.payload) if job.payload else {}
+    table = BackgroundJob.__table__
+    held = and_(table.c.job_id == job_id, table.c.locked_by == worker)
+    try:
+        fn = HANDLERS.get(kind)
+        if fn is None:
+            raise LookupError(f"No handler registered for job kind {kind!r}")
+        result = fn(payload, JobContext(job_id, worker))
+        recorded = db.session.execute(
+            update(table)
+            .where(held)
+            .values(
+                status="succeeded",
+                progress=100,
+                result=json.dumps(result) if result is not None else None,
+                finished_at=datetime.now(timezone.utc),
+                locked_by=None,
+            )
+        ).rowcount
+        if not recorded:
+            raise LeaseLost(f"Job {job_id} is no longer held by {worker}")
+        db.session.commit()
+        return "succeeded"
+    except LeaseLost as exc:
+        db.session.rollback()
+        print(f"Job {job_id} ({kind}) attempt {attempts}/{max_attempts} dropped: {exc}")
+        return "lost"
+    except Exception as exc:
+        db.session.rollback()
+        error = f"{type(exc).__name__}: {exc}"
+        if attempts < max_attempts and not isinstance(exc, LookupError):
+            values = {"status": "queued", "run_after": datetime.now(timezone.utc) + timedelta(seconds=backoff(attempts))}
+        else:
+            values = {"status": "failed", "finished_at": datetime.now(timezone.utc)}
+        recorded = db.session.execute(
+            update(table)
+            .where(held)
+            .values(error=error[:4000], locked_by=None, **values)
+        ).rowcount
+        db.session.commit()
+        if not recorded:
+            print(f"Job {job_id} ({kind}) attempt {attempts}/{max_attempts} failed after losing its lease: {error}")
+            return "lost"
+        print(f"Job {job_id} ({kind}) attempt {attempts}/{max_attempts} failed: {error}")
+        return values["status"]
+
+
+def run_pending(worker: Optional[str] = None, limit: Optional[int] = None) -> int:
+    """Run due jobs until none are left (or ``limit`` ran); returns how many ran."""
+
+    worker = worker or worker_name()
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        run(job)
+        ran += 1
+    return ran
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run queued background jobs (Background_Job).")
+    parser.add_argument("--poll", type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+    parser.add_argument("--once", action="store_true", help="Run the jobs that are due now, then exit.")
+    parser.add_argument("--worker-id", help="Name recorded in locked_by (default host:pid).")
+    args = parser.parse_args()
+
+    # Importing app registers the handlers on the ``jobs`` module (not on
+    # __main__ when run as a script), so run through that module
+    from app import app
+    import jobs
+
+    with app.app_context():
+        if args.once:
+            print(f"Ran {jobs.run_pending(args.worker_id)} jobs")
+            return
+        while True:
+            if not jobs.run_pending(args.worker_id):
+                time.sleep(args.poll)
+            db.session.remove()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+HTTP_TIMEOUT = 30
+CAMERA_HEADERS = {"X-Request-Source": "camera"}
+# Driver messages as they surface in error bodies (SQL Server, SQLite)
+DEADLOCK_MARKERS = ("deadlock", "1205")
+UNIQUE_MARKERS = ("unique constraint", "duplicate key", "2627", "2601", "integrityerror")
+
+# (status, payload or error text)
+Response = Tuple[int, object]
+
+
+class HttpTarget:
+    """Sends requests to a running backend with the standard library."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    def __call__(self, method: str, path: str, body=None, headers=None) -> Response:
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json", **(headers or {})},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+                return response.status, json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as exc:
+            text = exc.read().decode(errors="replace")
+            try:
+                return exc.code, json.loads(text)
+            except ValueError:
+                return exc.code, text
+        except (urllib.error.URLError, OSError) as exc:
+            return 0, str(exc)
+
+
+class ClientTarget:
+    """Same interface over a Flask test client, for tests and in-process runs."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, method: str, path: str, body=None, headers=None) -> Response:
+        response = self.app.test_client().open(path, method=method, json=body, headers=headers or {})
+        payload = response.get_json(silent=True)
+        return response.status_code, payload if payload is not None else response.get_data(as_text=True)
+
+
+@dataclass
+class ClassSlot:
+    """One class starting in the wave: who hits the backend for it."""
+
+    lecture_id: int
+    lecture_name: str
+    teacher_user_id: Optional[int]
+    camera_ids: List[int]
+    students: List[int]
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    deadlocks: int = 0
+    unique_violations: int = 0
+
+    def record(self, status: int, payload, elapsed: float) -> None:
+        self.latencies.append(elapsed)
+        self.statuses[status] += 1
+        if status < 400 and status != 0:
+            return
+        text = (json.dumps(payload) if not isinstance(payload, str) else payload).lower()
+        if any(marker in text for marker in DEADLOCK_MARKERS):
+            self.deadlocks += 1
+        if any(marker in text for marker in UNIQUE_MARKERS):
+            self.unique_violations += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        ordered = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1)
+
+        errors = sum(count for status, count in self.statuses.items() if status >= 400 or status == 0)
+        return {
+            "requests": len(ordered),
+            "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0,
+            "errors": errors - self.statuses.get(429, 0),
+            "shed_429": self.statuses.get(429, 0),
+            "deadlocks": self.deadlocks,
+            "unique_violations": self.unique_violations,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+def build_timetable(target: Callable, classes: int, cameras_per_class: int, seed: int = 0) -> List[ClassSlot]:
+    """Pick the classes that start together, from the backend's own data."""
+
+    status, lectures = target("GET", "/api/lectures")
+    if status != 200:
+        raise RuntimeError(f"Unable to load lectures: {status} {lectures}")
+    _, enrollments = target("GET", "/api/enrollments")
+    _, cameras = target("GET", "/api/cameras")
+
+    students: Dict[int, List[int]] = defaultdict(list)
+    for enrollment in enrollments or []:
+        if not enrollment.get("is_teacher"):
+            students[enrollment["lecture_id"]].append(enrollment["user_id"])
+    assigned: Dict[int, List[int]] = defaultdict(list)
+    for camera in cameras or []:
+        if camera.get("assigned_lecture_id"):
+            assigned[camera["assigned_lecture_id"]].append(camera["camera_id"])
+
+    rng = random.Random(seed)
+    candidates = [lecture for lecture in lectures if students.get(lecture["lecture_id"])]
+    rng.shuffle(candidates)
+    slots = []
+    for lecture in candidates[:classes]:
+        lecture_id = lecture["lecture_id"]
+        camera_ids = assigned.get(lecture_id) or []
+        # Rooms without enough real cameras get synthetic ones (camera_id is only a label here)
+        camera_ids = (camera_ids + [-(lecture_id * 100 + n) for n in range(cameras_per_class)])[:cameras_per_class]
+        slots.append(
+            ClassSlot(
+                lecture_id=lecture_id,
+                lecture_name=lecture["lecture_name"],
+                teacher_user_id=(lecture.get("teacher") or {}).get("user_id"),
+                camera_ids=camera_ids,
+                students=students[lecture_id],
+            )
+        )
+    return slots
+
+
+class Simulation:
+    """Replays class starts: every camera, teacher and student of a wave at once.
+
+    Per class and wave, each camera resolves the session and posts detection
+    frames; the teacher resolves the session, submits a roll call and opens
+    the roster; some students open their dashboard. All actors start at a
+    random offset inside ``window`` seconds and share ``concurrency`` workers,
+    so the backend sees the burst of the first minutes of the hour.
+    """
+
+    def __init__(
+        self,
+        target: Callable,
+        slots: List[ClassSlot],
+        concurrency: int = 32,
+        window: float = 60.0,
+        frames: int = 3,
+        dashboards: int = 5,
+        seed: int = 0,
+    ):
+        self.target = target
+        self.slots = slots
+        self.concurrency = concurrency
+        self.window = window
+        self.frames = frames
+        self.dashboards = dashboards
+        self.rng = random.Random(seed)
+        self.stats: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self.sessions: Dict[Tuple[int, str], set] = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def call(self, endpoint: str, method: str, path: str, body=None, headers=None) -> Response:
+        started = time.perf_counter()
+        status, payload = self.target(method, path, body, headers)
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.stats[endpoint].record(status, payload, elapsed)
+        return status, payload
+
+    def open_session(self, slot: ClassSlot, day: str, headers=None) -> Optional[int]:
+        status, payload = self.call(
+            "POST /api/sessions/get-or-create",
+            "POST",
+            "/api/sessions/get-or-create",
+            {"lecture_name": slot.lecture_name, "date": day},
+            headers,
+        )
+        if status != 200:
+            return None
+        with self.lock:
+            self.sessions[(slot.lecture_id, day)].add(payload["session_id"])
+        return payload["session_id"]
+
+    def camera(self, slot: ClassSlot, day: str) -> None:
+        session_id = self.open_session(slot, day, CAMERA_HEADERS)
+        if session_id is None:
+            return
+        for _ in range(self.frames):
+            seen = self.rng.sample(slot.students, max(1, len(slot.students) // 2))
+            detections = [{"user_id": user_id, "confidence": round(self.rng.uniform(0.6, 0.99), 2)} for user_id in seen]
+            self.call(
+                "POST /api/sessions/<id>/detections",
+                "POST",
+                f"/api/sessions/{session_id}/detections",
+                {"detections": detections},
+                CAMERA_HEADERS,
+            )
+
+    def teacher(self, slot: ClassSlot, day: str) -> None:
+        session_id = self.open_session(slot, day)
+        if session_id is None:
+            return
+        records = [
+            {"session_id": session_id, "user_id": user_id, "status": self.rng.choice(("Present", "Present", "Late", "Absent"))}
+            for user_id in slot.students
+        ]
+        self.call(
+            "POST /api/attendance/batch",
+            "POST",
+            "/api/attendance/batch",
+            {"records": records, "verified_by": slot.teacher_user_id},
+        )
+        if slot.teacher_user_id:
+            self.call(
+                "GET /api/teachers/<id>/students",
+                "GET",
+                f"/api/teachers/{slot.teacher_user_id}/students",
+            )
+
+    def student(self, user_id: int) -> None:
+        self.call("GET /api/students/<id>/dashboard", "GET", f"/api/students/{user_id}/dashboard")
+
+    def plan(self, days: List[str]) -> List[Tuple[float, Callable, tuple]]:
+        actions = []
+        for day in days:
+            for slot in self.slots:
+                actions.extend((self.camera, (slot, day)) for _ in slot.camera_ids)
+                actions.append((self.teacher, (slot, day)))
+                for user_id in self.rng.sample(slot.students, min(self.dashboards, len(slot.students))):
+                    actions.append((self.student, (user_id,)))
+        return sorted(((self.rng.uniform(0, self.window), action, args) for action, args in actions), key=lambda item: item[0])
+
+    def run(self, days: List[str]) -> Dict:
+        schedule = self.plan(days)
+        started = time.perf_counter()
+
+        def fire(offset: float, action: Callable, args: tuple) -> None:
+            delay = offset - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            action(*args)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for future in [pool.submit(fire, *item) for item in schedule]:
+                future.result()
+        return self.report(time.perf_counter() - started)
+
+    def report(self, elapsed: float) -> Dict:
+        # More than one session_id for the same class and day is a lost get-or-create race
+        split = {f"{lecture_id}@{day}": sorted(ids) for (lecture_id, day), ids in self.sessions.items() if len(ids) > 1}
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "endpoints": {name: stats.summary(elapsed) for name, stats in sorted(self.stats.items())},
+            "split_sessions": split,
+        }
+
+
+def print_report(report: Dict) -> None:
+    columns = ("requests", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "errors", "shed_429", "deadlocks", "unique_violations")
+    headers = ("reqs", "rps", "p50", "p95", "p99", "max", "err", "429", "dlk", "uniq")
+    print(f"{'endpoint':40}" + "".join(f"{header:>9}" for header in headers))
+    for name, summary in report["endpoints"].items():
+        print(f"{name:40}" + "".join(f"{summary[column]:>9}" for column in columns))
+    print(f"elapsed {report['elapsed_s']}s, split sessions: {len(report['split_sessions'])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a class-start burst against a running backend.")
+    parser.add_argument("--server", default="http://127.0.0.1:5000")
+    parser.add_argument("--classes", type=int, default=10, help="Classes starting together.")
+    parser.add_argument("--cameras", type=int, default=2, help="Cameras per class.")
+    parser.add_argument("--frames", type=int, default=3, help="Detection posts per camera.")
+    parser.add_argument("--dashboards", type=int, default=5, help="Student dashboards opened per class.")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--window", type=float, default=60.0, help="Seconds over which the burst is spread.")
+    parser.add_argument("--waves", type=int, default=1, help="Class starts to replay, one per day from --date.")
+    parser.add_argument("--date", default=None, help="First session date (YYYY-MM-DD, default today).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    first = date.fromisoformat(args.date) if args.date else date.today()
+    days = [(first + timedelta(days=n)).isoformat() for n in range(args.waves)]
+    target = HttpTarget(args.server)
+    slots = build_timetable(target, args.classes, args.cameras, args.seed)
+    simulation = Simulation(
+        target,
+        slots,
+        concurrency=args.concurrency,
+        window=args.window,
+        frames=args.frames,
+        dashboards=args.dashboards,
+        seed=args.seed,
+    )
+    report = simulation.run(days)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
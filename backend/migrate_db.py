@@ -30,7 +30,65 @@ def migrate():
             else:
                 print(f"Note regarding column addition (might be okay if already exists): {e}")
 
-        # 2. Populate empty schedules
+        # 2. Per-image embeddings for best-template selection (quality.py)
+        try:
+            with db.engine.connect() as conn:
+                print("Attempting to add 'embedding' column to Face_dataset table...")
+                conn.execute(text("ALTER TABLE Face_dataset ADD embedding NVARCHAR(MAX)"))
+                conn.commit()
+                print("Successfully added 'embedding' column.")
+        except Exception as e:
+            if "Column names in each table must be unique" in str(e):
+                print("'embedding' column already exists.")
+            else:
+                print(f"Note regarding column addition (might be okay if already exists): {e}")
+
+        # 3. Per-lecture enrollment counter for capacity checks (seats.py)
+        try:
+            with db.engine.connect() as conn:
+                print("Attempting to add 'enrolled_count' column to Lecture table...")
+                conn.execute(text("ALTER TABLE Lecture ADD enrolled_count INT NOT NULL DEFAULT 0"))
+                conn.commit()
+                print("Successfully added 'enrolled_count' column.")
+        except Exception as e:
+            if "Column names in each table must be unique" in str(e):
+                print("'enrolled_count' column already exists.")
+            else:
+                print(f"Note regarding column addition (might be okay if already exists): {e}")
+        try:
+            from seats import recount
+
+            print(f"Recounted enrollments for {recount()} lectures.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error recounting enrollments: {e}")
+
+        # 4. Room a camera watches, for timetable lookups (timetable.py)
+        try:
+            with db.engine.connect() as conn:
+                print("Attempting to add 'room_number' column to Camera table...")
+                conn.execute(text("ALTER TABLE Camera ADD room_number VARCHAR(50) NULL"))
+                conn.commit()
+                print("Successfully added 'room_number' column.")
+        except Exception as e:
+            if "Column names in each table must be unique" in str(e):
+                print("'room_number' column already exists.")
+            else:
+                print(f"Note regarding column addition (might be okay if already exists): {e}")
+
+        # 5. Structured timetable, parsed from schedules before step 6 rewrites them
+        try:
+            from models import LectureSlot
+            from timetable import backfill
+
+            LectureSlot.__table__.create(db.engine, checkfirst=True)
+            lectures, slots = backfill()
+            print(f"Parsed {slots} timetable slots for {lectures} lectures.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error building timetable: {e}")
+
+        # 6. Populate empty schedules
         try:
             print("Forcing update of ALL schedules to 'Monday, Wednesday'...")
             updated = Lecture.query.update({'schedule': 'Monday, Wednesday'}, synchronize_session=False)
@@ -39,5 +97,68 @@ def migrate():
         except Exception as e:
             print(f"Error updating data: {e}")
 
+        # 7. Queue table for jobs.py workers
+        try:
+            from models import BackgroundJob
+
+            BackgroundJob.__table__.create(db.engine, checkfirst=True)
+            print("Background_Job table is present.")
+        except Exception as e:
+            print(f"Error creating Background_Job table: {e}")
+
+        # 8. Enrollment status is kept as Background_Job rows, looked up by user
+        try:
+            with db.engine.connect() as conn:
+                print("Attempting to add 'user_id' column to Background_Job table...")
+                conn.execute(text("ALTER TABLE Background_Job ADD user_id INT NULL"))
+                conn.execute(text("CREATE INDEX idx_job_user ON Background_Job(user_id, kind)"))
+                conn.commit()
+                print("Successfully added 'user_id' column.")
+        except Exception as e:
+            if "Column names in each table must be unique" in str(e):
+                print("'user_id' column already exists.")
+            else:
+                print(f"Note regarding column addition (might be okay if already exists): {e}")
+
+        # 9. Tables added since the original schema (waitlist, change feed,
+        #    history bitsets, archive, risk scores, edge sync receipts)
+        from sqlalchemy import inspect
+        from models import (
+            ArchivedTerm,
+            AttendanceBitset,
+            AttendanceRisk,
+            ChangeLog,
+            LectureWaitlist,
+            StudentAttendanceArchive,
+            SyncReceipt,
+        )
+
+        for model in (
+            LectureWaitlist,
+            ChangeLog,
+            StudentAttendanceArchive,
+            ArchivedTerm,
+            AttendanceRisk,
+            SyncReceipt,
+            AttendanceBitset,
+        ):
+            table = model.__tablename__
+            try:
+                existed = inspect(db.engine).has_table(table)
+                model.__table__.create(db.engine, checkfirst=True)
+                print(f"{table} table is present.")
+            except Exception as e:
+                print(f"Error creating {table} table: {e}")
+                continue
+            if model is AttendanceBitset and not existed:
+                # Histories are read from the bitsets, so fill them once
+                try:
+                    from bitsets import rebuild_all
+
+                    print(f"Built {rebuild_all()} attendance bitsets.")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error building attendance bitsets: {e}")
+
 if __name__ == "__main__":
     migrate()
@@ -1,3 +1,4 @@
+import json
 from datetime import datetime, timezone
 
 from flask_sqlalchemy import SQLAlchemy
@@ -149,6 +150,9 @@ class Lecture(db.Model):
     schedule = db.Column(db.Text)
     room_number = db.Column(db.String(50))
     capacity = db.Column(db.Integer)
+    # Student (non-teacher) enrollments; kept in step by seats.py so capacity
+    # checks are one conditional UPDATE instead of a COUNT
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0)
     credits = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -170,6 +174,7 @@ class Lecture(db.Model):
             "room_number": self.room_number,
             "schedule": self.schedule,
             "capacity": self.capacity,
+            "enrolled_count": self.enrolled_count,
             "credits": self.credits,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "teacher": self.teacher.to_dict() if self.teacher else None,
@@ -206,6 +211,49 @@ class UserLecture(db.Model):
         }
 
 
+class LectureWaitlist(db.Model):
+    __tablename__ = "Lecture_Waitlist"
+
+    lecture_id = db.Column(db.Integer, db.ForeignKey("Lecture.lecture_id"), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("User.user_id"), primary_key=True)
+    requested_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            "lecture_id": self.lecture_id,
+            "user_id": self.user_id,
+            "requested_at": self.requested_at.isoformat() if self.requested_at else None,
+        }
+
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+class LectureSlot(db.Model):
+    """One weekly meeting of a lecture; see timetable.py for parsing and lookup."""
+
+    __tablename__ = "Lecture_Timetable"
+
+    slot_id = db.Column(db.Integer, primary_key=True)
+    lecture_id = db.Column(db.Integer, db.ForeignKey("Lecture.lecture_id"), nullable=False, index=True)
+    day_of_week = db.Column(db.SmallInteger, nullable=False)  # 0 = Monday, as datetime.weekday()
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    # Defaults to the lecture's room_number when a slot does not name one
+    room_number = db.Column(db.String(50))
+
+    def to_dict(self):
+        return {
+            "slot_id": self.slot_id,
+            "lecture_id": self.lecture_id,
+            "day": WEEKDAYS[self.day_of_week],
+            "day_of_week": self.day_of_week,
+            "start": self.start_time.strftime("%H:%M") if self.start_time else None,
+            "end": self.end_time.strftime("%H:%M") if self.end_time else None,
+            "room": self.room_number,
+        }
+
+
 class Camera(db.Model):
     __tablename__ = "Camera"
 
@@ -213,6 +261,8 @@ class Camera(db.Model):
     camera_name = db.Column(db.String(100), nullable=False)
     location = db.Column(db.String(150), nullable=False)
     stream_url = db.Column(db.String(255), nullable=False)
+    # Room the camera watches, matched against the timetable (timetable.py)
+    room_number = db.Column(db.String(50))
     assigned_lecture_id = db.Column(db.Integer, db.ForeignKey("Lecture.lecture_id"))
     status = db.Column(db.String(20), default="Online")
     last_checked = db.Column(db.DateTime)
@@ -225,6 +275,7 @@ class Camera(db.Model):
             "camera_name": self.camera_name,
             "location": self.location,
             "stream_url": self.stream_url,
+            "room_number": self.room_number,
             "assigned_lecture_id": self.assigned_lecture_id,
             "status": self.status,
             "last_checked": self.last_checked.isoformat() if self.last_checked else None,
@@ -274,6 +325,9 @@ class AttendanceSession(db.Model):
 
 class StudentAttendance(db.Model):
     __tablename__ = "Student_Attendance"
+    # Mirrors idx_attendance_session_user in the DDL, so databases built by
+    # create_all can probe a session's roster the way SQL Server does
+    __table_args__ = (db.Index("idx_attendance_session_user", "session_id", "user_id"),)
 
     attendance_id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey("Attendance_Session.session_id"), nullable=False)
@@ -314,6 +368,178 @@ class StudentAttendance(db.Model):
         }
 
 
+class StudentAttendanceArchive(db.Model):
+    __tablename__ = "Student_Attendance_Archive"
+
+    # Same columns as Student_Attendance; rows of closed terms are moved here by
+    # archive.py so the live table and its indexes stay small.
+    attendance_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    session_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    time_in = db.Column(db.Time)
+    time_out = db.Column(db.Time)
+    status = db.Column(db.String(20))
+    verification_method = db.Column(db.String(30))
+    verified_by = db.Column(db.Integer)
+    confidence_score = db.Column(db.Float)
+    manual_override = db.Column(db.Boolean)
+    edited_by = db.Column(db.Integer)
+    edited_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime)
+    notes = db.Column(db.Text)
+
+
+class ArchivedTerm(db.Model):
+    __tablename__ = "Archived_Term"
+
+    semester = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    first_session_date = db.Column(db.Date)
+    last_session_date = db.Column(db.Date)
+    row_count = db.Column(db.Integer, default=0)
+    retained_count = db.Column(db.Integer, default=0)
+    archived_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            "semester": self.semester,
+            "year": self.year,
+            "first_session_date": self.first_session_date.isoformat() if self.first_session_date else None,
+            "last_session_date": self.last_session_date.isoformat() if self.last_session_date else None,
+            "row_count": self.row_count,
+            "retained_count": self.retained_count,
+            "archived_at": self.archived_at.isoformat() if self.archived_at else None,
+        }
+
+
+class AttendanceRisk(db.Model):
+    __tablename__ = "Attendance_Risk"
+
+    # Precomputed by risk.py; endpoints join this instead of scanning history.
+    user_id = db.Column(db.Integer, db.ForeignKey("User.user_id"), primary_key=True)
+    lecture_id = db.Column(db.Integer, db.ForeignKey("Lecture.lecture_id"), primary_key=True)
+    total_sessions = db.Column(db.Integer, default=0)
+    attended_sessions = db.Column(db.Integer, default=0)
+    attendance_rate = db.Column(db.Float)
+    recent_rate = db.Column(db.Float)
+    current_absence_streak = db.Column(db.Integer, default=0)
+    longest_absence_streak = db.Column(db.Integer, default=0)
+    is_at_risk = db.Column(db.Boolean, default=False)
+    last_session_date = db.Column(db.Date)
+    computed_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "lecture_id": self.lecture_id,
+            "total_sessions": self.total_sessions,
+            "attended_sessions": self.attended_sessions,
+            "attendance_rate": self.attendance_rate,
+            "recent_rate": self.recent_rate,
+            "current_absence_streak": self.current_absence_streak,
+            "longest_absence_streak": self.longest_absence_streak,
+            "is_at_risk": self.is_at_risk,
+            "last_session_date": self.last_session_date.isoformat() if self.last_session_date else None,
+            "computed_at": self.computed_at.isoformat() if self.computed_at else None,
+        }
+
+
+class ChangeLog(db.Model):
+    __tablename__ = "Change_Log"
+    # Append-only; written in the same transaction as the change it
+    # describes (see changes.py). change_id is the feed cursor.
+    change_id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_key = db.Column(db.String(50), nullable=False)
+    operation = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer)
+    lecture_id = db.Column(db.Integer)
+    session_id = db.Column(db.Integer)
+    changed_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            "change_id": self.change_id,
+            "entity": self.entity,
+            "key": self.entity_key,
+            "operation": self.operation,
+            "user_id": self.user_id,
+            "lecture_id": self.lecture_id,
+            "session_id": self.session_id,
+            "changed_at": self.changed_at.isoformat() if self.changed_at else None,
+        }
+
+
+class BackgroundJob(db.Model):
+    __tablename__ = "Background_Job"
+    # Work queued by the API and run by jobs.py workers. A worker claims a
+    # row with one conditional UPDATE; failures are retried with backoff.
+    job_id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text)  # JSON arguments for the handler
+    # The user a job is about, when it is looked up that way (enrollments)
+    user_id = db.Column(db.Integer)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    progress = db.Column(db.Float, nullable=False, default=0)
+    progress_message = db.Column(db.String(255))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    result = db.Column(db.Text)  # JSON returned by the handler
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index("idx_job_queue", "status", "run_after"),
+        db.Index("idx_job_user", "user_id", "kind"),
+    )
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "user_id": self.user_id,
+            "status": self.status,
+            "progress": self.progress,
+            "progress_message": self.progress_message,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "run_after": self.run_after.isoformat() if self.run_after else None,
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class SyncReceipt(db.Model):
+    __tablename__ = "Attendance_Sync_Receipt"
+    # One row per event applied by POST /api/attendance/sync, so a retried
+    # batch from an edge node is recognized instead of written twice
+    idempotency_key = db.Column(db.String(64), primary_key=True)
+    camera_id = db.Column(db.Integer, db.ForeignKey("Camera.camera_id"))
+    session_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    received_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+
+
+class AttendanceBitset(db.Model):
+    __tablename__ = "Attendance_Bitset"
+
+    # Maintained by bitsets.py on every attendance write: 2 bits per session
+    # ordinal of the lecture (see bitsets.CODES), little-endian.
+    user_id = db.Column(db.Integer, db.ForeignKey("User.user_id"), primary_key=True)
+    lecture_id = db.Column(db.Integer, db.ForeignKey("Lecture.lecture_id"), primary_key=True)
+    codes = db.Column(db.LargeBinary, nullable=False)
+    length = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+
 class FaceDataset(db.Model):
     __tablename__ = "Face_dataset"
 
@@ -323,6 +549,9 @@ class FaceDataset(db.Model):
     capture_device = db.Column(db.String(100))
     capture_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     quality_score = db.Column(db.Float)
+    # JSON vector for this image; quality.py copies the best ones into
+    # Student.face_embeddings, which is what the galleries match against
+    embedding = db.Column(db.Text)
 
     student = db.relationship("Student", back_populates="faces")
 
@@ -334,6 +563,7 @@ class FaceDataset(db.Model):
             "capture_device": self.capture_device,
             "capture_date": self.capture_date.isoformat() if self.capture_date else None,
             "quality_score": self.quality_score,
+            "has_embedding": self.embedding is not None,
         }
 
 
@@ -0,0 +1,438 @@
+import threading
+import time
+from contextlib import ExitStack
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, insert, select, update
+
+from bitsets import store as bitset_store
+from changes import attendance_rows, log_changes
+from dashboard_cache import dashboard_cache
+from models import db, AttendanceSession, StudentAttendance
+
+
+FLUSH_INTERVAL_SECONDS = 10.0
+# Sessions with no detection for this long are dropped from memory once written
+IDLE_SECONDS = 1800.0
+LATE_AFTER_MINUTES = 10
+
+
+class PresenceState:
+    __slots__ = ("first_seen", "last_seen", "confidence", "dirty", "persisted")
+
+    def __init__(self, seen_at: datetime, confidence: float):
+        self.first_seen = seen_at
+        self.last_seen = seen_at
+        self.confidence = confidence
+        self.dirty = True
+        self.persisted = False
+
+
+class SessionPresence:
+    """Presence of every recognized student in one attendance session."""
+
+    def __init__(
+        self,
+        session_id: int,
+        session_date: Optional[date],
+        start_time: Optional[dt_time],
+        lecture_id: Optional[int] = None,
+    ):
+        self.session_id = session_id
+        self.lecture_id = lecture_id
+        self.session_date = session_date
+        self.start_time = start_time
+        self.states: Dict[int, PresenceState] = {}
+        self.last_flush = time.monotonic()
+        self.last_observed = time.monotonic()
+        self.lock = threading.Lock()
+        # Held for a whole flush, so the request path and the timer cannot
+        # both see a student as new and insert their row twice
+        self.flush_lock = threading.Lock()
+
+    def observe(self, user_id: int, seen_at: datetime, confidence: float) -> bool:
+        """Record a detection; returns True when it changed what the DB should hold."""
+
+        with self.lock:
+            self.last_observed = time.monotonic()
+            state = self.states.get(user_id)
+            if state is None:
+                self.states[user_id] = PresenceState(seen_at, confidence)
+                return True
+
+            changed = False
+            if seen_at < state.first_seen:
+                state.first_seen = seen_at
+                changed = True
+            if seen_at > state.last_seen:
+                state.last_seen = seen_at
+                changed = True
+            if confidence > state.confidence:
+                state.confidence = confidence
+                changed = True
+            state.dirty = state.dirty or changed
+            return changed
+
+    def status_for(self, first_seen: datetime) -> str:
+        if self.start_time is None:
+            return "Present"
+        start = datetime.combine(self.session_date or first_seen.date(), self.start_time)
+        if first_seen > start + timedelta(minutes=LATE_AFTER_MINUTES):
+            return "Late"
+        return "Present"
+
+    def take_dirty(self) -> Dict[int, Dict]:
+        """Snapshot and clear dirty entries so detections can keep arriving mid-flush."""
+
+        with self.lock:
+            snapshot = {}
+            for user_id, state in self.states.items():
+                if not state.dirty:
+                    continue
+                snapshot[user_id] = {
+                    "first_seen": state.first_seen,
+                    "last_seen": state.last_seen,
+                    "confidence": state.confidence,
+                    "persisted": state.persisted,
+                }
+                state.dirty = False
+            return snapshot
+
+    def mark_persisted(self, user_ids, confidences: Dict[int, float]) -> None:
+        with self.lock:
+            for user_id in user_ids:
+                state = self.states[user_id]
+                state.persisted = True
+                if confidences.get(user_id, 0) > state.confidence:
+                    state.confidence = confidences[user_id]
+
+    def restore_dirty(self, user_ids) -> None:
+        with self.lock:
+            for user_id in user_ids:
+                self.states[user_id].dirty = True
+
+    def has_dirty(self) -> bool:
+        with self.lock:
+            return any(state.dirty for state in self.states.values())
+
+
+def lock_sessions(session_ids) -> Dict[int, object]:
+    """Read the sessions' lock state and hold their rows until the transaction ends.
+
+    Presence flushes and finalize both start here, so a flush either commits
+    before the Absent rows are inserted or finds the session already closed.
+    """
+
+    rows = db.session.execute(
+        select(
+            AttendanceSession.session_id,
+            AttendanceSession.status,
+            AttendanceSession.attendance_locked,
+            AttendanceSession.locked_by,
+        )
+        .where(AttendanceSession.session_id.in_(list(session_ids)))
+        .with_hint(AttendanceSession, "WITH (UPDLOCK, ROWLOCK)", "mssql")
+        .with_for_update()
+    )
+    return {row.session_id: row for row in rows}
+
+
+def is_closed(row) -> bool:
+    return bool(row.attendance_locked) or row.status == "Completed"
+
+
+class PresenceTracker:
+    """Coalesces recognition hits in memory and writes only state changes.
+
+    Each session keeps first-seen (time_in), last-seen (time_out) and the best
+    confidence per student. Flushes run at most every ``flush_interval``
+    seconds per session, issue one SELECT for students not yet written, and
+    then batch the remaining INSERTs and UPDATEs as executemany statements.
+    Sessions found closed at flush time (finalize may run in another process)
+    are dropped without writing, and idle ones are evicted by the timer.
+    Must be used inside an app context.
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL_SECONDS, idle_seconds: float = IDLE_SECONDS):
+        self.flush_interval = flush_interval
+        self.idle_seconds = idle_seconds
+        self.sessions: Dict[int, SessionPresence] = {}
+        self.lock = threading.RLock()
+
+    def session(self, session) -> SessionPresence:
+        with self.lock:
+            presence = self.sessions.get(session.session_id)
+            if presence is None:
+                presence = SessionPresence(
+                    session.session_id, session.session_date, session.session_start_time, session.lecture_id
+                )
+                self.sessions[session.session_id] = presence
+            return presence
+
+    def observe(self, session, user_id: int, confidence: float = 0.0, seen_at: Optional[datetime] = None) -> bool:
+        # Under the tracker lock so eviction cannot drop the session in between
+        with self.lock:
+            presence = self.session(session)
+            return presence.observe(int(user_id), seen_at or datetime.now(), float(confidence or 0.0))
+
+    def flush_if_due(self, session_id: int) -> int:
+        presence = self.sessions.get(session_id)
+        if presence is None or time.monotonic() - presence.last_flush < self.flush_interval:
+            return 0
+        return self.flush(session_id)
+
+    def flush(self, session_id: int) -> int:
+        """Write pending changes for one session; returns the number of rows touched."""
+
+        return self.flush_many([session_id])
+
+    def flush_many(
+        self,
+        session_ids,
+        before_commit: Optional[Callable[[], None]] = None,
+        include_closed: bool = False,
+    ) -> int:
+        """Write several sessions in one transaction.
+
+        ``before_commit`` runs inside that transaction, so callers can record
+        their own rows (e.g. sync receipts) atomically with the attendance.
+        Closed sessions are dropped with their pending hits; ``include_closed``
+        still writes those the lifecycle job closed (late edge uploads), but
+        never ones a person locked.
+        """
+
+        presences = sorted(
+            {self.sessions.get(session_id) for session_id in session_ids} - {None},
+            key=lambda presence: presence.session_id,
+        )
+        with ExitStack() as held:
+            # Always in session_id order, so two flushes cannot deadlock
+            for presence in presences:
+                held.enter_context(presence.flush_lock)
+            return self._flush(presences, before_commit, include_closed)
+
+    def _flush(self, presences, before_commit, include_closed: bool) -> int:
+        batches = []
+        for presence in presences:
+            presence.last_flush = time.monotonic()
+            pending = presence.take_dirty()
+            if pending:
+                batches.append((presence, pending))
+        if not batches and before_commit is None:
+            return 0
+
+        written = 0
+        results = []
+        closed = []
+        try:
+            if batches:
+                state = lock_sessions(presence.session_id for presence, _ in batches)
+                writable = []
+                for presence, pending in batches:
+                    row = state.get(presence.session_id)
+                    if row is None or (is_closed(row) and not (include_closed and row.locked_by is None)):
+                        closed.append(presence.session_id)
+                    else:
+                        writable.append((presence, pending))
+                batches = writable
+            for presence, pending in batches:
+                count, confidences = self._write(presence, pending)
+                written += count
+                results.append(confidences)
+            if before_commit is not None:
+                before_commit()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for presence, pending in batches:
+                presence.restore_dirty(pending)
+            raise
+        if closed:
+            with self.lock:
+                for session_id in closed:
+                    self.sessions.pop(session_id, None)
+        for (presence, pending), confidences in zip(batches, results):
+            presence.mark_persisted(pending, confidences)
+            dashboard_cache.invalidate_users(pending)
+        return written
+
+    def flush_all(self) -> int:
+        return sum(self.flush(session_id) for session_id in list(self.sessions))
+
+    def flush_due(self) -> int:
+        """Flush every session whose interval has passed, even if no detection arrived since."""
+
+        written = sum(self.flush_if_due(session_id) for session_id in list(self.sessions))
+        self.evict_idle()
+        return written
+
+    def evict_idle(self) -> int:
+        """Forget sessions with nothing pending and no detection for ``idle_seconds``."""
+
+        cutoff = time.monotonic() - self.idle_seconds
+        evicted = 0
+        with self.lock:
+            for session_id, presence in list(self.sessions.items()):
+                if presence.last_observed > cutoff or not presence.flush_lock.acquire(blocking=False):
+                    continue
+                try:
+                    if not presence.has_dirty():
+                        del self.sessions[session_id]
+                        evicted += 1
+                finally:
+                    presence.flush_lock.release()
+        return evicted
+
+    def end_session(self, session_id: int) -> int:
+        """Final flush for a session, then forget its in-memory state."""
+
+        written = self.flush(session_id)
+        with self.lock:
+            self.sessions.pop(session_id, None)
+        return written
+
+    def reset(self) -> None:
+        with self.lock:
+            self.sessions.clear()
+
+    def _write(self, presence: SessionPresence, pending: Dict[int, Dict]):
+        session_id = presence.session_id
+        unknown = [user_id for user_id, entry in pending.items() if not entry["persisted"]]
+
+        existing = {}
+        if unknown:
+            existing = {
+                row.user_id: row
+                for row in db.session.query(
+                    StudentAttendance.user_id,
+                    StudentAttendance.status,
+                    StudentAttendance.manual_override,
+                    StudentAttendance.time_in,
+                    StudentAttendance.confidence_score,
+                ).filter(
+                    StudentAttendance.session_id == session_id,
+                    StudentAttendance.user_id.in_(unknown),
+                )
+            }
+
+        inserts: List[Dict] = []
+        first_updates: List[Dict] = []
+        updates: List[Dict] = []
+        confidences: Dict[int, float] = {}
+        for user_id, entry in pending.items():
+            time_in = entry["first_seen"].time()
+            time_out = entry["last_seen"].time()
+            if entry["persisted"]:
+                updates.append(
+                    {"b_user": user_id, "b_time_out": time_out, "b_confidence": entry["confidence"]}
+                )
+                continue
+
+            row = existing.get(user_id)
+            if row is None:
+                inserts.append(
+                    {
+                        "session_id": session_id,
+                        "user_id": user_id,
+                        "status": presence.status_for(entry["first_seen"]),
+                        "verification_method": "Face Recognition",
+                        "time_in": time_in,
+                        "time_out": time_out,
+                        "confidence_score": entry["confidence"],
+                        "manual_override": False,
+                    }
+                )
+                continue
+
+            # Existing row (manual mark, earlier run): keep teacher decisions intact
+            confidences[user_id] = row.confidence_score or 0.0
+            status = row.status
+            if not row.manual_override and (row.status or "").lower() in ("absent", "unknown"):
+                status = presence.status_for(entry["first_seen"])
+            first_updates.append(
+                {
+                    "b_user": user_id,
+                    "b_status": status,
+                    "b_time_in": min(row.time_in, time_in) if row.time_in else time_in,
+                    "b_time_out": time_out,
+                    "b_confidence": max(row.confidence_score or 0.0, entry["confidence"]),
+                }
+            )
+
+        if inserts:
+            db.session.execute(insert(StudentAttendance), inserts)
+        # Core table statements so SQLAlchemy runs a plain executemany keyed by
+        # (session_id, user_id) instead of an ORM bulk update by primary key
+        table = StudentAttendance.__table__
+        match = (table.c.session_id == session_id) & (table.c.user_id == bindparam("b_user"))
+        if first_updates:
+            db.session.execute(
+                update(table)
+                .where(match)
+                .values(
+                    status=bindparam("b_status"),
+                    time_in=bindparam("b_time_in"),
+                    time_out=bindparam("b_time_out"),
+                    confidence_score=bindparam("b_confidence"),
+                ),
+                first_updates,
+            )
+        if updates:
+            db.session.execute(
+                update(table)
+                .where(match)
+                .values(time_out=bindparam("b_time_out"), confidence_score=bindparam("b_confidence")),
+                updates,
+            )
+        # Only first sightings can change a status; time_out refreshes cannot,
+        # and are left out of the change feed so it is not one row per student per flush
+        bitset_store.record(
+            [(session_id, row["user_id"], row["status"]) for row in inserts]
+            + [(session_id, row["b_user"], row["b_status"]) for row in first_updates]
+        )
+        lecture_ids = {session_id: presence.lecture_id}
+        log_changes(
+            "attendance",
+            "update",
+            attendance_rows([(session_id, row["user_id"]) for row in inserts], lecture_ids, "insert")
+            + attendance_rows([(session_id, row["b_user"]) for row in first_updates], lecture_ids),
+        )
+        return len(inserts) + len(first_updates) + len(updates), confidences
+
+
+def run_flush_loop(app, presence: PresenceTracker, every: float) -> None:
+    while True:
+        time.sleep(every)
+        with app.app_context():
+            try:
+                presence.flush_due()
+            except Exception:
+                app.logger.exception("Presence flush failed; pending detections are kept for the next one")
+
+
+_flusher: Optional[threading.Thread] = None
+_flusher_lock = threading.Lock()
+
+
+def start_flusher(app, presence: Optional[PresenceTracker] = None) -> None:
+    """Flush pending detections on a timer so the last hits of a quiet camera still land.
+
+    Without it, a session's pending hits are written only when a later
+    detection arrives or the session is finalized. One daemon thread per
+    process; calling it again is cheap and starts nothing.
+    """
+
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    presence = presence or tracker
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(
+                target=run_flush_loop, args=(app, presence, presence.flush_interval), daemon=True, name="presence-flush"
+            )
+            _flusher.start()
+
+
+tracker = PresenceTracker()
@@ -0,0 +1,295 @@
+import argparse
+import atexit
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, update
+
+# Allow running as a script from the backend directory (like migrate_db.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from changes import log_changes
+from models import db, FaceDataset, Student
+
+try:  # optional: JPEG/PNG captures; .npy and PGM/PPM load without it
+    from PIL import Image
+except ImportError:  # pragma: no cover - depends on the environment
+    Image = None
+
+
+FACE_IMAGE_ROOT = os.getenv("FACE_IMAGE_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "faces"))
+TEMPLATES_PER_STUDENT = int(os.getenv("FACE_TEMPLATES_PER_STUDENT", "5"))
+# Templates below this are dropped from the gallery unless a student has nothing better
+MIN_QUALITY = float(os.getenv("FACE_MIN_QUALITY", "0.2"))
+QUALITY_WORKERS = int(os.getenv("FACE_QUALITY_WORKERS", "0")) or max(1, (os.cpu_count() or 2) - 1)
+# Below this many images the pool's start-up and pickling cost more than it saves
+POOL_MIN_JOBS = 4
+
+SHARPNESS_SCALE = 150.0  # Laplacian variance at which sharpness reaches ~63%
+MIN_FACE_PIXELS = 40
+GOOD_FACE_PIXELS = 160
+WEIGHTS = {"sharpness": 0.35, "exposure": 0.25, "face_size": 0.2, "pose": 0.2}
+
+Box = Tuple[int, int, int, int]  # x, y, width, height
+
+
+def load_image(path: str) -> np.ndarray:
+    """Read an image file as a 2-D float32 grayscale array in [0, 255]."""
+
+    if not os.path.isabs(path):
+        path = os.path.join(FACE_IMAGE_ROOT, path)
+    with open(path, "rb") as handle:
+        return decode_image(handle.read())
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode .npy, binary PGM/PPM or (with Pillow) any common image format."""
+
+    if data[:6] == b"\x93NUMPY":
+        array = np.load(io.BytesIO(data), allow_pickle=False)
+    elif data[:2] in (b"P5", b"P6"):
+        array = _read_netpbm(data)
+    elif Image is not None:
+        with Image.open(io.BytesIO(data)) as image:
+            array = np.asarray(image.convert("L"))
+    else:
+        raise ValueError("Cannot decode this image format without Pillow")
+    return to_gray(array)
+
+
+def to_gray(array: np.ndarray) -> np.ndarray:
+    array = np.asarray(array, dtype=np.float32)
+    if array.ndim == 3:
+        array = array[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    if array.ndim != 2 or min(array.shape) < 3:
+        raise ValueError("Expected a 2-D image")
+    if array.max(initial=0) <= 1.0:
+        array = array * 255.0
+    return array
+
+
+def _read_netpbm(data: bytes) -> np.ndarray:
+    fields, position = [], 0
+    while len(fields) < 4:
+        while data[position : position + 1].isspace():
+            position += 1
+        if data[position : position + 1] == b"#":
+            position = data.index(b"\n", position)
+            continue
+        end = position
+        while not data[end : end + 1].isspace():
+            end += 1
+        fields.append(data[position:end])
+        position = end
+    magic, width, height, maximum = fields[0], int(fields[1]), int(fields[2]), int(fields[3])
+    channels = {b"P5": 1, b"P6": 3}[magic]
+    dtype = np.uint8 if maximum < 256 else np.dtype(">u2")
+    pixels = np.frombuffer(data, dtype=dtype, offset=position + 1, count=width * height * channels)
+    shape = (height, width) if channels == 1 else (height, width, 3)
+    return pixels.reshape(shape).astype(np.float32) * (255.0 / maximum)
+
+
+def sharpness(face: np.ndarray) -> float:
+    # Variance of the 4-neighbour Laplacian: blur and motion smear flatten it
+    laplacian = face[1:-1, :-2] + face[1:-1, 2:] + face[:-2, 1:-1] + face[2:, 1:-1] - 4 * face[1:-1, 1:-1]
+    return float(1.0 - np.exp(-laplacian.var() / SHARPNESS_SCALE))
+
+
+def exposure(face: np.ndarray) -> float:
+    brightness = 1.0 - abs(float(face.mean()) - 128.0) / 128.0
+    clipped = float(np.mean((face < 8) | (face > 247)))
+    contrast = min(1.0, float(face.std()) / 40.0)
+    return float(np.clip(brightness * (1.0 - min(1.0, clipped * 4.0)) * (0.5 + 0.5 * contrast), 0.0, 1.0))
+
+
+def face_size(box: Box) -> float:
+    side = min(box[2], box[3])
+    return float(np.clip((side - MIN_FACE_PIXELS) / (GOOD_FACE_PIXELS - MIN_FACE_PIXELS), 0.0, 1.0))
+
+
+def pose(face: np.ndarray, landmarks: Optional[Dict[str, Sequence[float]]] = None) -> float:
+    """Frontal-ness in [0, 1].
+
+    With eye and nose landmarks: the nose's offset from the eye midpoint
+    (yaw) and the eye line's tilt (roll). Without them: left/right mirror
+    symmetry of the crop, which drops as the head turns.
+    """
+
+    if landmarks and all(name in landmarks for name in ("left_eye", "right_eye", "nose")):
+        left, right, nose = (np.asarray(landmarks[name], dtype=np.float32) for name in ("left_eye", "right_eye", "nose"))
+        eye_distance = float(np.linalg.norm(right - left)) or 1.0
+        yaw = abs(float(nose[0] - (left[0] + right[0]) / 2.0)) / eye_distance
+        roll = abs(float(np.arctan2(right[1] - left[1], right[0] - left[0])))
+        return float(np.clip(1.0 - yaw / 0.5, 0.0, 1.0) * np.clip(1.0 - roll / 0.6, 0.0, 1.0))
+
+    asymmetry = float(np.mean(np.abs(face - face[:, ::-1]))) / (float(face.mean()) + 1.0)
+    return float(np.clip(1.0 - asymmetry, 0.0, 1.0))
+
+
+def score_face(
+    image: np.ndarray, box: Optional[Box] = None, landmarks: Optional[Dict[str, Sequence[float]]] = None
+) -> Dict[str, float]:
+    """Component scores plus ``quality``, their weighted geometric mean.
+
+    ``box`` is the detected face (defaults to the whole image, i.e. an
+    already-cropped face). A geometric mean lets one bad dimension, such as
+    heavy blur, sink the score however good the others are.
+    """
+
+    image = to_gray(image)
+    if box is None:
+        box = (0, 0, image.shape[1], image.shape[0])
+    x, y, width, height = (int(value) for value in box)
+    face = image[max(y, 0) : y + height, max(x, 0) : x + width]
+    if min(face.shape) < 3:
+        face = image
+
+    components = {
+        "sharpness": sharpness(face),
+        "exposure": exposure(face),
+        "face_size": face_size((x, y, width, height)),
+        "pose": pose(face, landmarks),
+    }
+    quality = float(np.prod([max(components[name], 1e-3) ** weight for name, weight in WEIGHTS.items()]))
+    return {**{name: round(value, 4) for name, value in components.items()}, "quality": round(quality, 4)}
+
+
+def _score_job(job: Tuple[int, str, Optional[Box], Optional[Dict]]) -> Tuple[int, Optional[float]]:
+    image_id, path, box, landmarks = job
+    try:
+        return image_id, score_face(load_image(path), box, landmarks)["quality"]
+    except (OSError, ValueError, KeyError):
+        return image_id, None
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process-wide scoring pool, started on first use (scoring is CPU bound)."""
+
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=QUALITY_WORKERS)
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def score_images(jobs: Iterable[Tuple[int, str, Optional[Box], Optional[Dict]]]) -> Dict[int, Optional[float]]:
+    """Score (image_id, path, box, landmarks) jobs; unreadable images map to None."""
+
+    jobs = list(jobs)
+    if QUALITY_WORKERS <= 1 or len(jobs) < POOL_MIN_JOBS:
+        return dict(map(_score_job, jobs))
+    chunksize = max(1, len(jobs) // (QUALITY_WORKERS * 4))
+    return dict(get_pool().map(_score_job, jobs, chunksize=chunksize))
+
+
+def best_templates(rows: Iterable[Tuple[int, Optional[float]]], k: int = TEMPLATES_PER_STUDENT) -> List[int]:
+    """Pick up to ``k`` image ids by quality; unscored images rank last."""
+
+    ranked = sorted(rows, key=lambda row: (row[1] is None, -(row[1] or 0.0), row[0]))
+    good = [image_id for image_id, quality in ranked if quality is not None and quality >= MIN_QUALITY]
+    return (good or [image_id for image_id, _ in ranked])[:k]
+
+
+def score_pending(student_ids: Optional[Sequence[int]] = None, rescore: bool = False) -> int:
+    """Score FaceDataset rows without a quality_score (all rows with ``rescore``)."""
+
+    query = db.session.query(FaceDataset.image_id, FaceDataset.image_path)
+    if student_ids is not None:
+        query = query.filter(FaceDataset.student_id.in_(list(student_ids)))
+    if not rescore:
+        query = query.filter(FaceDataset.quality_score.is_(None))
+    scores = score_images((image_id, path, None, None) for image_id, path in query)
+    rows = [{"b_id": image_id, "b_quality": quality} for image_id, quality in scores.items() if quality is not None]
+    if rows:
+        table = FaceDataset.__table__
+        db.session.execute(
+            update(table).where(table.c.image_id == bindparam("b_id")).values(quality_score=bindparam("b_quality")),
+            rows,
+        )
+    return len(rows)
+
+
+def apply_best_templates(student_ids: Optional[Sequence[int]] = None, k: int = TEMPLATES_PER_STUDENT) -> Dict[int, str]:
+    """Rewrite Student.face_embeddings to the best ``k`` per-image embeddings.
+
+    Only students whose FaceDataset rows carry an embedding are touched.
+    Returns {user_id: face_embeddings} for the students that changed, so the
+    caller can refresh galleries and the campus index after committing. Each
+    change is also logged as an "enrollment" update, which other processes
+    follow to refresh theirs.
+    """
+
+    query = (
+        db.session.query(
+            Student.student_id,
+            Student.user_id,
+            Student.face_embeddings,
+            FaceDataset.image_id,
+            FaceDataset.quality_score,
+            FaceDataset.embedding,
+        )
+        .join(FaceDataset, FaceDataset.student_id == Student.student_id)
+        .filter(FaceDataset.embedding.isnot(None))
+    )
+    if student_ids is not None:
+        query = query.filter(Student.student_id.in_(list(student_ids)))
+
+    by_student: Dict[int, Dict] = {}
+    for student_id, user_id, current, image_id, quality, embedding in query:
+        entry = by_student.setdefault(student_id, {"user_id": user_id, "current": current, "rows": {}})
+        entry["rows"][image_id] = (quality, embedding)
+
+    changed: Dict[int, str] = {}
+    updates = []
+    for student_id, entry in by_student.items():
+        keep = best_templates(((image_id, quality) for image_id, (quality, _) in entry["rows"].items()), k)
+        templates = json.dumps([json.loads(entry["rows"][image_id][1]) for image_id in keep])
+        if templates != entry["current"]:
+            updates.append({"b_id": student_id, "b_embeddings": templates})
+            changed[entry["user_id"]] = templates
+    if updates:
+        table = Student.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.student_id == bindparam("b_id"))
+            .values(face_embeddings=bindparam("b_embeddings")),
+            updates,
+        )
+        log_changes("enrollment", "update", [{"key": user_id, "user_id": user_id} for user_id in changed])
+    return changed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score enrollment images and keep the best templates per student.")
+    parser.add_argument("--student", type=int, action="append", help="Only this student_id (repeatable)")
+    parser.add_argument("--rescore", action="store_true", help="Score images that already have a score")
+    parser.add_argument("--keep", type=int, default=TEMPLATES_PER_STUDENT, help="Templates kept per student")
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        started = time.perf_counter()
+        scored = score_pending(args.student, args.rescore)
+        changed = apply_best_templates(args.student, args.keep)
+        db.session.commit()
+        print(
+            f"Scored {scored} images and updated templates for {len(changed)} students "
+            f"in {time.perf_counter() - started:.2f}s (running API processes pick them up from Change_Log)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+DEFAULT_TOP_K = 5
+# Candidates per face beyond this only add payload, never a better match
+MAX_TOP_K = 50
+DEFAULT_THRESHOLD = 0.5
+
+
+def parse_embeddings(raw) -> Optional[np.ndarray]:
+    """Parse Student.face_embeddings into an (n_templates, dim) float32 array.
+
+    Accepts a JSON list of floats (one template) or a list of lists (several
+    templates). Anything else, such as captured image data, yields None.
+    """
+
+    if raw is None:
+        return None
+    try:
+        value = json.loads(raw) if isinstance(raw, str) else raw
+        array = np.asarray(value, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+
+    if array.ndim == 1:
+        array = array[np.newaxis, :]
+    if array.ndim != 2 or array.shape[0] == 0 or array.shape[1] == 0:
+        return None
+    if not np.isfinite(array).all():
+        return None
+    return array
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def check_k(k: int) -> None:
+    if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+
+
+class FaceGallery:
+    """Enrolled templates for a set of students, ready for cosine matching.
+
+    Templates are L2-normalized and grouped by user so a whole frame can be
+    scored with one matrix multiply followed by a per-student max.
+    """
+
+    def __init__(self, user_ids: np.ndarray, templates: np.ndarray):
+        order = np.argsort(user_ids, kind="stable")
+        self.template_users = user_ids[order]
+        self.templates = normalize_rows(templates[order].astype(np.float32))
+        self.user_ids, self.user_starts = np.unique(self.template_users, return_index=True)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, object]]) -> "FaceGallery":
+        """Build from (user_id, face_embeddings) rows, skipping unusable entries."""
+
+        users: List[np.ndarray] = []
+        templates: List[np.ndarray] = []
+        dim = None
+        for user_id, raw in rows:
+            parsed = parse_embeddings(raw)
+            if parsed is None:
+                continue
+            if dim is None:
+                dim = parsed.shape[1]
+            if parsed.shape[1] != dim:
+                continue
+            templates.append(parsed)
+            users.append(np.full(parsed.shape[0], user_id, dtype=np.int64))
+
+        if not templates:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+        return cls(np.concatenate(users), np.vstack(templates))
+
+    @property
+    def dim(self) -> int:
+        return self.templates.shape[1]
+
+    def __len__(self) -> int:
+        return int(self.user_ids.size)
+
+    def score(self, probes: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every probe against every student: (n_probes, n_students)."""
+
+        similarities = normalize_rows(probes.astype(np.float32)) @ self.templates.T
+        return np.maximum.reduceat(similarities, self.user_starts, axis=1)
+
+    def top_k(self, probes: np.ndarray, k: int = DEFAULT_TOP_K) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (student indices, scores) of the k best students per probe, best first."""
+
+        check_k(k)
+        scores = self.score(probes)
+        k = min(k, scores.shape[1])
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        return (
+            np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1),
+        )
+
+    def match_batch(
+        self,
+        probes: np.ndarray,
+        k: int = DEFAULT_TOP_K,
+        threshold: float = DEFAULT_THRESHOLD,
+    ) -> List[Dict]:
+        """Identify every face in a frame at once (see ``assign_candidates``)."""
+
+        check_k(k)
+        if probes.shape[0] == 0 or len(self) == 0:
+            return assign_candidates(
+                np.full((probes.shape[0], 0), -1, dtype=np.int64),
+                np.empty((probes.shape[0], 0), dtype=np.float32),
+                threshold,
+            )
+        candidates, scores = self.top_k(probes, k)
+        return assign_candidates(self.user_ids[candidates], scores, threshold)
+
+
+def assign_candidates(candidate_users: np.ndarray, scores: np.ndarray, threshold: float) -> List[Dict]:
+    """Resolve per-face candidate lists into a one-to-one assignment.
+
+    ``candidate_users``/``scores`` are (n_faces, k), best first; id -1 marks
+    padding. Pairs are taken greedily by score, so two faces can never claim the
+    same student and a face that loses its best candidate falls back to its next
+    one above ``threshold``.
+    """
+
+    n_probes = candidate_users.shape[0]
+    results = []
+    for index in range(n_probes):
+        valid = candidate_users[index] >= 0
+        results.append(
+            {
+                "face_index": index,
+                "user_id": None,
+                "confidence": None,
+                "candidates": [
+                    {"user_id": int(user_id), "score": round(float(score), 4)}
+                    for user_id, score in zip(candidate_users[index][valid], scores[index][valid])
+                ],
+            }
+        )
+
+    probe_index = np.repeat(np.arange(n_probes), candidate_users.shape[1])
+    flat_users = candidate_users.ravel()
+    flat_scores = scores.ravel()
+    eligible = (flat_users >= 0) & (flat_scores >= threshold)
+    order = np.argsort(-flat_scores[eligible], kind="stable")
+
+    taken_users = set()
+    for probe, user_id, score in zip(
+        probe_index[eligible][order], flat_users[eligible][order], flat_scores[eligible][order]
+    ):
+        if results[probe]["user_id"] is not None or user_id in taken_users:
+            continue
+        taken_users.add(user_id)
+        results[probe]["user_id"] = int(user_id)
+        results[probe]["confidence"] = round(float(score), 4)
+    return results
+
+
+_gallery_cache: Dict[object, FaceGallery] = {}
+_gallery_lock = threading.Lock()
+
+
+def get_cached_gallery(key, loader) -> FaceGallery:
+    """Return the gallery for ``key`` (e.g. a lecture id), building it on first use."""
+
+    with _gallery_lock:
+        gallery = _gallery_cache.get(key)
+    if gallery is None:
+        gallery = FaceGallery.from_rows(loader())
+        with _gallery_lock:
+            _gallery_cache[key] = gallery
+    return gallery
+
+
+def invalidate_galleries() -> None:
+    """Drop cached galleries after student or enrollment changes."""
+
+    with _gallery_lock:
+        _gallery_cache.clear()
@@ -0,0 +1,222 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from sqlalchemy import case, func, insert, select
+
+# Allow running as a script from the backend directory (like migrate_db.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from archive import attendance_source
+from models import db, AttendanceRisk, AttendanceSession
+
+
+# Scoring knobs. A student is flagged for a lecture when any rule trips.
+RECENT_WINDOW = 5
+STREAK_THRESHOLD = 3
+MIN_RATE = 75.0
+FALLING_DELTA = 15.0
+CHUNK_SIZE = 10000
+
+
+def score_chunk(
+    users: np.ndarray,
+    lectures: np.ndarray,
+    days: np.ndarray,
+    absent: np.ndarray,
+    attended: np.ndarray,
+    window: int = RECENT_WINDOW,
+) -> List[Dict]:
+    """Score rows already ordered by (user, lecture, session_date).
+
+    Every (user, lecture) group in the arrays must be complete. Streaks come
+    from a run-length encoding of the absence flag, so no Python loop runs
+    per attendance row.
+    """
+
+    n = users.size
+    if n == 0:
+        return []
+
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = (users[1:] != users[:-1]) | (lectures[1:] != lectures[:-1])
+    group_starts = np.flatnonzero(new_group)
+    group_id = np.cumsum(new_group) - 1
+    group_len = np.diff(np.append(group_starts, n))
+    group_ends = group_starts + group_len - 1
+
+    totals = group_len
+    attended_counts = np.add.reduceat(attended.astype(np.int64), group_starts)
+
+    # Rolling rate over the last `window` sessions of each group
+    position_from_end = group_ends[group_id] - np.arange(n)
+    in_window = position_from_end < window
+    window_totals = np.bincount(group_id, weights=in_window, minlength=group_starts.size)
+    window_attended = np.bincount(group_id, weights=in_window & attended, minlength=group_starts.size)
+
+    # Runs break on group boundaries and on absent/not-absent changes
+    new_run = new_group.copy()
+    new_run[1:] |= absent[1:] != absent[:-1]
+    run_starts = np.flatnonzero(new_run)
+    run_len = np.diff(np.append(run_starts, n))
+    absent_runs = np.where(absent[run_starts], run_len, 0)
+
+    first_run_of_group = np.searchsorted(run_starts, group_starts)
+    longest = np.maximum.reduceat(absent_runs, first_run_of_group)
+    last_run_of_group = np.append(first_run_of_group[1:], run_starts.size) - 1
+    current = absent_runs[last_run_of_group]
+
+    rates = attended_counts * 100.0 / totals
+    recent = np.divide(
+        window_attended * 100.0,
+        window_totals,
+        out=np.zeros(window_totals.shape),
+        where=window_totals > 0,
+    )
+    at_risk = (
+        (current >= STREAK_THRESHOLD)
+        | (rates < MIN_RATE)
+        | ((totals > window) & (recent < rates - FALLING_DELTA))
+    )
+
+    last_days = days[group_ends].astype("datetime64[D]").tolist()
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "user_id": int(users[start]),
+            "lecture_id": int(lectures[start]),
+            "total_sessions": int(totals[index]),
+            "attended_sessions": int(attended_counts[index]),
+            "attendance_rate": round(float(rates[index]), 1),
+            "recent_rate": round(float(recent[index]), 1),
+            "current_absence_streak": int(current[index]),
+            "longest_absence_streak": int(longest[index]),
+            "is_at_risk": bool(at_risk[index]),
+            "last_session_date": last_days[index],
+            "computed_at": now,
+        }
+        for index, start in enumerate(group_starts)
+    ]
+
+
+def _rows_to_arrays(rows: List[Tuple]) -> Tuple[np.ndarray, ...]:
+    users, lectures, session_dates, codes = zip(*rows)
+    codes = np.asarray(codes, dtype=np.int8)
+    return (
+        np.asarray(users, dtype=np.int64),
+        np.asarray(lectures, dtype=np.int64),
+        np.array(session_dates, dtype="datetime64[D]"),
+        codes == 2,
+        codes == 1,
+    )
+
+
+def user_ranges(counts: Iterable[Tuple[int, int]], chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """Cut (user_id, rows) pairs, ordered by user, into ranges of about ``chunk_size`` rows.
+
+    Ranges hold whole users, so no (user, lecture) group is split; a user
+    with more rows than ``chunk_size`` gets a range of their own.
+    """
+
+    first = last = None
+    total = 0
+    for user_id, rows in counts:
+        if first is not None and total + rows > chunk_size:
+            yield first, last
+            first, total = None, 0
+        if first is None:
+            first = user_id
+        last = user_id
+        total += rows
+    if first is not None:
+        yield first, last
+
+
+def compute_risk_scores(chunk_size: int = CHUNK_SIZE) -> int:
+    """Rebuild Attendance_Risk from all attendance, live and archived, in chunks.
+
+    Rows are read ordered by (user, lecture, session_date) one user range at
+    a time (see user_ranges). Each range is fetched in full before its scores
+    are inserted: SQL Server connections without MARS cannot write while a
+    result set is still open. Must run inside an app context.
+    """
+
+    # Scores cover every session, so closed terms in the archive count too
+    attendance = attendance_source()
+    status = func.lower(attendance.c.status)
+    # 1 = attended (present/late), 2 = absent, 0 = anything else; excused skipped
+    status_code = case(
+        (status.in_(["present", "late"]), 1),
+        (status == "absent", 2),
+        else_=0,
+    )
+    scored_rows = [AttendanceSession.session_date.isnot(None), status != "excused"]
+    counts = db.session.execute(
+        select(attendance.c.user_id, func.count())
+        .select_from(attendance)
+        .join(AttendanceSession, AttendanceSession.session_id == attendance.c.session_id)
+        .where(*scored_rows)
+        .group_by(attendance.c.user_id)
+        .order_by(attendance.c.user_id)
+    ).all()
+    statement = (
+        select(
+            attendance.c.user_id,
+            AttendanceSession.lecture_id,
+            AttendanceSession.session_date,
+            status_code,
+        )
+        .select_from(attendance)
+        .join(AttendanceSession, AttendanceSession.session_id == attendance.c.session_id)
+        .where(*scored_rows)
+        .order_by(
+            attendance.c.user_id,
+            AttendanceSession.lecture_id,
+            AttendanceSession.session_date,
+            AttendanceSession.session_start_time,
+        )
+    )
+
+    written = 0
+    try:
+        db.session.query(AttendanceRisk).delete(synchronize_session=False)
+
+        for first, last in user_ranges(counts, chunk_size):
+            rows = db.session.execute(statement.where(attendance.c.user_id.between(first, last))).all()
+            if not rows:
+                continue
+            scored = score_chunk(*_rows_to_arrays(rows))
+            db.session.execute(insert(AttendanceRisk), scored)
+            written += len(scored)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recompute attendance risk scores.")
+    parser.add_argument("--every", type=int, default=0, help="Repeat every N minutes (0 = run once).")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from app import app
+
+    while True:
+        with app.app_context():
+            started = time.perf_counter()
+            written = compute_risk_scores(args.chunk_size)
+            print(f"Scored {written} (user, lecture) pairs in {time.perf_counter() - started:.2f}s")
+        if args.every <= 0:
+            break
+        time.sleep(args.every * 60)
+
+
+if __name__ == "__main__":
+    main()
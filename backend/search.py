@@ -0,0 +1,237 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Upper bound on documents considered per query term, so one-letter prefixes stay cheap
+MAX_CANDIDATES = 5000
+
+EXACT, PREFIX, SUBSTRING = 3, 2, 1
+
+Key = Tuple[str, int]
+
+_token_pattern = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text) -> List[str]:
+    return _token_pattern.findall(str(text or "").lower())
+
+
+def trigrams(token: str) -> Set[str]:
+    return {token[i : i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+    """Autocomplete index over users/students and lectures.
+
+    Every field is split into lowercase alphanumeric tokens. A sorted token
+    list answers prefix lookups with a binary search, and a trigram posting
+    map answers substring lookups (e.g. "2024" inside a roll number). A
+    document matches when every query term matches one of its tokens;
+    exact token hits outrank prefix hits, which outrank substring hits.
+    """
+
+    def __init__(self):
+        self.documents: Dict[Key, Dict] = {}
+        self.doc_tokens: Dict[Key, Set[str]] = {}
+        self.sorted_tokens: List[Tuple[str, Key]] = []
+        self.grams: Dict[str, Set[Key]] = {}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, document: Dict) -> None:
+        """Add or replace a document with ``type``, ``id``, ``label`` and ``fields``."""
+
+        key = (document["type"], int(document["id"]))
+        tokens = {token for value in document["fields"].values() for token in tokenize(value)}
+        with self.lock:
+            self._remove(key)
+            self.documents[key] = document
+            self.doc_tokens[key] = tokens
+            for token in tokens:
+                insort(self.sorted_tokens, (token, key))
+                for gram in trigrams(token):
+                    self.grams.setdefault(gram, set()).add(key)
+
+    def add_many(self, documents: Iterable[Dict]) -> None:
+        """Bulk load into an empty index: append every token, then sort once."""
+
+        with self.lock:
+            for document in documents:
+                key = (document["type"], int(document["id"]))
+                tokens = {token for value in document["fields"].values() for token in tokenize(value)}
+                self.documents[key] = document
+                self.doc_tokens[key] = tokens
+                self.sorted_tokens.extend((token, key) for token in tokens)
+                for token in tokens:
+                    for gram in trigrams(token):
+                        self.grams.setdefault(gram, set()).add(key)
+            self.sorted_tokens.sort()
+
+    def remove(self, doc_type: str, doc_id: int) -> None:
+        with self.lock:
+            self._remove((doc_type, int(doc_id)))
+
+    def _remove(self, key: Key) -> None:
+        tokens = self.doc_tokens.pop(key, None)
+        self.documents.pop(key, None)
+        if not tokens:
+            return
+        for token in tokens:
+            position = bisect_left(self.sorted_tokens, (token, key))
+            if position < len(self.sorted_tokens) and self.sorted_tokens[position] == (token, key):
+                del self.sorted_tokens[position]
+            for gram in trigrams(token):
+                postings = self.grams.get(gram)
+                if postings is not None:
+                    postings.discard(key)
+                    if not postings:
+                        del self.grams[gram]
+
+    def _term_scores(self, term: str, doc_type: Optional[str] = None) -> Dict[Key, int]:
+        # The type filter runs before the MAX_CANDIDATES cut so a common prefix
+        # in the other type cannot crowd out every match of the requested one
+        scores: Dict[Key, int] = {}
+        position = bisect_left(self.sorted_tokens, (term,))
+        while position < len(self.sorted_tokens) and len(scores) < MAX_CANDIDATES:
+            token, key = self.sorted_tokens[position]
+            if not token.startswith(term):
+                break
+            position += 1
+            if doc_type and key[0] != doc_type:
+                continue
+            score = EXACT if token == term else PREFIX
+            if score > scores.get(key, 0):
+                scores[key] = score
+
+        if len(term) >= 3:
+            grams = trigrams(term)
+            postings = sorted((self.grams.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:]) if postings else set()
+            for key in candidates:
+                if key in scores or (doc_type and key[0] != doc_type):
+                    continue
+                if any(term in token for token in self.doc_tokens[key]):
+                    scores[key] = SUBSTRING
+                    if len(scores) >= MAX_CANDIDATES:
+                        break
+        return scores
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT, doc_type: Optional[str] = None) -> List[Dict]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self.lock:
+            totals: Optional[Dict[Key, int]] = None
+            # Rarest-looking (longest) terms first keeps the running intersection small
+            for term in sorted(set(terms), key=len, reverse=True):
+                scores = self._term_scores(term, doc_type)
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {key: totals[key] + score for key, score in scores.items() if key in totals}
+                if not totals:
+                    return []
+
+            phrase = " ".join(terms)
+            ranked = []
+            for key, score in totals.items():
+                document = self.documents[key]
+                label = str(document.get("label") or "").lower()
+                ranked.append((-score, not label.startswith(phrase), len(label), label, key))
+            ranked.sort()
+
+            results = []
+            for negative_score, _, _, _, key in ranked[:limit]:
+                document = self.documents[key]
+                results.append(
+                    {
+                        "type": document["type"],
+                        "id": document["id"],
+                        "label": document["label"],
+                        "detail": document.get("detail"),
+                        "role": document.get("role"),
+                        "score": -negative_score,
+                    }
+                )
+            return results
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index(load_documents) -> SearchIndex:
+    """Return the process-wide index, building it from ``load_documents()`` on first use."""
+
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = SearchIndex()
+            index.add_many(load_documents())
+            _index = index
+        return _index
+
+
+def index_document(document: Dict) -> None:
+    """Update the index after a write; a no-op until the index has been built."""
+
+    with _index_lock:
+        index = _index
+    if index is not None:
+        index.add(document)
+
+
+def unindex_document(doc_type: str, doc_id: int) -> None:
+    with _index_lock:
+        index = _index
+    if index is not None:
+        index.remove(doc_type, doc_id)
+
+
+def reset_search_index() -> None:
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def user_document(user, roll_number=None) -> Dict:
+    return {
+        "type": "user",
+        "id": user.user_id,
+        "label": user.full_name,
+        "detail": roll_number or user.email or user.username,
+        "role": user.role,
+        "fields": {
+            "full_name": user.full_name,
+            "username": user.username,
+            "email": user.email,
+            "roll_number": roll_number,
+        },
+    }
+
+
+def lecture_document(lecture) -> Dict:
+    return {
+        "type": "lecture",
+        "id": lecture.lecture_id,
+        "label": lecture.lecture_name,
+        "detail": lecture.course_code,
+        "role": None,
+        "fields": {"lecture_name": lecture.lecture_name, "course_code": lecture.course_code},
+    }
+
+
+def build_documents(users: Iterable, lectures: Iterable) -> Iterable[Dict]:
+    """``users`` yields (user, roll_number) pairs; ``lectures`` yields Lecture rows."""
+
+    for user, roll_number in users:
+        yield user_document(user, roll_number)
+    for lecture in lectures:
+        yield lecture_document(lecture)
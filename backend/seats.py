@@ -0,0 +1,146 @@
+import argparse
+import os
+import sys
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, or_, select, update
+
+# Allow running as a script from the backend directory (like migrate_db.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models import db, Lecture, LectureWaitlist, UserLecture
+
+
+PROMOTE_BATCH = 10
+
+
+def holds_seat():
+    """Enrollment rows that count against capacity: every non-teacher row."""
+
+    return or_(UserLecture.is_teacher.is_(None), UserLecture.is_teacher == False)
+
+
+def claim_seat(lecture_id: int) -> bool:
+    """Take a seat with one conditional UPDATE; False when the lecture is full.
+
+    The check and the increment are the same statement, so concurrent
+    registrations cannot both see the last seat free. The row lock lasts
+    until the caller commits or rolls back (which also returns the seat).
+    """
+
+    table = Lecture.__table__
+    result = db.session.execute(
+        update(table)
+        .where(
+            table.c.lecture_id == lecture_id,
+            or_(table.c.capacity.is_(None), table.c.enrolled_count < table.c.capacity),
+        )
+        .values(enrolled_count=table.c.enrolled_count + 1)
+    )
+    return result.rowcount == 1
+
+
+def release_seats(lecture_ids: Iterable[int]) -> None:
+    lecture_ids = list(lecture_ids)
+    if not lecture_ids:
+        return
+    table = Lecture.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.lecture_id.in_(lecture_ids), table.c.enrolled_count > 0)
+        .values(enrolled_count=table.c.enrolled_count - 1)
+    )
+
+
+def join_waitlist(lecture_id: int, user_id: int) -> int:
+    """Queue a user for a full lecture; returns their 1-based position."""
+
+    db.session.execute(insert(LectureWaitlist).values(lecture_id=lecture_id, user_id=user_id))
+    return waitlist_position(lecture_id, user_id)
+
+
+def waitlist_position(lecture_id: int, user_id: int) -> Optional[int]:
+    entry = db.session.get(LectureWaitlist, (lecture_id, user_id))
+    if entry is None:
+        return None
+    ahead = (
+        db.session.query(func.count())
+        .select_from(LectureWaitlist)
+        .filter(
+            LectureWaitlist.lecture_id == lecture_id,
+            or_(
+                LectureWaitlist.requested_at < entry.requested_at,
+                (LectureWaitlist.requested_at == entry.requested_at) & (LectureWaitlist.user_id < user_id),
+            ),
+        )
+        .scalar()
+    )
+    return ahead + 1
+
+
+def promote_waitlist(lecture_id: int) -> List[int]:
+    """Move the longest-waiting users into free seats; returns their user ids.
+
+    Each promotion claims a seat and deletes the waitlist row; a row that is
+    already gone was taken by a concurrent promotion, so its seat goes back.
+    Runs in the caller's transaction.
+    """
+
+    table = LectureWaitlist.__table__
+    promoted: List[int] = []
+    while True:
+        waiting = db.session.execute(
+            select(table.c.user_id)
+            .where(table.c.lecture_id == lecture_id)
+            .order_by(table.c.requested_at, table.c.user_id)
+            .limit(PROMOTE_BATCH)
+        ).scalars().all()
+        if not waiting:
+            return promoted
+        for user_id in waiting:
+            if not claim_seat(lecture_id):
+                return promoted
+            taken = db.session.execute(
+                delete(table).where(table.c.lecture_id == lecture_id, table.c.user_id == user_id)
+            ).rowcount
+            if not taken:
+                release_seats([lecture_id])
+                continue
+            db.session.execute(
+                insert(UserLecture).values(
+                    user_id=user_id, lecture_id=lecture_id, is_teacher=False, enrollment_status="Active"
+                )
+            )
+            promoted.append(user_id)
+
+
+def recount(lecture_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute enrolled_count from User_Lecture (after a migration or bulk import)."""
+
+    enrolled = (
+        select(func.count())
+        .select_from(UserLecture)
+        .where(UserLecture.lecture_id == Lecture.lecture_id, holds_seat())
+        .scalar_subquery()
+    )
+    statement = update(Lecture).values(enrolled_count=enrolled)
+    if lecture_ids is not None:
+        statement = statement.where(Lecture.lecture_id.in_(list(lecture_ids)))
+    result = db.session.execute(statement.execution_options(synchronize_session=False))
+    db.session.commit()
+    return result.rowcount or 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recompute per-lecture enrollment counters.")
+    parser.add_argument("--lecture", type=int, action="append", help="Limit to these lectures.")
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        print(f"Recounted {recount(args.lecture)} lectures")
+
+
+if __name__ == "__main__":
+    main()
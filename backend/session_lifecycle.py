@@ -0,0 +1,190 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import String, and_, cast, exists, insert, literal, or_, select
+
+# Allow running as a script from the backend directory (like migrate_db.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bitsets import store as bitset_store
+from changes import utc_ago
+from dashboard_cache import dashboard_cache
+from models import db, AttendanceSession, ChangeLog, StudentAttendance, UserLecture
+from presence import lock_sessions
+
+
+ABSENT_NOTE = "Marked absent at session close"
+
+
+def insert_absent_rows(session: AttendanceSession, now: datetime) -> int:
+    """Add an Absent row for every active enrollee without a record, in one INSERT ... SELECT."""
+
+    already_marked = exists().where(
+        StudentAttendance.session_id == session.session_id,
+        StudentAttendance.user_id == UserLecture.user_id,
+    )
+    missing = select(
+        literal(session.session_id),
+        UserLecture.user_id,
+        literal("Absent"),
+        literal(False),
+        literal(ABSENT_NOTE),
+        literal(now),
+    ).where(
+        UserLecture.lecture_id == session.lecture_id,
+        UserLecture.is_teacher == False,
+        or_(UserLecture.enrollment_status.is_(None), UserLecture.enrollment_status == "Active"),
+        ~already_marked,
+    )
+    table = StudentAttendance.__table__
+    result = db.session.execute(
+        insert(table).from_select(
+            [
+                table.c.session_id,
+                table.c.user_id,
+                table.c.status,
+                table.c.manual_override,
+                table.c.notes,
+                table.c.created_at,
+            ],
+            missing,
+        )
+    )
+    return result.rowcount or 0
+
+
+def log_absent_rows(session: AttendanceSession) -> None:
+    """Add the rows insert_absent_rows wrote to the change feed, server-side."""
+
+    table = ChangeLog.__table__
+    closed = select(
+        literal("attendance"),
+        cast(StudentAttendance.session_id, String) + literal(":") + cast(StudentAttendance.user_id, String),
+        literal("insert"),
+        StudentAttendance.user_id,
+        literal(session.lecture_id),
+        StudentAttendance.session_id,
+        utc_ago(),
+    ).where(
+        StudentAttendance.session_id == session.session_id,
+        StudentAttendance.status == "Absent",
+        StudentAttendance.notes == ABSENT_NOTE,
+    )
+    db.session.execute(
+        insert(table).from_select(
+            [
+                table.c.entity,
+                table.c.entity_key,
+                table.c.operation,
+                table.c.user_id,
+                table.c.lecture_id,
+                table.c.session_id,
+                table.c.changed_at,
+            ],
+            closed,
+        )
+    )
+
+
+def finalize_session(session: AttendanceSession, locked_by: Optional[int] = None) -> int:
+    """Close a session: mark no-shows absent and lock attendance.
+
+    Returns the number of Absent rows inserted. Commits on success; closing
+    an already closed session inserts nothing and keeps its lock details.
+    The session row is locked first, so a presence flush running elsewhere
+    either lands before the Absent rows or sees the session closed.
+    """
+
+    try:
+        lock_sessions([session.session_id])
+        now = datetime.now(timezone.utc)
+        absent = insert_absent_rows(session, now)
+        if absent:
+            bitset_store.record_session(session.session_id, [session.lecture_id])
+            log_absent_rows(session)
+        session.status = "Completed"
+        session.completed_at = session.completed_at or now
+        if not session.attendance_locked:
+            # A repeat close keeps who locked it and when
+            session.attendance_locked = True
+            session.locked_by = locked_by
+            session.locked_at = now
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # Absent rows can land on anyone enrolled in the lecture
+    dashboard_cache.invalidate_lectures([session.lecture_id])
+    return absent
+
+
+def advance_sessions(now: Optional[datetime] = None) -> dict:
+    """Move sessions along Scheduled -> In Progress -> Completed by their timetable.
+
+    ``now`` is local wall-clock time, matching session_date/session_start_time.
+    Sessions past their end time are finalized (and locked) individually.
+    """
+
+    now = now or datetime.now()
+    today, clock = now.date(), now.time()
+
+    started = (
+        AttendanceSession.query.filter(
+            AttendanceSession.status == "Scheduled",
+            AttendanceSession.session_start_time.isnot(None),
+            or_(
+                AttendanceSession.session_date < today,
+                and_(
+                    AttendanceSession.session_date == today,
+                    AttendanceSession.session_start_time <= clock,
+                ),
+            ),
+        ).update({"status": "In Progress"}, synchronize_session=False)
+    )
+    db.session.commit()
+
+    ended = AttendanceSession.query.filter(
+        AttendanceSession.status == "In Progress",
+        or_(AttendanceSession.attendance_locked.is_(None), AttendanceSession.attendance_locked == False),
+        AttendanceSession.session_end_time.isnot(None),
+        or_(
+            AttendanceSession.session_date < today,
+            and_(
+                AttendanceSession.session_date == today,
+                AttendanceSession.session_end_time <= clock,
+            ),
+        ),
+    ).all()
+
+    absent = 0
+    for session in ended:
+        absent += finalize_session(session)
+
+    return {"started": started, "completed": len(ended), "absent_rows": absent}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Advance attendance sessions through their lifecycle.")
+    parser.add_argument("--every", type=int, default=0, help="Repeat every N seconds (0 = run once).")
+    args = parser.parse_args()
+
+    from app import app
+
+    while True:
+        with app.app_context():
+            result = advance_sessions()
+            print(
+                f"Started {result['started']}, completed {result['completed']} sessions, "
+                f"{result['absent_rows']} absent rows"
+            )
+        if args.every <= 0:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
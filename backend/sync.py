@@ -0,0 +1,167 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+
+# Allow running as a script from the backend directory (like migrate_db.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models import db, AttendanceSession, SyncReceipt
+from presence import tracker as presence_tracker
+
+
+MAX_EVENTS = 5000
+MAX_KEY_LENGTH = 64
+# SQL Server caps a statement at 2100 parameters
+KEY_CHUNK = 1000
+RECEIPT_RETENTION_DAYS = 30
+
+
+def _parse_seen(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    # Same convention as the detections endpoint: local wall-clock time
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _float(value) -> float:
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def known_keys(keys: List[str]) -> set:
+    found = set()
+    for start in range(0, len(keys), KEY_CHUNK):
+        chunk = keys[start : start + KEY_CHUNK]
+        found.update(
+            row.idempotency_key
+            for row in db.session.query(SyncReceipt.idempotency_key).filter(SyncReceipt.idempotency_key.in_(chunk))
+        )
+    return found
+
+
+def apply_events(events: List[Dict], camera_id: Optional[int] = None) -> Dict:
+    """Apply a batch of spooled recognition events from an edge node.
+
+    Each event is ``{"key", "session_id", "user_id", "first_seen",
+    "last_seen", "confidence"}``. Keys already in Attendance_Sync_Receipt
+    are reported as duplicates and skipped; the rest go through the presence
+    tracker (so manual marks are never overwritten) and are written together
+    with their receipts in one transaction.
+
+    Sessions closed by the lifecycle job still accept events, since the node
+    may have been offline when it ran; sessions a person locked do not.
+    """
+
+    rejected = []
+    parsed: Dict[str, Dict] = {}
+    for event in events:
+        event = event if isinstance(event, dict) else {}
+        key = str(event.get("key") or "").strip()
+        session_id = event.get("session_id")
+        user_id = event.get("user_id")
+        first_seen = _parse_seen(event.get("first_seen"))
+        if not key or len(key) > MAX_KEY_LENGTH:
+            rejected.append({"key": key or None, "reason": "invalid_key"})
+            continue
+        if not isinstance(session_id, int) or not isinstance(user_id, int) or first_seen is None:
+            rejected.append({"key": key, "reason": "invalid_event"})
+            continue
+        parsed[key] = {
+            "session_id": session_id,
+            "user_id": user_id,
+            "first_seen": first_seen,
+            "last_seen": _parse_seen(event.get("last_seen")) or first_seen,
+            "confidence": _float(event.get("confidence")),
+        }
+
+    duplicates = known_keys(list(parsed))
+    fresh = {key: event for key, event in parsed.items() if key not in duplicates}
+
+    sessions = {}
+    if fresh:
+        session_ids = {event["session_id"] for event in fresh.values()}
+        sessions = {
+            session.session_id: session
+            for session in AttendanceSession.query.filter(AttendanceSession.session_id.in_(session_ids))
+        }
+
+    receipts = []
+    touched = set()
+    for key, event in fresh.items():
+        session = sessions.get(event["session_id"])
+        if session is None:
+            rejected.append({"key": key, "reason": "unknown_session"})
+            continue
+        if session.attendance_locked and session.locked_by is not None:
+            rejected.append({"key": key, "reason": "session_locked"})
+            continue
+        presence_tracker.observe(session, event["user_id"], event["confidence"], event["first_seen"])
+        presence_tracker.observe(session, event["user_id"], event["confidence"], event["last_seen"])
+        touched.add(session.session_id)
+        receipts.append(
+            {
+                "idempotency_key": key,
+                "camera_id": camera_id,
+                "session_id": event["session_id"],
+                "user_id": event["user_id"],
+            }
+        )
+
+    def write_receipts():
+        if receipts:
+            db.session.execute(insert(SyncReceipt), receipts)
+
+    written = (
+        presence_tracker.flush_many(sorted(touched), before_commit=write_receipts, include_closed=True)
+        if receipts
+        else 0
+    )
+    return {
+        "accepted": len(receipts),
+        "duplicates": len(duplicates),
+        "rejected": rejected,
+        "rows_written": written,
+    }
+
+
+def prune_receipts(days: int = RECEIPT_RETENTION_DAYS) -> int:
+    """Forget receipts older than ``days``; nodes must sync within that window."""
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    removed = SyncReceipt.query.filter(SyncReceipt.received_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prune old edge sync receipts.")
+    parser.add_argument("--days", type=int, default=RECEIPT_RETENTION_DAYS, help="Receipt retention in days")
+    parser.add_argument("--every", type=int, default=0, help="Repeat every N minutes (0 = run once)")
+    args = parser.parse_args()
+
+    from app import app
+
+    while True:
+        with app.app_context():
+            removed = prune_receipts(args.days)
+        print(f"Removed {removed} sync receipts older than {args.days} days")
+        if not args.every:
+            break
+        time.sleep(args.every * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy import event, insert
+from werkzeug.security import generate_password_hash
+
+# Every app created by the suite runs on its own in-memory SQLite database
+os.environ["DATABASE_URL"] = "sqlite://"
+# ...and never touches the persisted campus face index
+os.environ["ANN_INDEX_PATH"] = os.path.join(tempfile.mkdtemp(prefix="ann-"), "campus_ivf.npz")
+# Presence is flushed explicitly by the tests, not by a background thread
+os.environ["PRESENCE_FLUSH_THREAD"] = "0"
+# ...and caches follow Change_Log only in the tests that turn it on
+os.environ["CACHE_SYNC_SECONDS"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ann  # noqa: E402
+from ann import reset_campus_index  # noqa: E402
+from app import create_app  # noqa: E402
+from archive import invalidate_spans  # noqa: E402
+from cache_sync import follower as cache_follower  # noqa: E402
+from bitsets import rebuild_all as rebuild_bitsets, store as bitset_store  # noqa: E402
+from dashboard_cache import dashboard_cache  # noqa: E402
+from presence import tracker as presence_tracker  # noqa: E402
+from recognition import invalidate_galleries  # noqa: E402
+from search import reset_search_index  # noqa: E402
+from seats import recount as recount_seats  # noqa: E402
+from timetable import backfill as backfill_timetable, index as timetable_index  # noqa: E402
+from models import (  # noqa: E402
+    db,
+    AttendanceCorrectionRequest,
+    AttendanceSession,
+    Camera,
+    Department,
+    Lecture,
+    Student,
+    StudentAttendance,
+    Teacher,
+    User,
+    UserLecture,
+)
+
+
+SMALL = {"students": 10, "lectures": 4, "sessions": 4}
+MEDIUM = {"students": 300, "lectures": 12, "sessions": 24}
+
+STATUSES = ["Present", "Present", "Present", "Late", "Absent", "Present", "Excused"]
+ADMIN_PASSWORD = "admin-password"
+
+
+def seed_dataset(students: int, lectures: int, sessions: int) -> dict:
+    """Populate the current app's database; returns ids the route tests need.
+
+    Student i takes lecture j when (i + j) is even, and everyone takes
+    lecture 0. Rows go in through Core bulk inserts so the medium dataset
+    seeds in well under a second.
+    """
+
+    db.create_all()
+    db.session.add_all([Department(name="Computer Science", code="CS"), Department(name="Physics", code="PHY")])
+    admin = User(
+        username="admin",
+        password_hash=generate_password_hash(ADMIN_PASSWORD),
+        role="Admin",
+        full_name="Admin",
+        email="admin@example.edu",
+    )
+    teacher_users = [
+        User(username=f"teacher{n}", password_hash="x", role="Teacher", full_name=f"Teacher {n}", email=f"t{n}@example.edu")
+        for n in range(2)
+    ]
+    db.session.add(admin)
+    db.session.add_all(teacher_users)
+    db.session.flush()
+    teachers = [Teacher(user_id=user.user_id, department="Computer Science") for user in teacher_users]
+    db.session.add_all(teachers)
+    db.session.flush()
+
+    lecture_rows = [
+        Lecture(
+            lecture_name=f"Lecture {j}",
+            course_code=f"CS{100 + j}",
+            department="Computer Science" if j % 2 == 0 else "Physics",
+            teacher_id=teachers[j % 2].teacher_id,
+            semester=3,
+            year=2026,
+            room_number=f"R{j}",
+            schedule="Mon 09:00-10:00",
+            # Room for the students the tests enroll on top of the seed
+            capacity=students * 2,
+        )
+        for j in range(lectures)
+    ]
+    db.session.add_all(lecture_rows)
+    db.session.flush()
+    lecture_ids = [lecture.lecture_id for lecture in lecture_rows]
+
+    db.session.add_all(
+        [
+            Camera(
+                camera_name=f"Camera {j}",
+                location=f"Room {j}",
+                stream_url=f"rtsp://camera-{j}",
+                assigned_lecture_id=lecture_id,
+                status="Offline" if j == 0 else "Online",
+            )
+            for j, lecture_id in enumerate(lecture_ids)
+        ]
+    )
+
+    student_ids = db.session.execute(
+        insert(User).returning(User.user_id, sort_by_parameter_order=True),
+        [
+            {
+                "username": f"student{i}",
+                "password_hash": "x",
+                "role": "Student",
+                "full_name": f"Student {i}",
+                "email": f"s{i}@example.edu",
+            }
+            for i in range(students)
+        ],
+    ).scalars().all()
+    db.session.execute(
+        insert(Student),
+        [
+            {"user_id": user_id, "roll_number": f"R{i:05d}", "department": "Computer Science", "face_embeddings": "[]"}
+            for i, user_id in enumerate(student_ids)
+        ],
+    )
+
+    takes = {j: [user_id for i, user_id in enumerate(student_ids) if j == 0 or (i + j) % 2 == 0] for j in range(lectures)}
+    db.session.execute(
+        insert(UserLecture),
+        [
+            {"user_id": user_id, "lecture_id": lecture_ids[j], "is_teacher": False, "enrollment_status": "Active"}
+            for j, users in takes.items()
+            for user_id in users
+        ]
+        + [
+            {"user_id": teacher_users[j % 2].user_id, "lecture_id": lecture_id, "is_teacher": True}
+            for j, lecture_id in enumerate(lecture_ids)
+        ],
+    )
+
+    session_ids = db.session.execute(
+        insert(AttendanceSession).returning(AttendanceSession.session_id, sort_by_parameter_order=True),
+        [
+            {
+                "lecture_id": lecture_ids[j],
+                "session_date": date(2026, 9, 1) + timedelta(days=d),
+                "session_start_time": time(9),
+                "session_end_time": time(10),
+                "status": "Completed",
+            }
+            for j in range(lectures)
+            for d in range(sessions)
+        ],
+    ).scalars().all()
+
+    attendance_ids = db.session.execute(
+        insert(StudentAttendance).returning(StudentAttendance.attendance_id, sort_by_parameter_order=True),
+        [
+            {
+                "session_id": session_ids[j * sessions + d],
+                "user_id": user_id,
+                "status": STATUSES[(i * 3 + d + j) % len(STATUSES)],
+                "verification_method": "Face Recognition",
+                "manual_override": False,
+            }
+            for j, users in takes.items()
+            for d in range(sessions)
+            for i, user_id in enumerate(users)
+        ],
+    ).scalars().all()
+
+    # Scheduled sessions nobody has recorded yet, one per call of the finalize budget
+    open_session_ids = db.session.execute(
+        insert(AttendanceSession).returning(AttendanceSession.session_id, sort_by_parameter_order=True),
+        [
+            {
+                "lecture_id": lecture_ids[0],
+                "session_date": date(2026, 12, 7) + timedelta(days=d),
+                "session_start_time": time(9),
+                "session_end_time": time(10),
+                "status": "Scheduled",
+            }
+            for d in range(6)
+        ],
+    ).scalars().all()
+
+    # A pending correction for every tenth attendance row of the first session
+    first_session_rows = attendance_ids[: len(takes[0])]
+    correction_ids = db.session.execute(
+        insert(AttendanceCorrectionRequest).returning(
+            AttendanceCorrectionRequest.request_id, sort_by_parameter_order=True
+        ),
+        [
+            {"attendance_id": attendance_id, "requesting_user_id": takes[0][n], "reason": "Was there", "status": "Pending"}
+            for n, attendance_id in enumerate(first_session_rows)
+            if n % 10 == 0
+        ],
+    ).scalars().all()
+    db.session.commit()
+
+    return {
+        "admin": admin.user_id,
+        "teacher_user": teacher_users[0].user_id,
+        "lecture": lecture_ids[0],
+        "lecture_name": lecture_rows[0].lecture_name,
+        "student": student_ids[0],
+        "session": session_ids[0],
+        "session_students": takes[0],
+        "corrections": list(correction_ids),
+        "open_sessions": list(open_session_ids),
+    }
+
+
+def build_app(size: dict):
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        ids = seed_dataset(**size)
+        rebuild_bitsets()
+        recount_seats()
+        backfill_timetable()
+    bitset_store.reset()
+    timetable_index.reset()
+    return app, ids
+
+
+def clone_app(template):
+    """A fresh app whose database is a copy of an already seeded one."""
+
+    source, ids = template
+    app = create_app()
+    app.config["TESTING"] = True
+    with source.app_context():
+        source_connection = db.engine.raw_connection()
+    with app.app_context():
+        target_connection = db.engine.raw_connection()
+    # Both are single-connection in-memory databases; SQLite copies page by page
+    source_connection.driver_connection.backup(target_connection.driver_connection)
+    return app, dict(ids, session_students=list(ids["session_students"]), open_sessions=list(ids["open_sessions"]))
+
+
+# Seeded once per run; every test gets its own copy, so no test sees another's writes
+@pytest.fixture(scope="session")
+def small_template():
+    return build_app(SMALL)
+
+
+@pytest.fixture(scope="session")
+def medium_template():
+    return build_app(MEDIUM)
+
+
+@pytest.fixture
+def small_app(small_template):
+    reset_caches()
+    return clone_app(small_template)
+
+
+@pytest.fixture
+def medium_app(medium_template):
+    reset_caches()
+    return clone_app(medium_template)
+
+
+@pytest.fixture(autouse=True)
+def ann_index_path(tmp_path, monkeypatch):
+    """Each test saves and loads the campus index in its own directory."""
+
+    path = str(tmp_path / "campus_ivf.npz")
+    monkeypatch.setattr(ann, "INDEX_PATH", path)
+    return path
+
+
+def reset_caches() -> None:
+    """Drop process-wide caches so a request is measured cold, whichever app ran before."""
+
+    invalidate_spans()
+    invalidate_galleries()
+    reset_search_index()
+    dashboard_cache.clear()
+    bitset_store.reset()
+    timetable_index.reset()
+    reset_campus_index()
+    cache_follower.reset()
+    presence_tracker.reset()
+
+
+@contextmanager
+def count_queries(app):
+    """Collect every SQL statement the app's engine runs inside the block.
+
+    Requests must be issued without an outer app context so each one gets a
+    fresh session and nothing is served from a leftover identity map.
+    """
+
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from admission import CAMERA, MANUAL, AdmissionGate, Rejected, controller
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_manual_requests_jump_the_camera_queue():
+    gate = AdmissionGate("test", concurrency=1, max_queue=4, max_wait=2)
+    gate.acquire(MANUAL)
+    order = []
+
+    def worker(name, priority):
+        with gate.admit(priority):
+            order.append(name)
+
+    threads = [threading.Thread(target=worker, args=("camera", CAMERA))]
+    threads[0].start()
+    wait_for(lambda: len(gate.waiting) == 1)
+    threads.append(threading.Thread(target=worker, args=("teacher", MANUAL)))
+    threads[1].start()
+    wait_for(lambda: len(gate.waiting) == 2)
+
+    gate.release()
+    for thread in threads:
+        thread.join()
+    assert order == ["teacher", "camera"]
+    assert gate.stats()["active"] == 0
+
+
+def test_full_queue_sheds_cameras_first_with_a_retry_hint():
+    gate = AdmissionGate("test", concurrency=1, max_queue=2, max_wait=0.3)
+    gate.acquire(MANUAL)
+    waiter = threading.Thread(target=lambda: pytest.raises(Rejected, gate.acquire, CAMERA))
+    waiter.start()
+    wait_for(lambda: len(gate.waiting) == 1)
+
+    # Cameras get half the queue, which the first one already holds
+    with pytest.raises(Rejected) as shed:
+        gate.acquire(CAMERA)
+    assert shed.value.reason == "queue_full" and shed.value.retry_after >= 1
+    waiter.join()
+
+    # A teacher can still queue, and times out rather than waiting forever
+    with pytest.raises(Rejected) as timed_out:
+        gate.acquire(MANUAL)
+    assert timed_out.value.reason == "timeout"
+    counters = gate.stats()["counters"]
+    assert counters["shed_camera"] == 2 and counters["shed_manual"] == 1 and counters["shed_queue_full"] == 1
+
+
+def test_saturated_route_returns_429(small_app, monkeypatch):
+    app, ids = small_app
+    gate = AdmissionGate("batch", concurrency=1, max_queue=0)
+    monkeypatch.setitem(controller.gates, "batch", gate)
+    client = app.test_client()
+
+    gate.acquire(MANUAL)
+    response = client.post("/api/attendance/batch", json={"records": [{"session_id": 1, "user_id": 1}]})
+    assert response.status_code == 429 and int(response.headers["Retry-After"]) >= 1
+    gate.release()
+
+    assert client.post("/api/attendance/batch", json={"records": []}).status_code == 400
+    assert client.get("/api/admission").get_json()["batch"]["counters"]["shed_manual"] == 1
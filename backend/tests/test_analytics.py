@@ -0,0 +1,58 @@
+from datetime import date
+
+import numpy as np
+
+from analytics import STATUS_CODES, aggregate_timeseries, bucket_days, dense_groups, snapshot_to_arrays
+
+
+def epoch_days(*days):
+    return np.array(days, dtype="datetime64[D]").astype(np.int64)
+
+
+def test_week_buckets_start_on_iso_monday():
+    # Sunday 2026-01-04 closes ISO week 1; Monday 2026-01-05 opens week 2.
+    # 2025-12-29 (Monday) starts the ISO week that contains New Year's Day.
+    days = epoch_days("2025-12-29", "2026-01-01", "2026-01-04", "2026-01-05", "2026-01-11")
+    weeks = bucket_days(days, "week").astype("datetime64[D]").astype(str).tolist()
+    assert weeks == ["2025-12-29", "2025-12-29", "2025-12-29", "2026-01-05", "2026-01-05"]
+    assert (bucket_days(days, "day") == days).all()
+    # Dates before the epoch still floor to their Monday
+    assert bucket_days(epoch_days("1969-12-31"), "week").astype("datetime64[D]").astype(str)[0] == "1969-12-29"
+
+
+def test_timeseries_counts_statuses_per_group_and_period():
+    present, late, absent = STATUS_CODES["present"], STATUS_CODES["late"], STATUS_CODES["absent"]
+    days, lectures, codes = snapshot_to_arrays(
+        [
+            (date(2026, 1, 4), 2, present),
+            (date(2026, 1, 5), 2, present),
+            (date(2026, 1, 6), 2, absent),
+            (date(2026, 1, 5), 10, late),
+            (date(2026, 1, 5), 10, present),
+        ]
+    )
+    labels, group_index = dense_groups(lectures, {2: 2, 10: 10})
+    series = aggregate_timeseries(days, group_index, codes, "week")
+
+    assert labels == [2, 10]
+    assert series["group"] == [0, 0, 1]
+    assert series["period"] == ["2025-12-29", "2026-01-05", "2026-01-05"]
+    assert series["total"] == [1, 2, 2]
+    assert (series["present"], series["absent"], series["late"]) == ([1, 1, 1], [0, 1, 0], [0, 0, 1])
+    assert series["rate"] == [100.0, 50.0, 50.0]
+
+
+def test_dense_groups_sort_ids_numerically_with_unknown_last():
+    lectures = np.array([11, 2, 10, 1, 3, 2], dtype=np.int64)
+    labels, group_index = dense_groups(lectures, {1: 1, 2: 2, 10: 10, 11: 11})
+    assert labels == [1, 2, 10, 11, None]
+    assert [labels[index] for index in group_index] == [11, 2, 10, 1, None, 2]
+
+    departments, _ = dense_groups(lectures, {1: "Physics", 2: "Biology", 10: "Physics"})
+    assert departments == ["Biology", "Physics", None]
+
+
+def test_empty_snapshot_gives_empty_series():
+    days, lectures, codes = snapshot_to_arrays([])
+    series = aggregate_timeseries(days, lectures, codes, "day")
+    assert series["period"] == [] and series["present"] == []
@@ -0,0 +1,105 @@
+import numpy as np
+
+import ann
+from ann import IVFIndex, get_campus_index, index_student
+from conftest import reset_caches
+
+
+def clustered(n_centers=40, per_center=50, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_centers, dim))
+    vectors = np.repeat(centers, per_center, axis=0) + 0.35 * rng.normal(size=(n_centers * per_center, dim))
+    return np.arange(vectors.shape[0], dtype=np.int64), vectors.astype(np.float32), rng
+
+
+def test_probing_a_few_lists_recalls_the_exact_neighbours():
+    ids, vectors, rng = clustered()
+    index = IVFIndex.build(ids, vectors, n_probe=8)
+    queries = vectors[rng.choice(ids.size, 200, replace=False)] + 0.1 * rng.normal(size=(200, vectors.shape[1]))
+
+    approximate, _ = index.search(queries, 10)
+    exact, exact_scores = index.search(queries, 10, exact=True)
+    recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(approximate, exact)])
+    assert recall >= 0.9
+    # exact=True is the brute-force answer
+    brute = ann.normalize_rows(queries.astype(np.float32)) @ ann.normalize_rows(vectors).T
+    assert (exact[:, 0] == np.argmax(brute, axis=1)).all()
+    assert np.allclose(exact_scores[:, 0], brute.max(axis=1), atol=1e-5)
+
+
+def test_add_and_remove_keep_one_hit_per_user():
+    ids, vectors, _ = clustered(n_centers=8, per_center=20)
+    index = IVFIndex.build(ids, vectors)
+    probe = vectors[5:6]
+
+    # A second template for the same user does not produce a duplicate hit
+    index.add(np.array([5]), probe * 1.01)
+    found, _ = index.search(probe, 3, exact=True)
+    assert found[0, 0] == 5 and len(set(found[0])) == 3
+    assert index.remove(5) and 5 not in index and not index.remove(5)
+    found, _ = index.search(probe, 3, exact=True)
+    assert 5 not in found[0]
+
+    # Fewer users than k pads with -1
+    small = IVFIndex.build(np.array([1, 2]), vectors[:2])
+    found, scores = small.search(probe, 4)
+    assert found[0, 2:].tolist() == [-1, -1] and np.isneginf(scores[0, 2:]).all()
+
+
+def test_save_and_load_round_trip(tmp_path):
+    ids, vectors, _ = clustered(n_centers=6, per_center=10)
+    index = IVFIndex.build(ids, vectors, n_lists=5, n_probe=3)
+    index.remove(7)
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+
+    loaded = IVFIndex.load(path)
+    assert (loaded.dim, loaded.n_probe, loaded.n_lists, loaded.trained_size) == (32, 3, 5, ids.size)
+    assert len(loaded) == len(index) == ids.size - 1 and 7 not in loaded
+    queries = vectors[:20]
+    for expected, actual in zip(index.search(queries, 5), loaded.search(queries, 5)):
+        assert np.array_equal(expected, actual)
+
+
+def test_empty_campus_index_is_cached_and_grows_with_enrollments(tmp_path, monkeypatch):
+    path = str(tmp_path / "campus.npz")
+    ann.reset_campus_index()
+    calls = []
+
+    def load_rows(user_ids):
+        calls.append(user_ids)
+        return []
+
+    assert get_campus_index(lambda: [], load_rows, path) is None
+    assert get_campus_index(lambda: [], load_rows, path) is None
+    assert calls == [None]
+
+    # The first enrollment starts the index; growth past 4x the training set re-clusters it
+    monkeypatch.setattr(ann, "SAVE_INTERVAL_SECONDS", 0)
+    ids, vectors, _ = clustered(n_centers=4, per_center=5)
+    for user_id, vector in zip(ids, vectors):
+        index_student(int(user_id), vector.tolist(), path)
+    index = get_campus_index(lambda: [], load_rows, path)
+    assert len(index) == ids.size and index.trained_size > 4 and not index.needs_retrain
+    found, _ = index.search(vectors[3:4], 1, exact=True)
+    assert found[0, 0] == 3
+    assert len(IVFIndex.load(path)) == ids.size
+    ann.reset_campus_index()
+
+
+def test_match_route_validates_top_k_and_parses_exact(small_app):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+
+    def match(**body):
+        return client.post("/api/recognition/match", json={"embeddings": [[1.0, 0.0]], **body})
+
+    for bad in ({"top_k": -3}, {"top_k": 0}, {"top_k": "many"}, {"n_probe": 0}):
+        assert match(**bad).status_code == 400
+    assert match(top_k=10000).status_code == 200
+    # Seeded students have no usable templates: the ANN path answers with no matches,
+    # while the exact scan reports one (unmatched) result per face
+    assert match(exact="false").get_json()["matches"] == []
+    assert match(exact=False).get_json()["matches"] == []
+    assert len(match(exact="true").get_json()["matches"]) == 1
@@ -0,0 +1,104 @@
+from datetime import date, time
+
+import pytest
+
+from archive import archive_table, archive_term, attendance_source, live_table
+from conftest import SMALL, build_app, reset_caches
+from models import (
+    db,
+    AttendanceCorrectionRequest,
+    AttendanceRisk,
+    AttendanceSession,
+    Lecture,
+    StudentAttendance,
+    StudentAttendanceArchive,
+)
+from risk import compute_risk_scores
+
+SPRING = {"from": "2026-03-01", "to": "2026-03-31"}
+FALL = {"from": "2026-09-01", "to": "2026-09-30"}
+NEXT_YEAR = {"from": "2027-01-01", "to": "2027-12-31"}
+SPANNING = {"from": "2026-03-01", "to": "2027-12-31"}
+
+
+def add_term(ids, semester, year, day):
+    lecture = Lecture(lecture_name=f"Term {semester}/{year}", semester=semester, year=year)
+    db.session.add(lecture)
+    db.session.flush()
+    session = AttendanceSession(
+        lecture_id=lecture.lecture_id, session_date=day, session_start_time=time(9), status="Completed"
+    )
+    db.session.add(session)
+    db.session.flush()
+    db.session.add_all(
+        StudentAttendance(session_id=session.session_id, user_id=user_id, status=status)
+        for user_id, status in zip(ids["session_students"], ["Present", "Absent", "Late"])
+    )
+
+
+def risk_snapshot():
+    compute_risk_scores()
+    return sorted(
+        (row.user_id, row.lecture_id, row.total_sessions, row.attended_sessions, row.longest_absence_streak)
+        for row in AttendanceRisk.query
+    )
+
+
+@pytest.fixture(scope="module")
+def archived_app():
+    # Archiving moves whole terms, so this runs on its own database
+    reset_caches()
+    app, ids = build_app(SMALL)
+    client = app.test_client()
+    with app.app_context():
+        add_term(ids, 1, 2026, date(2026, 3, 2))
+        add_term(ids, 1, 2027, date(2027, 2, 1))
+        db.session.commit()
+        before = {"risk": risk_snapshot()}
+    for name, query in (("spring", SPRING), ("fall", FALL), ("next", NEXT_YEAR), ("spanning", SPANNING), ("all", {})):
+        before[name] = client.get("/api/reports/attendance", query_string=query).get_json()
+
+    with app.app_context():
+        live_rows = StudentAttendance.query.count()
+        # force: the seed keeps a few empty sessions open for the finalize budget
+        archived = archive_term(1, 2026).row_count + archive_term(3, 2026, force=True).row_count
+    yield app, ids, before, live_rows, archived
+    reset_caches()
+
+
+def test_closed_terms_move_except_rows_under_correction(archived_app):
+    app, ids, before, live_rows, archived = archived_app
+    with app.app_context():
+        retained = (
+            db.session.query(StudentAttendance.attendance_id)
+            .join(AttendanceSession, AttendanceSession.session_id == StudentAttendance.session_id)
+            .filter(AttendanceSession.session_date < date(2027, 1, 1))
+            .all()
+        )
+        corrected = {row.attendance_id for row in AttendanceCorrectionRequest.query}
+        assert {row.attendance_id for row in retained} == corrected and corrected
+        assert StudentAttendanceArchive.query.count() == archived == live_rows - len(corrected) - 3
+        assert not StudentAttendanceArchive.query.filter(StudentAttendanceArchive.attendance_id.in_(corrected)).count()
+
+
+def test_ranges_route_to_the_tables_that_hold_them(archived_app):
+    app, ids, before, live_rows, archived = archived_app
+    with app.app_context():
+        reset_caches()
+        # Spring has no rows left in the live table; fall kept its corrected rows
+        assert attendance_source(date(2026, 3, 1), date(2026, 3, 31)) is archive_table
+        assert attendance_source(date(2027, 1, 1), date(2027, 12, 31)) is live_table
+        assert attendance_source(date(2026, 9, 1), date(2026, 9, 30)) not in (archive_table, live_table)
+        assert attendance_source() not in (archive_table, live_table)
+
+    client = app.test_client()
+    for name, query in (("spring", SPRING), ("fall", FALL), ("next", NEXT_YEAR), ("spanning", SPANNING), ("all", {})):
+        assert client.get("/api/reports/attendance", query_string=query).get_json() == before[name], name
+
+
+def test_risk_scores_include_archived_terms(archived_app):
+    app, ids, before, live_rows, archived = archived_app
+    with app.app_context():
+        assert risk_snapshot() == before["risk"]
+        db.session.query(AttendanceRisk).delete()
+        db.session.commit()
@@ -0,0 +1,64 @@
+from bitsets import CODES, set_code, store as bitset_store, summarize
+from conftest import reset_caches
+from models import db
+
+
+def test_summarize_counts_rate_streak_and_pattern():
+    bits = 0
+    for ordinal, status in enumerate(["present", "late", "absent", "excused", "absent"]):
+        bits = set_code(bits, ordinal, CODES[status])
+
+    summary = summarize(bits, 5)
+    assert (summary["present"], summary["late"], summary["absent"], summary["excused"]) == (1, 1, 2, 1)
+    assert summary["attendance_rate"] == 50.0  # excused sessions are not counted
+    assert summary["absence_streak"] == 2
+    assert summary["recent_pattern"] == "PLAEA"
+    assert summarize(0, 0)["attendance_rate"] is None
+
+
+def history(client, ids):
+    return {row["user_id"]: row for row in client.get(f"/api/lectures/{ids['lecture']}/attendance-history").get_json()}
+
+
+def test_incremental_writes_match_a_rebuild(small_app):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    student = ids["session_students"][0]
+    history(client, ids)  # load the lecture into memory
+
+    client.post(
+        "/api/attendance/batch",
+        json={"records": [{"session_id": ids["session"], "user_id": student, "status": "Late"}]},
+    )
+    incremental = history(client, ids)
+    by_user = client.get(f"/api/students/{student}/attendance-history?lecture_id={ids['lecture']}").get_json()
+    assert by_user == [incremental[student]]
+
+    with app.app_context():
+        bitset_store.rebuild_lecture(ids["lecture"])
+        db.session.commit()
+    bitset_store.reset()
+    assert history(client, ids) == incremental
+
+
+def test_sessions_not_held_yet_are_not_absences(small_app):
+    app, ids = small_app
+    client = app.test_client()
+    student = ids["session_students"][0]
+    before = history(client, ids)[student]
+
+    def open_session(day):
+        return client.post(
+            "/api/sessions/get-or-create", json={"lecture_name": ids["lecture_name"], "date": day}
+        ).get_json()["session_id"]
+
+    # Created ahead of time, so it gets an ordinal below the one held first
+    open_session("2026-11-10")
+    held = open_session("2026-11-03")
+    client.post("/api/attendance/batch", json={"records": [{"session_id": held, "user_id": student, "status": "Present"}]})
+
+    after = history(client, ids)[student]
+    assert after["sessions"] == before["sessions"] + 1
+    assert (after["present"], after["absent"]) == (before["present"] + 1, before["absent"])
+    assert after["recent_pattern"].endswith("-P")
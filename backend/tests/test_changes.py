@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import insert
+
+import cache_sync
+import changes
+from cache_sync import ChangeFollower
+from conftest import reset_caches
+from models import db, ChangeLog
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    monkeypatch.setattr(changes, "SETTLE_SECONDS", 0)
+
+
+def drain(client, cursor, **params):
+    seen = []
+    while True:
+        page = client.get("/api/changes", query_string={"since": cursor, "limit": 2, **params}).get_json()
+        seen.extend(page["changes"])
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            return seen, cursor
+
+
+def test_writes_append_to_the_feed_in_order(small_app, settled):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    _, cursor = drain(client, 0)
+
+    user = client.post("/api/users", json={"username": "feed-user", "password": "x", "role": "Student"}).get_json()
+    client.post(f"/api/lectures/{ids['lecture']}/enroll", json={"user_id": user["user_id"]})
+    session_id = client.post(
+        "/api/sessions/get-or-create", json={"lecture_name": ids["lecture_name"], "date": "2026-10-05"}
+    ).get_json()["session_id"]
+    client.post(
+        "/api/attendance/batch",
+        json={"records": [{"session_id": session_id, "user_id": user["user_id"], "status": "Late"}]},
+    )
+    client.delete(f"/api/lectures/{ids['lecture']}/students/{user['user_id']}")
+
+    seen, cursor = drain(client, cursor)
+    assert [(change["entity"], change["operation"]) for change in seen] == [
+        ("user", "insert"),
+        ("enrollment", "insert"),
+        ("attendance", "insert"),
+        ("enrollment", "delete"),
+    ]
+    assert seen[2]["key"] == f"{session_id}:{user['user_id']}" and seen[2]["lecture_id"] == ids["lecture"]
+    assert [change["change_id"] for change in seen] == sorted(change["change_id"] for change in seen)
+
+    # Polling from the returned cursor yields nothing new
+    assert client.get("/api/changes", query_string={"since": cursor}).get_json()["changes"] == []
+    only_enrollments, _ = drain(client, 0, entity="enrollment", lecture_id=ids["lecture"])
+    assert {change["entity"] for change in only_enrollments} == {"enrollment"}
+
+
+def test_closing_a_session_logs_absent_rows(small_app, settled):
+    app, ids = small_app
+    client = app.test_client()
+    session_id = client.post(
+        "/api/sessions/get-or-create", json={"lecture_name": ids["lecture_name"], "date": "2026-10-06"}
+    ).get_json()["session_id"]
+    _, cursor = drain(client, 0)
+
+    closed = client.post(f"/api/sessions/{session_id}/end").get_json()
+    seen, _ = drain(client, cursor, entity="attendance")
+    assert len(seen) == closed["absent_marked"] > 0
+    assert {change["session_id"] for change in seen} == {session_id}
+
+
+def test_unsettled_changes_are_held_back(small_app, monkeypatch):
+    monkeypatch.setattr(changes, "SETTLE_SECONDS", 60)
+    app, ids = small_app
+    client = app.test_client()
+    cursor = client.get("/api/changes", query_string={"since": 0, "limit": 1000}).get_json()["next_cursor"]
+    client.post("/api/users", json={"username": "feed-late", "password": "x", "role": "Student"})
+    assert client.get("/api/changes", query_string={"since": cursor}).get_json()["changes"] == []
+    assert client.get("/api/changes", query_string={"entity": "camera"}).status_code == 400
+
+
+def test_follower_waits_for_ids_that_commit_late(small_app, settled, monkeypatch):
+    app, ids = small_app
+    forgotten = []
+    monkeypatch.setattr(cache_sync, "forget_users", lambda user_ids: forgotten.extend(sorted(user_ids)))
+    follower = ChangeFollower(interval=0)
+
+    def commit_delete(change_id, user_id):
+        db.session.execute(
+            insert(ChangeLog).values(
+                change_id=change_id,
+                entity="user",
+                entity_key=str(user_id),
+                operation="delete",
+                user_id=user_id,
+                changed_at=changes.utc_ago(),
+            )
+        )
+        db.session.commit()
+
+    with app.app_context():
+        follower.poll(force=True)
+        top = follower.top
+        # top + 1 is still in flight when top + 2 commits
+        commit_delete(top + 2, 101)
+        assert follower.poll(force=True) == 1
+        assert forgotten == [101] and follower.cursor == top
+
+        commit_delete(top + 1, 102)
+        assert follower.poll(force=True) == 1
+        assert forgotten == [101, 102] and follower.cursor == top + 2
+        assert follower.poll(force=True) == 0
+
+        # An id that never shows up (rolled back) is given up after gap_seconds
+        commit_delete(top + 4, 103)
+        follower.gap_seconds = 0
+        follower.poll(force=True)
+        assert follower.cursor == top + 4 and not follower.gaps
@@ -0,0 +1,52 @@
+import pytest
+
+import changes
+from models import db, AttendanceCorrectionRequest, StudentAttendance
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    monkeypatch.setattr(changes, "SETTLE_SECONDS", 0)
+
+
+def test_bulk_approval_only_touches_requests_it_resolved(small_app, settled):
+    app, ids = small_app
+    client = app.test_client()
+    with app.app_context():
+        rows = (
+            StudentAttendance.query.filter(
+                StudentAttendance.session_id == ids["session"], StudentAttendance.status != "Present"
+            )
+            .order_by(StudentAttendance.attendance_id)
+            .limit(2)
+            .all()
+        )
+        pending_row, rejected_row = [(row.attendance_id, row.user_id, row.status) for row in rows]
+        requests = [
+            AttendanceCorrectionRequest(attendance_id=attendance_id, requesting_user_id=user_id, reason="Was there")
+            for attendance_id, user_id, _ in (pending_row, rejected_row)
+        ]
+        db.session.add_all(requests)
+        db.session.commit()
+        pending_id, rejected_id = (request.request_id for request in requests)
+    cursor = client.get("/api/changes", query_string={"since": 0, "limit": 1000}).get_json()["next_cursor"]
+
+    # Someone else rejects one of them first
+    rejected = client.post(
+        f"/api/attendance/correction/{rejected_id}/resolve", json={"status": "Rejected", "reviewed_by": ids["admin"]}
+    )
+    assert rejected.status_code == 200
+
+    response = client.post(
+        "/api/attendance/correction/resolve",
+        json={"request_ids": [pending_id, rejected_id, 999999], "status": "Approved", "reviewed_by": ids["admin"]},
+    ).get_json()
+    assert response["resolved"] == [pending_id]
+    assert response["skipped"] == sorted([rejected_id, 999999])
+
+    with app.app_context():
+        assert db.session.get(StudentAttendance, pending_row[0]).status == "Present"
+        assert db.session.get(StudentAttendance, rejected_row[0]).status == rejected_row[2]
+        assert db.session.get(AttendanceCorrectionRequest, rejected_id).status == "Rejected"
+    logged = client.get("/api/changes", query_string={"since": cursor, "entity": "attendance"}).get_json()["changes"]
+    assert [change["user_id"] for change in logged] == [pending_row[1]]
@@ -0,0 +1,29 @@
+import counts
+from models import db, Lecture, Student, Teacher, User, UserLecture
+
+
+def test_sqlite_serves_exact_counts_in_one_query(small_app):
+    app, ids = small_app
+    payload = app.test_client().get("/api/stats/overview").get_json()
+    assert payload["accuracy"] == "exact"
+    with app.app_context():
+        assert payload["total_users"] == User.query.count()
+        assert payload["total_students"] == Student.query.count()
+        assert payload["total_teachers"] == Teacher.query.count()
+        assert payload["total_lectures"] == Lecture.query.count()
+        assert payload["total_enrollments"] == UserLecture.query.count()
+
+
+def test_metadata_counts_fall_back_to_exact(small_app, monkeypatch):
+    app, ids = small_app
+    with app.app_context():
+        # Pretend to be SQL Server: the metadata query fails on SQLite and the
+        # provider must still answer, exactly
+        monkeypatch.setattr(db.engine.dialect, "name", "mssql")
+        result = counts.overview_counts()
+        assert result["accuracy"] == "exact" and result["total_users"] == User.query.count()
+
+        monkeypatch.setattr(counts, "metadata_counts", lambda: dict.fromkeys(counts.COUNTED, 7))
+        result = counts.overview_counts()
+        assert result["accuracy"] == "approximate" and result["total_lectures"] == 7
+        assert counts.overview_counts(exact=True)["accuracy"] == "exact"
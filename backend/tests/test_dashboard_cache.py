@@ -0,0 +1,122 @@
+import time
+
+import changes
+from cache_sync import ChangeFollower
+from changes import attendance_rows, log_changes
+from conftest import count_queries, reset_caches
+from dashboard_cache import SnapshotCache, dashboard_cache
+from models import db
+
+
+def test_lru_evicts_oldest_and_ttl_expires():
+    cache = SnapshotCache(max_entries=2, ttl=60)
+    cache.put("a", {"n": 1}, user_id=1, lecture_ids=[10])
+    cache.put("b", {"n": 2}, user_id=2, lecture_ids=[10])
+    assert cache.get("a") == {"n": 1}
+    cache.put("c", {"n": 3}, user_id=3, lecture_ids=[11])
+    assert cache.get("b") is None and cache.get("a") is not None
+
+    cache.ttl = 0.01
+    time.sleep(0.02)
+    assert cache.get("a") is None and len(cache) == 1
+
+
+def test_invalidation_is_scoped_to_users_and_lectures():
+    cache = SnapshotCache()
+    cache.put((1, None, None), {}, user_id=1, lecture_ids=[10, 11])
+    cache.put((1, "2026-01-01", None), {}, user_id=1, lecture_ids=[10, 11])
+    cache.put((2, None, None), {}, user_id=2, lecture_ids=[11])
+    cache.put((3, None, None), {}, user_id=3, lecture_ids=[12])
+
+    cache.invalidate_users([1])
+    assert len(cache) == 2
+    cache.invalidate_lectures([11])
+    assert cache.get((3, None, None)) == {} and len(cache) == 1
+    assert not cache.by_user.get(2) and not cache.by_lecture.get(11)
+
+
+def test_put_started_before_an_invalidation_is_dropped():
+    cache = SnapshotCache(max_entries=4)
+    stamp = cache.stamp()
+    cache.invalidate_users([1])
+    cache.put("a", {}, user_id=1, lecture_ids=[10], stamp=stamp)
+    cache.put("b", {}, user_id=2, lecture_ids=[11], stamp=stamp)
+    assert cache.get("a") is None and cache.get("b") == {}
+
+    stamp = cache.stamp()
+    cache.invalidate_lectures([10])
+    cache.put("c", {}, user_id=3, lecture_ids=[10, 12], stamp=stamp)
+    assert cache.get("c") is None
+
+    # Trimming the marks keeps older stamps out conservatively
+    cache.invalidate_users(range(100, 110))
+    stamp = cache.stamp()
+    cache.invalidate_users([200])
+    cache.put("d", {}, user_id=4, lecture_ids=[], stamp=stamp)
+    assert cache.get("d") is None
+    cache.put("d", {}, user_id=4, lecture_ids=[], stamp=cache.stamp())
+    assert cache.get("d") == {}
+
+
+def dashboard(client, user_id):
+    return client.get(f"/api/students/{user_id}/dashboard").get_json()
+
+
+def test_dashboard_hits_skip_the_database_until_a_write(small_app):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    student, other = ids["session_students"][:2]
+    dashboard(client, student)
+    dashboard(client, other)
+
+    with count_queries(app) as statements:
+        before = dashboard(client, student)
+    assert statements == []
+
+    client.post(
+        "/api/attendance/batch",
+        json={"records": [{"session_id": ids["session"], "user_id": student, "status": "Absent"}]},
+    )
+    assert len(dashboard_cache) == 1  # only the marked student's snapshot was dropped
+    after = dashboard(client, student)
+    marked = [row["status"] for row in after["recent_records"] if row["session_id"] == ids["session"]]
+    assert marked == ["absent"]
+    assert sum(after["attendance"][key] for key in ("present", "absent", "late", "unknown")) == sum(
+        before["attendance"][key] for key in ("present", "absent", "late", "unknown")
+    )
+
+    with count_queries(app) as statements:
+        dashboard(client, other)
+    assert statements == []
+
+
+def test_closing_a_session_drops_its_lecture(small_app):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    for user_id in ids["session_students"][:3]:
+        dashboard(client, user_id)
+
+    session = client.post(
+        "/api/sessions/get-or-create", json={"lecture_name": ids["lecture_name"], "date": "2026-12-01"}
+    ).get_json()
+    client.post(f"/api/sessions/{session['session_id']}/end")
+    assert len(dashboard_cache) == 0
+
+
+def test_attendance_written_elsewhere_drops_the_dashboard(small_app, monkeypatch):
+    app, ids = small_app
+    monkeypatch.setattr(changes, "SETTLE_SECONDS", 0)
+    client = app.test_client()
+    follower = ChangeFollower(interval=0)
+    with app.app_context():
+        follower.poll(force=True)
+    dashboard(client, ids["student"])
+    assert len(dashboard_cache) == 1
+
+    with app.app_context():
+        log_changes("attendance", "update", attendance_rows([(ids["session"], ids["student"])], {ids["session"]: ids["lecture"]}))
+        db.session.commit()
+        follower.poll(force=True)
+    assert len(dashboard_cache) == 0
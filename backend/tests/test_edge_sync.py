@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import reset_caches
+from edge import EdgeNode, LocalRoster, Spool, SyncFailed
+from models import db, StudentAttendance
+
+
+SERVER = "http://central"
+
+
+def new_session(app, ids, day):
+    client = app.test_client()
+    return client.post("/api/sessions/get-or-create", json={"lecture_name": ids["lecture_name"], "date": day}).get_json()[
+        "session_id"
+    ]
+
+
+def attendance(app, session_id):
+    with app.app_context():
+        return {
+            row.user_id: row
+            for row in db.session.query(StudentAttendance.user_id, StudentAttendance.status, StudentAttendance.time_in)
+            .filter(StudentAttendance.session_id == session_id)
+        }
+
+
+def test_sync_endpoint_ignores_replayed_keys(small_app):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    session_id = new_session(app, ids, "2026-09-20")
+    students = ids["session_students"][:3]
+    events = [
+        {
+            "key": f"test:{user_id}",
+            "session_id": session_id,
+            "user_id": user_id,
+            "first_seen": "2026-09-20T09:02:00",
+            "last_seen": "2026-09-20T09:40:00",
+            "confidence": 0.9,
+        }
+        for user_id in students
+    ] + [{"key": "test:bad", "session_id": 0, "user_id": students[0], "first_seen": "2026-09-20T09:00:00"}]
+
+    first = client.post("/api/attendance/sync", json={"events": events}).get_json()
+    assert (first["accepted"], first["duplicates"]) == (3, 0)
+    assert first["rejected"] == [{"key": "test:bad", "reason": "unknown_session"}]
+    rows = attendance(app, session_id)
+    assert {rows[user_id].status for user_id in students} == {"Present"}
+
+    replay = client.post("/api/attendance/sync", json={"events": events}).get_json()
+    assert (replay["accepted"], replay["duplicates"], replay["rows_written"]) == (0, 3, 0)
+    assert len(attendance(app, session_id)) == len(rows)
+
+
+def test_sessions_locked_by_a_person_reject_synced_events(small_app):
+    app, ids = small_app
+    client = app.test_client()
+    session_id = new_session(app, ids, "2026-09-22")
+    client.post(f"/api/sessions/{session_id}/lock", json={"locked_by": ids["teacher_user"]})
+
+    event = {"key": "test:locked", "session_id": session_id, "user_id": ids["student"], "first_seen": "2026-09-22T09:00:00"}
+    result = client.post("/api/attendance/sync", json={"events": [event]}).get_json()
+    assert result["rejected"] == [{"key": "test:locked", "reason": "session_locked"}]
+
+
+def test_edge_node_spools_offline_and_resends_safely(small_app, tmp_path):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    session_id = new_session(app, ids, "2026-09-21")
+    students = ids["session_students"][:4]
+
+    roster = LocalRoster(str(tmp_path / "edge.sqlite3"))
+    roster.replace(
+        {
+            "generated_at": "2026-09-21T08:00:00",
+            "roster": [
+                {"user_id": user_id, "face_embeddings": [1.0 if n == i else 0.0 for n in range(len(students))]}
+                for i, user_id in enumerate(students)
+            ],
+            "sessions": [
+                {
+                    "session_id": session_id,
+                    "session_date": "2026-09-21",
+                    "session_start_time": "09:00:00",
+                    "session_end_time": "17:00:00",
+                }
+            ],
+        }
+    )
+
+    online = True
+
+    def transport(url, payload):
+        if not online:
+            raise SyncFailed("link down")
+        return client.post(url[len(SERVER) :], json=payload).get_json()
+
+    node = EdgeNode(SERVER, 1, roster, Spool(str(tmp_path / "spool")), transport, flush_interval=3600)
+    probes = [[1.0, 0.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]]
+    for minute in (3, 4, 30):
+        result = node.recognize(probes, seen_at=datetime(2026, 9, 21, 9, minute))
+        assert result["session_id"] == session_id
+    assert node.flush() == 2  # one coalesced event per student, not one per frame
+
+    online = False
+    with pytest.raises(SyncFailed):
+        node.sync()
+    assert node.spool.pending() == 2
+
+    online = True
+    assert node.sync()["accepted"] == 2
+    assert node.spool.pending() == 0
+    rows = attendance(app, session_id)
+    assert rows[students[0]].status == "Present" and rows[students[2]].time_in.minute == 3
+
+    # A batch whose response was lost is sent again: recognized, not re-applied
+    node.recognize(probes[:1], seen_at=datetime(2026, 9, 21, 9, 45))
+    node.flush()
+    node.spool.seal()
+    segment = node.spool.segments()[0]
+    spooled = Spool.read(segment)
+    client.post("/api/attendance/sync", json={"events": spooled})
+    assert node.sync()["duplicates"] == 1
@@ -0,0 +1,95 @@
+import base64
+import io
+import json
+
+import numpy as np
+import pytest
+
+import quality
+from embedding import MAX_IMAGES, EnrollmentTracker, enrollments, extract_face
+from models import db, FaceDataset, Student
+
+
+def capture(seed, size=128):
+    rng = np.random.default_rng(seed)
+    image = rng.uniform(40, 220, size=(size, size)).astype(np.float32)
+    buffer = io.BytesIO()
+    np.save(buffer, image)
+    return buffer.getvalue()
+
+
+def data_url(data):
+    return "data:application/octet-stream;base64," + base64.b64encode(data).decode()
+
+
+@pytest.fixture
+def face_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(quality, "FACE_IMAGE_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def test_stub_model_is_deterministic_and_rejects_non_faces():
+    first, again = extract_face(capture(1)), extract_face(capture(1))
+    assert first["vector"] == again["vector"] and len(first["vector"]) == 128
+    assert abs(np.linalg.norm(first["vector"]) - 1.0) < 1e-4
+    assert first["vector"] != extract_face(capture(2))["vector"]
+
+    blank = io.BytesIO()
+    np.save(blank, np.full((128, 128), 90.0))
+    assert extract_face(blank.getvalue()) == {"error": "no_face"}
+    assert extract_face(b"not an image") == {"error": "unreadable_image"}
+
+
+def test_create_student_enrolls_images_off_the_request_thread(small_app, face_root):
+    app, ids = small_app
+    client = app.test_client()
+    user = client.post("/api/users", json={"username": "enrollee", "password": "x", "role": "Student"}).get_json()
+
+    images = [data_url(capture(seed)) for seed in (10, 11, 12)] + [data_url(b"junk")]
+    # Older clients send the captured images as face_embeddings
+    response = client.post(
+        "/api/students",
+        json={"user_id": user["user_id"], "roll_number": "ENR-1", "face_embeddings": json.dumps(images)},
+    )
+    assert response.status_code == 201
+    assert response.get_json()["enrollment"]["status"] == "processing"
+
+    with app.app_context():
+        status = enrollments.wait(user["user_id"])
+        # Kept in Background_Job, so a process that did not run it reports it too
+        assert EnrollmentTracker().get(user["user_id"]) == status
+    assert status["status"] == "completed", status
+    assert status["accepted"] == 3 and status["rejected"] == [{"index": 3, "reason": "unreadable_image"}]
+    assert client.get(f"/api/students/{user['user_id']}/enrollment").get_json()["status"] == "completed"
+
+    with app.app_context():
+        student = Student.query.filter_by(user_id=user["user_id"]).one()
+        templates = json.loads(student.face_embeddings)
+        faces = FaceDataset.query.filter_by(student_id=student.student_id).all()
+    assert len(templates) == 3 and len(templates[0]) == 128
+    assert len(faces) == 3 and all((face_root / face.image_path).exists() for face in faces)
+
+    # Re-enrollment replaces the previous images
+    response = client.post(f"/api/students/{user['user_id']}/faces", json={"images": [data_url(capture(20))]})
+    assert response.status_code == 202
+    with app.app_context():
+        assert enrollments.wait(user["user_id"])["templates"] == 1
+    probe = extract_face(capture(20))["vector"]
+    match = client.post("/api/recognition/match", json={"embeddings": [probe], "exact": True}).get_json()
+    assert match["matches"][0]["user_id"] == user["user_id"]
+
+
+def test_too_many_images_are_rejected_on_create_and_reenroll(small_app, face_root):
+    app, ids = small_app
+    client = app.test_client()
+    user = client.post("/api/users", json={"username": "overfull", "password": "x", "role": "Student"}).get_json()
+    images = [data_url(capture(seed)) for seed in range(MAX_IMAGES + 1)]
+
+    response = client.post("/api/students", json={"user_id": user["user_id"], "roll_number": "ENR-2", "images": images})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == f"At most {MAX_IMAGES} images per enrollment"
+    with app.app_context():
+        assert not Student.query.filter_by(user_id=user["user_id"]).count()
+
+    response = client.post(f"/api/students/{ids['student']}/faces", json={"images": images})
+    assert response.status_code == 400
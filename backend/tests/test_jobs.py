@@ -0,0 +1,224 @@
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import jobs
+from cache_sync import follower as cache_follower
+from conftest import create_app, reset_caches
+from models import db, BackgroundJob
+
+
+def run_jobs(app):
+    with app.app_context():
+        return jobs.run_pending("test-worker")
+
+
+def run_jobs_elsewhere(app, monkeypatch):
+    """Run due jobs as the worker process does: its cache invalidations never reach this process."""
+
+    # The module that registered the handlers (pytest can import app.py under two names)
+    handlers = sys.modules[jobs.HANDLERS["delete_user"].__module__]
+    with monkeypatch.context() as worker:
+        worker.setattr(handlers, "forget_users", lambda user_ids: None)
+        worker.setattr(handlers, "forget_lectures", lambda lecture_ids: None)
+        return run_jobs(app)
+
+
+@pytest.fixture
+def following(monkeypatch):
+    monkeypatch.setattr(cache_follower, "interval", 1e-6)
+
+
+def test_async_delete_returns_202_and_runs_in_the_worker(small_app):
+    app, ids = small_app
+    client = app.test_client()
+    lecture_id = client.post("/api/lectures", json={"lecture_name": "Doomed"}).get_json()["lecture_id"]
+
+    accepted = client.delete(f"/api/lectures/{lecture_id}?async=true")
+    assert accepted.status_code == 202
+    job = accepted.get_json()
+    assert accepted.headers["Location"] == job["status_url"] == f"/api/jobs/{job['job_id']}"
+    assert job["status"] == "queued" and job["kind"] == "delete_lecture"
+    assert client.get(f"/api/lectures/{lecture_id}").status_code == 200
+
+    assert run_jobs(app) >= 1
+    done = client.get(job["status_url"]).get_json()
+    assert (done["status"], done["progress"], done["attempts"]) == ("succeeded", 100, 1)
+    assert done["result"] == {"lecture_id": lecture_id, "deleted": True}
+    assert client.get(f"/api/lectures/{lecture_id}").status_code == 404
+
+
+def test_report_job_matches_the_synchronous_report(small_app):
+    app, ids = small_app
+    client = app.test_client()
+    query = {"lecture_id": ids["lecture"]}
+    accepted = client.get("/api/reports/attendance", query_string=query, headers={"Prefer": "respond-async"})
+    assert accepted.status_code == 202
+
+    run_jobs(app)
+    job = client.get(accepted.get_json()["status_url"]).get_json()
+    assert job["status"] == "succeeded"
+    assert job["result"] == client.get("/api/reports/attendance", query_string=query).get_json()
+
+
+def test_failures_retry_with_backoff_then_fail(small_app, monkeypatch):
+    app, ids = small_app
+    calls = []
+
+    def flaky(payload, job):
+        calls.append(payload)
+        job.progress(1, 2, "half way")
+        if len(calls) < payload["succeed_on"]:
+            raise RuntimeError("transient")
+        return {"calls": len(calls)}
+
+    monkeypatch.setitem(jobs.HANDLERS, "flaky", flaky)
+    with app.app_context():
+        retried = jobs.enqueue("flaky", {"succeed_on": 2}).job_id
+        doomed = jobs.enqueue("flaky", {"succeed_on": 99}, max_attempts=2).job_id
+        db.session.commit()
+
+        assert jobs.run_pending("test-worker") == 2
+        for job_id in (retried, doomed):
+            job = db.session.get(BackgroundJob, job_id)
+            assert (job.status, job.attempts, job.error) == ("queued", 1, "RuntimeError: transient")
+            # Progress written before the failure was rolled back with it
+            assert job.progress == 0
+            due = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=jobs.BACKOFF_SECONDS - 2)
+            assert job.run_after > due
+
+        # Not due yet: nothing runs until the backoff passes
+        assert jobs.run_pending("test-worker") == 0
+        db.session.query(BackgroundJob).filter(BackgroundJob.job_id.in_([retried, doomed])).update(
+            {"run_after": datetime.now(timezone.utc) - timedelta(seconds=1)}, synchronize_session=False
+        )
+        db.session.commit()
+        assert jobs.run_pending("test-worker") == 2
+
+        db.session.expire_all()
+        succeeded, failed = db.session.get(BackgroundJob, retried), db.session.get(BackgroundJob, doomed)
+        assert (succeeded.status, succeeded.attempts, succeeded.to_dict()["result"]) == ("succeeded", 2, {"calls": 3})
+        assert (failed.status, failed.attempts, failed.finished_at is not None) == ("failed", 2, True)
+
+
+def test_expired_lease_is_claimed_again(small_app):
+    app, ids = small_app
+    client = app.test_client()
+    assert client.post("/api/jobs", json={"kind": "nope"}).status_code == 400
+    job_id = client.post("/api/jobs", json={"kind": "recount_seats"}).get_json()["job_id"]
+
+    with app.app_context():
+        # A worker claimed it and died
+        db.session.query(BackgroundJob).filter_by(job_id=job_id).update(
+            {
+                "status": "running",
+                "attempts": 1,
+                "locked_by": "dead-worker",
+                "locked_at": datetime.now(timezone.utc) - timedelta(seconds=jobs.LEASE_SECONDS + 60),
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        assert jobs.run_pending("test-worker") == 1
+
+    job = client.get(f"/api/jobs/{job_id}").get_json()
+    assert (job["status"], job["attempts"]) == ("succeeded", 2)
+    assert job["result"]["lectures"] >= 1
+    listed = client.get("/api/jobs", query_string={"kind": "recount_seats"}).get_json()
+    assert listed[0]["job_id"] == job_id
+
+
+def test_progress_renews_the_lease_and_a_taken_over_job_is_left_alone(small_app, monkeypatch):
+    app, ids = small_app
+    table = BackgroundJob.__table__
+
+    def slow(payload, job):
+        job.progress(1, 2)
+        renewed = db.session.get(BackgroundJob, job.job_id, populate_existing=True).locked_at
+        assert renewed > datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=5)
+        db.session.commit()
+        # Meanwhile the lease expired and another worker claimed the job
+        db.session.execute(table.update().where(table.c.job_id == job.job_id).values(locked_by="other-worker"))
+        db.session.commit()
+        if payload["report"]:
+            job.progress(2, 2)
+        return {"done": True}
+
+    monkeypatch.setitem(jobs.HANDLERS, "slow", slow)
+    with app.app_context():
+        reporting = jobs.enqueue("slow", {"report": True}).job_id
+        silent = jobs.enqueue("slow", {"report": False}).job_id
+        db.session.commit()
+        assert jobs.run(jobs.claim("test-worker")) == "lost"
+        assert jobs.run(jobs.claim("test-worker")) == "lost"
+        db.session.expire_all()
+        for job_id in (reporting, silent):
+            job = db.session.get(BackgroundJob, job_id)
+            assert (job.status, job.locked_by, job.result) == ("running", "other-worker", None)
+
+
+def test_the_presence_flusher_starts_with_the_first_request(monkeypatch):
+    started = []
+    app_module = sys.modules[create_app.__module__]
+    monkeypatch.setattr(app_module, "start_presence_flusher", started.append)
+    monkeypatch.setenv("PRESENCE_FLUSH_THREAD", "1")
+
+    # CLIs create the app for its context only
+    app = create_app()
+    assert started == []
+    app.test_client().get("/api/health")
+    assert started == [app]
+
+
+def test_deletes_in_the_worker_reach_the_api_caches(small_app, following, monkeypatch):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    user_id = client.post(
+        "/api/users", json={"username": "vanishing", "password": "x", "role": "Student", "full_name": "Vanishing Act"}
+    ).get_json()["user_id"]
+    probe = [1.0] + [0.0] * 127
+    created = client.post(
+        "/api/students", json={"user_id": user_id, "roll_number": "GONE-1", "face_embeddings": json.dumps([probe])}
+    )
+    assert created.status_code == 201
+
+    def found():
+        return [hit["id"] for hit in client.get("/api/search", query_string={"q": "vanishing"}).get_json()["results"]]
+
+    def matched(exact):
+        body = {"embeddings": [probe], "exact": exact}
+        return client.post("/api/recognition/match", json=body).get_json()["matches"][0]["user_id"]
+
+    # Warm every cache in this process first
+    assert user_id in found() and matched(False) == user_id and matched(True) == user_id
+
+    assert client.delete(f"/api/users/{user_id}?async=true").status_code == 202
+    assert run_jobs_elsewhere(app, monkeypatch) >= 1
+    assert user_id not in found()
+    assert matched(False) is None and matched(True) is None
+
+
+def test_lecture_deletes_in_the_worker_drop_the_timetable(small_app, following, monkeypatch):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    lecture_id = client.post(
+        "/api/lectures",
+        json={"lecture_name": "Evaporating", "room_number": "E-1", "timetable": [{"day": "Fri", "start": "14:00", "end": "15:00"}]},
+    ).get_json()["lecture_id"]
+    camera_id = client.post(
+        "/api/cameras", json={"camera_name": "E1", "location": "Block E", "room_number": "E-1", "stream_url": "rtsp://e1"}
+    ).get_json()["camera_id"]
+
+    def active():
+        query = {"at": "2026-11-06T14:30:00"}
+        return client.get(f"/api/cameras/{camera_id}/active-session", query_string=query).get_json()["lecture_id"]
+
+    assert active() == lecture_id
+    assert client.delete(f"/api/lectures/{lecture_id}?async=true").status_code == 202
+    assert run_jobs_elsewhere(app, monkeypatch) >= 1
+    assert active() is None
+    assert not client.get("/api/search", query_string={"q": "evaporating"}).get_json()["results"]
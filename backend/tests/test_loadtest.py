@@ -0,0 +1,29 @@
+from conftest import reset_caches
+from loadtest import ClientTarget, EndpointStats, Simulation, build_timetable
+
+
+def test_error_bodies_are_classified():
+    stats = EndpointStats()
+    stats.record(200, {"session_id": 1}, 0.01)
+    stats.record(500, {"error": "(pyodbc.Error) Transaction (Process ID 57) was deadlocked ... (1205)"}, 0.2)
+    stats.record(500, {"error": "Violation of UNIQUE KEY constraint ... duplicate key (2627)"}, 0.1)
+    stats.record(429, {"error": "Server busy, retry in 1s"}, 0.001)
+    summary = stats.summary(1.0)
+    assert (summary["deadlocks"], summary["unique_violations"], summary["shed_429"], summary["errors"]) == (1, 1, 1, 2)
+    assert summary["requests"] == 4 and summary["max_ms"] == 200.0
+
+
+def test_simulated_class_start_hits_every_endpoint(small_app):
+    app, ids = small_app
+    reset_caches()
+    target = ClientTarget(app)
+    slots = build_timetable(target, classes=2, cameras_per_class=2)
+    assert len(slots) == 2 and all(slot.students for slot in slots)
+
+    report = Simulation(target, slots, concurrency=1, window=0, frames=2, dashboards=2).run(["2026-11-02"])
+    endpoints = report["endpoints"]
+    assert endpoints["POST /api/sessions/get-or-create"]["requests"] == 2 * (2 + 1)
+    assert endpoints["POST /api/sessions/<id>/detections"]["requests"] == 2 * 2 * 2
+    assert endpoints["POST /api/attendance/batch"]["requests"] == 2
+    assert all(summary["errors"] == 0 for summary in endpoints.values()), endpoints
+    assert report["split_sessions"] == {}
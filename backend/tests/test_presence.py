@@ -0,0 +1,138 @@
+import time
+from datetime import datetime, time as dt_time
+
+from conftest import reset_caches
+from models import db, AttendanceSession, StudentAttendance
+from presence import PresenceTracker, tracker
+from session_lifecycle import finalize_session
+
+
+def new_session(app, ids, day):
+    client = app.test_client()
+    return client.post("/api/sessions/get-or-create", json={"lecture_name": ids["lecture_name"], "date": day}).get_json()[
+        "session_id"
+    ]
+
+
+def rows(session_id):
+    return {
+        row.user_id: row
+        for row in db.session.query(
+            StudentAttendance.user_id,
+            StudentAttendance.status,
+            StudentAttendance.time_in,
+            StudentAttendance.time_out,
+            StudentAttendance.confidence_score,
+        ).filter(StudentAttendance.session_id == session_id)
+    }
+
+
+def test_hits_coalesce_into_first_and_last_seen(small_app):
+    app, ids = small_app
+    reset_caches()
+    session_id = new_session(app, ids, "2026-10-05")
+    early, late = ids["session_students"][:2]
+    presence = PresenceTracker(flush_interval=3600)
+
+    with app.app_context():
+        session = db.session.get(AttendanceSession, session_id)
+        for user_id, minute, confidence in [(early, 5, 0.6), (early, 2, 0.8), (early, 30, 0.7), (late, 20, 0.9)]:
+            presence.observe(session, user_id, confidence, datetime(2026, 10, 5, 9, minute))
+        # Not due yet; a repeat of an older sighting changes nothing
+        assert presence.flush_if_due(session_id) == 0
+        assert not presence.observe(session, early, 0.5, datetime(2026, 10, 5, 9, 10))
+
+        assert presence.flush(session_id) == 2
+        written = rows(session_id)
+        assert (written[early].status, written[early].time_in, written[early].time_out) == (
+            "Present",
+            dt_time(9, 2),
+            dt_time(9, 30),
+        )
+        assert written[early].confidence_score == 0.8
+        assert (written[late].status, written[late].time_in) == ("Late", dt_time(9, 20))
+
+        # Later sightings only move time_out forward, as one UPDATE per student
+        presence.observe(session, early, 0.1, datetime(2026, 10, 5, 9, 45))
+        assert presence.flush(session_id) == 1
+        assert presence.flush(session_id) == 0
+        written = rows(session_id)
+        assert (written[early].time_in, written[early].time_out, written[early].confidence_score) == (
+            dt_time(9, 2),
+            dt_time(9, 45),
+            0.8,
+        )
+
+
+def test_quiet_sessions_are_flushed_by_the_timer(small_app):
+    app, ids = small_app
+    reset_caches()
+    session_id = new_session(app, ids, "2026-10-13")
+    user_id = ids["session_students"][0]
+    presence = PresenceTracker(flush_interval=60)
+
+    with app.app_context():
+        presence.observe(db.session.get(AttendanceSession, session_id), user_id, 0.9, datetime(2026, 10, 13, 9, 1))
+        assert presence.flush_due() == 0
+        # No further detection arrives; once the interval passes the timer writes the hit
+        presence.sessions[session_id].last_flush = time.monotonic() - 61
+        assert presence.flush_due() == 1
+        assert rows(session_id)[user_id].time_in == dt_time(9, 1)
+
+
+def test_finalize_flushes_pending_hits_before_marking_absent(small_app):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    session_id = new_session(app, ids, "2026-10-07")
+    seen = ids["session_students"][0]
+
+    recorded = client.post(
+        f"/api/sessions/{session_id}/detections",
+        json={"detections": [{"user_id": seen, "confidence": 0.9, "seen_at": "2026-10-07T09:03:00"}]},
+    ).get_json()
+    assert (recorded["recorded"], recorded["flushed"]) == (1, 0)
+    with app.app_context():
+        assert seen not in rows(session_id)
+
+    closed = client.post(f"/api/sessions/{session_id}/end").get_json()
+    assert closed["absent_marked"] == len(ids["session_students"]) - 1
+    with app.app_context():
+        written = rows(session_id)
+        assert (written[seen].status, written[seen].time_in) == ("Present", dt_time(9, 3))
+        assert session_id not in tracker.sessions
+
+
+def test_sessions_closed_elsewhere_drop_their_pending_hits(small_app):
+    app, ids = small_app
+    reset_caches()
+    session_id = new_session(app, ids, "2026-10-08")
+    user_id = ids["session_students"][0]
+    # Stands in for an API process whose tracker finalize never sees
+    presence = PresenceTracker(flush_interval=60)
+
+    with app.app_context():
+        presence.observe(db.session.get(AttendanceSession, session_id), user_id, 0.9, datetime(2026, 10, 8, 9, 1))
+        finalize_session(db.session.get(AttendanceSession, session_id))
+        assert rows(session_id)[user_id].status == "Absent"
+
+        presence.sessions[session_id].last_flush = time.monotonic() - 61
+        assert presence.flush_due() == 0
+        assert rows(session_id)[user_id].status == "Absent"
+        assert session_id not in presence.sessions
+
+
+def test_idle_sessions_are_evicted_once_written(small_app):
+    app, ids = small_app
+    reset_caches()
+    session_id = new_session(app, ids, "2026-10-09")
+    presence = PresenceTracker(flush_interval=60, idle_seconds=600)
+
+    with app.app_context():
+        presence.observe(db.session.get(AttendanceSession, session_id), ids["session_students"][0], 0.9)
+        presence.sessions[session_id].last_observed = time.monotonic() - 601
+        # Still holds an unwritten hit, so it stays until flushed
+        assert presence.evict_idle() == 0
+        presence.flush(session_id)
+        assert presence.evict_idle() == 1
+        assert session_id not in presence.sessions
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+
+import cache_sync
+import changes
+from cache_sync import ChangeFollower
+from models import db, ChangeLog, FaceDataset, Student
+from quality import apply_best_templates, best_templates, score_face
+
+
+def portrait(size=160, seed=7):
+    # Symmetric, textured and mid-grey: what a sharp frontal capture looks like to the scorer
+    half = np.random.default_rng(seed).uniform(60, 200, size=(size, size // 2))
+    return np.hstack([half, half[:, ::-1]]).astype(np.float32)
+
+
+def blur(image, passes=6):
+    for _ in range(passes):
+        image = (image + np.roll(image, 1, 0) + np.roll(image, -1, 0) + np.roll(image, 1, 1) + np.roll(image, -1, 1)) / 5
+    return image
+
+
+def test_each_defect_lowers_the_score():
+    sharp = score_face(portrait())
+    assert sharp["quality"] > score_face(blur(portrait()))["quality"]
+    assert sharp["quality"] > score_face(portrait() * 0.15)["quality"]
+    assert sharp["quality"] > score_face(np.clip(portrait() + 120, 0, 255))["quality"]
+    assert sharp["quality"] > score_face(portrait(48))["quality"]
+    turned = portrait()
+    turned[:, 80:] = np.random.default_rng(1).uniform(60, 200, size=(160, 80))
+    assert sharp["pose"] > score_face(turned)["pose"]
+
+
+def test_best_templates_prefers_scored_images_above_the_floor():
+    assert best_templates([(1, 0.9), (2, None), (3, 0.05), (4, 0.6)], k=3) == [1, 4]
+    assert best_templates([(1, 0.05), (2, None)], k=1) == [1]
+
+
+def test_scoring_route_keeps_the_best_templates(small_app, tmp_path):
+    app, ids = small_app
+    images = {
+        "sharp": portrait(),
+        "blurred": blur(portrait()),
+        "dark": portrait() * 0.15,
+        "small": portrait(48),
+    }
+    with app.app_context():
+        student = Student.query.filter_by(user_id=ids["student"]).one()
+        for n, (name, image) in enumerate(images.items()):
+            path = tmp_path / f"{name}.npy"
+            np.save(path, image)
+            vector = [0.0] * len(images)
+            vector[n] = 1.0
+            db.session.add(FaceDataset(student_id=student.student_id, image_path=str(path), embedding=json.dumps(vector)))
+        db.session.commit()
+
+    payload = app.test_client().post(f"/api/students/{ids['student']}/faces/score", json={"keep": 2}).get_json()
+    assert payload["scored"] == len(images)
+    assert all(face["quality_score"] is not None for face in payload["faces"])
+    assert payload["faces"][0]["image_path"].endswith("sharp.npy")
+
+    with app.app_context():
+        templates = json.loads(Student.query.filter_by(user_id=ids["student"]).one().face_embeddings)
+    assert len(templates) == 2 and templates[0] == [1.0, 0.0, 0.0, 0.0]
+
+
+def test_template_rewrites_reach_other_processes(small_app, monkeypatch):
+    app, ids = small_app
+    monkeypatch.setattr(changes, "SETTLE_SECONDS", 0)
+    dropped, reloaded = [], []
+    monkeypatch.setattr(cache_sync, "invalidate_galleries", lambda: dropped.append(True))
+    monkeypatch.setattr(cache_sync, "reload_templates", lambda user_ids: reloaded.extend(sorted(user_ids)))
+    follower = ChangeFollower(interval=0)
+    with app.app_context():
+        follower.poll(force=True)
+        # What quality.py does in its own process
+        student = Student.query.filter_by(user_id=ids["student"]).one()
+        db.session.add(FaceDataset(student_id=student.student_id, image_path="x.npy", embedding="[0.5, 0.5]"))
+        db.session.flush()
+        assert apply_best_templates([student.student_id]) == {ids["student"]: "[[0.5, 0.5]]"}
+        db.session.commit()
+
+        entry = ChangeLog.query.order_by(ChangeLog.change_id.desc()).first()
+        assert (entry.entity, entry.operation, entry.user_id) == ("enrollment", "update", ids["student"])
+        assert follower.poll(force=True) == 1
+    assert dropped and reloaded == [ids["student"]]
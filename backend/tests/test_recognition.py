@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from recognition import FaceGallery, assign_candidates
+
+
+def test_two_faces_on_the_same_best_student_do_not_share_it():
+    candidate_users = np.array([[10, 11], [10, 12], [10, 11]])
+    scores = np.array([[0.8, 0.3], [0.9, 0.7], [0.85, 0.45]], dtype=np.float32)
+
+    first, second, third = assign_candidates(candidate_users, scores, threshold=0.5)
+    # The strongest claim wins the student; the loser falls back to its next candidate
+    assert (second["user_id"], second["confidence"]) == (10, 0.9)
+    assert first["user_id"] is None and first["candidates"][0] == {"user_id": 10, "score": 0.8}
+    # 11 would be free but its score is under the threshold
+    assert third["user_id"] is None and third["confidence"] is None
+
+
+def test_threshold_cut_and_padding():
+    candidate_users = np.array([[7, -1], [8, 9]])
+    scores = np.array([[0.6, -np.inf], [0.49, 0.2]], dtype=np.float32)
+
+    matched, unmatched = assign_candidates(candidate_users, scores, threshold=0.5)
+    assert (matched["user_id"], matched["candidates"]) == (7, [{"user_id": 7, "score": 0.6}])
+    assert unmatched["user_id"] is None and len(unmatched["candidates"]) == 2
+
+
+def test_gallery_rejects_non_positive_k():
+    gallery = FaceGallery.from_rows([(1, [1.0, 0.0]), (2, [0.0, 1.0]), (3, [0.6, 0.8])])
+    probes = np.array([[1.0, 0.1]], dtype=np.float32)
+
+    for k in (0, -3):
+        with pytest.raises(ValueError):
+            gallery.top_k(probes, k)
+        with pytest.raises(ValueError):
+            gallery.match_batch(probes, k)
+    users, scores = gallery.top_k(probes, 10)
+    assert gallery.user_ids[users[0]].tolist() == [1, 3, 2] and scores.shape == (1, 3)
+    assert gallery.match_batch(probes, 1)[0]["user_id"] == 1
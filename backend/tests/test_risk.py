@@ -0,0 +1,49 @@
+from datetime import date
+
+from models import db, AttendanceRisk
+from risk import _rows_to_arrays, compute_risk_scores, score_chunk, user_ranges
+
+PRESENT, ABSENT = 1, 2
+
+
+def test_user_ranges_keep_whole_users():
+    counts = [(1, 4), (2, 3), (5, 9), (6, 1), (8, 2)]
+    assert list(user_ranges(counts, 8)) == [(1, 2), (5, 5), (6, 8)]
+    assert list(user_ranges([], 8)) == []
+
+
+def test_groups_are_scored_from_runs():
+    rows = [
+        (1, 7, date(2026, 9, 1), PRESENT),
+        (1, 7, date(2026, 9, 2), ABSENT),
+        (1, 7, date(2026, 9, 3), ABSENT),
+        (1, 7, date(2026, 9, 4), ABSENT),
+        (1, 7, date(2026, 9, 5), ABSENT),
+        (2, 7, date(2026, 9, 1), PRESENT),
+    ]
+    student, other = score_chunk(*_rows_to_arrays(rows))
+    assert (student["user_id"], student["total_sessions"], student["attended_sessions"]) == (1, 5, 1)
+    assert (student["current_absence_streak"], student["longest_absence_streak"]) == (4, 4)
+    assert (student["attendance_rate"], student["recent_rate"]) == (20.0, 20.0)
+    assert student["is_at_risk"] and student["last_session_date"] == date(2026, 9, 5)
+    assert (other["user_id"], other["attendance_rate"], other["is_at_risk"]) == (2, 100.0, False)
+
+
+def test_chunk_size_does_not_change_scores(small_app):
+    app, ids = small_app
+
+    def snapshot():
+        return sorted(
+            (row.user_id, row.lecture_id, row.total_sessions, row.attended_sessions, row.current_absence_streak,
+             row.longest_absence_streak, row.recent_rate)
+            for row in AttendanceRisk.query
+        )
+
+    with app.app_context():
+        whole = compute_risk_scores(chunk_size=100000)
+        expected = snapshot()
+        # Chunks far smaller than a group force carries across many chunks
+        assert compute_risk_scores(chunk_size=2) == whole
+        assert snapshot() == expected and whole > 0
+        db.session.query(AttendanceRisk).delete()
+        db.session.commit()
@@ -0,0 +1,223 @@
+"""Statement-count and latency budgets for the API routes.
+
+Each route runs against a small and a medium dataset. The number of SQL
+statements must stay within the route's budget on both, and must not grow
+with the data: a lazy relationship walked inside a loop (``to_dict()`` on
+lists, per-record lookups in a batch) shows up here as a failure instead of
+as a slow page in production.
+"""
+
+import os
+import time
+
+import pytest
+
+from conftest import ADMIN_PASSWORD, count_queries, reset_caches
+
+
+# Budgets are wall-clock milliseconds on the medium dataset; slow CI runners
+# can scale them with ROUTE_LATENCY_SCALE=2 and so on.
+LATENCY_SCALE = float(os.getenv("ROUTE_LATENCY_SCALE", "1"))
+
+
+def batch_records(ids):
+    statuses = ["Present", "Absent", "Late"]
+    return {
+        "verified_by": ids["teacher_user"],
+        "records": [
+            {"session_id": ids["session"], "user_id": user_id, "status": statuses[n % 3]}
+            for n, user_id in enumerate(ids["session_students"])
+        ],
+    }
+
+
+def finalize_path(ids):
+    # Closing locks the session, so every call takes a fresh one
+    return f"/api/sessions/{ids['open_sessions'].pop()}/end"
+
+
+# (name, method, path, JSON body, max statements, latency budget in ms)
+ROUTES = [
+    ("health", "GET", lambda ids: "/api/health", None, 1, 50),
+    ("login", "POST", lambda ids: "/api/login", lambda ids: {"username": "admin", "password": ADMIN_PASSWORD}, 5, 500),
+    ("users", "GET", lambda ids: "/api/users", None, 1, 300),
+    ("users_by_role", "GET", lambda ids: "/api/users?role=student", None, 1, 300),
+    ("users_columnar", "GET", lambda ids: "/api/users?format=columnar", None, 1, 100),
+    ("students", "GET", lambda ids: "/api/students", None, 1, 300),
+    ("students_columnar", "GET", lambda ids: "/api/students?format=columnar", None, 1, 100),
+    ("teachers", "GET", lambda ids: "/api/teachers", None, 1, 50),
+    ("search", "GET", lambda ids: "/api/search?q=stud", None, 2, 100),
+    ("search_roll_number", "GET", lambda ids: "/api/search?q=0001&type=user", None, 2, 100),
+    ("departments", "GET", lambda ids: "/api/departments", None, 1, 50),
+    ("lectures", "GET", lambda ids: "/api/lectures", None, 1, 50),
+    ("lecture", "GET", lambda ids: f"/api/lectures/{ids['lecture']}", None, 2, 100),
+    ("lecture_students", "GET", lambda ids: f"/api/lectures/{ids['lecture']}/students", None, 3, 300),
+    ("lecture_waitlist", "GET", lambda ids: f"/api/lectures/{ids['lecture']}/waitlist", None, 2, 100),
+    ("lecture_timetable", "GET", lambda ids: f"/api/lectures/{ids['lecture']}/timetable", None, 2, 50),
+    ("lecture_summary", "GET", lambda ids: "/api/lectures/summary", None, 3, 300),
+    (
+        "lecture_attendance_summary",
+        "GET",
+        lambda ids: f"/api/lectures/{ids['lecture']}/attendance-summary",
+        None,
+        6,
+        300,
+    ),
+    ("enrollments", "GET", lambda ids: "/api/enrollments", None, 3, 500),
+    ("enrollments_columnar", "GET", lambda ids: "/api/enrollments?format=columnar", None, 1, 200),
+    ("cameras", "GET", lambda ids: "/api/cameras", None, 1, 50),
+    ("camera_edge_snapshot", "GET", lambda ids: "/api/cameras/1/edge-snapshot", None, 3, 200),
+    # Cold: camera, the two index-building reads, then the day's session
+    ("camera_active_session", "GET", lambda ids: "/api/cameras/1/active-session?at=2026-11-02T09:30:00", None, 4, 200),
+    ("notifications", "GET", lambda ids: "/api/notifications", None, 3, 100),
+    ("overview_stats", "GET", lambda ids: "/api/stats/overview", None, 1, 200),
+    ("teacher_stats", "GET", lambda ids: f"/api/stats/teacher/{ids['teacher_user']}", None, 3, 200),
+    ("teacher_students", "GET", lambda ids: f"/api/teachers/{ids['teacher_user']}/students", None, 3, 500),
+    (
+        "teacher_students_breakdown",
+        "GET",
+        lambda ids: f"/api/teachers/{ids['teacher_user']}/students?breakdown=lecture",
+        None,
+        3,
+        500,
+    ),
+    (
+        "teacher_workspace",
+        "GET",
+        lambda ids: f"/api/teachers/{ids['teacher_user']}/workspace?date=2026-09-01",
+        None,
+        5,
+        500,
+    ),
+    ("student_dashboard", "GET", lambda ids: f"/api/students/{ids['student']}/dashboard", None, 5, 200),
+    (
+        "student_attendance_history",
+        "GET",
+        lambda ids: f"/api/students/{ids['student']}/attendance-history",
+        None,
+        2,
+        50,
+    ),
+    (
+        "lecture_attendance_history",
+        "GET",
+        lambda ids: f"/api/lectures/{ids['lecture']}/attendance-history",
+        None,
+        2,
+        100,
+    ),
+    ("reports", "GET", lambda ids: "/api/reports/attendance", None, 4, 500),
+    (
+        "reports_by_teacher",
+        "GET",
+        lambda ids: f"/api/reports/attendance?teacher_user_id={ids['teacher_user']}",
+        None,
+        5,
+        500,
+    ),
+    ("timeseries", "GET", lambda ids: "/api/analytics/timeseries?interval=week", None, 3, 1000),
+    (
+        "timeseries_by_department",
+        "GET",
+        lambda ids: "/api/analytics/timeseries?group_by=department",
+        None,
+        3,
+        1000,
+    ),
+    ("corrections", "GET", lambda ids: "/api/attendance/correction", None, 1, 200),
+    ("admission", "GET", lambda ids: "/api/admission", None, 0, 50),
+    ("jobs", "GET", lambda ids: "/api/jobs?limit=50", None, 1, 50),
+    ("changes", "GET", lambda ids: "/api/changes?since=0&limit=500", None, 1, 200),
+    (
+        "get_or_create_session",
+        "POST",
+        lambda ids: "/api/sessions/get-or-create",
+        lambda ids: {"lecture_name": ids["lecture_name"], "date": "2026-09-01"},
+        3,
+        300,
+    ),
+    ("batch_attendance", "POST", lambda ids: "/api/attendance/batch", batch_records, 8, 1000),
+    # Session, INSERT ... SELECT absents, bitset refresh (4), change log, lock, reload
+    ("finalize_session", "POST", finalize_path, None, 10, 500),
+]
+
+
+def call(app, ids, method, path, body):
+    client = app.test_client()
+    kwargs = {"json": body(ids)} if body else {}
+    return client.open(path(ids), method=method, **kwargs)
+
+
+@pytest.mark.parametrize(
+    "name, method, path, body, max_statements, budget_ms", ROUTES, ids=[route[0] for route in ROUTES]
+)
+def test_statement_count_is_bounded(small_app, medium_app, name, method, path, body, max_statements, budget_ms):
+    counts = []
+    for app, ids in (small_app, medium_app):
+        reset_caches()
+        with count_queries(app) as statements:
+            response = call(app, ids, method, path, body)
+        assert response.status_code < 400, response.get_json()
+        counts.append(len(statements))
+
+    assert counts[1] <= max_statements, f"{name} ran {counts[1]} statements (budget {max_statements})"
+    assert counts[0] == counts[1], f"{name} statement count grows with data: {counts[0]} -> {counts[1]}"
+
+
+@pytest.mark.parametrize(
+    "name, method, path, body, max_statements, budget_ms", ROUTES, ids=[route[0] for route in ROUTES]
+)
+def test_latency_within_budget(medium_app, name, method, path, body, max_statements, budget_ms):
+    app, ids = medium_app
+    call(app, ids, method, path, body)  # warm compiled statement caches
+
+    timings = []
+    for _ in range(3):
+        reset_caches()  # time the cold path, not a cached snapshot
+        started = time.perf_counter()
+        response = call(app, ids, method, path, body)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code < 400, response.get_json()
+
+    budget = budget_ms * LATENCY_SCALE
+    assert min(timings) <= budget, f"{name} took {min(timings):.0f} ms (budget {budget:.0f} ms)"
+
+
+@pytest.mark.parametrize("path", ["/api/users", "/api/students", "/api/enrollments"])
+def test_columnar_matches_default_format(small_app, path):
+    app, ids = small_app
+    client = app.test_client()
+    records = client.get(path).get_json()
+    table = client.get(f"{path}?format=columnar").get_json()
+
+    assert len(table["rows"]) == len(records)
+    for row, record in zip(table["rows"], records):
+        for column, value in zip(table["columns"], row):
+            if column in record:
+                assert value == record[column], column
+
+
+def test_enrollments_payload_is_complete(medium_app):
+    app, ids = medium_app
+    payload = call(app, ids, "GET", lambda ids: "/api/enrollments", None).get_json()
+    teacher_rows = [row for row in payload if row["is_teacher"]]
+    assert teacher_rows and all(row["user"]["teacher_id"] for row in teacher_rows)
+    assert all(row["lecture"]["teacher"]["user"]["username"] for row in payload)
+
+
+def test_teacher_workspace_matches_the_individual_routes(small_app):
+    app, ids = small_app
+    teacher = ids["teacher_user"]
+    workspace = call(app, ids, "GET", lambda ids: f"/api/teachers/{teacher}/workspace?date=2026-09-01", None).get_json()
+
+    stats = call(app, ids, "GET", lambda ids: f"/api/stats/teacher/{teacher}", None).get_json()
+    assert workspace["stats"] == stats
+    assert workspace["roster"] == call(app, ids, "GET", lambda ids: f"/api/teachers/{teacher}/students", None).get_json()
+    corrections = call(app, ids, "GET", lambda ids: f"/api/attendance/correction?teacher_id={teacher}", None).get_json()
+    assert workspace["pending_corrections"] == corrections
+
+    lecture_ids = {lecture["lecture_id"] for lecture in workspace["lectures"]}
+    assert ids["lecture"] in lecture_ids and len(lecture_ids) == stats["classes"]
+    sessions = workspace["today"]["sessions"]
+    assert {session["lecture_id"] for session in sessions} == lecture_ids
+    assert all(session["marked"] > 0 for session in sessions)
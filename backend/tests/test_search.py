@@ -0,0 +1,98 @@
+import changes
+import search
+from cache_sync import ChangeFollower
+from changes import log_change
+from conftest import reset_caches
+from models import db, Lecture, User
+from search import SearchIndex, lecture_document, user_document
+
+
+class Row:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def make_index():
+    index = SearchIndex()
+    index.add(user_document(Row(user_id=1, full_name="Ada Lovelace", username="ada", email="ada@example.edu", role="Student"), "CS2024001"))
+    index.add(user_document(Row(user_id=2, full_name="Adam Smith", username="asmith", email="adam@example.edu", role="Teacher")))
+    index.add(user_document(Row(user_id=3, full_name="Grace Hopper", username="ghopper", email="grace@example.edu", role="Student"), "CS2024002"))
+    index.add(lecture_document(Row(lecture_id=7, lecture_name="Data Structures", course_code="CS201")))
+    return index
+
+
+def test_exact_token_ranks_above_prefix():
+    results = make_index().search("ada")
+    assert [(row["type"], row["id"]) for row in results] == [("user", 1), ("user", 2)]
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_every_term_must_match():
+    index = make_index()
+    assert [row["id"] for row in index.search("gr hop")] == [3]
+    assert index.search("grace smith") == []
+
+
+def test_substring_matches_roll_numbers_and_course_codes():
+    index = make_index()
+    assert {row["id"] for row in index.search("2024", doc_type="user")} == {1, 3}
+    assert [row["id"] for row in index.search("201")] == [7]
+
+
+def test_type_filter_applies_before_the_candidate_cap(monkeypatch):
+    monkeypatch.setattr(search, "MAX_CANDIDATES", 2)
+    index = make_index()
+    index.add(lecture_document(Row(lecture_id=8, lecture_name="Adaptive Systems", course_code="CS310")))
+    assert [row["id"] for row in index.search("ada", doc_type="lecture")] == [8]
+
+
+def test_add_and_remove_are_incremental():
+    index = make_index()
+    index.remove("user", 1)
+    assert [row["id"] for row in index.search("ada")] == [2]
+    index.add(lecture_document(Row(lecture_id=7, lecture_name="Algorithms", course_code="CS201")))
+    assert index.search("data") == []
+    assert [row["label"] for row in index.search("algo")] == ["Algorithms"]
+    assert len(index) == 3
+
+
+def test_search_route_follows_writes(small_app):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    assert client.get("/api/search?q=student").get_json()["results"]
+
+    created = client.post(
+        "/api/users", json={"username": "zed", "password": "pw", "role": "Student", "full_name": "Zed Quill"}
+    ).get_json()
+    assert [row["id"] for row in client.get("/api/search?q=quill").get_json()["results"]] == [created["user_id"]]
+
+    client.delete(f"/api/users/{created['user_id']}")
+    assert client.get("/api/search?q=quill").get_json()["results"] == []
+
+
+def test_follower_indexes_writes_from_other_processes(small_app, monkeypatch):
+    app, ids = small_app
+    monkeypatch.setattr(changes, "SETTLE_SECONDS", 0)
+    client = app.test_client()
+    follower = ChangeFollower(interval=0)
+    with app.app_context():
+        follower.poll(force=True)
+    assert client.get("/api/search?q=student").get_json()["results"]
+
+    # Another process renames a user and a lecture; only Change_Log tells us
+    with app.app_context():
+        user = db.session.get(User, ids["student"])
+        user.full_name = "Yara Quimby"
+        log_change("user", "update", user.user_id, user_id=user.user_id)
+        lecture = db.session.get(Lecture, ids["lecture"])
+        lecture.lecture_name = "Quimby Seminar"
+        log_change("lecture", "update", lecture.lecture_id, lecture_id=lecture.lecture_id)
+        db.session.commit()
+        follower.poll(force=True)
+
+    results = client.get("/api/search?q=quimby").get_json()["results"]
+    assert {(row["type"], row["id"]) for row in results} == {
+        ("user", ids["student"]),
+        ("lecture", ids["lecture"]),
+    }
@@ -0,0 +1,62 @@
+from models import db, Lecture
+from seats import claim_seat, recount
+
+
+def new_students(client, prefix, count):
+    return [
+        client.post("/api/users", json={"username": f"{prefix}{n}", "password": "x", "role": "Student"}).get_json()[
+            "user_id"
+        ]
+        for n in range(count)
+    ]
+
+
+def test_full_lecture_waitlists_and_promotes_in_order(small_app):
+    app, ids = small_app
+    client = app.test_client()
+    lecture_id = client.post("/api/lectures", json={"lecture_name": "Seminar", "capacity": 2}).get_json()["lecture_id"]
+    first, second, third, fourth = new_students(client, "seat", 4)
+
+    assert client.post(f"/api/lectures/{lecture_id}/enroll", json={"user_id": first}).status_code == 201
+    assert client.post(f"/api/lectures/{lecture_id}/enroll", json={"user_id": second}).status_code == 201
+    full = client.post(f"/api/lectures/{lecture_id}/enroll", json={"user_id": third})
+    assert full.status_code == 409 and full.get_json()["error"] == "Lecture is full"
+
+    queued = [
+        client.post(f"/api/lectures/{lecture_id}/enroll", json={"user_id": user_id, "waitlist": True})
+        for user_id in (third, fourth)
+    ]
+    assert [response.status_code for response in queued] == [202, 202]
+    assert [response.get_json()["position"] for response in queued] == [1, 2]
+    again = client.post(f"/api/lectures/{lecture_id}/enroll", json={"user_id": third, "waitlist": True})
+    assert again.status_code == 409
+
+    removed = client.delete(f"/api/lectures/{lecture_id}/students/{first}").get_json()
+    assert removed["promoted"] == [third]
+    waitlist = client.get(f"/api/lectures/{lecture_id}/waitlist").get_json()
+    assert waitlist["enrolled_count"] == 2 and [entry["user_id"] for entry in waitlist["waitlist"]] == [fourth]
+
+    # Deleting an enrolled user frees the seat for the next in line
+    client.delete(f"/api/users/{second}")
+    assert client.get(f"/api/lectures/{lecture_id}/waitlist").get_json()["waitlist"] == []
+    roster = {row["user_id"] for row in client.get("/api/enrollments").get_json() if row["lecture_id"] == lecture_id}
+    assert roster == {third, fourth}
+
+    with app.app_context():
+        before = db.session.get(Lecture, lecture_id).enrolled_count
+        recount([lecture_id])
+        assert db.session.get(Lecture, lecture_id).enrolled_count == before == 2
+
+
+def test_seat_claims_never_exceed_capacity(small_app):
+    app, ids = small_app
+    client = app.test_client()
+    lecture_id = client.post("/api/lectures", json={"lecture_name": "Lab", "capacity": 3}).get_json()["lecture_id"]
+    teacher = client.post(f"/api/lectures/{lecture_id}/enroll", json={"user_id": ids["teacher_user"], "is_teacher": True})
+    assert teacher.status_code == 201
+
+    with app.app_context():
+        claims = [claim_seat(lecture_id) for _ in range(5)]
+        db.session.commit()
+        assert claims == [True, True, True, False, False]
+        assert db.session.get(Lecture, lecture_id).enrolled_count == 3
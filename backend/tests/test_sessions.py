@@ -0,0 +1,101 @@
+from datetime import date, datetime, time
+
+import pytest
+
+import changes
+from conftest import reset_caches
+from models import db, AttendanceSession, StudentAttendance
+from session_lifecycle import ABSENT_NOTE, advance_sessions, finalize_session
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    monkeypatch.setattr(changes, "SETTLE_SECONDS", 0)
+
+
+def add_session(app, ids, day, status="Scheduled"):
+    with app.app_context():
+        session = AttendanceSession(
+            lecture_id=ids["lecture"],
+            session_date=day,
+            session_start_time=time(9),
+            session_end_time=time(10),
+            status=status,
+        )
+        db.session.add(session)
+        db.session.commit()
+        return session.session_id
+
+
+def test_finalize_marks_no_shows_absent_once(small_app, settled):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    session_id = add_session(app, ids, date(2026, 10, 12), "In Progress")
+    present = ids["session_students"][0]
+    with app.app_context():
+        db.session.add(StudentAttendance(session_id=session_id, user_id=present, status="Present", manual_override=True))
+        db.session.commit()
+    cursor = client.get("/api/changes", query_string={"since": 0, "limit": 100000}).get_json()["next_cursor"]
+
+    closed = client.post(f"/api/sessions/{session_id}/end", json={"locked_by": ids["teacher_user"]}).get_json()
+    absentees = sorted(ids["session_students"][1:])
+    assert closed["absent_marked"] == len(absentees)
+    assert (closed["session"]["status"], closed["session"]["attendance_locked"]) == ("Completed", True)
+
+    with app.app_context():
+        rows = StudentAttendance.query.filter_by(session_id=session_id).all()
+        assert sorted(row.user_id for row in rows if row.status == "Absent" and row.notes == ABSENT_NOTE) == absentees
+        assert [row.status for row in rows if row.user_id == present] == ["Present"]
+
+        # Closing again adds nothing and keeps the original lock
+        session = db.session.get(AttendanceSession, session_id)
+        locked_at = session.locked_at
+        assert finalize_session(session, locked_by=ids["admin"]) == 0
+        assert StudentAttendance.query.filter_by(session_id=session_id).count() == len(rows)
+        assert (session.locked_by, session.locked_at) == (ids["teacher_user"], locked_at)
+
+    logged = client.get("/api/changes", query_string={"since": cursor, "entity": "attendance"}).get_json()["changes"]
+    assert sorted(change["user_id"] for change in logged) == absentees
+
+
+def test_locked_sessions_reject_writes(small_app):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    session_id = add_session(app, ids, date(2026, 10, 13), "In Progress")
+    assert client.post(f"/api/sessions/{session_id}/lock").status_code == 200
+    student = ids["session_students"][0]
+
+    assert client.post(f"/api/sessions/{session_id}/end").status_code == 409
+    batch = client.post(
+        "/api/attendance/batch", json={"records": [{"session_id": session_id, "user_id": student, "status": "Present"}]}
+    )
+    assert batch.status_code == 409
+    detections = client.post(
+        f"/api/sessions/{session_id}/detections", json={"detections": [{"user_id": student, "confidence": 0.9}]}
+    )
+    assert detections.status_code == 409
+    assert client.post("/api/recognition/match", json={"embeddings": [], "session_id": session_id}).status_code == 409
+    assert client.post("/api/sessions/999999/end").status_code == 404
+    with app.app_context():
+        assert StudentAttendance.query.filter_by(session_id=session_id, user_id=student).one().status == "Absent"
+
+
+def test_advance_moves_sessions_along_their_timetable(small_app):
+    app, ids = small_app
+    reset_caches()
+    # Dated before every other session in the suite, so only these two are due
+    finished = add_session(app, ids, date(2026, 7, 20))
+    running = add_session(app, ids, date(2026, 8, 3))
+
+    with app.app_context():
+        result = advance_sessions(datetime(2026, 8, 3, 9, 30))
+        assert result == {"started": 2, "completed": 1, "absent_rows": len(ids["session_students"])}
+        first, second = db.session.get(AttendanceSession, finished), db.session.get(AttendanceSession, running)
+        assert (first.status, first.attendance_locked) == ("Completed", True)
+        assert (second.status, bool(second.attendance_locked)) == ("In Progress", False)
+
+        # At the end of the second one it closes; nothing else is due
+        assert advance_sessions(datetime(2026, 8, 3, 10, 0))["completed"] == 1
+        assert advance_sessions(datetime(2026, 8, 3, 10, 5)) == {"started": 0, "completed": 0, "absent_rows": 0}
@@ -0,0 +1,125 @@
+from datetime import datetime, time
+
+from conftest import reset_caches
+from models import db, AttendanceSession, Camera
+from timetable import Intervals, Slot, format_schedule, index, parse_schedule, session_for_slot
+
+MONDAY = "2026-11-02"
+
+
+def test_free_text_schedules_parse_into_slots():
+    assert parse_schedule("Monday, Wednesday 9-10:30am @ R12") == [
+        Slot(0, time(9), time(10, 30), "R12"),
+        Slot(2, time(9), time(10, 30), "R12"),
+    ]
+    assert parse_schedule("Tue 9-10, Thu 11-1pm room B2", "A1") == [
+        Slot(1, time(9), time(10), "A1"),
+        Slot(3, time(11), time(13), "B2"),
+    ]
+    assert [slot.day for slot in parse_schedule("Mon-Fri 14:00-15:00")] == [0, 1, 2, 3, 4]
+    # Days without times (the old UI format) have nothing to index
+    assert parse_schedule("Monday, Wednesday") == []
+
+    slots = parse_schedule("Fri 08:00-09:00; Mon 13:00-14:00", "R1")
+    assert parse_schedule(format_schedule(slots)) == slots
+
+
+def test_overlapping_slots_resolve_to_the_latest_start():
+    first = {"slot_id": 1}
+    second = {"slot_id": 2}
+    intervals = Intervals([(540, 660, 10, first), (600, 720, 20, second)])
+    assert intervals.find(539) is None
+    assert intervals.find(570) == (10, first)
+    assert intervals.find(630) == (20, second)
+    assert intervals.find(719) == (20, second)
+    assert intervals.find(720) is None
+
+
+def test_camera_frames_resolve_to_the_scheduled_session(small_app):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    created = client.post(
+        "/api/lectures",
+        json={
+            "lecture_name": "Timetabled",
+            "room_number": "B-12",
+            "timetable": [{"day": "Mon", "start": "10:00", "end": "11:30"}, {"day": 2, "start": "10:00", "end": "11:30"}],
+        },
+    )
+    assert created.status_code == 201
+    lecture = created.get_json()
+    assert lecture["schedule"] == "Mon 10:00-11:30 @ B-12; Wed 10:00-11:30 @ B-12"
+    assert [slot["day"] for slot in lecture["timetable"]] == ["Mon", "Wed"]
+    camera_id = client.post(
+        "/api/cameras",
+        json={"camera_name": "B12 front", "location": "Block B", "room_number": "Room B12", "stream_url": "rtsp://b12"},
+    ).get_json()["camera_id"]
+
+    def active(at):
+        return client.get(f"/api/cameras/{camera_id}/active-session", query_string={"at": at}).get_json()
+
+    assert active(f"{MONDAY}T10:15:00")["lecture_id"] == lecture["lecture_id"]
+    assert active(f"{MONDAY}T10:15:00")["session"] is None
+    assert active(f"{MONDAY}T11:30:00")["lecture_id"] is None
+
+    session_id = client.post(
+        "/api/sessions/get-or-create", json={"lecture_name": "Timetabled", "date": MONDAY}
+    ).get_json()["session_id"]
+    assert active(f"{MONDAY}T11:00:00")["session"]["session_id"] == session_id
+    matched = client.post(
+        "/api/recognition/match", json={"embeddings": [], "camera_id": camera_id, "captured_at": f"{MONDAY}T10:05:00"}
+    ).get_json()
+    assert (matched["lecture_id"], matched["session_id"]) == (lecture["lecture_id"], session_id)
+
+    # Edits rebuild the index
+    moved = client.put(f"/api/lectures/{lecture['lecture_id']}/timetable", json={"schedule": "Tue 10:00-11:30"})
+    assert moved.get_json()["timetable"][0]["room"] == "B-12"
+    assert active(f"{MONDAY}T10:15:00")["lecture_id"] is None
+    assert active("2026-11-03T10:15:00")["lecture_id"] == lecture["lecture_id"]
+    client.patch(f"/api/cameras/{camera_id}", json={"room_number": "C3"})
+    assert active("2026-11-03T10:15:00")["lecture_id"] is None
+
+    bad = client.put(f"/api/lectures/{lecture['lecture_id']}/timetable", json={"timetable": [{"day": "Funday"}]})
+    assert bad.status_code == 400
+
+
+def test_camera_without_a_scheduled_room_uses_its_lecture(small_app):
+    app, ids = small_app
+    reset_caches()
+    with app.app_context():
+        camera_id = Camera.query.filter_by(assigned_lecture_id=ids["lecture"]).first().camera_id
+        assert index.lookup(camera_id, datetime(2026, 11, 2, 9, 30))[0] == ids["lecture"]
+        assert index.lookup(camera_id, datetime(2026, 11, 3, 9, 30)) is None
+        builds = index.builds
+        index.lookup(camera_id, datetime(2026, 11, 2, 9, 45))
+        assert index.builds == builds
+
+
+def test_a_scheduled_room_does_not_fall_back_to_the_assigned_lecture(small_app):
+    app, ids = small_app
+    reset_caches()
+    client = app.test_client()
+    client.post(
+        "/api/lectures",
+        json={"lecture_name": "Afternoons", "room_number": "D4", "timetable": [{"day": "Mon", "start": "14:00", "end": "15:00"}]},
+    )
+    with app.app_context():
+        camera = Camera.query.filter_by(assigned_lecture_id=ids["lecture"]).first()
+        camera.room_number = "D4"
+        db.session.commit()
+        index.invalidate()
+        # D4 is free at 9:30, so the camera's lecture in another room is not guessed
+        assert index.lookup(camera.camera_id, datetime(2026, 11, 2, 9, 30)) is None
+        assert index.lookup(camera.camera_id, datetime(2026, 11, 2, 14, 30)) is not None
+
+
+def test_sessions_are_matched_to_the_slot_time():
+    morning = AttendanceSession(session_id=1, session_start_time=time(9), session_end_time=time(10))
+    afternoon = AttendanceSession(session_id=2, session_start_time=time(14), session_end_time=time(15))
+    untimed = AttendanceSession(session_id=3)
+    sessions = [morning, afternoon, untimed]
+    assert session_for_slot(sessions, {"start": "14:00", "end": "15:00"}) is afternoon
+    assert session_for_slot(sessions, {"start": "09:00", "end": "10:30"}) is morning
+    assert session_for_slot(sessions, {"start": "11:00", "end": "12:00"}) is untimed
+    assert session_for_slot([morning], {"start": "11:00", "end": "12:00"}) is None
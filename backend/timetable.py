@@ -0,0 +1,414 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, time as dtime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+
+# Allow running as a script from the backend directory (like migrate_db.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models import WEEKDAYS as DAY_NAMES, db, AttendanceSession, Camera, Lecture, LectureSlot
+
+
+DAYS = {
+    "mon": 0, "monday": 0,
+    "tue": 1, "tues": 1, "tuesday": 1,
+    "wed": 2, "weds": 2, "wednesday": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3,
+    "fri": 4, "friday": 4,
+    "sat": 5, "saturday": 5,
+    "sun": 6, "sunday": 6,
+}
+# The index is rebuilt after local edits; this bounds staleness for edits
+# made by other processes
+TTL_SECONDS = float(os.getenv("TIMETABLE_TTL_SECONDS", "300"))
+
+_DAY = r"[A-Za-z]+"
+_CLOCK = r"(\d{1,2})(?:[:.](\d{2}))?\s*([ap]\.?m\.?)?"
+TOKENS = re.compile(
+    rf"(?P<days>(?P<first>{_DAY})\s*(?:-|–|to)\s*(?P<last>{_DAY}))"
+    rf"|(?P<time>{_CLOCK}\s*(?:-|–|to)\s*{_CLOCK})"
+    r"|(?:@|\b(?:room|rm)\b\.?)\s*(?P<room>[A-Za-z0-9][\w.\-/]*)"
+    rf"|(?P<day>{_DAY})",
+    re.IGNORECASE,
+)
+
+
+class Slot(NamedTuple):
+    day: int  # 0 = Monday, as datetime.weekday()
+    start: dtime
+    end: dtime
+    room: Optional[str]
+
+
+def ordered(slots: Iterable[Slot]) -> List[Slot]:
+    return sorted(set(slots), key=lambda slot: (slot.day, slot.start, slot.end, slot.room or ""))
+
+
+def _clock(hour: str, minute: Optional[str], meridiem: Optional[str]) -> Optional[int]:
+    """Minutes after midnight, or None for an impossible clock reading."""
+
+    hours, minutes = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hours <= 12:
+            return None
+        hours = hours % 12 + (12 if meridiem[0].lower() == "p" else 0)
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+def _time_range(groups: Tuple) -> Optional[Tuple[dtime, dtime]]:
+    start_h, start_m, start_ap, end_h, end_m, end_ap = groups
+    end = _clock(end_h, end_m, end_ap)
+    start = _clock(start_h, start_m, start_ap or end_ap)
+    if start_ap is None and end_ap and (start is None or end is None or start >= end):
+        # "11-1pm": the start sits on the other side of noon
+        start = _clock(start_h, start_m, "pm" if end_ap[0].lower() == "a" else "am")
+    if start is None or end is None or start >= end:
+        return None
+    return dtime(start // 60, start % 60), dtime(end // 60, end % 60)
+
+
+def parse_day(value) -> Optional[int]:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if 0 <= value <= 6 else None
+    if isinstance(value, str):
+        return DAYS.get(value.strip().lower())
+    return None
+
+
+def parse_time(value) -> Optional[dtime]:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value.strip(), "%H:%M").time()
+    except ValueError:
+        return None
+
+
+def slots_from_payload(items, default_room: Optional[str] = None) -> Tuple[List[Slot], Optional[str]]:
+    """Validate ``[{day, start, end, room?}]`` entries; returns (slots, error)."""
+
+    if not isinstance(items, list):
+        return [], "timetable must be a list of {day, start, end, room} entries"
+    slots = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            return [], f"timetable[{position}] must be an object"
+        day = parse_day(item.get("day", item.get("day_of_week")))
+        start, end = parse_time(item.get("start")), parse_time(item.get("end"))
+        if day is None:
+            return [], f"timetable[{position}].day must be a weekday name or 0-6 (0 = Monday)"
+        if start is None or end is None:
+            return [], f"timetable[{position}] start and end must be HH:MM"
+        if start >= end:
+            return [], f"timetable[{position}] must end after it starts"
+        room = item.get("room") or item.get("room_number") or default_room
+        slots.append(Slot(day, start, end, str(room).strip() if room else None))
+    return ordered(slots), None
+
+
+def parse_schedule(text: Optional[str], default_room: Optional[str] = None) -> List[Slot]:
+    """Best-effort slots from a free-text ``Lecture.schedule``.
+
+    Understands "Mon 09:00-10:30", "Monday, Wednesday 9-10:30am @ R12",
+    "Mon-Fri 14:00-15:00" and "Tue 9-10, Thu 11-12 room B2", plus a JSON
+    list in the PUT /timetable format. Days are collected until a time range
+    follows them; a room applies to the group it appears in. Days that never
+    get a time ("Monday, Wednesday") produce no slots.
+    """
+
+    if not text or not text.strip():
+        return []
+    if text.lstrip()[:1] in "[{":
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict):
+            payload = payload.get("timetable") or payload.get("slots")
+        if isinstance(payload, list):
+            slots, error = slots_from_payload(payload, default_room)
+            return [] if error else slots
+
+    groups: List[Dict] = []
+    current = None
+    for match in TOKENS.finditer(text):
+        if match.group("time"):
+            times = _time_range(match.groups()[4:10])
+            if current is not None and times:
+                current["times"].append(times)
+            continue
+        if match.group("room"):
+            if current is not None:
+                current["room"] = match.group("room")
+            continue
+        if match.group("days"):
+            first, last = parse_day(match.group("first")), parse_day(match.group("last"))
+            if first is None or last is None:
+                continue
+            days = [day % 7 for day in range(first, first + (last - first) % 7 + 1)]
+        else:
+            day = parse_day(match.group("day"))
+            if day is None:
+                continue
+            days = [day]
+        if current is None or current["times"]:
+            current = {"days": [], "times": [], "room": None}
+            groups.append(current)
+        current["days"].extend(days)
+
+    slots = {
+        Slot(day, start, end, group["room"] or default_room)
+        for group in groups
+        for day in group["days"]
+        for start, end in group["times"]
+    }
+    return ordered(slots)
+
+
+def format_schedule(slots: Iterable[Slot]) -> str:
+    """Human-readable schedule text that parse_schedule reads back."""
+
+    return "; ".join(
+        f"{DAY_NAMES[slot.day]} {slot.start:%H:%M}-{slot.end:%H:%M}" + (f" @ {slot.room}" if slot.room else "")
+        for slot in ordered(slots)
+    )
+
+
+def replace_slots(lecture_id: int, slots: Iterable[Slot]) -> None:
+    """Swap a lecture's timetable rows in the caller's transaction."""
+
+    table = LectureSlot.__table__
+    db.session.execute(delete(table).where(table.c.lecture_id == lecture_id))
+    rows = [
+        {"lecture_id": lecture_id, "day_of_week": slot.day, "start_time": slot.start, "end_time": slot.end, "room_number": slot.room}
+        for slot in slots
+    ]
+    if rows:
+        db.session.execute(insert(table), rows)
+
+
+def room_key(room: Optional[str]) -> Optional[str]:
+    """Normalize "Room 101", "room-101" and "101" to the same key."""
+
+    if not room:
+        return None
+    key = re.sub(r"[^a-z0-9]", "", room.lower())
+    if key.startswith("room") and len(key) > 4:
+        key = key[4:]
+    return key or None
+
+
+class Intervals:
+    """One weekday's slots for a room or lecture, as disjoint sorted segments.
+
+    Overlapping slots are cut at every boundary and each piece keeps the
+    slot that started last, so a lookup is a single bisect over starts.
+    """
+
+    def __init__(self, entries: List[Tuple[int, int, int, dict]]):
+        bounds = sorted({minute for start, end, _, _ in entries for minute in (start, end)})
+        self.starts: List[int] = []
+        self.segments: List[Tuple[int, int, dict]] = []
+        for low, high in zip(bounds, bounds[1:]):
+            covering = [entry for entry in entries if entry[0] <= low and high <= entry[1]]
+            if not covering:
+                continue
+            _, _, lecture_id, slot = max(covering, key=lambda entry: (entry[0], entry[3]["slot_id"]))
+            if self.segments and self.segments[-1][2] is slot and self.segments[-1][0] == low:
+                # Same slot on both sides of a boundary: extend instead of splitting
+                self.segments[-1] = (high, lecture_id, slot)
+                continue
+            self.starts.append(low)
+            self.segments.append((high, lecture_id, slot))
+
+    def find(self, minute: int) -> Optional[Tuple[int, dict]]:
+        position = bisect_right(self.starts, minute) - 1
+        if position < 0:
+            return None
+        end, lecture_id, slot = self.segments[position]
+        return (lecture_id, slot) if minute < end else None
+
+
+class TimetableIndex:
+    """In-memory interval index of the timetable, by room and by lecture.
+
+    Answers "which lecture is on in this camera's room right now" without a
+    query. A camera's room is its room_number (falling back to location);
+    a camera with no scheduled room falls back to the slots of its assigned
+    lecture. The index is built lazily from two queries and dropped by
+    invalidate() after lecture, timetable or camera edits commit.
+    """
+
+    def __init__(self, ttl: float = TTL_SECONDS):
+        self.ttl = ttl
+        self.rooms: Dict[str, Dict[int, Intervals]] = {}
+        self.lectures: Dict[int, Dict[int, Intervals]] = {}
+        self.cameras: Dict[int, Tuple[Optional[str], Optional[int]]] = {}
+        self.built_at: Optional[float] = None
+        self.builds = 0
+        self.lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.built_at = None
+
+    def _ensure(self) -> None:
+        with self.lock:
+            if self.built_at is not None and time.monotonic() - self.built_at <= self.ttl:
+                return
+        by_room: Dict[str, Dict[int, list]] = {}
+        by_lecture: Dict[int, Dict[int, list]] = {}
+        slot_rows = db.session.execute(
+            select(LectureSlot, Lecture.room_number.label("lecture_room"))
+            .join(Lecture, Lecture.lecture_id == LectureSlot.lecture_id)
+            .where(Lecture.is_active.isnot(False))
+        ).all()
+        for slot, lecture_room in slot_rows:
+            entry = (
+                slot.start_time.hour * 60 + slot.start_time.minute,
+                slot.end_time.hour * 60 + slot.end_time.minute,
+                slot.lecture_id,
+                slot.to_dict(),
+            )
+            room = room_key(slot.room_number or lecture_room)
+            if room:
+                by_room.setdefault(room, {}).setdefault(slot.day_of_week, []).append(entry)
+            by_lecture.setdefault(slot.lecture_id, {}).setdefault(slot.day_of_week, []).append(entry)
+        cameras = {
+            row.camera_id: (room_key(row.room_number or row.location), row.assigned_lecture_id)
+            for row in db.session.execute(
+                select(Camera.camera_id, Camera.room_number, Camera.location, Camera.assigned_lecture_id)
+            )
+        }
+
+        def build(groups):
+            return {owner: {day: Intervals(entries) for day, entries in days.items()} for owner, days in groups.items()}
+
+        rooms, lectures = build(by_room), build(by_lecture)
+        with self.lock:
+            self.rooms, self.lectures, self.cameras = rooms, lectures, cameras
+            self.built_at = time.monotonic()
+            self.builds += 1
+
+    def lookup(self, camera_id: int, when: datetime) -> Optional[Tuple[int, dict]]:
+        """(lecture_id, slot) scheduled in front of the camera at ``when``."""
+
+        self._ensure()
+        with self.lock:
+            camera = self.cameras.get(camera_id)
+            rooms, lectures = self.rooms, self.lectures
+        if camera is None:
+            return None
+        room, assigned_lecture_id = camera
+        day, minute = when.weekday(), when.hour * 60 + when.minute
+        if room in rooms:
+            # A scheduled room is authoritative, even when nothing is on right now
+            intervals = rooms[room].get(day)
+        elif assigned_lecture_id in lectures:
+            intervals = lectures[assigned_lecture_id].get(day)
+        else:
+            return None
+        return intervals.find(minute) if intervals else None
+
+    def reset(self) -> None:
+        with self.lock:
+            self.rooms, self.lectures, self.cameras = {}, {}, {}
+            self.built_at = None
+
+
+index = TimetableIndex()
+
+
+def resolve_session(camera_id: int, when: datetime) -> Tuple[Optional[int], Optional[dict], Optional[AttendanceSession]]:
+    """(lecture_id, slot, session) for a camera frame taken at ``when``.
+
+    ``when`` is local wall-clock time, like session_start_time. The lecture
+    comes from the in-memory index; the session is the lecture's session on
+    that date that covers the slot (see session_for_slot), found with one
+    indexed query. Either can be None.
+    """
+
+    found = index.lookup(camera_id, when)
+    if not found:
+        return None, None, None
+    lecture_id, slot = found
+    sessions = (
+        AttendanceSession.query.filter_by(lecture_id=lecture_id, session_date=when.date())
+        .order_by(AttendanceSession.session_id.asc())
+        .all()
+    )
+    return lecture_id, slot, session_for_slot(sessions, slot)
+
+
+def session_for_slot(sessions: Iterable[AttendanceSession], slot: dict) -> Optional[AttendanceSession]:
+    """The session whose times overlap the slot, starting closest to it.
+
+    A lecture meeting twice a day has one session per slot. A session
+    without a start time only matches when none has times that fit.
+    """
+
+    start, end = (_minutes(dtime.fromisoformat(slot[key])) for key in ("start", "end"))
+    best, best_gap, untimed = None, None, None
+    for session in sessions:
+        if session.session_start_time is None:
+            untimed = untimed or session
+            continue
+        session_start = _minutes(session.session_start_time)
+        session_end = _minutes(session.session_end_time) if session.session_end_time else session_start + 1
+        if session_start >= end or session_end <= start:
+            continue
+        gap = abs(session_start - start)
+        if best_gap is None or gap < best_gap:
+            best, best_gap = session, gap
+    return best or untimed
+
+
+def _minutes(value: dtime) -> int:
+    return value.hour * 60 + value.minute
+
+
+def backfill(overwrite: bool = False) -> Tuple[int, int]:
+    """Parse Lecture.schedule into Lecture_Timetable rows; returns (lectures, slots)."""
+
+    has_slots = set(db.session.execute(select(LectureSlot.lecture_id).distinct()).scalars())
+    lectures = slots = 0
+    for lecture_id, schedule, room in db.session.execute(
+        select(Lecture.lecture_id, Lecture.schedule, Lecture.room_number)
+    ).all():
+        if lecture_id in has_slots and not overwrite:
+            continue
+        parsed = parse_schedule(schedule, room)
+        if not parsed:
+            continue
+        replace_slots(lecture_id, parsed)
+        lectures += 1
+        slots += len(parsed)
+    db.session.commit()
+    index.invalidate()
+    return lectures, slots
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build Lecture_Timetable rows from free-text Lecture.schedule values.")
+    parser.add_argument("--overwrite", action="store_true", help="Re-parse lectures that already have slots.")
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        lectures, slots = backfill(args.overwrite)
+        print(f"Parsed {slots} slots for {lectures} lectures")
+
+
+if __name__ == "__main__":
+    main()
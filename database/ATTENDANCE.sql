@@ -68,6 +68,7 @@ CREATE TABLE Lecture (
     schedule NVARCHAR(MAX) NULL, -- JSON data for schedule
     room_number VARCHAR(50) NULL,
     capacity INT NULL,
+    enrolled_count INT NOT NULL DEFAULT 0, -- student enrollments, maintained by the backend
     credits INT NULL,
     created_at DATETIME DEFAULT GETDATE(),
     
@@ -101,11 +102,44 @@ CREATE INDEX idx_userlecture_status ON User_Lecture(enrollment_status);
 
 GO
 
+CREATE TABLE Lecture_Waitlist (
+    lecture_id INT NOT NULL,
+    user_id INT NOT NULL,
+    requested_at DATETIME NOT NULL DEFAULT GETDATE(),
+
+    PRIMARY KEY (lecture_id, user_id),
+    CONSTRAINT FK_Waitlist_Lecture FOREIGN KEY (lecture_id) REFERENCES Lecture(lecture_id) ON DELETE CASCADE,
+    CONSTRAINT FK_Waitlist_User FOREIGN KEY (user_id) REFERENCES [User](user_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_waitlist_order ON Lecture_Waitlist(lecture_id, requested_at);
+
+GO
+
+-- Structured weekly timetable; Lecture.schedule stays as display text
+CREATE TABLE Lecture_Timetable (
+    slot_id INT IDENTITY(1,1) PRIMARY KEY,
+    lecture_id INT NOT NULL,
+    day_of_week TINYINT NOT NULL CHECK (day_of_week BETWEEN 0 AND 6), -- 0 = Monday
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    room_number VARCHAR(50) NULL,
+
+    CONSTRAINT FK_Timetable_Lecture FOREIGN KEY (lecture_id) REFERENCES Lecture(lecture_id) ON DELETE CASCADE,
+    CONSTRAINT CK_Timetable_Times CHECK (start_time < end_time)
+);
+
+CREATE INDEX idx_timetable_lecture ON Lecture_Timetable(lecture_id);
+CREATE INDEX idx_timetable_room ON Lecture_Timetable(room_number, day_of_week, start_time);
+
+GO
+
 CREATE TABLE Camera (
     camera_id INT IDENTITY(1,1) PRIMARY KEY,
     camera_name VARCHAR(100) NOT NULL,
     location VARCHAR(150) NOT NULL,
     stream_url VARCHAR(255) NOT NULL,
+    room_number VARCHAR(50) NULL,
     assigned_lecture_id INT NULL,
     status VARCHAR(20) DEFAULT 'Online' CHECK (status IN ('Online', 'Offline', 'Error', 'Maintenance')),
     last_checked DATETIME NULL,
@@ -177,6 +211,133 @@ CREATE INDEX idx_attendance_session_user ON Student_Attendance(session_id, user_
 
 GO
 
+CREATE TABLE Student_Attendance_Archive (
+    attendance_id BIGINT PRIMARY KEY,
+    session_id BIGINT NOT NULL,
+    user_id INT NOT NULL,
+    time_in TIME NULL,
+    time_out TIME NULL,
+    status VARCHAR(20) NULL,
+    verification_method VARCHAR(30) NULL,
+    verified_by INT NULL,
+    confidence_score FLOAT NULL,
+    manual_override BIT NULL,
+    edited_by INT NULL,
+    edited_at DATETIME NULL,
+    created_at DATETIME NULL,
+    notes NVARCHAR(MAX) NULL
+);
+
+CREATE INDEX idx_attendance_archive_session ON Student_Attendance_Archive(session_id);
+CREATE INDEX idx_attendance_archive_user ON Student_Attendance_Archive(user_id);
+
+GO
+
+CREATE TABLE Archived_Term (
+    semester INT NOT NULL,
+    year INT NOT NULL,
+    first_session_date DATE NULL,
+    last_session_date DATE NULL,
+    row_count INT DEFAULT 0,
+    retained_count INT DEFAULT 0,
+    archived_at DATETIME DEFAULT GETDATE(),
+
+    PRIMARY KEY (semester, year)
+);
+
+GO
+
+CREATE TABLE Attendance_Risk (
+    user_id INT NOT NULL,
+    lecture_id INT NOT NULL,
+    total_sessions INT DEFAULT 0,
+    attended_sessions INT DEFAULT 0,
+    attendance_rate FLOAT NULL,
+    recent_rate FLOAT NULL,
+    current_absence_streak INT DEFAULT 0,
+    longest_absence_streak INT DEFAULT 0,
+    is_at_risk BIT DEFAULT 0,
+    last_session_date DATE NULL,
+    computed_at DATETIME DEFAULT GETDATE(),
+
+    PRIMARY KEY (user_id, lecture_id),
+    CONSTRAINT FK_AttendanceRisk_User FOREIGN KEY (user_id) REFERENCES [User](user_id) ON DELETE CASCADE,
+    CONSTRAINT FK_AttendanceRisk_Lecture FOREIGN KEY (lecture_id) REFERENCES Lecture(lecture_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_risk_lecture ON Attendance_Risk(lecture_id);
+CREATE INDEX idx_risk_flag ON Attendance_Risk(is_at_risk);
+
+GO
+
+CREATE TABLE Attendance_Bitset (
+    user_id INT NOT NULL,
+    lecture_id INT NOT NULL,
+    codes VARBINARY(MAX) NOT NULL,
+    length INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT GETDATE(),
+
+    PRIMARY KEY (user_id, lecture_id),
+    CONSTRAINT FK_AttendanceBitset_User FOREIGN KEY (user_id) REFERENCES [User](user_id) ON DELETE CASCADE,
+    CONSTRAINT FK_AttendanceBitset_Lecture FOREIGN KEY (lecture_id) REFERENCES Lecture(lecture_id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_bitset_lecture ON Attendance_Bitset(lecture_id);
+
+GO
+
+CREATE TABLE Change_Log (
+    change_id BIGINT IDENTITY(1,1) PRIMARY KEY,
+    entity VARCHAR(20) NOT NULL,
+    entity_key VARCHAR(50) NOT NULL,
+    operation VARCHAR(10) NOT NULL,
+    user_id INT NULL,
+    lecture_id INT NULL,
+    session_id INT NULL,
+    changed_at DATETIME NOT NULL DEFAULT GETDATE()
+);
+
+GO
+
+CREATE TABLE Background_Job (
+    job_id BIGINT IDENTITY(1,1) PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    payload NVARCHAR(MAX) NULL,
+    user_id INT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    progress FLOAT NOT NULL DEFAULT 0,
+    progress_message NVARCHAR(255) NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    run_after DATETIME NOT NULL DEFAULT GETUTCDATE(),
+    locked_by VARCHAR(100) NULL,
+    locked_at DATETIME NULL,
+    result NVARCHAR(MAX) NULL,
+    error NVARCHAR(MAX) NULL,
+    created_at DATETIME DEFAULT GETUTCDATE(),
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL
+);
+
+CREATE INDEX idx_job_queue ON Background_Job(status, run_after);
+CREATE INDEX idx_job_user ON Background_Job(user_id, kind);
+
+GO
+
+CREATE TABLE Attendance_Sync_Receipt (
+    idempotency_key VARCHAR(64) PRIMARY KEY,
+    camera_id INT NULL,
+    session_id INT NOT NULL,
+    user_id INT NOT NULL,
+    received_at DATETIME DEFAULT GETDATE(),
+
+    CONSTRAINT FK_SyncReceipt_Camera FOREIGN KEY (camera_id) REFERENCES Camera(camera_id) ON DELETE SET NULL
+);
+
+CREATE INDEX idx_sync_receipt_received ON Attendance_Sync_Receipt(received_at);
+
+GO
+
 CREATE TABLE Face_dataset (
     image_id INT IDENTITY(1,1) PRIMARY KEY,
     student_id INT NOT NULL,
@@ -184,6 +345,7 @@ CREATE TABLE Face_dataset (
     capture_device VARCHAR(100) NULL,
     capture_date DATETIME DEFAULT GETDATE(),
     quality_score FLOAT NULL,
+    embedding NVARCHAR(MAX) NULL,
     
     CONSTRAINT FK_FaceDataset_Student FOREIGN KEY (student_id) REFERENCES Student(student_id) ON DELETE CASCADE
 );
@@ -33,15 +33,17 @@ echo 1. Run ALL Tests
 echo 2. Student Form Tests
 echo 3. Course Form Tests
 echo 4. Enrollment Form Tests
-echo 5. Back to Main Menu
+echo 5. Backend Route Budget Tests
+echo 6. Back to Main Menu
 echo ==========================================
-set /p tchoice=Enter selection (1-5): 
+set /p tchoice=Enter selection (1-6): 
 
 if "%tchoice%"=="1" set "TEST_CMD=npm test" & goto launch_test
 if "%tchoice%"=="2" set "TEST_CMD=npx vitest run ../tests/StudentForm.test.tsx" & goto launch_test
 if "%tchoice%"=="3" set "TEST_CMD=npx vitest run ../tests/CourseForm.test.tsx" & goto launch_test
 if "%tchoice%"=="4" set "TEST_CMD=npx vitest run ../tests/EnrollmentForm.test.tsx" & goto launch_test
-if "%tchoice%"=="5" goto menu
+if "%tchoice%"=="5" set "TEST_CMD=cd ..\backend && python -m pytest -q tests" & goto launch_test
+if "%tchoice%"=="6" goto menu
 goto test_menu
 
 :launch_test
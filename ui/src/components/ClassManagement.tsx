@@ -541,6 +541,14 @@ export function ClassManagement({ onBack, userRole, teacherUserId }: ClassManage
           teacher_id: classData.teacherId || undefined,
           room_number: classData.room,
           schedule: classData.schedule?.days?.join(", "),
+          timetable:
+            classData.schedule?.startTime && classData.schedule?.endTime
+              ? classData.schedule.days.map((day) => ({
+                  day,
+                  start: classData.schedule!.startTime,
+                  end: classData.schedule!.endTime,
+                }))
+              : undefined,
           semester: semesterValue,
           year: classData.year ? Number(classData.year) : undefined,
           capacity: classData.enrollment?.max,
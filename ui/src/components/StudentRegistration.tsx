@@ -86,7 +86,7 @@ export function StudentRegistration({ onBack, registeredBy }: StudentRegistratio
         roll_number: formData.rollNumber,
         department_id: formData.department || undefined,
         department: departmentName,
-        face_embeddings: JSON.stringify(capturedImages),
+        images: capturedImages,
         registered_by: registeredBy || undefined,
       });
 
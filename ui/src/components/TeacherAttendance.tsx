@@ -31,15 +31,14 @@ import {
 import { EditAttendanceModal } from "./EditAttendanceModal";
 import { ClassManagement } from "./ClassManagement";
 import {
-  fetchTeacherStats,
-  fetchTeacherStudents,
+  fetchTeacherWorkspace,
   batchMarkAttendance,
   fetchCorrectionRequests,
   resolveCorrectionRequest,
   CorrectionRequest,
   getOrCreateSession,
   lockSession,
-  fetchLectures,
+  TeacherWorkspace,
 } from "../lib/api";
 
 import {
@@ -88,6 +87,8 @@ interface AttendanceRecord {
   manualStatus?: string;
 }
 
+type DaySessions = TeacherWorkspace["today"];
+
 interface TeacherAttendanceProps {
   userId: number;
   onBack: () => void;
@@ -112,6 +113,10 @@ export function TeacherAttendance({ userId, onBack, onLogout, onNavigateToReport
   const [requests, setRequests] = useState<CorrectionRequest[]>([]);
   const [loadingRequests, setLoadingRequests] = useState(false);
   const [lectureSchedules, setLectureSchedules] = useState<Record<string, number[]>>({});
+  // Sessions of the teacher's lectures on the selected date; a session is
+  // only created (get-or-create) when attendance is submitted or locked
+  const [daySessions, setDaySessions] = useState<DaySessions | null>(null);
+  const [lectureIds, setLectureIds] = useState<Record<string, number>>({});
 
   const [attendanceData, setAttendanceData] = useState<AttendanceRecord[]>([]);
   const [classOptions, setClassOptions] = useState<string[]>([]);
@@ -129,15 +134,17 @@ export function TeacherAttendance({ userId, onBack, onLogout, onNavigateToReport
     setLoading(true);
     setError(null);
     try {
-      const [teacherSummary, students, allLectures] = await Promise.all([
-        fetchTeacherStats(userId),
-        fetchTeacherStudents(userId),
-        fetchLectures(),
-      ]);
+      // One request for stats, roster, the teacher's own lectures and pending corrections
+      const workspace = await fetchTeacherWorkspace(userId, format(manualDate, "yyyy-MM-dd"));
+      const teacherSummary = workspace.stats;
+      const students = workspace.roster;
+      setRequests(workspace.pending_corrections);
+      setDaySessions(workspace.today);
+      setLectureIds(Object.fromEntries(workspace.lectures.map(lecture => [lecture.lecture_name, lecture.lecture_id])));
 
       // Process schedules
       const schedules: Record<string, number[]> = {};
-      allLectures.forEach(lecture => {
+      workspace.lectures.forEach(lecture => {
         if (lecture.schedule) {
           // Robust parsing for "Monday", "Mon", "Tu", "Tues", etc.
           const days: number[] = [];
@@ -192,28 +199,42 @@ export function TeacherAttendance({ userId, onBack, onLogout, onNavigateToReport
     loadData();
   }, [userId]);
 
+  const sessionFor = (sessions: DaySessions | null, lectureName: string) =>
+    sessions?.sessions.find(session => session.lecture_id === lectureIds[lectureName]);
+
   // Load existing session data when class or date changes
   useEffect(() => {
-    const loadSession = async () => {
-      if (!selectedClass || !manualDate) return;
+    // daySessions arrives with the workspace in loadData
+    if (!selectedClass || !manualDate || !userId || !daySessions) return;
+    const dateStr = format(manualDate, "yyyy-MM-dd");
+    let cancelled = false;
 
-      const dateStr = format(manualDate, "yyyy-MM-dd");
-      setIsLocked(false); // Reset lock state initially
+    const loadSession = async () => {
       try {
-        const { existing_records, status } = await getOrCreateSession(selectedClass, dateStr);
-
-        // Check if session is locked
-        if (status === 'locked') {
-          setIsLocked(true);
+        if (daySessions.date !== dateStr) {
+          // Another day: read its sessions without creating one
+          setIsLocked(false);
+          const workspace = await fetchTeacherWorkspace(userId, dateStr);
+          if (!cancelled) setDaySessions(workspace.today);
+          return;
         }
 
+        const session = sessionFor(daySessions, selectedClass);
+        setIsLocked(Boolean(session && (session.attendance_locked || session.status.toLowerCase() === "locked")));
+
+        // The session exists and has marks, so get-or-create only reads them
+        const existing_records: Record<number, string> = session && session.marked > 0
+          ? (await getOrCreateSession(selectedClass, dateStr)).existing_records
+          : {};
+        if (cancelled) return;
+
         if (existing_records && Object.keys(existing_records).length > 0) {
           setAttendanceData(prev => prev.map(record => ({
             ...record,
             manualStatus: existing_records[record.userId] || record.manualStatus
           })));
         } else {
-          // Reset if new session and not locked (if locked, we assume records are there or it's just locked empty)
+          // No marks yet for this class and day
           setAttendanceData(prev => prev.map(record => ({
             ...record,
             manualStatus: undefined
@@ -224,7 +245,35 @@ export function TeacherAttendance({ userId, onBack, onLogout, onNavigateToReport
       }
     };
     loadSession();
-  }, [selectedClass, manualDate]);
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedClass, manualDate, daySessions, lectureIds, userId]);
+
+  // Record a session created or changed by submit/lock so the day stays current
+  const rememberSession = (sessionId: number, changes: Partial<DaySessions["sessions"][number]>) => {
+    setDaySessions(prev => {
+      if (!prev) return prev;
+      const known = prev.sessions.some(session => session.session_id === sessionId);
+      const sessions = known
+        ? prev.sessions.map(session => session.session_id === sessionId ? { ...session, ...changes } : session)
+        : [
+            ...prev.sessions,
+            {
+              session_id: sessionId,
+              lecture_id: lectureIds[selectedClass],
+              start_time: null,
+              end_time: null,
+              status: "Scheduled",
+              attendance_locked: false,
+              marked: 0,
+              present: 0,
+              ...changes,
+            },
+          ];
+      return { ...prev, sessions };
+    });
+  };
 
   const handleExport = () => {
     // Mock export functionality
@@ -237,12 +286,10 @@ export function TeacherAttendance({ userId, onBack, onLogout, onNavigateToReport
 
     if (confirm("Are you sure you want to lock this attendance session? This action cannot be undone.")) {
       try {
-        // We typically need the session ID, so we might need to get it again or store it.
-        // For simplicity, let's assume we get it again or it was stored. 
-        // Ideally we should store currentSessionId in state. 
-        // Let's do a quick fetch to get ID.
-        const { session_id } = await getOrCreateSession(selectedClass, dateStr);
+        const session = daySessions?.date === dateStr ? sessionFor(daySessions, selectedClass) : undefined;
+        const session_id = session ? session.session_id : (await getOrCreateSession(selectedClass, dateStr)).session_id;
         await lockSession(session_id);
+        rememberSession(session_id, { attendance_locked: true });
         setIsLocked(true);
         alert("Attendance has been locked.");
       } catch (e: any) {
@@ -278,6 +325,10 @@ export function TeacherAttendance({ userId, onBack, onLogout, onNavigateToReport
       }));
 
       await batchMarkAttendance(records, userId);
+      rememberSession(sessionId, {
+        marked: records.length,
+        present: records.filter(record => record.status === "Present" || record.status === "Late").length,
+      });
       alert("Attendance marked successfully");
     } catch (e: any) {
       alert("Error marking attendance: " + e.message);
@@ -19,7 +19,11 @@ export interface Student {
   full_name: string;
   email?: string;
   lecture?: string;
+  lecture_count?: number;
   enrollment_status?: string;
+  lectures?: StudentLectureBreakdown[];
+  at_risk?: boolean;
+  absence_streak?: number;
   // Stats
   total_classes?: number;
   present?: number;
@@ -28,6 +32,35 @@ export interface Student {
   attendance_percentage?: number;
 }
 
+export interface StudentLectureBreakdown {
+  lecture_id: number;
+  lecture_name: string;
+  course_code?: string;
+  enrollment_status?: string;
+  total_classes: number;
+  present: number;
+  absent: number;
+  late: number;
+  attendance_percentage: number;
+  at_risk?: boolean;
+  absence_streak?: number;
+  recent_rate?: number | null;
+}
+
+export interface AttendanceRisk {
+  user_id: number;
+  lecture_id: number;
+  total_sessions: number;
+  attended_sessions: number;
+  attendance_rate: number | null;
+  recent_rate: number | null;
+  current_absence_streak: number;
+  longest_absence_streak: number;
+  is_at_risk: boolean;
+  last_session_date: string | null;
+  computed_at: string | null;
+}
+
 export interface CreateUserPayload {
   username: string;
   password: string;
@@ -47,6 +80,9 @@ export interface OverviewStats {
   total_teachers: number;
   total_lectures: number;
   total_enrollments: number;
+  // "approximate" when served from SQL Server row-count metadata
+  accuracy?: "exact" | "approximate";
+  source?: string;
 }
 
 export interface Department {
@@ -110,7 +146,9 @@ export interface StudentDashboard {
     room_number?: string;
     semester?: string | number;
     year?: string | number;
+    risk?: AttendanceRisk | null;
   }>;
+  at_risk?: boolean;
   attendance: { present: number; absent: number; late: number; unknown: number; percentage: number };
   recent_records: Array<{
     attendance_id: number;
@@ -128,6 +166,7 @@ export interface CameraResponse {
   camera_name: string;
   location: string;
   stream_url: string;
+  room_number?: string | null;
   assigned_lecture_id: number | null;
   status: "Online" | "Offline" | "Error" | "Maintenance";
   last_checked: string | null;
@@ -156,9 +195,26 @@ export interface LecturePayload {
   room_number?: string;
   capacity?: number;
   schedule?: string;
+  timetable?: TimetableSlot[];
   camera?: CameraResponse | null;
 }
 
+export interface TimetableSlot {
+  slot_id?: number;
+  day: string;
+  start: string;
+  end: string;
+  room?: string | null;
+}
+
+export interface CameraActiveSession {
+  camera_id: number;
+  at: string;
+  lecture_id: number | null;
+  slot: (TimetableSlot & { lecture_id: number }) | null;
+  session: { session_id: number; session_date: string; status: string } | null;
+}
+
 export async function fetchDepartments(): Promise<Department[]> {
   const response = await fetch(withBase("/api/departments"));
   const payload = await response.json().catch(() => []);
@@ -245,7 +301,9 @@ export async function createStudent(input: {
   roll_number: string;
   department?: string;
   department_id?: string;
-  face_embeddings: string;
+  // Captured images are embedded server-side; face_embeddings is for precomputed vectors
+  images?: string[];
+  face_embeddings?: string;
   face_image_path?: string;
   registered_by?: number;
 }): Promise<any> {
@@ -264,6 +322,45 @@ export async function createStudent(input: {
   return payload;
 }
 
+export interface EnrollmentStatus {
+  user_id: number;
+  status: "processing" | "completed" | "failed";
+  model: string;
+  images: number;
+  accepted: number;
+  rejected: { index: number; reason: string }[];
+  templates?: number;
+  error?: string;
+}
+
+export async function reenrollStudent(
+  userId: number,
+  images: string[],
+  options?: { replace?: boolean; capture_device?: string }
+): Promise<EnrollmentStatus> {
+  const response = await fetch(withBase(`/api/students/${userId}/faces`), {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ images, ...options }),
+  });
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    const message = (payload && payload.error) || "Unable to start enrollment";
+    throw new Error(message);
+  }
+  return payload as EnrollmentStatus;
+}
+
+export async function fetchEnrollmentStatus(userId: number): Promise<EnrollmentStatus> {
+  const response = await fetch(withBase(`/api/students/${userId}/enrollment`));
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    const message = (payload && payload.error) || "Unable to load enrollment status";
+    throw new Error(message);
+  }
+  return payload as EnrollmentStatus;
+}
+
 export async function fetchStudents(): Promise<any[]> {
   const response = await fetch(withBase("/api/students"));
   const payload = await response.json().catch(() => []);
@@ -314,8 +411,12 @@ export async function fetchTeacherStats(userId: number): Promise<TeacherStats> {
   return payload as TeacherStats;
 }
 
-export async function fetchTeacherStudents(userId: number): Promise<Student[]> {
-  const response = await fetch(withBase(`/api/teachers/${userId}/students`));
+export async function fetchTeacherStudents(
+  userId: number,
+  options?: { breakdown?: boolean }
+): Promise<Student[]> {
+  const query = options?.breakdown ? "?breakdown=lecture" : "";
+  const response = await fetch(withBase(`/api/teachers/${userId}/students${query}`));
   const payload = await response.json().catch(() => []);
   if (!response.ok) {
     const message = (payload && (payload.error as string)) || "Unable to load students";
@@ -324,6 +425,51 @@ export async function fetchTeacherStudents(userId: number): Promise<Student[]> {
   return payload as Student[];
 }
 
+export interface TeacherWorkspace {
+  teacher_id: number;
+  user_id: number;
+  stats: TeacherStats;
+  lectures: Array<{
+    lecture_id: number;
+    lecture_name: string;
+    course_code: string | null;
+    department: string | null;
+    semester: number | null;
+    year: number | null;
+    schedule: string | null;
+    room_number: string | null;
+    capacity: number | null;
+    enrolled_count: number;
+  }>;
+  roster: Student[];
+  roster_summary: { students: number; at_risk: number; average_attendance: number | null };
+  pending_corrections: CorrectionRequest[];
+  today: {
+    date: string;
+    sessions: Array<{
+      session_id: number;
+      lecture_id: number;
+      start_time: string | null;
+      end_time: string | null;
+      status: string;
+      attendance_locked: boolean;
+      marked: number;
+      present: number;
+    }>;
+  };
+}
+
+export async function fetchTeacherWorkspace(userId: number, date?: string): Promise<TeacherWorkspace> {
+  const query = date ? `?date=${encodeURIComponent(date)}` : "";
+  const response = await fetch(withBase(`/api/teachers/${userId}/workspace${query}`));
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    const message = (payload && payload.error) || "Unable to load teacher workspace";
+    throw new Error(message);
+  }
+  return payload as TeacherWorkspace;
+}
+
 export async function fetchLectureSummaries(options?: { teacherUserId?: number }): Promise<LectureSummary[]> {
   const query = options?.teacherUserId ? `?teacher_user_id=${options.teacherUserId}` : "";
   const response = await fetch(withBase(`/api/lectures/summary${query}`));
@@ -335,8 +481,15 @@ export async function fetchLectureSummaries(options?: { teacherUserId?: number }
   return payload as LectureSummary[];
 }
 
-export async function fetchAttendanceReports(teacherUserId?: number): Promise<AttendanceReports> {
-  const query = teacherUserId ? `?teacher_user_id=${teacherUserId}` : "";
+export async function fetchAttendanceReports(
+  teacherUserId?: number,
+  range?: { from?: string; to?: string }
+): Promise<AttendanceReports> {
+  const params = new URLSearchParams();
+  if (teacherUserId) params.set("teacher_user_id", String(teacherUserId));
+  if (range?.from) params.set("from", range.from);
+  if (range?.to) params.set("to", range.to);
+  const query = params.toString() ? `?${params.toString()}` : "";
   const response = await fetch(withBase(`/api/reports/attendance${query}`));
   const payload = await response.json().catch(() => ({}));
   if (!response.ok) {
@@ -346,6 +499,92 @@ export async function fetchAttendanceReports(teacherUserId?: number): Promise<At
   return payload as AttendanceReports;
 }
 
+export interface AttendanceTimeseries {
+  interval: "day" | "week";
+  group_by: "lecture" | "department";
+  groups: { key: Array<number | string | null>; name: Array<string | null> };
+  series: {
+    period: string[];
+    group: number[];
+    total: number[];
+    present: number[];
+    late: number[];
+    absent: number[];
+    excused: number[];
+    unknown: number[];
+    rate: number[];
+  };
+}
+
+export async function fetchAttendanceTimeseries(options?: {
+  interval?: "day" | "week";
+  groupBy?: "lecture" | "department";
+  teacherUserId?: number;
+  lectureId?: number;
+  department?: string;
+  from?: string;
+  to?: string;
+}): Promise<AttendanceTimeseries> {
+  const params = new URLSearchParams();
+  if (options?.interval) params.set("interval", options.interval);
+  if (options?.groupBy) params.set("group_by", options.groupBy);
+  if (options?.teacherUserId) params.set("teacher_user_id", String(options.teacherUserId));
+  if (options?.lectureId) params.set("lecture_id", String(options.lectureId));
+  if (options?.department) params.set("department", options.department);
+  if (options?.from) params.set("from", options.from);
+  if (options?.to) params.set("to", options.to);
+  const query = params.toString() ? `?${params.toString()}` : "";
+  const response = await fetch(withBase(`/api/analytics/timeseries${query}`));
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    const message = (payload && (payload.error as string)) || "Unable to load attendance trends";
+    throw new Error(message);
+  }
+  return payload as AttendanceTimeseries;
+}
+
+export interface ColumnarTable<Row extends Record<string, unknown> = Record<string, unknown>> {
+  columns: Array<keyof Row & string>;
+  rows: unknown[][];
+}
+
+export async function fetchColumnar<Row extends Record<string, unknown>>(
+  path: "/api/users" | "/api/students" | "/api/enrollments"
+): Promise<ColumnarTable<Row>> {
+  const response = await fetch(withBase(`${path}?format=columnar`));
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    const message = (payload && (payload.error as string)) || "Unable to load table";
+    throw new Error(message);
+  }
+  return payload as ColumnarTable<Row>;
+}
+
+export interface SearchResult {
+  type: "user" | "lecture";
+  id: number;
+  label: string;
+  detail: string | null;
+  role: string | null;
+  score: number;
+}
+
+export async function searchDirectory(
+  query: string,
+  options?: { type?: "user" | "lecture"; limit?: number }
+): Promise<SearchResult[]> {
+  const params = new URLSearchParams({ q: query });
+  if (options?.type) params.set("type", options.type);
+  if (options?.limit) params.set("limit", String(options.limit));
+  const response = await fetch(withBase(`/api/search?${params.toString()}`));
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    const message = (payload && (payload.error as string)) || "Unable to search";
+    throw new Error(message);
+  }
+  return (payload.results ?? []) as SearchResult[];
+}
+
 export async function fetchStudentDashboard(userId: number): Promise<StudentDashboard> {
   const response = await fetch(withBase(`/api/students/${userId}/dashboard`));
   const payload = await response.json().catch(() => ({}));
@@ -356,6 +595,90 @@ export async function fetchStudentDashboard(userId: number): Promise<StudentDash
   return payload as StudentDashboard;
 }
 
+export interface AttendanceHistory {
+  user_id: number;
+  lecture_id: number;
+  sessions: number;
+  present: number;
+  late: number;
+  absent: number;
+  excused: number;
+  attendance_rate: number | null;
+  absence_streak: number;
+  recent_pattern: string;
+}
+
+export async function fetchAttendanceHistory(
+  scope: { userId: number; lectureId?: number } | { lectureId: number }
+): Promise<AttendanceHistory[]> {
+  const path =
+    "userId" in scope
+      ? `/api/students/${scope.userId}/attendance-history${scope.lectureId ? `?lecture_id=${scope.lectureId}` : ""}`
+      : `/api/lectures/${scope.lectureId}/attendance-history`;
+  const response = await fetch(withBase(path));
+  const payload = await response.json().catch(() => []);
+  if (!response.ok) {
+    const message = (payload && (payload.error as string)) || "Unable to load attendance history";
+    throw new Error(message);
+  }
+  return payload as AttendanceHistory[];
+}
+
+export interface ChangeEntry {
+  change_id: number;
+  entity: "attendance" | "enrollment" | "user" | "lecture";
+  key: string;
+  operation: "insert" | "update" | "delete";
+  user_id: number | null;
+  lecture_id: number | null;
+  session_id: number | null;
+  changed_at: string | null;
+}
+
+export async function fetchChanges(
+  since: number,
+  options?: { limit?: number; entity?: string[]; lectureId?: number }
+): Promise<{ changes: ChangeEntry[]; next_cursor: number; has_more: boolean }> {
+  const params = new URLSearchParams({ since: String(since) });
+  if (options?.limit) params.set("limit", String(options.limit));
+  if (options?.entity?.length) params.set("entity", options.entity.join(","));
+  if (options?.lectureId) params.set("lecture_id", String(options.lectureId));
+  const response = await fetch(withBase(`/api/changes?${params.toString()}`));
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    const message = (payload && (payload.error as string)) || "Unable to load changes";
+    throw new Error(message);
+  }
+  return payload;
+}
+
+export interface FaceImage {
+  image_id: number;
+  student_id: number;
+  image_path: string;
+  capture_device: string | null;
+  capture_date: string | null;
+  quality_score: number | null;
+  has_embedding: boolean;
+}
+
+export async function scoreStudentFaces(
+  userId: number,
+  options?: { keep?: number; rescore?: boolean }
+): Promise<{ user_id: number; scored: number; templates: number[]; faces: FaceImage[] }> {
+  const response = await fetch(withBase(`/api/students/${userId}/faces/score`), {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(options ?? {}),
+  });
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    const message = (payload && (payload.error as string)) || "Unable to score face images";
+    throw new Error(message);
+  }
+  return payload;
+}
+
 export async function fetchCameras(): Promise<CameraResponse[]> {
   const response = await fetch(withBase("/api/cameras"));
   const payload = await response.json().catch(() => []);
@@ -371,6 +694,7 @@ export async function createCamera(input: {
   location: string;
   stream_url: string;
   status?: string;
+  room_number?: string | null;
   assigned_lecture_id?: number | null;
 }): Promise<CameraResponse> {
   const response = await fetch(withBase("/api/cameras"), {
@@ -435,6 +759,49 @@ export async function deleteLecture(lectureId: number): Promise<void> {
   }
 }
 
+export interface BackgroundJob {
+  job_id: number;
+  kind: string;
+  status: "queued" | "running" | "succeeded" | "failed";
+  progress: number;
+  progress_message: string | null;
+  attempts: number;
+  max_attempts: number;
+  run_after: string | null;
+  result: any;
+  error: string | null;
+  created_at: string | null;
+  started_at: string | null;
+  finished_at: string | null;
+  status_url?: string;
+}
+
+export async function fetchJob(jobId: number): Promise<BackgroundJob> {
+  const response = await fetch(withBase(`/api/jobs/${jobId}`));
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    throw new Error((payload && payload.error) || "Unable to load job");
+  }
+  return payload as BackgroundJob;
+}
+
+export async function waitForJob(jobId: number, intervalMs = 1000, timeoutMs = 120000): Promise<BackgroundJob> {
+  const deadline = Date.now() + timeoutMs;
+  for (;;) {
+    const job = await fetchJob(jobId);
+    if (job.status === "succeeded") {
+      return job;
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Job failed");
+    }
+    if (Date.now() > deadline) {
+      throw new Error("Timed out waiting for job");
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
+
 export async function assignLectureTeacher(lectureId: number, teacherId: number): Promise<LecturePayload> {
   const response = await fetch(withBase(`/api/lectures/${lectureId}/assign-teacher`), {
     method: "POST",
@@ -448,6 +815,41 @@ export async function assignLectureTeacher(lectureId: number, teacherId: number)
   return payload as LecturePayload;
 }
 
+export async function fetchLectureTimetable(lectureId: number): Promise<{ schedule: string | null; timetable: TimetableSlot[] }> {
+  const response = await fetch(withBase(`/api/lectures/${lectureId}/timetable`));
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    throw new Error((payload && payload.error) || "Unable to load timetable");
+  }
+  return payload;
+}
+
+export async function replaceLectureTimetable(
+  lectureId: number,
+  data: { timetable: TimetableSlot[] } | { schedule: string },
+): Promise<{ schedule: string | null; timetable: TimetableSlot[] }> {
+  const response = await fetch(withBase(`/api/lectures/${lectureId}/timetable`), {
+    method: "PUT",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(data),
+  });
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    throw new Error((payload && payload.error) || "Unable to save timetable");
+  }
+  return payload;
+}
+
+export async function fetchCameraActiveSession(cameraId: number, at?: string): Promise<CameraActiveSession> {
+  const query = at ? `?at=${encodeURIComponent(at)}` : "";
+  const response = await fetch(withBase(`/api/cameras/${cameraId}/active-session${query}`));
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    throw new Error((payload && payload.error) || "Unable to resolve active session");
+  }
+  return payload as CameraActiveSession;
+}
+
 export async function assignLectureCamera(lectureId: number, cameraId: number): Promise<LecturePayload> {
   const response = await fetch(withBase(`/api/lectures/${lectureId}/assign-camera`), {
     method: "POST",
@@ -472,12 +874,14 @@ export async function fetchLectures(): Promise<LecturePayload[]> {
 
 export async function enrollStudentInLecture(
   lectureId: number,
-  userId: number
+  userId: number,
+  options?: { waitlist?: boolean }
 ): Promise<any> {
+  // With waitlist, a full lecture answers 202 { waitlisted: true, position }
   const response = await fetch(withBase(`/api/lectures/${lectureId}/enroll`), {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ user_id: userId, is_teacher: false }),
+    body: JSON.stringify({ user_id: userId, is_teacher: false, waitlist: Boolean(options?.waitlist) }),
   });
   const payload = await response.json().catch(() => ({}));
   if (!response.ok) {
@@ -510,6 +914,34 @@ export async function removeStudentFromLecture(
   }
 }
 
+export interface LectureWaitlist {
+  lecture_id: number;
+  capacity: number | null;
+  enrolled_count: number;
+  waitlist: Array<{ position: number; user_id: number; full_name: string; requested_at: string | null }>;
+}
+
+export async function fetchLectureWaitlist(lectureId: number): Promise<LectureWaitlist> {
+  const response = await fetch(withBase(`/api/lectures/${lectureId}/waitlist`));
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    const message = (payload && (payload.error as string)) || "Unable to load waitlist";
+    throw new Error(message);
+  }
+  return payload as LectureWaitlist;
+}
+
+export async function leaveLectureWaitlist(lectureId: number, userId: number): Promise<void> {
+  const response = await fetch(withBase(`/api/lectures/${lectureId}/waitlist/${userId}`), {
+    method: "DELETE",
+  });
+  if (!response.ok) {
+    const payload = await response.json().catch(() => ({}));
+    const message = (payload && (payload.error as string)) || "Unable to leave waitlist";
+    throw new Error(message);
+  }
+}
+
 export async function fetchLectureAttendanceSummary(
   lectureId: number
 ): Promise<{
@@ -585,7 +1017,7 @@ export async function batchMarkAttendance(
   }
 }
 
-export async function getOrCreateSession(lectureName: string, date: string): Promise<{ session_id: number; existing_records: Record<number, string>; status?: string }> {
+export async function getOrCreateSession(lectureName: string, date: string): Promise<{ session_id: number; existing_records: Record<number, string>; status?: string; attendance_locked?: boolean }> {
   const response = await fetch(withBase("/api/sessions/get-or-create"), {
     method: "POST",
     headers: { "Content-Type": "application/json" },
@@ -595,12 +1027,14 @@ export async function getOrCreateSession(lectureName: string, date: string): Pro
   if (!response.ok) {
     throw new Error((payload && payload.error) || "Unable to get or create session");
   }
-  return payload as { session_id: number; existing_records: Record<number, string>; status?: string };
+  return payload as { session_id: number; existing_records: Record<number, string>; status?: string; attendance_locked?: boolean };
 }
 
-export async function lockSession(sessionId: number): Promise<void> {
+export async function lockSession(sessionId: number, lockedBy?: number): Promise<void> {
   const response = await fetch(withBase(`/api/sessions/${sessionId}/lock`), {
     method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ locked_by: lockedBy }),
   });
   if (!response.ok) {
     const payload = await response.json().catch(() => ({}));
@@ -668,4 +1102,22 @@ export async function resolveCorrectionRequest(
   return payload as CorrectionRequest;
 }
 
+export async function bulkResolveCorrectionRequests(
+  request_ids: number[],
+  status: "Approved" | "Rejected",
+  reviewed_by: number,
+  notes?: string
+): Promise<{ status: string; resolved: number[]; skipped: number[] }> {
+  const response = await fetch(withBase("/api/attendance/correction/resolve"), {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ request_ids, status, reviewed_by, notes }),
+  });
+  const payload = await response.json().catch(() => ({}));
+  if (!response.ok) {
+    throw new Error((payload && payload.error) || "Unable to resolve requests");
+  }
+  return payload as { status: string; resolved: number[]; skipped: number[] };
+}
+
 export const API_BASE_URL = normalizedBase || "(proxy)";